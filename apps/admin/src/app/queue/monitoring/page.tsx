@@ -31,7 +31,19 @@ export default function QueueMonitoringPage() {
     if (statsData && statsData.length > 0) setStats(statsData[0]);
 
     const { data: jobsData } = await supabase.from('jobs').select('*').order('created_at', { ascending: false }).limit(50);
-    setJobs(jobsData || []);
+    // Positions are computed on read (jobs.queue_position is no longer
+    // maintained), for every queued job on the page in one call
+    const queuedIds = (jobsData || []).filter((job) => job.status === 'queued').map((job) => job.id);
+    const positions = new Map<string, number>();
+    if (queuedIds.length > 0) {
+      const { data } = await supabase.rpc('get_queue_positions', { p_job_ids: queuedIds });
+      for (const row of data || []) positions.set(row.job_id, row.queue_position);
+    }
+    const withPositions = (jobsData || []).map((job) => ({
+      ...job,
+      queue_position: positions.get(job.id) ?? null,
+    }));
+    setJobs(withPositions);
     setLoading(false);
   }
 
@@ -84,7 +84,15 @@ export default function DoubtStatusPage() {
         return;
       }
 
-      setJob(data as Job);
+      // Position is computed on read (jobs.queue_position is no longer maintained)
+      let queuePosition: number | null = null;
+      if ((data as any).status === 'queued') {
+        const { data: position } = await supabase.rpc('get_queue_position', { p_job_id: jobId });
+        const row = Array.isArray(position) ? position[0] : position;
+        queuePosition = row?.queue_position ?? null;
+      }
+
+      setJob({ ...(data as Job), queue_position: queuePosition });
 
       // Stop polling on terminal states
       if (['completed', 'failed', 'cancelled'].includes((data as any).status)) {
@@ -56,7 +56,7 @@ export async function GET(request: NextRequest) {
       return NextResponse.json({ error: 'Unauthorized' }, { status: 401 });
     }
 
-    // Fetch revenue analytics view (created in migration 021)
+    // Fetch revenue analytics (materialized in migration 077; see refreshed_at)
     const { data: analytics, error: analyticsError } = await supabase
       .from('revenue_analytics')
       .select('*')
@@ -139,21 +139,12 @@ export async function GET(request: NextRequest) {
       ? ((convertedFromTrial || 0) / trialsStartedLast30) * 100
       : 0;
 
-    // Calculate LTV (simplified: average revenue per active user)
-    const { data: transactions } = await supabase
-      .from('payment_transactions')
-      .select('final_amount, user_id')
-      .eq('status', 'captured');
+    // Calculate LTV (simplified: average revenue per paying user), from the
+    // totals materialized in revenue_analytics (migration 077)
+    const totalRevenue = Number(analytics?.captured_revenue || 0);
+    const payingUsers = Number(analytics?.paying_users || 0);
 
-    let totalRevenue = 0;
-    const uniqueUsers = new Set();
-
-    transactions?.forEach((txn: any) => {
-      totalRevenue += txn.final_amount;
-      uniqueUsers.add(txn.user_id);
-    });
-
-    const ltv = uniqueUsers.size > 0 ? totalRevenue / uniqueUsers.size : 0;
+    const ltv = payingUsers > 0 ? totalRevenue / payingUsers : 0;
 
     // Get plan distribution
     const { data: planDistribution } = await supabase
@@ -226,7 +217,7 @@ export async function GET(request: NextRequest) {
         trialToPaidRate: Math.round(trialToPaidRate * 100) / 100,
         ltv: Math.round(ltv / 100),
         totalRevenue: Math.round(totalRevenue / 100),
-        uniqueCustomers: uniqueUsers.size,
+        uniqueCustomers: payingUsers,
       },
       planDistribution: Object.entries(distribution).map(([plan, count]) => ({
         plan,
@@ -236,6 +227,7 @@ export async function GET(request: NextRequest) {
           : 0
       })),
       mrrTrend,
+      analyticsRefreshedAt: analytics?.refreshed_at || null,
     });
 
   } catch (error) {
@@ -216,7 +216,43 @@ export async function PUT(request: NextRequest) {
       return NextResponse.json({ error: 'Unauthorized' }, { status: 401 });
     }
 
-    const { action, bookmark_ids } = await request.json();
+    const { action, bookmark_ids, reviews } = await request.json();
+
+    // AC 7, 8, 9: Submit a whole review session in one call
+    if (action === 'review') {
+      const validResponses = ['easy', 'medium', 'hard', 'again'];
+      if (!Array.isArray(reviews) || reviews.some((r: ReviewResponse) => !r?.bookmark_id || !validResponses.includes(r.response))) {
+        return NextResponse.json(
+          { error: 'reviews must be a list of { bookmark_id, response } with response easy, medium, hard, or again' },
+          { status: 400 }
+        );
+      }
+
+      const { data: results, error } = await supabase.rpc('process_bookmark_reviews', {
+        p_user_id: user.id,
+        p_reviews: reviews
+      });
+
+      if (error) throw error;
+
+      const { data: streak } = await supabase
+        .from('review_streaks')
+        .select('*')
+        .eq('user_id', user.id)
+        .single();
+
+      return NextResponse.json({
+        success: true,
+        reviewed: (results || []).filter((r: { success: boolean }) => r.success).length,
+        results: (results || []).map((r: { bookmark_id: string; success: boolean; new_interval: number; next_review: string }) => ({
+          bookmark_id: r.bookmark_id,
+          success: r.success,
+          new_interval_days: r.new_interval,
+          next_review_date: r.next_review
+        })),
+        streak: streak || { current_streak: 0 }
+      });
+    }
 
     // Initialize bookmarks for review
     if (action === 'initialize') {
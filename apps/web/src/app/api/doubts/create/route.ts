@@ -103,9 +103,9 @@ export async function POST(request: NextRequest) {
       );
     }
 
-    // Get queue position
-    const { data: stats } = await supabase.rpc('get_queue_stats');
-    const queuePosition = (stats?.total_queued || 0) + 1;
+    // Get queue position (computed on read from the job's priority and enqueue order)
+    const { data: position } = await supabase.rpc('get_queue_position', { p_job_id: job.id });
+    const queuePosition = (Array.isArray(position) ? position[0] : position)?.queue_position || 1;
 
     // Estimate wait time (rough calculation)
     const estimatedMinutes = Math.ceil(queuePosition * 3); // ~3 min per video average
@@ -451,7 +451,8 @@ async function awardXP(userId: string, body: any) {
 
   const amount = XP_VALUES[activity_type as keyof typeof XP_VALUES];
 
-  // Call database function to award XP
+  // Queue the XP event; the batch worker (process_xp_events) applies the
+  // totals, level, daily counters and badges
   const { data, error } = await supabase.rpc('award_xp', {
     p_user_id: userId,
     p_amount: amount,
@@ -465,50 +466,14 @@ async function awardXP(userId: string, body: any) {
     return NextResponse.json({ error: error.message }, { status: 500 });
   }
 
-  // Update specific counters in daily activity
-  const updateField = getActivityField(activity_type);
-  if (updateField) {
-    const today = new Date().toISOString().split('T')[0];
-    try {
-      await supabase.rpc('increment_daily_activity', {
-        p_user_id: userId,
-        p_date: today,
-        p_field: updateField
-      });
-    } catch {
-      // Fallback: direct upsert if RPC doesn't exist
-      await supabase.from('daily_activity')
-        .upsert({
-          user_id: userId,
-          activity_date: today,
-          [updateField]: 1
-        }, { onConflict: 'user_id,activity_date' });
-    }
-  }
-
-  // Check for new badges
-  const badges = await supabase.rpc('check_and_award_badges', {
-    p_user_id: userId
-  });
-
   return NextResponse.json({
     awarded: data,
     amount,
     activity_type,
-    newBadges: badges.data || []
+    queued: true
   });
 }
 
-function getActivityField(activityType: string): string | null {
-  const fieldMap: Record<string, string> = {
-    video_watched: 'videos_watched',
-    quiz_completed: 'quizzes_completed',
-    doubt_asked: 'doubts_asked',
-    notes_generated: 'notes_generated'
-  };
-  return fieldMap[activityType] || null;
-}
-
 // ============================================================================
 // UPDATE STREAK (AC 3)
 // ============================================================================
@@ -531,9 +496,7 @@ async function updateStreak(userId: string, body: any) {
     return NextResponse.json({ error: error.message }, { status: 500 });
   }
 
-  // Check for streak-based badges
-  await supabase.rpc('check_and_award_badges', { p_user_id: userId });
-
+  // Streak badges are checked by the batch worker once the day counts
   return NextResponse.json({
     streak: data
   });
@@ -590,8 +553,15 @@ async function visitRoom(userId: string, body: any) {
     return NextResponse.json({ error: error.message }, { status: 500 });
   }
 
-  // Check for explorer badge
-  await supabase.rpc('check_and_award_badges', { p_user_id: userId });
+  // Queue the visit so the batch worker re-checks the explorer badges
+  const { error: eventError } = await supabase
+    .from('xp_events')
+    .insert({ user_id: userId, activity_type: 'room_visited' });
+
+  if (eventError) {
+    console.error('Queue room visit error:', eventError);
+    return NextResponse.json({ error: eventError.message }, { status: 500 });
+  }
 
   return NextResponse.json({
     progress: data
@@ -0,0 +1,229 @@
+"""
+Cross-process coordination for multi-worker deployments
+
+Every uvicorn worker is a separate process, so anything that must be shared
+lives on disk under CRAWL_STATE_DIR:
+- coordination.sqlite (WAL): page cache, per-host politeness slots,
+  per-worker metric counters and the owner of each running frontier job
+- locks/: flock files for single-flight crawls and frontier job ownership
+
+SQLite's write lock serialises slot reservations, so the per-host interval
+holds across all workers without an external broker.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+STATE_DIR = os.getenv("CRAWL_STATE_DIR", "state")
+COORDINATION_DB = os.path.join(STATE_DIR, "coordination.sqlite")
+LOCK_DIR = os.path.join(STATE_DIR, "locks")
+
+CACHE_TTL = float(os.getenv("CRAWL_CACHE_TTL", "900"))
+CACHE_PRUNE_INTERVAL = float(os.getenv("CRAWL_CACHE_PRUNE_INTERVAL", "300"))
+HOST_INTERVAL = float(os.getenv("CRAWL_HOST_INTERVAL", "1.0"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_cache (
+    cache_key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS host_slots (
+    host TEXT PRIMARY KEY,
+    next_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS worker_metrics (
+    pid INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (pid, name)
+);
+CREATE TABLE IF NOT EXISTS frontier_owners (
+    job_id TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class FileLock:
+    """Exclusive advisory lock on a file under LOCK_DIR"""
+
+    def __init__(self, name: str):
+        os.makedirs(LOCK_DIR, exist_ok=True)
+        self.path = os.path.join(LOCK_DIR, f"{name}.lock")
+        self._fd: Optional[int] = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(fd, flags)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class Coordinator:
+    """Shared cache, politeness limiter and metrics for all workers"""
+
+    def __init__(self, path: str = COORDINATION_DB):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def pid(self) -> int:
+        # Read per call: workers may be forked after this object is created
+        return os.getpid()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; crawls run in worker threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # -- page cache ---------------------------------------------------------
+
+    @staticmethod
+    def cache_key(url: str, profile: str) -> str:
+        return hashlib.sha256(f"{profile}|{url}".encode("utf-8")).hexdigest()
+
+    def cache_get(self, key: str) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT payload FROM page_cache WHERE cache_key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def cache_put(self, key: str, payload: dict, ttl: float = CACHE_TTL):
+        conn = self._conn()
+        conn.execute(
+            """INSERT INTO page_cache (cache_key, payload, expires_at) VALUES (?, ?, ?)
+               ON CONFLICT (cache_key) DO UPDATE SET
+                 payload = excluded.payload, expires_at = excluded.expires_at""",
+            (key, json.dumps(payload), time.time() + ttl),
+        )
+
+    def cache_prune(self) -> int:
+        return self._conn().execute(
+            "DELETE FROM page_cache WHERE expires_at <= ?", (time.time(),)
+        ).rowcount
+
+    # -- frontier job ownership --------------------------------------------
+
+    def register_job(self, job_id: str):
+        """Record this worker as the owner of a frontier job it started"""
+        self._conn().execute(
+            """INSERT INTO frontier_owners (job_id, pid, cancel_requested, updated_at)
+               VALUES (?, ?, 0, ?)
+               ON CONFLICT (job_id) DO UPDATE SET
+                 pid = excluded.pid, cancel_requested = 0, updated_at = excluded.updated_at""",
+            (job_id, self.pid, time.time()),
+        )
+
+    def finish_job(self, job_id: str):
+        self._conn().execute(
+            "DELETE FROM frontier_owners WHERE job_id = ? AND pid = ?", (job_id, self.pid)
+        )
+
+    def forget_job(self, job_id: str):
+        """Drop the record of a job whose owner died without finishing it"""
+        self._conn().execute("DELETE FROM frontier_owners WHERE job_id = ?", (job_id,))
+
+    def job_owner(self, job_id: str) -> Optional[int]:
+        row = self._conn().execute(
+            "SELECT pid FROM frontier_owners WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def request_cancel(self, job_id: str) -> Optional[int]:
+        """Ask the owning worker to stop a job; returns its pid, None if not running"""
+        conn = self._conn()
+        conn.execute(
+            "UPDATE frontier_owners SET cancel_requested = 1, updated_at = ? WHERE job_id = ?",
+            (time.time(), job_id),
+        )
+        return self.job_owner(job_id)
+
+    def cancel_requests(self) -> List[str]:
+        """Jobs owned by this worker that another worker asked to stop"""
+        rows = self._conn().execute(
+            "SELECT job_id FROM frontier_owners WHERE pid = ? AND cancel_requested = 1",
+            (self.pid,),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    # -- politeness ---------------------------------------------------------
+
+    def reserve_slot(self, host: str, interval: float = HOST_INTERVAL) -> float:
+        """Reserve the next crawl slot for host; returns seconds to wait"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT next_at FROM host_slots WHERE host = ?", (host,)
+            ).fetchone()
+            slot = max(now, row[0]) if row else now
+            conn.execute(
+                """INSERT INTO host_slots (host, next_at) VALUES (?, ?)
+                   ON CONFLICT (host) DO UPDATE SET next_at = excluded.next_at""",
+                (host, slot + interval),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return slot - now
+
+    # -- metrics ------------------------------------------------------------
+
+    def incr(self, name: str, value: float = 1):
+        self._conn().execute(
+            """INSERT INTO worker_metrics (pid, name, value, updated_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT (pid, name) DO UPDATE SET
+                 value = value + excluded.value, updated_at = excluded.updated_at""",
+            (self.pid, name, value, time.time()),
+        )
+
+    def metrics(self) -> dict:
+        rows = self._conn().execute(
+            "SELECT pid, name, value, updated_at FROM worker_metrics"
+        ).fetchall()
+        totals, workers = {}, {}
+        for pid, name, value, updated_at in rows:
+            totals[name] = totals.get(name, 0) + value
+            worker = workers.setdefault(str(pid), {"last_seen": 0})
+            worker[name] = value
+            worker["last_seen"] = max(worker["last_seen"], updated_at)
+        return {"totals": totals, "workers": workers}
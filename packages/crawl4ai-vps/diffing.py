@@ -0,0 +1,182 @@
+"""
+Paragraph-level content diffing for recrawled pages
+
+Every crawl of a URL (from /crawl in either mode, /batch and frontier jobs)
+records the block ids of the extracted text as a numbered version in a
+small SQLite store, keeping the last KEEP_VERSIONS versions per URL. On
+recrawl the new text is split into paragraph blocks and aligned against a
+stored version, so callers can process only what was added or changed.
+A delta consumer passes the version from its previous response as
+since_version, so crawls made by anyone else in between never hide a change
+from it. Block ids are derived from the block text, so an unchanged
+paragraph keeps the same id across crawls no matter where it moves.
+"""
+
+import difflib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from writer import canonicalize_url
+
+STATE_DIR = os.getenv("CRAWL_STATE_DIR", "state")
+VERSIONS_DB = os.path.join(STATE_DIR, "versions.sqlite")
+KEEP_VERSIONS = int(os.getenv("CRAWL_KEEP_VERSIONS", "20"))
+
+
+def split_blocks(content: str) -> List[dict]:
+    """Split text into paragraph blocks with content-derived ids"""
+    blocks = []
+    seen = {}
+    for para in re.split(r"\n\s*\n", content):
+        text = para.strip()
+        if not text:
+            continue
+        digest = hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+        # Repeated paragraphs (e.g. "Read more") get an occurrence suffix
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        block_id = digest[:16] if occurrence == 0 else f"{digest[:16]}-{occurrence}"
+        blocks.append({"id": block_id, "text": text})
+    return blocks
+
+
+def diff_blocks(old: List[dict], new: List[dict]) -> dict:
+    """Align two block lists and classify new blocks as added or changed"""
+    matcher = difflib.SequenceMatcher(
+        a=[b["id"] for b in old], b=[b["id"] for b in new], autojunk=False
+    )
+    added, changed, removed = [], [], []
+    unchanged = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            unchanged += i2 - i1
+        elif tag == "insert":
+            added.extend(new[j1:j2])
+        elif tag == "delete":
+            removed.extend(b["id"] for b in old[i1:i2])
+        else:  # replace: pair blocks positionally, spill extras
+            old_span, new_span = old[i1:i2], new[j1:j2]
+            for k, block in enumerate(new_span):
+                if k < len(old_span):
+                    changed.append({**block, "replaces": old_span[k]["id"]})
+                else:
+                    added.append(block)
+            removed.extend(b["id"] for b in old_span[len(new_span):])
+    return {
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "unchanged_count": unchanged,
+    }
+
+
+def delta_outputs(content: str, delta: Optional[dict], mode: str) -> Tuple[str, str]:
+    """
+    (response content, persisted content) for one crawl. Delta mode reduces
+    the response to the added and changed blocks, but the persisted content
+    is always the full text: daily_updates and knowledge_chunks hold whole
+    articles, and merge_crawl_staging() replaces a URL's chunks with the
+    ones submitted, so persisting a delta would drop the unchanged
+    paragraphs.
+    """
+    if mode != "delta" or delta is None:
+        return content, content
+    response = "\n\n".join(block["text"] for block in delta["added"] + delta["changed"])
+    return response, content
+
+
+class VersionStore:
+    """Numbered block-id versions of the extracted text per canonical URL"""
+
+    def __init__(self, path: str = VERSIONS_DB, keep: int = KEEP_VERSIONS):
+        self.path = path
+        self.keep = max(1, keep)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS page_block_versions (
+                    canonical_url TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    blocks TEXT NOT NULL,
+                    crawled_at TEXT NOT NULL,
+                    PRIMARY KEY (canonical_url, version)
+                )"""
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, url: str, version: Optional[int] = None) -> Optional[Tuple[int, List[dict]]]:
+        """(version, blocks) of url: the given version, else the latest"""
+        sql = "SELECT version, blocks FROM page_block_versions WHERE canonical_url = ?"
+        params: tuple = (canonicalize_url(url),)
+        if version is None:
+            sql += " ORDER BY version DESC LIMIT 1"
+        else:
+            sql += " AND version = ?"
+            params += (version,)
+        with self._lock:
+            row = self._connect().execute(sql, params).fetchone()
+        if row is None:
+            return None
+        return row[0], [{"id": block_id} for block_id in json.loads(row[1])]
+
+    def put(self, url: str, blocks: List[dict]) -> int:
+        """Store blocks as the next version of url (unless unchanged); returns its number"""
+        canonical = canonicalize_url(url)
+        ids = [b["id"] for b in blocks]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                row = conn.execute(
+                    """SELECT version, blocks FROM page_block_versions
+                       WHERE canonical_url = ? ORDER BY version DESC LIMIT 1""",
+                    (canonical,),
+                ).fetchone()
+                if row is not None and json.loads(row[1]) == ids:
+                    return row[0]
+                version = row[0] + 1 if row else 1
+                conn.execute(
+                    """INSERT INTO page_block_versions (canonical_url, version, blocks, crawled_at)
+                       VALUES (?, ?, ?, ?)""",
+                    (canonical, version, json.dumps(ids), datetime.now(timezone.utc).isoformat()),
+                )
+                conn.execute(
+                    "DELETE FROM page_block_versions WHERE canonical_url = ? AND version <= ?",
+                    (canonical, version - self.keep),
+                )
+        return version
+
+    def record(self, url: str, content: str, since_version: Optional[int] = None) -> dict:
+        """
+        Store the new version of url and return its delta against
+        since_version, or against the latest stored version when it is not
+        given. A since_version that is no longer kept gives a full resync
+        (every block added, resync=True).
+        """
+        new = split_blocks(content)
+        latest = self.get(url)
+        base = latest
+        resync = False
+        if since_version is not None:
+            base = self.get(url, since_version)
+            resync = base is None
+        version = self.put(url, new)
+
+        delta = diff_blocks(base[1] if base else [], new)
+        delta["version"] = version
+        delta["base_version"] = base[0] if base else None
+        delta["first_seen"] = latest is None
+        delta["resync"] = resync
+        return delta
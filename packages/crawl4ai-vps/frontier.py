@@ -0,0 +1,338 @@
+"""
+Link-graph frontier crawl for crawl4ai VPS Service
+
+Starts from seed URLs and follows extracted links breadth-first, subject to
+the domain allowlist, a depth limit and path include/exclude patterns.
+Visited URLs are tracked in a Bloom filter; the filter and the pending
+frontier are checkpointed to disk so an interrupted job resumes where it
+stopped instead of recrawling the section.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import struct
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+from writer import canonicalize_url
+
+STATE_DIR = os.getenv("CRAWL_STATE_DIR", "state")
+CHECKPOINT_EVERY = 25
+# Per-page results kept for status responses; older pages are only counted
+RECENT_PAGES = 100
+
+# Job ids become file names under STATE_DIR and the lock directory
+JOB_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def valid_job_id(job_id: str) -> bool:
+    return bool(job_id) and len(job_id) <= 64 and JOB_ID_PATTERN.fullmatch(job_id) is not None
+
+
+def _job_path(job_id: str, suffix: str) -> str:
+    if not valid_job_id(job_id):
+        raise ValueError(f"Invalid frontier job id: {job_id!r}")
+    return os.path.join(STATE_DIR, f"frontier_{job_id}{suffix}")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter with double hashing and a compact file format"""
+
+    HEADER = struct.Struct("<QIQ")  # bits, hashes, items added
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001):
+        bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.num_bits = max(bits, 8)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """Add item; returns False if it was (probably) already present"""
+        added = False
+        for p in self._positions(item):
+            mask = 1 << (p & 7)
+            if not self.bits[p >> 3] & mask:
+                self.bits[p >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def save(self, path: str):
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.HEADER.pack(self.num_bits, self.num_hashes, self.count))
+            f.write(self.bits)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        with open(path, "rb") as f:
+            num_bits, num_hashes, count = cls.HEADER.unpack(f.read(cls.HEADER.size))
+            bloom = cls.__new__(cls)
+            bloom.num_bits = num_bits
+            bloom.num_hashes = num_hashes
+            bloom.count = count
+            bloom.bits = bytearray(f.read())
+        return bloom
+
+
+def read_checkpoint(job_id: str) -> Optional[dict]:
+    """Last checkpointed status of a job, as written by FrontierJob.checkpoint"""
+    path = _job_path(job_id, ".json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    return {
+        "job_id": state["job_id"],
+        "status": state["status"],
+        "config": state["config"],
+        "pages_crawled": state["pages_crawled"],
+        "pages_failed": state.get("pages_failed", 0),
+        "frontier_size": len(state["frontier"]),
+        "visited_estimate": state.get("visited_count"),
+        "recent_pages": state.get("recent_pages", []),
+    }
+
+
+def link_urls(base_url: str, links) -> List[str]:
+    """Flatten crawl4ai link output (list or internal/external dict) to absolute URLs"""
+    if not links:
+        return []
+    if isinstance(links, dict):
+        items = [l for group in links.values() for l in (group or [])]
+    else:
+        items = list(links)
+
+    urls = []
+    for item in items:
+        href = item.get("href") if isinstance(item, dict) else item
+        if not href or href.startswith(("mailto:", "javascript:", "tel:", "#")):
+            continue
+        urls.append(urljoin(base_url, href))
+    return urls
+
+
+class FrontierJob:
+    """A resumable breadth-first crawl over one section of the link graph"""
+
+    def __init__(
+        self,
+        job_id: str,
+        seeds: List[str],
+        is_allowed: Callable[[str], bool],
+        max_depth: int = 2,
+        max_pages: int = 500,
+        include_patterns: Optional[List[str]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+        concurrency: int = 4,
+        bloom_capacity: int = 100_000,
+    ):
+        if not valid_job_id(job_id):
+            raise ValueError(f"Invalid frontier job id: {job_id!r}")
+        self.job_id = job_id
+        self.seeds = seeds
+        self.is_allowed = is_allowed
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.include_patterns = include_patterns or []
+        self.exclude_patterns = exclude_patterns or []
+        self._include = [re.compile(p) for p in self.include_patterns]
+        self._exclude = [re.compile(p) for p in self.exclude_patterns]
+        self.concurrency = concurrency
+
+        self.frontier: Deque[Tuple[str, int]] = deque()
+        self.visited = BloomFilter(capacity=bloom_capacity)
+        self.pages: Deque[dict] = deque(maxlen=RECENT_PAGES)
+        self.pages_crawled = 0
+        self.pages_failed = 0
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    # -- persistence --------------------------------------------------------
+
+    @property
+    def checkpoint_path(self) -> str:
+        return _job_path(self.job_id, ".json")
+
+    @property
+    def bloom_path(self) -> str:
+        return _job_path(self.job_id, ".bloom")
+
+    def config(self) -> dict:
+        return {
+            "seeds": self.seeds,
+            "max_depth": self.max_depth,
+            "max_pages": self.max_pages,
+            "include_patterns": self.include_patterns,
+            "exclude_patterns": self.exclude_patterns,
+            "concurrency": self.concurrency,
+        }
+
+    def checkpoint(self):
+        os.makedirs(STATE_DIR, exist_ok=True)
+        self.visited.save(self.bloom_path)
+        state = {
+            "job_id": self.job_id,
+            "config": self.config(),
+            "status": self.status,
+            "frontier": list(self.frontier),
+            "pages_crawled": self.pages_crawled,
+            "pages_failed": self.pages_failed,
+            "visited_count": self.visited.count,
+            "recent_pages": list(self.pages),
+        }
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def restore(self) -> bool:
+        """
+        Load frontier, counters and visited set from disk; False if no
+        checkpoint. The JSON file is the record of progress: the filter is
+        saved first, so after a crash between the two writes it may hold a
+        few more URLs than the count says, and if it is missing it is
+        rebuilt from the frontier. Either way pages_crawled carries over,
+        so max_pages bounds the job across resumes.
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return False
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        self.frontier = deque((url, depth) for url, depth in state["frontier"])
+        self.pages_crawled = state["pages_crawled"]
+        self.pages_failed = state.get("pages_failed", 0)
+        self.pages.extend(state.get("recent_pages", []))
+        if os.path.exists(self.bloom_path):
+            self.visited = BloomFilter.load(self.bloom_path)
+        else:
+            for url, _ in self.frontier:
+                self.visited.add(url)
+        self.visited.count = state.get("visited_count", self.visited.count)
+        return True
+
+    # -- filtering ----------------------------------------------------------
+
+    def accepts(self, url: str, depth: int) -> bool:
+        if depth > self.max_depth or not self.is_allowed(url):
+            return False
+        if depth == 0:
+            # Seeds are often index pages that the path patterns exclude
+            return True
+        path = urlparse(url).path or "/"
+        if self._include and not any(p.search(path) for p in self._include):
+            return False
+        return not any(p.search(path) for p in self._exclude)
+
+    def enqueue(self, url: str, depth: int):
+        canonical = canonicalize_url(url)
+        if self.accepts(canonical, depth) and self.visited.add(canonical):
+            self.frontier.append((canonical, depth))
+
+    # -- execution ----------------------------------------------------------
+
+    def status_dict(self) -> dict:
+        elapsed = None
+        if self.started_at:
+            elapsed = round((self.finished_at or time.time()) - self.started_at, 2)
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "error": self.error,
+            "config": self.config(),
+            "pages_crawled": self.pages_crawled,
+            "pages_failed": self.pages_failed,
+            "frontier_size": len(self.frontier),
+            "visited_estimate": self.visited.count,
+            "elapsed_seconds": elapsed,
+            "recent_pages": list(self.pages),
+        }
+
+    def _record(self, page: dict):
+        self.pages.append(page)
+        if not page["success"]:
+            self.pages_failed += 1
+
+    async def run(self, crawl: Callable, on_page: Optional[Callable] = None):
+        """
+        Crawl until the frontier is empty or max_pages is reached.
+        `crawl(url)` is a blocking call returning a crawl4ai result; it runs
+        in worker threads so up to `concurrency` pages are in flight at once,
+        and must therefore be safe to call from several threads (main.py
+        serialises the shared browser and overlaps only cache lookups and
+        politeness waits).
+        `on_page(url, result)` is awaited for each successful page.
+        """
+        self.status = "running"
+        self.started_at = time.time()
+        if not self.restore():
+            for seed in self.seeds:
+                self.enqueue(seed, 0)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def visit(url: str, depth: int):
+            async with semaphore:
+                try:
+                    result = await asyncio.to_thread(crawl, url)
+                except Exception as e:
+                    self._record({"url": url, "depth": depth, "success": False, "error": str(e)})
+                    return
+            self._record({
+                "url": url,
+                "depth": depth,
+                "title": result.title or "",
+                "success": result.success,
+            })
+            if not result.success:
+                return
+            if on_page is not None:
+                await on_page(url, result)
+            if depth < self.max_depth:
+                for link in link_urls(url, result.links):
+                    self.enqueue(link, depth + 1)
+
+        wave: List[Tuple[str, int]] = []
+        try:
+            while self.frontier and self.pages_crawled < self.max_pages:
+                wave = []
+                while self.frontier and len(wave) < min(
+                    CHECKPOINT_EVERY, self.max_pages - self.pages_crawled
+                ):
+                    wave.append(self.frontier.popleft())
+                await asyncio.gather(*(visit(url, depth) for url, depth in wave))
+                self.pages_crawled += len(wave)
+                wave = []
+                self.checkpoint()
+            self.status = "completed"
+        except asyncio.CancelledError:
+            # Put the unfinished wave back so a resume revisits it
+            self.frontier.extendleft(reversed(wave))
+            self.status = "interrupted"
+            raise
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
+            self.checkpoint()
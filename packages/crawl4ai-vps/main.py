@@ -10,11 +10,33 @@ Allowed domains:
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
-from typing import Optional, List
+from pydantic import BaseModel, Field, HttpUrl
+from typing import Optional, List, Dict, Literal
 import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from types import SimpleNamespace
 from urllib.parse import urlparse
 
+from writer import BulkWriter, canonicalize_url
+from frontier import FrontierJob, read_checkpoint, valid_job_id
+from coordination import CACHE_PRUNE_INTERVAL, Coordinator, FileLock
+from diffing import VersionStore, delta_outputs
+from render_profiles import (
+    DEFAULT_PROFILE,
+    DOMAIN_PROFILES,
+    PROFILES,
+    ProfileRunner,
+    RenderProfile,
+    resolve_profile,
+)
+
+logger = logging.getLogger(__name__)
+
 # Initialize FastAPI app
 app = FastAPI(
     title="crawl4ai UPSC Service",
@@ -52,23 +74,181 @@ ALLOWED_DOMAINS = [
     "niti.gov.in",
 ]
 
-# Global crawler instance
+# Global crawler instance (one Selenium browser; not thread-safe)
 _crawler = None
+_crawler_init_lock = threading.Lock()
+
+# Bulk Postgres writer (enabled when CRAWL_PG_DSN is set)
+CRAWL_PG_DSN = os.getenv("CRAWL_PG_DSN")
+_writer: Optional[BulkWriter] = None
+
+# Render profiles (resource blocking + load caps) and their timings
+_renderer = ProfileRunner()
+
+# Extracted versions of every crawled page, for delta responses
+_versions = VersionStore()
+
+# Frontier crawl jobs by id (checkpoints live in CRAWL_STATE_DIR)
+_frontier_jobs: Dict[str, FrontierJob] = {}
+_frontier_tasks: Dict[str, asyncio.Task] = {}
+
+# Cache, per-host politeness and metrics shared by all uvicorn workers
+_coordinator = Coordinator()
+_maintenance_task: Optional[asyncio.Task] = None
+
+# How often a worker checks for cancel requests on the jobs it owns, and
+# how long DELETE /frontier waits for another worker to stop its job
+CANCEL_POLL_INTERVAL = 1.0
+REMOTE_STOP_WAIT = 10.0
+
+# Result fields kept in the shared page cache
+CACHED_FIELDS = ("title", "extracted_content", "markdown", "html", "links", "images", "success")
 
 def get_crawler():
     """Get or create crawler instance"""
     global _crawler
-    if _crawler is None:
+    with _crawler_init_lock:
+        if _crawler is None:
+            try:
+                from crawl4ai import WebCrawler
+                crawler = WebCrawler()
+                crawler.warmup()
+                _crawler = crawler
+            except ImportError:
+                raise HTTPException(
+                    status_code=500, 
+                    detail="crawl4ai not installed. Run: pip install crawl4ai"
+                )
+    return _crawler
+
+def get_writer() -> BulkWriter:
+    """Get the bulk writer, failing if persistence is not configured"""
+    if _writer is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Bulk writer disabled. Set CRAWL_PG_DSN to enable persist."
+        )
+    return _writer
+
+def count_lost_results(lost: int, _error: Exception):
+    # Called by the writer on the event loop; the SQLite write goes to a thread
+    asyncio.get_running_loop().run_in_executor(
+        None, _coordinator.incr, "writer_failed_results", lost
+    )
+
+@app.on_event("startup")
+async def start_writer():
+    global _writer
+    if CRAWL_PG_DSN:
+        writer = BulkWriter(
+            CRAWL_PG_DSN,
+            batch_size=int(os.getenv("CRAWL_PG_BATCH_SIZE", "200")),
+            max_buffer=int(os.getenv("CRAWL_PG_MAX_BUFFER", "2000")),
+            pool_size=int(os.getenv("CRAWL_PG_POOL_SIZE", "4")),
+            # Lost results show up in GET /metrics across all workers
+            on_error=count_lost_results,
+        )
+        await writer.start()
+        _writer = writer
+
+async def coordination_maintenance():
+    """Per-worker loop: act on cross-worker cancel requests, prune the page cache"""
+    next_prune = 0.0
+    while True:
         try:
-            from crawl4ai import WebCrawler
-            _crawler = WebCrawler()
-            _crawler.warmup()
-        except ImportError:
-            raise HTTPException(
-                status_code=500, 
-                detail="crawl4ai not installed. Run: pip install crawl4ai"
+            for job_id in await asyncio.to_thread(_coordinator.cancel_requests):
+                task = _frontier_tasks.get(job_id)
+                if task is not None:
+                    task.cancel()
+            if time.monotonic() >= next_prune:
+                pruned = await asyncio.to_thread(_coordinator.cache_prune)
+                if pruned:
+                    await asyncio.to_thread(_coordinator.incr, "cache_pruned", pruned)
+                next_prune = time.monotonic() + CACHE_PRUNE_INTERVAL
+        except Exception:
+            logger.exception("Coordination maintenance failed")
+        await asyncio.sleep(CANCEL_POLL_INTERVAL)
+
+@app.on_event("startup")
+async def start_coordination():
+    global _maintenance_task
+    # The first pass prunes the cache left by previous processes
+    _maintenance_task = asyncio.create_task(coordination_maintenance())
+
+@app.on_event("shutdown")
+async def stop_coordination():
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+        await asyncio.gather(_maintenance_task, return_exceptions=True)
+
+@app.on_event("shutdown")
+async def stop_writer():
+    global _writer
+    for task in _frontier_tasks.values():
+        task.cancel()
+    await asyncio.gather(*_frontier_tasks.values(), return_exceptions=True)
+    if _writer is not None:
+        await _writer.close()
+        _writer = None
+
+def get_profile(url: str, requested: Optional[str] = None) -> RenderProfile:
+    """Resolve the render profile for a URL, rejecting unknown names"""
+    try:
+        return resolve_profile(url, requested)
+    except KeyError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown render profile. Available: {sorted(PROFILES)}"
+        )
+
+def fetch_blocking(crawler, url: str, profile: RenderProfile, use_cache: bool = True):
+    """
+    Crawl url through the shared cache. A per-page file lock makes
+    concurrent requests for the same page (from any worker) wait for one
+    render, and each render first reserves a per-host politeness slot.
+    Safe to call from many threads: the shared browser is only driven inside
+    _renderer.run, which holds the process-wide render lock.
+    """
+    key = Coordinator.cache_key(canonicalize_url(url), profile.name)
+    with FileLock(f"fetch_{key[:32]}"):
+        if use_cache:
+            cached = _coordinator.cache_get(key)
+            if cached is not None:
+                _coordinator.incr("cache_hits")
+                return SimpleNamespace(**cached)
+            _coordinator.incr("cache_misses")
+
+        wait = _coordinator.reserve_slot(urlparse(url).hostname or "")
+        if wait > 0:
+            time.sleep(wait)
+            _coordinator.incr("politeness_wait_seconds", wait)
+
+        started = time.perf_counter()
+        result, applied = _renderer.run(crawler, url, profile)
+        if applied:
+            _coordinator.incr(f"renders.{profile.name}")
+            _coordinator.incr(f"render_seconds.{profile.name}", time.perf_counter() - started)
+        else:
+            _coordinator.incr(f"renders_unapplied.{profile.name}")
+
+        if result.success:
+            _coordinator.cache_put(
+                key, {field: getattr(result, field, None) for field in CACHED_FIELDS}
             )
-    return _crawler
+    return result
+
+async def fetch(url: str, profile: RenderProfile, use_cache: bool = True):
+    """Crawl url under profile without blocking the event loop"""
+    crawler = get_crawler()
+    return await asyncio.to_thread(fetch_blocking, crawler, url, profile, use_cache)
+
+def check_job_id(job_id: str):
+    """Reject job ids that are not safe to use in state file names"""
+    if not valid_job_id(job_id):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid job_id: use 1-64 letters, digits, '_' or '-'"
+        )
 
 def is_allowed_domain(url: str) -> bool:
     """Check if URL is from an allowed domain"""
@@ -94,6 +274,12 @@ class CrawlRequest(BaseModel):
     url: HttpUrl
     extract_links: bool = False
     extract_images: bool = False
+    persist: bool = False
+    category: Optional[str] = None
+    mode: Literal["full", "delta"] = "full"
+    since_version: Optional[int] = None  # delta base: version from the previous response
+    profile: Optional[str] = None
+    bypass_cache: bool = False
 
 class CrawlResponse(BaseModel):
     url: str
@@ -102,6 +288,9 @@ class CrawlResponse(BaseModel):
     html: Optional[str] = None
     links: Optional[List[str]] = None
     images: Optional[List[str]] = None
+    delta: Optional[dict] = None
+    version: Optional[int] = None
+    profile: Optional[str] = None
     success: bool
     error: Optional[str] = None
 
@@ -110,6 +299,18 @@ class SearchRequest(BaseModel):
     domains: Optional[List[str]] = None
     max_results: int = 5
 
+class FrontierRequest(BaseModel):
+    seeds: List[HttpUrl]
+    job_id: Optional[str] = None
+    max_depth: int = Field(2, ge=0, le=5)
+    max_pages: int = Field(500, ge=1, le=5000)
+    include_patterns: Optional[List[str]] = None
+    exclude_patterns: Optional[List[str]] = None
+    concurrency: int = Field(4, ge=1, le=16)
+    persist: bool = False
+    category: Optional[str] = None
+    profile: Optional[str] = None
+
 class HealthResponse(BaseModel):
     status: str
     service: str
@@ -146,17 +347,43 @@ async def crawl_url(request: CrawlRequest):
             detail=f"Domain not allowed. Only UPSC-approved sources permitted."
         )
     
+    if request.persist:
+        get_writer()
+    profile = get_profile(url, request.profile)
+    
+    # Delta mode always recrawls so the diff reflects the live page
+    use_cache = not request.bypass_cache and request.mode != "delta"
+    
     try:
-        crawler = get_crawler()
-        result = crawler.run(url=url, bypass_cache=True)
+        await asyncio.to_thread(_coordinator.incr, "requests.crawl")
+        result = await fetch(url, profile, use_cache)
+        content = result.extracted_content or result.markdown or ""
+        
+        # Every successful crawl records a version, whatever the mode, so
+        # delta consumers diffing from their since_version miss nothing
+        delta = None
+        version = None
+        if result.success:
+            delta = _versions.record(url, content, request.since_version)
+            version = delta["version"]
+        content, persisted = delta_outputs(content, delta, request.mode)
+        if request.mode != "delta":
+            delta = None
+        
+        # The full text is persisted even in delta mode (see delta_outputs)
+        if request.persist and result.success:
+            await _writer.submit(url, result.title or "", persisted, request.category)
         
         return CrawlResponse(
             url=url,
             title=result.title or "",
-            content=result.extracted_content or result.markdown or "",
+            content=content,
             html=result.html if request.extract_links or request.extract_images else None,
             links=result.links if request.extract_links else None,
             images=result.images if request.extract_images else None,
+            delta=delta,
+            version=version,
+            profile=profile.name,
             success=result.success,
             error=None
         )
@@ -170,9 +397,18 @@ async def crawl_url(request: CrawlRequest):
         )
 
 @app.post("/batch")
-async def batch_crawl(urls: List[str]):
+async def batch_crawl(
+    urls: List[str],
+    persist: bool = False,
+    profile: Optional[str] = None,
+    category: Optional[str] = None,
+):
     """Crawl multiple URLs in batch"""
     results = []
+    if persist:
+        get_writer()
+    if profile:
+        get_profile("", profile)
     
     for url in urls[:10]:  # Max 10 URLs per batch
         if not is_allowed_domain(url):
@@ -184,12 +420,18 @@ async def batch_crawl(urls: List[str]):
             continue
         
         try:
-            crawler = get_crawler()
-            result = crawler.run(url=url, bypass_cache=True)
+            result = await fetch(url, resolve_profile(url, profile))
+            content = result.extracted_content or result.markdown or ""
+            version = None
+            if result.success:
+                version = _versions.record(url, content)["version"]
+            if persist and result.success:
+                await _writer.submit(url, result.title or "", content, category)
             results.append({
                 "url": url,
                 "title": result.title or "",
-                "content": result.extracted_content or result.markdown or "",
+                "content": content,
+                "version": version,
                 "success": result.success
             })
         except Exception as e:
@@ -201,6 +443,142 @@ async def batch_crawl(urls: List[str]):
     
     return {"results": results, "total": len(results)}
 
+@app.post("/frontier")
+async def start_frontier_crawl(request: FrontierRequest):
+    """
+    Start (or resume, if job_id has a checkpoint) a section-wide crawl.
+    Links are followed from the seeds within the allowlist, depth limit and
+    path patterns; progress is polled via GET /frontier/{job_id}.
+    """
+    seeds = [str(seed) for seed in request.seeds]
+    disallowed = [seed for seed in seeds if not is_allowed_domain(seed)]
+    if disallowed:
+        raise HTTPException(
+            status_code=403,
+            detail=f"Domain not allowed for seeds: {disallowed}"
+        )
+    if request.persist:
+        get_writer()
+    if request.profile:
+        get_profile(seeds[0], request.profile)
+
+    job_id = request.job_id or uuid.uuid4().hex[:12]
+    check_job_id(job_id)
+    # Held for the job's lifetime so no other worker runs the same job
+    job_lock = FileLock(f"frontier_{job_id}")
+    if not job_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is already running")
+
+    try:
+        job = FrontierJob(
+            job_id,
+            seeds,
+            is_allowed_domain,
+            max_depth=request.max_depth,
+            max_pages=request.max_pages,
+            include_patterns=request.include_patterns,
+            exclude_patterns=request.exclude_patterns,
+            concurrency=request.concurrency,
+        )
+    except re.error as e:
+        job_lock.release()
+        raise HTTPException(status_code=400, detail=f"Invalid path pattern: {e}")
+
+    try:
+        crawler = get_crawler()
+    except HTTPException:
+        job_lock.release()
+        raise
+
+    def crawl(url: str):
+        return fetch_blocking(crawler, url, resolve_profile(url, request.profile))
+
+    async def on_page(url, result):
+        content = result.extracted_content or result.markdown or ""
+        _versions.record(url, content)
+        if request.persist:
+            await _writer.submit(url, result.title or "", content, request.category)
+
+    def release():
+        _coordinator.finish_job(job_id)
+        job_lock.release()
+
+    def finished(_):
+        # Done callbacks run on the event loop; the SQLite write goes to a thread
+        asyncio.get_running_loop().run_in_executor(None, release)
+
+    try:
+        await asyncio.to_thread(_coordinator.register_job, job_id)
+    except Exception:
+        job_lock.release()
+        raise
+    task = asyncio.create_task(job.run(crawl, on_page))
+    task.add_done_callback(finished)
+    _frontier_jobs[job_id] = job
+    _frontier_tasks[job_id] = task
+    return {"job_id": job_id, "status": "started"}
+
+@app.get("/frontier/{job_id}")
+async def frontier_status(job_id: str):
+    """Progress of a frontier crawl job"""
+    check_job_id(job_id)
+    job = _frontier_jobs.get(job_id)
+    if job is not None:
+        return job.status_dict()
+    # Job owned by another worker (or a previous process): use its checkpoint
+    checkpoint = read_checkpoint(job_id)
+    if checkpoint is None:
+        raise HTTPException(status_code=404, detail="Unknown frontier job")
+    return checkpoint
+
+@app.delete("/frontier/{job_id}")
+async def stop_frontier_crawl(job_id: str):
+    """
+    Stop a running job; its checkpoint is kept so it can be resumed.
+    A job owned by another worker is stopped through the coordination DB:
+    the owner sees the cancel request within CANCEL_POLL_INTERVAL.
+    """
+    check_job_id(job_id)
+    task = _frontier_tasks.get(job_id)
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return _frontier_jobs[job_id].status_dict()
+
+    owner = await asyncio.to_thread(_coordinator.request_cancel, job_id)
+    if owner is None:
+        raise HTTPException(status_code=404, detail="Unknown frontier job")
+    # The owner holds the job lock while the job runs; a free lock means
+    # the owner died and left its record behind
+    probe = FileLock(f"frontier_{job_id}")
+    if probe.acquire(blocking=False):
+        probe.release()
+        await asyncio.to_thread(_coordinator.forget_job, job_id)
+        raise HTTPException(status_code=404, detail="Frontier job is not running")
+
+    deadline = time.monotonic() + REMOTE_STOP_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(CANCEL_POLL_INTERVAL / 2)
+        if await asyncio.to_thread(_coordinator.job_owner, job_id) is None:
+            return {**(read_checkpoint(job_id) or {"job_id": job_id}), "owner_pid": owner}
+    return {"job_id": job_id, "status": "cancelling", "owner_pid": owner}
+
+@app.get("/profiles")
+async def list_render_profiles():
+    """Render profiles, per-domain defaults and per-profile timings"""
+    return {
+        "profiles": [p.describe() for p in PROFILES.values()],
+        "default": DEFAULT_PROFILE,
+        "domains": DOMAIN_PROFILES,
+        "timings": _renderer.timings(),
+    }
+
+@app.get("/metrics")
+async def worker_metrics():
+    """Counters aggregated across all worker processes"""
+    metrics = await asyncio.to_thread(_coordinator.metrics)
+    return {"worker_pid": os.getpid(), **metrics}
+
 @app.get("/domains")
 async def list_allowed_domains():
     """List all allowed domains for crawling"""
@@ -210,6 +588,11 @@ async def list_allowed_domains():
         "total": len(ALLOWED_DOMAINS) + 2  # +2 for gov.in patterns
     }
 
+@app.get("/writer/stats")
+async def writer_stats():
+    """Bulk writer throughput and buffer occupancy"""
+    return get_writer().stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8105)
@@ -0,0 +1,198 @@
+"""
+Named render profiles for headless crawls
+
+A profile decides which resources the browser may fetch and how long a page
+load may take. Blocking happens at the network layer through the Chrome
+DevTools protocol on the crawler's Selenium driver, so ads, fonts, trackers
+and video embeds are never downloaded for text-only ingestion.
+
+Profile selection order: explicit request > per-domain mapping
+(CRAWL_DOMAIN_PROFILES="pib.gov.in=text-only,thehindu.com=text+images")
+> CRAWL_DEFAULT_PROFILE.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+# Third-party hosts that never carry article text
+TRACKER_HOSTS = (
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googletagmanager.com",
+    "google-analytics.com",
+    "googleadservices.com",
+    "adservice.google.com",
+    "connect.facebook.net",
+    "facebook.com/tr",
+    "platform.twitter.com",
+    "hotjar.com",
+    "taboola.com",
+    "outbrain.com",
+    "clarity.ms",
+    "scorecardresearch.com",
+    "amazon-adsystem.com",
+    "youtube.com/embed",
+    "player.vimeo.com",
+)
+
+IMAGE_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.avif")
+FONT_PATTERNS = ("*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot")
+MEDIA_PATTERNS = ("*.mp4", "*.webm", "*.m3u8", "*.mp3", "*.ogg")
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    name: str
+    blocked_patterns: Tuple[str, ...]
+    page_load_timeout: int  # seconds before the load is cut short
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "blocked_patterns": list(self.blocked_patterns),
+            "page_load_timeout": self.page_load_timeout,
+        }
+
+
+def _tracker_patterns() -> Tuple[str, ...]:
+    return tuple(f"*{host}*" for host in TRACKER_HOSTS)
+
+
+PROFILES: Dict[str, RenderProfile] = {
+    "text-only": RenderProfile(
+        name="text-only",
+        blocked_patterns=IMAGE_PATTERNS + FONT_PATTERNS + MEDIA_PATTERNS + _tracker_patterns(),
+        page_load_timeout=15,
+    ),
+    "text+images": RenderProfile(
+        name="text+images",
+        blocked_patterns=FONT_PATTERNS + MEDIA_PATTERNS + _tracker_patterns(),
+        page_load_timeout=25,
+    ),
+    "full": RenderProfile(
+        name="full",
+        blocked_patterns=(),
+        page_load_timeout=60,
+    ),
+}
+
+DEFAULT_PROFILE = os.getenv("CRAWL_DEFAULT_PROFILE", "full")
+
+# A misconfigured profile fails the service at startup, not every request
+if DEFAULT_PROFILE not in PROFILES:
+    raise RuntimeError(
+        f"CRAWL_DEFAULT_PROFILE={DEFAULT_PROFILE!r} is not a render profile. "
+        f"Available: {sorted(PROFILES)}"
+    )
+
+
+def _parse_domain_profiles(raw: str) -> Dict[str, str]:
+    mapping = {}
+    for entry in raw.split(","):
+        if not entry.strip():
+            continue
+        if "=" not in entry:
+            raise RuntimeError(
+                f"CRAWL_DOMAIN_PROFILES entry {entry.strip()!r} is not domain=profile"
+            )
+        domain, profile = (part.strip().lower() for part in entry.split("=", 1))
+        if profile not in PROFILES:
+            raise RuntimeError(
+                f"CRAWL_DOMAIN_PROFILES maps {domain} to unknown profile {profile!r}. "
+                f"Available: {sorted(PROFILES)}"
+            )
+        mapping[domain] = profile
+    return mapping
+
+
+DOMAIN_PROFILES = _parse_domain_profiles(os.getenv("CRAWL_DOMAIN_PROFILES", ""))
+
+
+def resolve_profile(url: str, requested: Optional[str] = None) -> RenderProfile:
+    """Pick the profile for a crawl; raises KeyError for unknown names"""
+    if requested:
+        return PROFILES[requested]
+    hostname = (urlparse(url).hostname or "").lower()
+    for domain, profile in DOMAIN_PROFILES.items():
+        if hostname == domain or hostname.endswith(f".{domain}"):
+            return PROFILES[profile]
+    return PROFILES[DEFAULT_PROFILE]
+
+
+class ProfileRunner:
+    """
+    Runs crawls under a render profile and keeps per-profile timings.
+    The crawler drives a single browser, so switching the profile and
+    loading the page happen under one lock. Crawls where the profile could
+    not be applied (no Selenium driver or no DevTools access) are counted
+    as unapplied and kept out of the profile's timings.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Optional[str] = None
+        self._timings: Dict[str, dict] = {
+            name: {"crawls": 0, "failures": 0, "unapplied": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            for name in PROFILES
+        }
+
+    def _apply(self, crawler, profile: RenderProfile) -> bool:
+        """Configure the driver for profile; False if it cannot block requests"""
+        if self._active == profile.name:
+            return True
+        driver = getattr(getattr(crawler, "crawler_strategy", None), "driver", None)
+        if driver is None:
+            return False
+        driver.set_page_load_timeout(profile.page_load_timeout)
+        if not hasattr(driver, "execute_cdp_cmd"):
+            return False
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd(
+            "Network.setBlockedURLs", {"urls": list(profile.blocked_patterns)}
+        )
+        self._active = profile.name
+        return True
+
+    def run(self, crawler, url: str, profile: RenderProfile) -> Tuple[object, bool]:
+        """Blocking crawl of url under profile; returns (result, profile applied)"""
+        with self._lock:
+            applied = self._apply(crawler, profile)
+            if not applied:
+                # The browser keeps whatever it last had; re-apply next time
+                self._active = None
+            started = time.perf_counter()
+            try:
+                result = crawler.run(url=url, bypass_cache=True)
+            except Exception:
+                self._record(profile.name, time.perf_counter() - started, failed=True, applied=applied)
+                raise
+            self._record(
+                profile.name, time.perf_counter() - started, failed=not result.success, applied=applied
+            )
+        return result, applied
+
+    def _record(self, name: str, seconds: float, failed: bool, applied: bool):
+        stats = self._timings[name]
+        if not applied:
+            stats["unapplied"] += 1
+            return
+        stats["crawls"] += 1
+        stats["failures"] += int(failed)
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def timings(self) -> Dict[str, dict]:
+        report = {}
+        for name, stats in self._timings.items():
+            crawls = stats["crawls"]
+            report[name] = {
+                **stats,
+                "total_seconds": round(stats["total_seconds"], 3),
+                "max_seconds": round(stats["max_seconds"], 3),
+                "avg_seconds": round(stats["total_seconds"] / crawls, 3) if crawls else None,
+            }
+        return report
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The service modules are run from the package directory, not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
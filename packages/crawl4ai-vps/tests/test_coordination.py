@@ -0,0 +1,125 @@
+import multiprocessing
+import time
+
+import pytest
+
+import coordination
+from coordination import Coordinator, FileLock
+
+# Fork so children inherit the patched LOCK_DIR and the parent's Coordinator
+# (whose SQLite connection must be reopened per process)
+fork = multiprocessing.get_context("fork")
+
+INTERVAL = 100.0  # wide enough that scheduling jitter cannot blur two slots
+
+
+@pytest.fixture
+def coordinator(tmp_path, monkeypatch):
+    monkeypatch.setattr(coordination, "LOCK_DIR", str(tmp_path / "locks"))
+    return Coordinator(str(tmp_path / "coordination.sqlite"))
+
+
+def reserve_slots(coordinator, count, results, start):
+    start.wait()
+    for _ in range(count):
+        wait = coordinator.reserve_slot("pib.gov.in", interval=INTERVAL)
+        results.put(time.time() + wait)
+        coordinator.incr("reserved")
+
+
+def test_slot_reservations_from_two_processes_never_overlap(coordinator):
+    coordinator.incr("reserved", 0)  # open the parent's connection before forking
+    results = fork.Queue()
+    start = fork.Event()
+    workers = [fork.Process(target=reserve_slots, args=(coordinator, 10, results, start)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    slots = sorted(results.get(timeout=30) for _ in range(20))
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    gaps = [later - earlier for earlier, later in zip(slots, slots[1:])]
+    assert all(abs(gap - INTERVAL) < 1.0 for gap in gaps)
+
+    metrics = coordinator.metrics()
+    assert metrics["totals"]["reserved"] == 20
+    per_worker = sorted(w.get("reserved", 0) for w in metrics["workers"].values())
+    assert per_worker == [0, 10, 10]
+
+
+def hold_lock(name, locked, release):
+    lock = FileLock(name)
+    lock.acquire()
+    locked.set()
+    release.wait(timeout=30)
+    lock.release()
+
+
+def test_file_lock_excludes_other_processes(coordinator):
+    locked, release = fork.Event(), fork.Event()
+    holder = fork.Process(target=hold_lock, args=("frontier_job-1", locked, release))
+    holder.start()
+    assert locked.wait(timeout=30)
+
+    probe = FileLock("frontier_job-1")
+    assert not probe.acquire(blocking=False)
+    assert FileLock("frontier_job-2").acquire(blocking=False)
+
+    release.set()
+    holder.join(timeout=30)
+    assert probe.acquire(blocking=False)
+    probe.release()
+
+
+def own_job(coordinator, job_id, registered, cancelled):
+    coordinator.register_job(job_id)
+    registered.set()
+    deadline = time.monotonic() + 30
+    while job_id not in coordinator.cancel_requests():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    coordinator.finish_job(job_id)
+    cancelled.set()
+
+
+def test_cancel_request_reaches_the_owning_process(coordinator):
+    registered, cancelled = fork.Event(), fork.Event()
+    owner = fork.Process(target=own_job, args=(coordinator, "job-1", registered, cancelled))
+    owner.start()
+    assert registered.wait(timeout=30)
+
+    assert coordinator.job_owner("job-1") == owner.pid
+    # Requests for jobs this process does not own are not its business
+    assert coordinator.cancel_requests() == []
+    assert coordinator.request_cancel("job-1") == owner.pid
+
+    assert cancelled.wait(timeout=30)
+    owner.join(timeout=30)
+    assert coordinator.job_owner("job-1") is None
+    assert coordinator.request_cancel("job-1") is None
+
+
+def test_finish_job_leaves_a_newer_owner_alone(coordinator):
+    coordinator.register_job("job-1")
+    registered, cancelled = fork.Event(), fork.Event()
+    owner = fork.Process(target=own_job, args=(coordinator, "job-1", registered, cancelled))
+    owner.start()
+    assert registered.wait(timeout=30)
+
+    coordinator.finish_job("job-1")  # the parent's stale record was replaced
+    assert coordinator.job_owner("job-1") == owner.pid
+
+    coordinator.request_cancel("job-1")
+    assert cancelled.wait(timeout=30)
+    owner.join(timeout=30)
+
+
+def test_cache_entries_expire(coordinator):
+    key = Coordinator.cache_key("https://pib.gov.in/a", "full")
+    coordinator.cache_put(key, {"markdown": "x"}, ttl=60)
+    coordinator.cache_put(Coordinator.cache_key("https://pib.gov.in/b", "full"), {}, ttl=-1)
+    assert coordinator.cache_get(key) == {"markdown": "x"}
+    assert coordinator.cache_prune() == 1
+    assert Coordinator.cache_key("https://pib.gov.in/a", "text-only") != key
@@ -0,0 +1,49 @@
+from diffing import VersionStore, delta_outputs
+
+URL = "https://pib.gov.in/PressReleasePage.aspx?PRID=1"
+
+V1 = "Intro paragraph.\n\nBudget outlay is 100 crore."
+V2 = "Intro paragraph.\n\nBudget outlay is 120 crore.\n\nNew scheme announced."
+
+
+def test_full_crawl_does_not_hide_changes_from_delta_consumer(tmp_path):
+    store = VersionStore(str(tmp_path / "versions.sqlite"))
+    first = store.record(URL, V1)
+    assert first["first_seen"] and first["version"] == 1
+
+    # Someone else crawls in full mode: the version advances...
+    assert store.record(URL, V2)["version"] == 2
+
+    # ...but a consumer diffing from the version it last saw still gets the change
+    delta = store.record(URL, V2, since_version=first["version"])
+    assert delta["base_version"] == 1
+    assert [b["text"] for b in delta["changed"]] == ["Budget outlay is 120 crore."]
+    assert [b["text"] for b in delta["added"]] == ["New scheme announced."]
+
+
+def test_unchanged_recrawl_keeps_version(tmp_path):
+    store = VersionStore(str(tmp_path / "versions.sqlite"))
+    store.record(URL, V1)
+    delta = store.record(URL, "Intro  paragraph.\n\nBudget outlay is 100 crore.")
+    assert delta["version"] == 1
+    assert not (delta["added"] or delta["changed"] or delta["removed"])
+
+
+def test_pruned_since_version_resyncs(tmp_path):
+    store = VersionStore(str(tmp_path / "versions.sqlite"), keep=2)
+    for n in range(4):
+        store.record(URL, f"Paragraph {n}.")
+    delta = store.record(URL, "Paragraph 3.", since_version=1)
+    assert delta["resync"] and delta["base_version"] is None
+    assert [b["text"] for b in delta["added"]] == ["Paragraph 3."]
+
+
+def test_persisted_content_is_full_text_in_delta_mode(tmp_path):
+    store = VersionStore(str(tmp_path / "versions.sqlite"))
+    store.record(URL, V1)
+    delta = store.record(URL, V2)
+    response, persisted = delta_outputs(V2, delta, "delta")
+    assert response == "New scheme announced.\n\nBudget outlay is 120 crore."
+    assert persisted == V2
+
+    assert delta_outputs(V2, delta, "full") == (V2, V2)
@@ -0,0 +1,131 @@
+import asyncio
+import itertools
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import frontier
+from frontier import BloomFilter, FrontierJob, read_checkpoint, valid_job_id
+
+SEED = "https://pib.gov.in/index"
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(frontier, "STATE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def endless_site():
+    """crawl() for a site where every page links to two new ones"""
+    counter = itertools.count()
+    calls = []
+
+    def crawl(url):
+        calls.append(url)
+        links = [f"/page/{next(counter)}", f"/page/{next(counter)}"]
+        return SimpleNamespace(success=True, title=url, links=links)
+
+    return crawl, calls
+
+
+def job(**kwargs):
+    kwargs.setdefault("max_depth", 5)
+    return FrontierJob("job-1", [SEED], lambda url: True, **kwargs)
+
+
+def test_bloom_filter_round_trip(tmp_path):
+    bloom = BloomFilter(capacity=1000)
+    urls = [f"https://pib.gov.in/{n}" for n in range(200)]
+    assert all(bloom.add(url) for url in urls)
+    assert not bloom.add(urls[0])
+
+    path = str(tmp_path / "visited.bloom")
+    bloom.save(path)
+    loaded = BloomFilter.load(path)
+    assert loaded.count == 200
+    assert (loaded.num_bits, loaded.num_hashes) == (bloom.num_bits, bloom.num_hashes)
+    assert all(url in loaded for url in urls)
+    # 0.1% target error rate: a handful of false positives at most
+    assert sum(f"https://other.gov.in/{n}" in loaded for n in range(1000)) < 10
+
+
+def test_checkpoint_round_trip():
+    original = job()
+    for n in range(5):
+        original.enqueue(f"https://pib.gov.in/page/{n}", 1)
+    original.pages_crawled = 7
+    original.pages_failed = 2
+    original.pages.append({"url": SEED, "depth": 0, "success": True})
+    original.checkpoint()
+
+    resumed = job()
+    assert resumed.restore()
+    assert list(resumed.frontier) == list(original.frontier)
+    assert resumed.pages_crawled == 7
+    assert resumed.pages_failed == 2
+    assert resumed.visited.count == original.visited.count == 5
+    assert list(resumed.pages) == list(original.pages)
+    assert "https://pib.gov.in/page/3" in resumed.visited
+
+    status = read_checkpoint("job-1")
+    assert status["pages_crawled"] == 7
+    assert status["visited_estimate"] == 5
+    assert status["frontier_size"] == 5
+
+
+def test_resume_does_not_exceed_max_pages():
+    crawl, calls = endless_site()
+    first = job(max_pages=30)
+    asyncio.run(first.run(crawl))
+    assert first.pages_crawled == 30
+    assert len(calls) == 30
+
+    again = job(max_pages=30)
+    asyncio.run(again.run(crawl))
+    assert again.pages_crawled == 30
+    assert len(calls) == 30
+
+
+def test_resume_without_bloom_file_keeps_counters(state_dir):
+    crawl, calls = endless_site()
+    first = job(max_pages=10)
+    asyncio.run(first.run(crawl))
+    os.remove(first.bloom_path)
+
+    resumed = job(max_pages=15)
+    asyncio.run(resumed.run(crawl))
+    assert resumed.pages_crawled == 15
+    assert len(calls) == 15
+    assert all(url in resumed.visited for url, _ in first.frontier)
+
+
+def test_status_keeps_only_recent_pages(monkeypatch):
+    monkeypatch.setattr(frontier, "RECENT_PAGES", 3)
+    crawl, _ = endless_site()
+    running = job(max_pages=8)
+    asyncio.run(running.run(crawl))
+
+    status = running.status_dict()
+    assert status["pages_crawled"] == 8
+    assert len(status["recent_pages"]) == 3
+    assert read_checkpoint("job-1")["recent_pages"] == status["recent_pages"]
+
+
+def test_failed_pages_are_counted():
+    def crawl(url):
+        raise RuntimeError("render timed out")
+
+    failing = job(max_pages=5)
+    asyncio.run(failing.run(crawl))
+    assert failing.pages_crawled == 1
+    assert failing.pages_failed == 1
+    assert failing.status_dict()["recent_pages"][0]["error"] == "render timed out"
+
+
+@pytest.mark.parametrize("job_id", ["", "../etc", "a/b", "x" * 65, "job id"])
+def test_invalid_job_ids(job_id):
+    assert not valid_job_id(job_id)
+    with pytest.raises(ValueError):
+        FrontierJob(job_id, [SEED], lambda url: True)
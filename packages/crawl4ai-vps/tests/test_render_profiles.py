@@ -0,0 +1,110 @@
+from types import SimpleNamespace
+
+import pytest
+
+import render_profiles
+from render_profiles import PROFILES, ProfileRunner, _parse_domain_profiles, resolve_profile
+
+
+class FakeDriver:
+    def __init__(self):
+        self.commands = []
+        self.timeouts = []
+
+    def set_page_load_timeout(self, seconds):
+        self.timeouts.append(seconds)
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append((command, params))
+
+
+def crawler(driver=None, success=True, error=None):
+    def run(url, bypass_cache):
+        if error is not None:
+            raise error
+        return SimpleNamespace(success=success, url=url)
+
+    return SimpleNamespace(crawler_strategy=SimpleNamespace(driver=driver), run=run)
+
+
+@pytest.fixture
+def domains(monkeypatch):
+    mapping = _parse_domain_profiles("pib.gov.in=text-only, thehindu.com=text+images")
+    monkeypatch.setattr(render_profiles, "DOMAIN_PROFILES", mapping)
+    monkeypatch.setattr(render_profiles, "DEFAULT_PROFILE", "full")
+    return mapping
+
+
+def test_explicit_profile_wins(domains):
+    assert resolve_profile("https://pib.gov.in/a", "full").name == "full"
+
+
+def test_domain_mapping_covers_subdomains(domains):
+    assert resolve_profile("https://pib.gov.in/a").name == "text-only"
+    assert resolve_profile("https://www.PIB.gov.in/a").name == "text-only"
+    assert resolve_profile("https://epaper.thehindu.com/x").name == "text+images"
+
+
+def test_suffix_without_dot_is_not_a_subdomain(domains):
+    assert resolve_profile("https://notpib.gov.in/a").name == "full"
+
+
+def test_unknown_domain_falls_back_to_default(domains):
+    assert resolve_profile("https://drishtiias.com/").name == "full"
+
+
+def test_unknown_requested_profile_raises(domains):
+    with pytest.raises(KeyError):
+        resolve_profile("https://pib.gov.in/a", "no-such-profile")
+
+
+@pytest.mark.parametrize("raw", ["pib.gov.in", "pib.gov.in=images-only"])
+def test_bad_domain_mapping_fails_at_parse(raw):
+    with pytest.raises(RuntimeError):
+        _parse_domain_profiles(raw)
+
+
+def test_text_only_blocks_more_than_text_and_images():
+    text_only = set(PROFILES["text-only"].blocked_patterns)
+    with_images = set(PROFILES["text+images"].blocked_patterns)
+    assert with_images < text_only
+    assert "*.png" in text_only - with_images
+    assert PROFILES["full"].blocked_patterns == ()
+
+
+def test_profile_is_applied_once_until_it_changes():
+    driver = FakeDriver()
+    runner = ProfileRunner()
+    text_only = PROFILES["text-only"]
+
+    for _ in range(3):
+        _, applied = runner.run(crawler(driver), "https://pib.gov.in/a", text_only)
+        assert applied
+    blocked = [params for command, params in driver.commands if command == "Network.setBlockedURLs"]
+    assert blocked == [{"urls": list(text_only.blocked_patterns)}]
+
+    runner.run(crawler(driver), "https://pib.gov.in/a", PROFILES["full"])
+    assert driver.commands[-1] == ("Network.setBlockedURLs", {"urls": []})
+    assert driver.timeouts == [15, 60]
+
+
+def test_crawls_without_a_driver_are_unapplied():
+    runner = ProfileRunner()
+    _, applied = runner.run(crawler(None), "https://pib.gov.in/a", PROFILES["text-only"])
+    assert not applied
+    stats = runner.timings()["text-only"]
+    assert stats["unapplied"] == 1
+    assert stats["crawls"] == 0 and stats["avg_seconds"] is None
+
+
+def test_failures_are_timed_and_reraised():
+    runner = ProfileRunner()
+    driver = FakeDriver()
+    runner.run(crawler(driver, success=False), "https://pib.gov.in/a", PROFILES["full"])
+    with pytest.raises(TimeoutError):
+        runner.run(crawler(driver, error=TimeoutError()), "https://pib.gov.in/b", PROFILES["full"])
+    stats = runner.timings()["full"]
+    assert stats["crawls"] == 2
+    assert stats["failures"] == 2
+    # The lock was released after the exception
+    runner.run(crawler(driver), "https://pib.gov.in/c", PROFILES["full"])
@@ -0,0 +1,17 @@
+import sys
+
+from writer import WHITESPACE_CLASS, content_hash
+
+
+def test_unicode_spaces_hash_like_ascii_spaces():
+    assert content_hash("Union\u00a0Budget\u2003 2025\n\n") == content_hash("Union Budget 2025")
+    assert content_hash("\u3000a\u202fb\u2028") == content_hash("a b")
+
+
+def test_whitespace_class_is_exactly_str_isspace():
+    import re
+
+    pattern = re.compile(WHITESPACE_CLASS)
+    for code in range(sys.maxunicode + 1):
+        char = chr(code)
+        assert bool(pattern.fullmatch(char)) == char.isspace(), hex(code)
@@ -0,0 +1,271 @@
+"""
+Bulk Postgres writer for crawl4ai results
+
+Crawl results are buffered in a bounded queue and flushed in batches:
+each batch is loaded with COPY into crawl_ingest_staging and merged into
+daily_updates / knowledge_chunks by merge_crawl_staging() (migration 073).
+A full buffer makes submit() wait, which pushes back on the crawl endpoints
+instead of growing memory without limit. A batch that fails to write is
+logged, counted in stats() and passed to the on_error callback.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+STAGING_TABLE = "crawl_ingest_staging"
+STAGING_COLUMNS = [
+    "batch_id",
+    "kind",
+    "canonical_url",
+    "source_url",
+    "title",
+    "content",
+    "content_hash",
+    "category",
+    "published_date",
+    "scraped_at",
+    "chunk_index",
+    "chunk_text",
+]
+
+# Query parameters that never change page content
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+
+CHUNK_MAX_CHARS = 1500
+
+# Whitespace for content hashing: exactly the characters str.isspace()
+# accepts, spelled out so that a Postgres regexp_replace over the same class
+# (migrator/backfill.py hashes rows ingested before 073 that way) produces
+# the same digest; Postgres \s depends on the database locale
+WHITESPACE_CLASS = (
+    r"[\u0009-\u000d\u001c-\u0020\u0085\u00a0\u1680\u2000-\u200a"
+    r"\u2028\u2029\u202f\u205f\u3000]"
+)
+_WHITESPACE_RUN = re.compile(WHITESPACE_CLASS + "+")
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so the same article always maps to one key"""
+    parsed = urlparse(url.strip())
+    scheme = (parsed.scheme or "https").lower()
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    netloc = host
+    if parsed.port and parsed.port not in (80, 443):
+        netloc = f"{host}:{parsed.port}"
+
+    path = re.sub(r"/{2,}", "/", parsed.path or "/")
+    if len(path) > 1 and path.endswith("/"):
+        path = path[:-1]
+
+    query = [
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    ]
+    query.sort()
+
+    return urlunparse((scheme, netloc, path, "", urlencode(query), ""))
+
+
+def content_hash(text: str) -> str:
+    """Hash of whitespace-normalized text, stable across cosmetic reflows"""
+    normalized = _WHITESPACE_RUN.sub(" ", text).strip(" ")
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def split_chunks(text: str, max_chars: int = CHUNK_MAX_CHARS) -> List[str]:
+    """Greedily pack paragraphs into chunks of at most max_chars"""
+    chunks = []
+    current = ""
+    for para in re.split(r"\n\s*\n", text):
+        para = para.strip()
+        if not para:
+            continue
+        while len(para) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(para[:max_chars])
+            para = para[max_chars:]
+        if current and len(current) + len(para) + 2 > max_chars:
+            chunks.append(current)
+            current = para
+        else:
+            current = f"{current}\n\n{para}" if current else para
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_rows(
+    url: str,
+    title: str,
+    content: str,
+    category: Optional[str] = None,
+    published_date: Optional[datetime] = None,
+) -> List[tuple]:
+    """Staging rows (without batch_id) for one crawl result"""
+    canonical = canonicalize_url(url)
+    scraped_at = datetime.now(timezone.utc)
+    rows = [(
+        "article", canonical, url, title, content, content_hash(content),
+        category, published_date, scraped_at, None, None,
+    )]
+    for index, chunk in enumerate(split_chunks(content)):
+        rows.append((
+            "chunk", canonical, url, None, None, content_hash(chunk),
+            None, None, scraped_at, index, chunk,
+        ))
+    return rows
+
+
+class BulkWriter:
+    """Buffered COPY writer backed by an asyncpg connection pool"""
+
+    def __init__(
+        self,
+        dsn: str,
+        batch_size: int = 200,
+        max_buffer: int = 2000,
+        flush_interval: float = 2.0,
+        pool_size: int = 4,
+        on_error: Optional[Callable[[int, Exception], None]] = None,
+    ):
+        self.dsn = dsn
+        self.on_error = on_error  # called with (results lost, error) per failed batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pool_size = pool_size
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer)
+        self._pool = None
+        self._workers: List[asyncio.Task] = []
+        self._stats = {
+            "submitted": 0,
+            "batches": 0,
+            "rows_copied": 0,
+            "updates_upserted": 0,
+            "chunks_inserted": 0,
+            "chunks_deleted": 0,
+            "failed_batches": 0,
+            "failed_results": 0,
+            "last_error": None,
+            "last_error_at": None,
+            "last_flush_seconds": 0.0,
+        }
+
+    async def start(self):
+        """Open the pool and start one flush worker per connection"""
+        try:
+            import asyncpg
+        except ImportError:
+            raise RuntimeError("asyncpg not installed. Run: pip install asyncpg")
+
+        self._pool = await asyncpg.create_pool(
+            self.dsn, min_size=1, max_size=self.pool_size
+        )
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.pool_size)
+        ]
+
+    async def close(self):
+        """Flush everything still buffered, then release the pool"""
+        await self._queue.join()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def submit(
+        self,
+        url: str,
+        title: str,
+        content: str,
+        category: Optional[str] = None,
+        published_date: Optional[datetime] = None,
+    ):
+        """Queue one crawl result; waits while the buffer is full"""
+        if not content:
+            return
+        rows = build_rows(url, title, content, category, published_date)
+        await self._queue.put(rows)
+        self._stats["submitted"] += 1
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "buffered": self._queue.qsize(),
+            "buffer_capacity": self._queue.maxsize,
+        }
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            results = [first]
+            deadline = loop.time() + self.flush_interval
+            while len(results) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    results.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(results)
+            finally:
+                for _ in results:
+                    self._queue.task_done()
+
+    async def _flush(self, results: List[List[tuple]]):
+        rows = [row for rows in results for row in rows]
+        batch_id = uuid.uuid4()
+        started = time.perf_counter()
+        try:
+            async with self._pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.copy_records_to_table(
+                        STAGING_TABLE,
+                        schema_name="public",
+                        columns=STAGING_COLUMNS,
+                        records=[(batch_id, *row) for row in rows],
+                    )
+                    merged = await conn.fetchrow(
+                        "SELECT * FROM merge_crawl_staging($1)", batch_id
+                    )
+        except Exception as e:
+            self._stats["failed_batches"] += 1
+            self._stats["failed_results"] += len(results)
+            self._stats["last_error"] = str(e)
+            self._stats["last_error_at"] = datetime.now(timezone.utc).isoformat()
+            logger.exception(
+                "Bulk writer flush failed (%d results, %d rows)", len(results), len(rows)
+            )
+            if self.on_error is not None:
+                try:
+                    self.on_error(len(results), e)
+                except Exception:
+                    logger.exception("Bulk writer on_error callback failed")
+            return
+
+        self._stats["batches"] += 1
+        self._stats["rows_copied"] += len(rows)
+        self._stats["updates_upserted"] += merged["updates_upserted"]
+        self._stats["chunks_inserted"] += merged["chunks_inserted"]
+        self._stats["chunks_deleted"] += merged["chunks_deleted"]
+        self._stats["last_flush_seconds"] = round(time.perf_counter() - started, 4)
@@ -62,7 +62,7 @@ async function getProcessingCount() {
   return count || 0;
 }
 
-// Get next job from queue
+// Claim next job from queue
 async function getNextJob(config) {
   const processingCount = await getProcessingCount();
 
@@ -72,43 +72,16 @@ async function getNextJob(config) {
     return null;
   }
 
-  // Get next queued job (ordered by priority and created_at)
-  const { data, error } = await supabase
-    .from('jobs')
-    .select('*')
-    .eq('status', 'queued')
-    .order('priority', { ascending: true })  // high=1, medium=2, low=3
-    .order('created_at', { ascending: true })
-    .limit(1)
-    .single();
-
-  if (error && error.code !== 'PGRST116') { // PGRST116 = no rows
-    console.error('❌ Error fetching next job:', error);
-    return null;
-  }
-
-  return data;
-}
-
-// Mark job as processing
-async function startJob(jobId) {
-  const { data, error } = await supabase
-    .from('jobs')
-    .update({
-      status: 'processing',
-      started_at: new Date().toISOString(),
-      updated_at: new Date().toISOString()
-    })
-    .eq('id', jobId)
-    .select()
-    .single();
+  // Claim the next queued job (priority, then enqueue order) and mark it
+  // processing in one call; FOR UPDATE SKIP LOCKED lets workers run side by side
+  const { data, error } = await supabase.rpc('dequeue_jobs', { p_limit: 1 });
 
   if (error) {
-    console.error(`❌ Error starting job ${jobId}:`, error);
+    console.error('❌ Error claiming next job:', error);
     return null;
   }
 
-  return data;
+  return data && data.length > 0 ? data[0] : null;
 }
 
 // Categorize errors for better handling
@@ -312,10 +285,7 @@ async function workerLoop() {
     const nextJob = await getNextJob(config);
 
     if (nextJob) {
-      const startedJob = await startJob(nextJob.id);
-      if (startedJob) {
-        await processJob(startedJob);
-      }
+      await processJob(nextJob);
     } else {
       console.log('   📭 No jobs in queue');
     }
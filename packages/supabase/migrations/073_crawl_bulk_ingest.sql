@@ -0,0 +1,151 @@
+-- ============================================================================
+-- Migration: 073_crawl_bulk_ingest.sql
+-- Description: Staging table and merge function for bulk COPY ingestion of
+--              crawl results into daily_updates and knowledge_chunks
+-- ============================================================================
+
+-- ============================================================================
+-- 1. DEDUP KEYS ON TARGET TABLES
+-- ============================================================================
+
+ALTER TABLE public.daily_updates ADD COLUMN IF NOT EXISTS canonical_url TEXT;
+ALTER TABLE public.daily_updates ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_daily_updates_canonical_url
+  ON public.daily_updates(canonical_url);
+
+ALTER TABLE public.knowledge_chunks ADD COLUMN IF NOT EXISTS canonical_url TEXT;
+ALTER TABLE public.knowledge_chunks ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_knowledge_chunks_canonical_hash
+  ON public.knowledge_chunks(canonical_url, content_hash);
+
+-- ============================================================================
+-- 2. STAGING TABLE
+-- ============================================================================
+
+-- UNLOGGED: rows only live between COPY and merge, so WAL is wasted on them.
+-- Each flush uses its own batch_id so concurrent writers never collide.
+CREATE UNLOGGED TABLE IF NOT EXISTS public.crawl_ingest_staging (
+  batch_id UUID NOT NULL,
+  kind TEXT NOT NULL CHECK (kind IN ('article', 'chunk')),
+  canonical_url TEXT NOT NULL,
+  source_url TEXT,
+  title TEXT,
+  content TEXT,
+  content_hash TEXT NOT NULL,
+  category TEXT,
+  published_date TIMESTAMPTZ,
+  scraped_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  chunk_index INTEGER,
+  chunk_text TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_crawl_ingest_staging_batch
+  ON public.crawl_ingest_staging(batch_id);
+
+-- Service role only
+ALTER TABLE public.crawl_ingest_staging ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- 3. MERGE FUNCTION
+-- ============================================================================
+
+-- Merge one staged batch into the target tables and clear it.
+-- daily_updates is upserted on canonical_url and only rewritten when the
+-- content hash changed; chunks are keyed on (canonical_url, content_hash) so
+-- unchanged chunks are skipped entirely. Chunks of a recrawled URL that are
+-- not in its latest crawl are deleted, so old paragraphs stop being served.
+CREATE OR REPLACE FUNCTION merge_crawl_staging(p_batch_id UUID)
+RETURNS TABLE (
+  updates_upserted INTEGER,
+  chunks_inserted INTEGER,
+  chunks_deleted INTEGER
+) AS $$
+DECLARE
+  v_updates INTEGER;
+  v_chunks INTEGER;
+  v_stale INTEGER;
+BEGIN
+  INSERT INTO public.daily_updates (
+    date, category, title, content, source_url, canonical_url,
+    content_hash, published_date, scraped_at
+  )
+  SELECT DISTINCT ON (s.canonical_url)
+    COALESCE(s.published_date::DATE, CURRENT_DATE),
+    COALESCE(s.category, 'national'),
+    COALESCE(NULLIF(s.title, ''), s.canonical_url),
+    s.content,
+    s.source_url,
+    s.canonical_url,
+    s.content_hash,
+    s.published_date,
+    s.scraped_at
+  FROM public.crawl_ingest_staging s
+  WHERE s.batch_id = p_batch_id AND s.kind = 'article'
+  ORDER BY s.canonical_url, s.scraped_at DESC
+  ON CONFLICT (canonical_url) DO UPDATE SET
+    title = EXCLUDED.title,
+    content = EXCLUDED.content,
+    source_url = EXCLUDED.source_url,
+    content_hash = EXCLUDED.content_hash,
+    published_date = COALESCE(EXCLUDED.published_date, daily_updates.published_date),
+    scraped_at = EXCLUDED.scraped_at
+  WHERE daily_updates.content_hash IS DISTINCT FROM EXCLUDED.content_hash;
+
+  GET DIAGNOSTICS v_updates = ROW_COUNT;
+
+  INSERT INTO public.knowledge_chunks (
+    chunk_text, chunk_index, canonical_url, content_hash, metadata
+  )
+  SELECT DISTINCT ON (s.canonical_url, s.content_hash)
+    s.chunk_text,
+    s.chunk_index,
+    s.canonical_url,
+    s.content_hash,
+    jsonb_build_object('source_url', s.source_url, 'source', 'crawl4ai')
+  FROM public.crawl_ingest_staging s
+  WHERE s.batch_id = p_batch_id AND s.kind = 'chunk'
+  ORDER BY s.canonical_url, s.content_hash, s.scraped_at DESC
+  ON CONFLICT (canonical_url, content_hash) DO NOTHING;
+
+  GET DIAGNOSTICS v_chunks = ROW_COUNT;
+
+  -- A URL crawled twice in one batch keeps the chunks of its latest crawl
+  WITH latest AS (
+    SELECT s.canonical_url, max(s.scraped_at) AS scraped_at
+    FROM public.crawl_ingest_staging s
+    WHERE s.batch_id = p_batch_id AND s.kind = 'article'
+    GROUP BY s.canonical_url
+  )
+  DELETE FROM public.knowledge_chunks kc
+  USING latest l
+  WHERE kc.canonical_url = l.canonical_url
+    AND NOT EXISTS (
+      SELECT 1 FROM public.crawl_ingest_staging s
+      WHERE s.batch_id = p_batch_id AND s.kind = 'chunk'
+        AND s.canonical_url = l.canonical_url
+        AND s.scraped_at = l.scraped_at
+        AND s.content_hash = kc.content_hash
+    );
+
+  GET DIAGNOSTICS v_stale = ROW_COUNT;
+
+  DELETE FROM public.crawl_ingest_staging WHERE batch_id = p_batch_id;
+
+  RETURN QUERY SELECT v_updates, v_chunks, v_stale;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public, pg_temp;
+
+-- Only the crawl writer (CRAWL_PG_DSN connects as service_role) may merge;
+-- the function deletes chunks, so it must not be callable through the API
+REVOKE ALL ON FUNCTION merge_crawl_staging(UUID) FROM PUBLIC;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+    GRANT EXECUTE ON FUNCTION merge_crawl_staging(UUID) TO service_role;
+  END IF;
+END $$;
+
+COMMENT ON TABLE public.crawl_ingest_staging IS 'COPY target for crawl4ai bulk writer; rows are merged and deleted per batch';
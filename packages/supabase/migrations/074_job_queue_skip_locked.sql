@@ -0,0 +1,216 @@
+-- ============================================================================
+-- Migration: 074_job_queue_skip_locked.sql
+-- Description: O(1) enqueue/dequeue for the video job queue. Replaces the
+--              update_queue_positions() statement trigger (which renumbered
+--              every queued job on each write) with a monotonic sequence,
+--              a priority-partitioned queue index and a SKIP LOCKED batch
+--              dequeue; positions are computed on read
+-- ============================================================================
+
+-- ============================================================================
+-- 1. DROP THE RENUMBERING TRIGGER
+-- ============================================================================
+
+DROP TRIGGER IF EXISTS trigger_update_queue_positions ON public.jobs;
+DROP FUNCTION IF EXISTS update_queue_positions();
+
+-- ============================================================================
+-- 2. MONOTONIC QUEUE SEQUENCE
+-- ============================================================================
+
+-- Order within a priority is fixed at enqueue time, so no write ever has to
+-- touch other jobs. Re-queued (retried) jobs keep their original ticket.
+CREATE SEQUENCE IF NOT EXISTS public.jobs_queue_seq;
+
+ALTER TABLE public.jobs ADD COLUMN IF NOT EXISTS queue_seq BIGINT;
+
+-- Every existing job gets a ticket in the old queue order. Finished jobs
+-- need one too: a failed or timed-out job can be re-queued, and a NULL
+-- ticket would sort it after every other job in get_queue_positions.
+WITH ordered AS (
+  SELECT id, ROW_NUMBER() OVER (ORDER BY created_at, id) AS seq
+  FROM public.jobs
+  WHERE queue_seq IS NULL
+)
+UPDATE public.jobs j
+SET queue_seq = ordered.seq
+FROM ordered
+WHERE j.id = ordered.id;
+
+SELECT setval('public.jobs_queue_seq', GREATEST((SELECT MAX(queue_seq) FROM public.jobs), 0) + 1, false);
+
+ALTER SEQUENCE public.jobs_queue_seq OWNED BY public.jobs.queue_seq;
+
+-- Set after the backfill: a volatile default on ADD COLUMN would rewrite the table
+ALTER TABLE public.jobs ALTER COLUMN queue_seq SET DEFAULT nextval('public.jobs_queue_seq');
+-- The ADD COLUMN above already holds ACCESS EXCLUSIVE for this transaction
+-- and the backfill touched every row, so the NOT VALID dance buys nothing
+-- migrator:lint-ignore L006
+ALTER TABLE public.jobs ALTER COLUMN queue_seq SET NOT NULL;
+
+COMMENT ON COLUMN public.jobs.queue_position IS 'Deprecated: no longer maintained; use get_queue_position(job_id)';
+
+-- ============================================================================
+-- 3. PRIORITY PARTITIONS
+-- ============================================================================
+
+-- Queued jobs only, keyed by priority first: each priority is a contiguous
+-- range of the index in enqueue order, so a dequeue reads the head of one
+-- range and a position lookup counts at most three ranges. (A single index
+-- instead of one partial index per priority keeps the plan valid when the
+-- priority is a parameter, as in dequeue_jobs.)
+CREATE INDEX IF NOT EXISTS idx_jobs_queued_priority_seq
+  ON public.jobs(priority, queue_seq) WHERE status = 'queued';
+
+-- Superseded by the index above
+DROP INDEX IF EXISTS public.idx_jobs_queue_position;
+DROP INDEX IF EXISTS public.idx_jobs_queue_processing;
+
+-- ============================================================================
+-- 4. BATCH DEQUEUE
+-- ============================================================================
+
+-- Claim up to p_limit queued jobs, highest priority first and FIFO within a
+-- priority, and mark them processing. Rows locked by another worker are
+-- skipped rather than waited on, so concurrent workers never serialise.
+-- p_type_limits caps how many jobs of a type this call may claim, e.g.
+-- '{"topic_short": 1}' while the Manim renderer has one free slot: jobs of
+-- a capped type are passed over in place instead of being claimed and
+-- handed back, which would fire the 075 counter triggers twice per job.
+DROP FUNCTION IF EXISTS dequeue_jobs(INTEGER, TEXT[]);
+
+CREATE OR REPLACE FUNCTION dequeue_jobs(
+  p_limit INTEGER DEFAULT 1,
+  p_job_types TEXT[] DEFAULT NULL,
+  p_type_limits JSONB DEFAULT NULL
+)
+RETURNS SETOF public.jobs AS $$
+DECLARE
+  v_priority TEXT;
+  v_remaining INTEGER := p_limit;
+  v_claimed INTEGER;
+  v_full TEXT[];
+  v_taken JSONB := '{}'::jsonb;
+  v_job RECORD;
+BEGIN
+  IF p_type_limits IS NULL THEN
+    FOREACH v_priority IN ARRAY ARRAY['high', 'medium', 'low'] LOOP
+      EXIT WHEN v_remaining <= 0;
+
+      RETURN QUERY
+      WITH next_jobs AS (
+        SELECT id
+        FROM public.jobs
+        WHERE status = 'queued'
+          AND priority = v_priority
+          AND (p_job_types IS NULL OR job_type = ANY(p_job_types))
+        ORDER BY queue_seq
+        LIMIT v_remaining
+        FOR UPDATE SKIP LOCKED
+      )
+      UPDATE public.jobs j
+      SET status = 'processing', started_at = NOW(), updated_at = NOW()
+      FROM next_jobs
+      WHERE j.id = next_jobs.id
+      RETURNING j.*;
+
+      GET DIAGNOSTICS v_claimed = ROW_COUNT;
+      v_remaining := v_remaining - v_claimed;
+    END LOOP;
+    RETURN;
+  END IF;
+
+  -- Capped types are counted job by job; a type leaves the scan as soon as
+  -- its cap is reached (types capped at 0 never enter it)
+  SELECT COALESCE(array_agg(key), ARRAY[]::TEXT[]) INTO v_full
+  FROM jsonb_each_text(p_type_limits)
+  WHERE value::INTEGER <= 0;
+
+  FOREACH v_priority IN ARRAY ARRAY['high', 'medium', 'low'] LOOP
+    EXIT WHEN v_remaining <= 0;
+
+    FOR v_job IN
+      SELECT id, job_type
+      FROM public.jobs
+      WHERE status = 'queued'
+        AND priority = v_priority
+        AND (p_job_types IS NULL OR job_type = ANY(p_job_types))
+        AND job_type <> ALL(v_full)
+      ORDER BY queue_seq
+      FOR UPDATE SKIP LOCKED
+    LOOP
+      CONTINUE WHEN v_job.job_type = ANY(v_full);
+
+      RETURN QUERY
+      UPDATE public.jobs j
+      SET status = 'processing', started_at = NOW(), updated_at = NOW()
+      WHERE j.id = v_job.id
+      RETURNING j.*;
+
+      v_remaining := v_remaining - 1;
+      EXIT WHEN v_remaining <= 0;
+
+      IF p_type_limits ? v_job.job_type THEN
+        v_claimed := COALESCE((v_taken ->> v_job.job_type)::INTEGER, 0) + 1;
+        v_taken := v_taken || jsonb_build_object(v_job.job_type, v_claimed);
+        IF v_claimed >= (p_type_limits ->> v_job.job_type)::INTEGER THEN
+          v_full := v_full || v_job.job_type;
+        END IF;
+      END IF;
+    END LOOP;
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- 5. POSITION ON READ
+-- ============================================================================
+
+-- 1-based positions of a set of queued jobs: every queued job of a higher
+-- priority plus those ahead of it in its own priority. Higher-priority
+-- counts are taken once for the whole set, and each job adds one range count
+-- on idx_jobs_queued_priority_seq. Jobs no longer queued get no row.
+CREATE OR REPLACE FUNCTION get_queue_positions(p_job_ids UUID[])
+RETURNS TABLE (
+  job_id UUID,
+  queue_position BIGINT,
+  total_ahead BIGINT
+) AS $$
+  WITH targets AS (
+    SELECT id, priority, queue_seq,
+           CASE priority WHEN 'high' THEN 0 WHEN 'medium' THEN 1 ELSE 2 END AS rank
+    FROM public.jobs
+    WHERE id = ANY(p_job_ids) AND status = 'queued'
+  ),
+  higher AS (
+    SELECT COUNT(*) FILTER (WHERE priority = 'high') AS high,
+           COUNT(*) FILTER (WHERE priority = 'medium') AS medium
+    FROM public.jobs
+    WHERE status = 'queued' AND priority IN ('high', 'medium')
+      AND EXISTS (SELECT 1 FROM targets WHERE rank > 0)
+  )
+  SELECT t.id, ahead.n + 1, ahead.n
+  FROM targets t
+  CROSS JOIN higher h
+  CROSS JOIN LATERAL (
+    SELECT CASE t.rank WHEN 0 THEN 0 WHEN 1 THEN h.high ELSE h.high + h.medium END
+           + (SELECT COUNT(*)
+              FROM public.jobs q
+              WHERE q.status = 'queued'
+                AND q.priority = t.priority
+                AND q.queue_seq < t.queue_seq) AS n
+  ) ahead;
+$$ LANGUAGE sql STABLE;
+
+-- Single-job form used by the doubt pipes and pages
+CREATE OR REPLACE FUNCTION get_queue_position(p_job_id UUID)
+RETURNS TABLE (
+  queue_position BIGINT,
+  total_ahead BIGINT
+) AS $$
+  SELECT queue_position, total_ahead FROM get_queue_positions(ARRAY[p_job_id]);
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION dequeue_jobs IS 'Claim queued video jobs with FOR UPDATE SKIP LOCKED (priority, then enqueue order)';
+COMMENT ON FUNCTION get_queue_positions IS 'Queue positions of many jobs computed on read from idx_jobs_queued_priority_seq';
+COMMENT ON FUNCTION get_queue_position IS 'Queue position of one job; see get_queue_positions';
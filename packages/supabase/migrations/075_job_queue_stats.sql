@@ -0,0 +1,292 @@
+-- ============================================================================
+-- Migration: 075_job_queue_stats.sql
+-- Description: O(1) get_queue_stats() from counters maintained by statement
+--              triggers on jobs, a rolling wait-time histogram, and archiving
+--              of finished jobs out of the hot table
+-- ============================================================================
+
+-- ============================================================================
+-- 1. COUNTER TABLES
+-- ============================================================================
+
+-- Jobs per (status, priority). Writers add to one of 8 shards, chosen by
+-- backend pid, so concurrent enqueues and dequeues do not queue up on a
+-- single counter row; readers sum at most 5 x 3 x 8 rows.
+CREATE TABLE IF NOT EXISTS public.job_queue_counters (
+  status TEXT NOT NULL,
+  priority TEXT NOT NULL,
+  shard SMALLINT NOT NULL,
+  jobs BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (status, priority, shard)
+);
+
+-- Jobs that reached completed/failed, per day
+CREATE TABLE IF NOT EXISTS public.job_queue_daily (
+  day DATE NOT NULL,
+  status TEXT NOT NULL,
+  shard SMALLINT NOT NULL,
+  jobs BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, status, shard)
+);
+
+-- Wait (created_at -> started_at) of every job that started processing, per
+-- 5-minute window and wait bucket; bucket n counts waits in
+-- [bounds[n], bounds[n + 1]) with bounds job_queue_wait_bounds()
+CREATE TABLE IF NOT EXISTS public.job_queue_wait_histogram (
+  window_start TIMESTAMPTZ NOT NULL,
+  bucket SMALLINT NOT NULL,
+  shard SMALLINT NOT NULL,
+  jobs BIGINT NOT NULL DEFAULT 0,
+  wait_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+  PRIMARY KEY (window_start, bucket, shard)
+);
+
+-- Written only by the SECURITY DEFINER functions below
+ALTER TABLE public.job_queue_counters ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.job_queue_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.job_queue_wait_histogram ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION job_queue_wait_bounds()
+RETURNS DOUBLE PRECISION[] AS $$
+  SELECT ARRAY[10, 30, 60, 120, 300, 600, 1800, 3600]::DOUBLE PRECISION[];
+$$ LANGUAGE sql IMMUTABLE;
+
+-- ============================================================================
+-- 2. MAINTENANCE TRIGGERS
+-- ============================================================================
+
+-- Statement-level with transition tables: a batch dequeue or an archive run
+-- costs one aggregated upsert per counter table, not one per row.
+CREATE OR REPLACE FUNCTION track_job_queue_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+  v_shard SMALLINT := pg_backend_pid() % 8;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO public.job_queue_counters (status, priority, shard, jobs)
+    SELECT status, priority, v_shard, COUNT(*) FROM new_jobs GROUP BY status, priority
+    ON CONFLICT (status, priority, shard) DO UPDATE SET jobs = job_queue_counters.jobs + EXCLUDED.jobs;
+
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO public.job_queue_counters (status, priority, shard, jobs)
+    SELECT status, priority, v_shard, -COUNT(*) FROM old_jobs GROUP BY status, priority
+    ON CONFLICT (status, priority, shard) DO UPDATE SET jobs = job_queue_counters.jobs + EXCLUDED.jobs;
+
+  ELSE
+    INSERT INTO public.job_queue_counters (status, priority, shard, jobs)
+    SELECT status, priority, v_shard, SUM(delta)
+    FROM (
+      SELECT o.status, o.priority, -1 AS delta
+      FROM old_jobs o JOIN new_jobs n ON n.id = o.id
+      WHERE o.status IS DISTINCT FROM n.status OR o.priority IS DISTINCT FROM n.priority
+      UNION ALL
+      SELECT n.status, n.priority, 1
+      FROM old_jobs o JOIN new_jobs n ON n.id = o.id
+      WHERE o.status IS DISTINCT FROM n.status OR o.priority IS DISTINCT FROM n.priority
+    ) changes
+    GROUP BY status, priority
+    HAVING SUM(delta) <> 0
+    ON CONFLICT (status, priority, shard) DO UPDATE SET jobs = job_queue_counters.jobs + EXCLUDED.jobs;
+
+    INSERT INTO public.job_queue_daily (day, status, shard, jobs)
+    SELECT CURRENT_DATE, n.status, v_shard, COUNT(*)
+    FROM old_jobs o JOIN new_jobs n ON n.id = o.id
+    WHERE n.status IN ('completed', 'failed') AND o.status IS DISTINCT FROM n.status
+    GROUP BY n.status
+    ON CONFLICT (day, status, shard) DO UPDATE SET jobs = job_queue_daily.jobs + EXCLUDED.jobs;
+
+    INSERT INTO public.job_queue_wait_histogram (window_start, bucket, shard, jobs, wait_seconds)
+    SELECT to_timestamp(floor(EXTRACT(EPOCH FROM n.started_at) / 300) * 300),
+           width_bucket(GREATEST(EXTRACT(EPOCH FROM n.started_at - n.created_at), 0)::DOUBLE PRECISION,
+                        job_queue_wait_bounds()),
+           v_shard, COUNT(*),
+           SUM(GREATEST(EXTRACT(EPOCH FROM n.started_at - n.created_at), 0))
+    FROM old_jobs o JOIN new_jobs n ON n.id = o.id
+    WHERE n.status = 'processing' AND o.status IS DISTINCT FROM 'processing' AND n.started_at IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT (window_start, bucket, shard) DO UPDATE SET
+      jobs = job_queue_wait_histogram.jobs + EXCLUDED.jobs,
+      wait_seconds = job_queue_wait_histogram.wait_seconds + EXCLUDED.wait_seconds;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Transition tables require one trigger per event
+DROP TRIGGER IF EXISTS trigger_job_queue_stats_insert ON public.jobs;
+CREATE TRIGGER trigger_job_queue_stats_insert
+AFTER INSERT ON public.jobs
+REFERENCING NEW TABLE AS new_jobs
+FOR EACH STATEMENT EXECUTE FUNCTION track_job_queue_stats();
+
+DROP TRIGGER IF EXISTS trigger_job_queue_stats_update ON public.jobs;
+CREATE TRIGGER trigger_job_queue_stats_update
+AFTER UPDATE ON public.jobs
+REFERENCING OLD TABLE AS old_jobs NEW TABLE AS new_jobs
+FOR EACH STATEMENT EXECUTE FUNCTION track_job_queue_stats();
+
+DROP TRIGGER IF EXISTS trigger_job_queue_stats_delete ON public.jobs;
+CREATE TRIGGER trigger_job_queue_stats_delete
+AFTER DELETE ON public.jobs
+REFERENCING OLD TABLE AS old_jobs
+FOR EACH STATEMENT EXECUTE FUNCTION track_job_queue_stats();
+
+-- ============================================================================
+-- 3. SEED FROM THE CURRENT TABLE
+-- ============================================================================
+
+-- CREATE TRIGGER holds a lock that blocks writes to jobs until this
+-- migration commits, so the seed and the triggers agree exactly.
+DELETE FROM public.job_queue_counters;
+INSERT INTO public.job_queue_counters (status, priority, shard, jobs)
+SELECT status, priority, 0, COUNT(*) FROM public.jobs GROUP BY status, priority;
+
+DELETE FROM public.job_queue_daily WHERE day = CURRENT_DATE;
+INSERT INTO public.job_queue_daily (day, status, shard, jobs)
+SELECT CURRENT_DATE, status, 0, COUNT(*)
+FROM public.jobs
+WHERE (status = 'completed' AND completed_at >= CURRENT_DATE)
+   OR (status = 'failed' AND updated_at >= CURRENT_DATE)
+GROUP BY status;
+
+DELETE FROM public.job_queue_wait_histogram;
+INSERT INTO public.job_queue_wait_histogram (window_start, bucket, shard, jobs, wait_seconds)
+SELECT to_timestamp(floor(EXTRACT(EPOCH FROM started_at) / 300) * 300),
+       width_bucket(GREATEST(EXTRACT(EPOCH FROM started_at - created_at), 0)::DOUBLE PRECISION,
+                    job_queue_wait_bounds()),
+       0, COUNT(*), SUM(GREATEST(EXTRACT(EPOCH FROM started_at - created_at), 0))
+FROM public.jobs
+WHERE started_at >= NOW() - INTERVAL '24 hours'
+GROUP BY 1, 2;
+
+-- ============================================================================
+-- 4. READERS
+-- ============================================================================
+
+-- Same columns as before; avg_wait_time_minutes now covers jobs that
+-- started in the last 24 hours instead of every job ever started.
+CREATE OR REPLACE FUNCTION get_queue_stats()
+RETURNS TABLE (
+  total_queued BIGINT,
+  total_processing BIGINT,
+  total_completed_today BIGINT,
+  total_failed_today BIGINT,
+  avg_wait_time_minutes NUMERIC,
+  high_priority_count BIGINT,
+  medium_priority_count BIGINT,
+  low_priority_count BIGINT
+) AS $$
+  WITH counters AS (
+    SELECT status, priority, SUM(jobs) AS jobs
+    FROM public.job_queue_counters
+    GROUP BY status, priority
+  ),
+  today AS (
+    SELECT status, SUM(jobs) AS jobs
+    FROM public.job_queue_daily
+    WHERE day = CURRENT_DATE
+    GROUP BY status
+  ),
+  waits AS (
+    SELECT SUM(wait_seconds) / NULLIF(SUM(jobs), 0) AS avg_seconds
+    FROM public.job_queue_wait_histogram
+    WHERE window_start >= NOW() - INTERVAL '24 hours'
+  )
+  SELECT
+    COALESCE((SELECT SUM(jobs) FROM counters WHERE status = 'queued'), 0)::BIGINT,
+    COALESCE((SELECT SUM(jobs) FROM counters WHERE status = 'processing'), 0)::BIGINT,
+    COALESCE((SELECT jobs FROM today WHERE status = 'completed'), 0)::BIGINT,
+    COALESCE((SELECT jobs FROM today WHERE status = 'failed'), 0)::BIGINT,
+    ((SELECT avg_seconds FROM waits) / 60)::NUMERIC,
+    COALESCE((SELECT jobs FROM counters WHERE status = 'queued' AND priority = 'high'), 0)::BIGINT,
+    COALESCE((SELECT jobs FROM counters WHERE status = 'queued' AND priority = 'medium'), 0)::BIGINT,
+    COALESCE((SELECT jobs FROM counters WHERE status = 'queued' AND priority = 'low'), 0)::BIGINT;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+-- Wait-time distribution over a rolling window, one row per bucket
+CREATE OR REPLACE FUNCTION get_queue_wait_histogram(p_window INTERVAL DEFAULT INTERVAL '1 hour')
+RETURNS TABLE (
+  min_wait_seconds DOUBLE PRECISION,
+  max_wait_seconds DOUBLE PRECISION,
+  jobs BIGINT,
+  avg_wait_seconds DOUBLE PRECISION
+) AS $$
+  SELECT
+    CASE WHEN h.bucket = 0 THEN 0 ELSE (job_queue_wait_bounds())[h.bucket] END,
+    (job_queue_wait_bounds())[h.bucket + 1],
+    SUM(h.jobs)::BIGINT,
+    SUM(h.wait_seconds) / NULLIF(SUM(h.jobs), 0)
+  FROM public.job_queue_wait_histogram h
+  WHERE h.window_start >= NOW() - p_window
+  GROUP BY h.bucket
+  ORDER BY h.bucket;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+-- ============================================================================
+-- 5. ARCHIVE OF FINISHED JOBS
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS public.jobs_archive (
+  LIKE public.jobs INCLUDING DEFAULTS,
+  archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (id)
+);
+
+ALTER TABLE public.jobs_archive ENABLE ROW LEVEL SECURITY;
+
+CREATE INDEX IF NOT EXISTS idx_jobs_finished
+  ON public.jobs(updated_at) WHERE status IN ('completed', 'failed', 'cancelled');
+
+-- Move finished jobs older than p_older_than to jobs_archive, at most
+-- p_batch_size per call (call repeatedly to catch up), and drop stats rows
+-- older than any reader looks at. Returns the number of jobs moved.
+-- Columns are listed by name (archived_at comes last in jobs_archive, so a
+-- positional copy breaks once jobs gains a column); a column added to jobs
+-- must be added to jobs_archive and to both lists here.
+CREATE OR REPLACE FUNCTION archive_finished_jobs(
+  p_older_than INTERVAL DEFAULT INTERVAL '7 days',
+  p_batch_size INTEGER DEFAULT 5000
+)
+RETURNS INTEGER AS $$
+DECLARE
+  v_moved INTEGER;
+BEGIN
+  WITH moved AS (
+    DELETE FROM public.jobs
+    WHERE id IN (
+      SELECT id FROM public.jobs
+      WHERE status IN ('completed', 'failed', 'cancelled')
+        AND updated_at < NOW() - p_older_than
+      LIMIT p_batch_size
+      FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, job_type, priority, status, payload, queue_position, retry_count, max_retries,
+              error_message, started_at, completed_at, created_at, updated_at, user_id, queue_seq
+  )
+  INSERT INTO public.jobs_archive
+    (id, job_type, priority, status, payload, queue_position, retry_count, max_retries,
+     error_message, started_at, completed_at, created_at, updated_at, user_id, queue_seq)
+  SELECT id, job_type, priority, status, payload, queue_position, retry_count, max_retries,
+         error_message, started_at, completed_at, created_at, updated_at, user_id, queue_seq
+  FROM moved;
+
+  GET DIAGNOSTICS v_moved = ROW_COUNT;
+
+  DELETE FROM public.job_queue_daily WHERE day < CURRENT_DATE - 31;
+  DELETE FROM public.job_queue_wait_histogram WHERE window_start < NOW() - INTERVAL '7 days';
+
+  RETURN v_moved;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Every 15 minutes where pg_cron is installed; otherwise call it from a worker
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('archive-finished-jobs', '*/15 * * * *', 'SELECT archive_finished_jobs()');
+  END IF;
+END $$;
+
+COMMENT ON TABLE public.job_queue_counters IS 'Sharded job counts per (status, priority), maintained by trigger_job_queue_stats_*';
+COMMENT ON TABLE public.jobs_archive IS 'Finished jobs moved out of jobs by archive_finished_jobs()';
+COMMENT ON FUNCTION get_queue_stats IS 'Queue dashboard stats from job_queue_counters/daily/wait_histogram; O(1) in the size of jobs';
@@ -0,0 +1,610 @@
+-- ============================================================================
+-- Migration: 076_question_attempt_rollups.sql
+-- Description: Daily per-user rollups of question_attempts, maintained by
+--              statement triggers, so the Story 8.10 analytics functions read
+--              a few hundred rollup rows instead of rescanning every attempt
+--              in the window once per section of get_complete_analytics()
+-- ============================================================================
+
+-- ============================================================================
+-- 1. ROLLUP TABLES
+-- ============================================================================
+
+-- One row per user, UTC day, subject and difficulty. "subject" is the label
+-- 043 groups by: the generated question's topic or the PYQ's subject, as
+-- stored on the attempt (question_attempts.subject below). Averages are time_seconds / timed_attempts
+-- because attempts without a time do not count towards AVG().
+CREATE TABLE IF NOT EXISTS public.question_attempt_daily (
+  user_id UUID NOT NULL,
+  day DATE NOT NULL,
+  subject TEXT NOT NULL,
+  difficulty TEXT NOT NULL,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  correct INTEGER NOT NULL DEFAULT 0,
+  timed_attempts INTEGER NOT NULL DEFAULT 0,
+  time_seconds BIGINT NOT NULL DEFAULT 0,
+  last_attempt TIMESTAMPTZ,
+  PRIMARY KEY (user_id, day, subject, difficulty)
+);
+
+-- Attempts per (user, PYQ), for coverage without COUNT(DISTINCT) over attempts
+CREATE TABLE IF NOT EXISTS public.user_pyq_attempts (
+  user_id UUID NOT NULL,
+  question_id UUID NOT NULL,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, question_id)
+);
+
+ALTER TABLE public.question_attempt_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.user_pyq_attempts ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view own attempt rollups" ON public.question_attempt_daily;
+CREATE POLICY "Users can view own attempt rollups"
+  ON public.question_attempt_daily FOR SELECT
+  USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Users can view own pyq attempts" ON public.user_pyq_attempts;
+CREATE POLICY "Users can view own pyq attempts"
+  ON public.user_pyq_attempts FOR SELECT
+  USING (auth.uid() = user_id);
+
+-- The subject an attempt rolls up under, fixed when it is recorded. The
+-- rollup triggers add and subtract this stored value, so retagging a
+-- question's topic or deleting the question cannot make an attempt's
+-- removal land on a different rollup row than its insert did.
+ALTER TABLE public.question_attempts ADD COLUMN IF NOT EXISTS subject TEXT;
+
+CREATE OR REPLACE FUNCTION set_question_attempt_subject()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.subject := COALESCE(
+    (SELECT gq.topic FROM public.generated_questions gq
+     WHERE gq.id = NEW.question_id AND NEW.question_source = 'generated'),
+    (SELECT pq.subject FROM public.pyq_questions pq
+     WHERE pq.id = NEW.question_id AND NEW.question_source = 'pyq'),
+    'Unknown'
+  );
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS trigger_question_attempt_subject ON public.question_attempts;
+CREATE TRIGGER trigger_question_attempt_subject
+BEFORE INSERT OR UPDATE OF question_id, question_source ON public.question_attempts
+FOR EACH ROW EXECUTE FUNCTION set_question_attempt_subject();
+
+-- Existing attempts get the label their question has now. CREATE TRIGGER
+-- above already blocks inserts until commit; the rollup triggers do not
+-- exist yet, so this UPDATE is not counted, and the seed below reads it.
+UPDATE public.question_attempts a
+SET subject = COALESCE(
+  (SELECT gq.topic FROM public.generated_questions gq
+   WHERE gq.id = a.question_id AND a.question_source = 'generated'),
+  (SELECT pq.subject FROM public.pyq_questions pq
+   WHERE pq.id = a.question_id AND a.question_source = 'pyq'),
+  'Unknown'
+)
+WHERE a.subject IS NULL;
+
+-- Raw reads are limited to one user's first (partial) day of a window
+CREATE INDEX IF NOT EXISTS idx_question_attempts_user_created
+  ON public.question_attempts(user_id, created_at);
+
+-- ============================================================================
+-- 2. MAINTENANCE TRIGGERS
+-- ============================================================================
+
+-- Statement-level with transition tables: a practice session saved in one
+-- INSERT costs one upsert per touched rollup row. Updates subtract the old
+-- rows and add the new ones, each under the subject stored on that row.
+-- A maximum cannot be subtracted, so last_attempt of every rollup row that
+-- lost attempts is recomputed from the attempts left in it (one user-day
+-- range of idx_question_attempts_user_created per row).
+CREATE OR REPLACE FUNCTION track_question_attempt_rollups()
+RETURNS TRIGGER AS $$
+DECLARE
+  v_change RECORD;
+BEGIN
+  FOR v_change IN
+    SELECT source, sign
+    FROM (VALUES ('old_attempts', -1), ('new_attempts', 1)) AS c(source, sign)
+    WHERE (source = 'old_attempts' AND TG_OP IN ('UPDATE', 'DELETE'))
+       OR (source = 'new_attempts' AND TG_OP IN ('INSERT', 'UPDATE'))
+  LOOP
+    EXECUTE format($sql$
+      INSERT INTO public.question_attempt_daily AS d
+        (user_id, day, subject, difficulty, attempts, correct, timed_attempts, time_seconds, last_attempt)
+      SELECT a.user_id,
+             (a.created_at AT TIME ZONE 'UTC')::DATE,
+             COALESCE(a.subject, 'Unknown'),
+             COALESCE(a.difficulty_at_attempt, 'unknown'),
+             $1 * COUNT(*),
+             $1 * COUNT(*) FILTER (WHERE a.is_correct),
+             $1 * COUNT(a.time_taken_seconds),
+             $1 * COALESCE(SUM(a.time_taken_seconds), 0),
+             MAX(a.created_at)
+      FROM %I a
+      GROUP BY 1, 2, 3, 4
+      ON CONFLICT (user_id, day, subject, difficulty) DO UPDATE SET
+        attempts = d.attempts + EXCLUDED.attempts,
+        correct = d.correct + EXCLUDED.correct,
+        timed_attempts = d.timed_attempts + EXCLUDED.timed_attempts,
+        time_seconds = d.time_seconds + EXCLUDED.time_seconds,
+        last_attempt = GREATEST(d.last_attempt, EXCLUDED.last_attempt)
+    $sql$, v_change.source) USING v_change.sign;
+
+    EXECUTE format($sql$
+      INSERT INTO public.user_pyq_attempts AS u (user_id, question_id, attempts)
+      SELECT a.user_id, a.question_id, $1 * COUNT(*)
+      FROM %I a
+      WHERE a.question_source = 'pyq'
+      GROUP BY 1, 2
+      ON CONFLICT (user_id, question_id) DO UPDATE SET attempts = u.attempts + EXCLUDED.attempts
+    $sql$, v_change.source) USING v_change.sign;
+  END LOOP;
+
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE public.question_attempt_daily d
+    SET last_attempt = (
+      SELECT MAX(a.created_at)
+      FROM public.question_attempts a
+      WHERE a.user_id = d.user_id
+        AND a.created_at >= d.day::TIMESTAMP AT TIME ZONE 'UTC'
+        AND a.created_at < (d.day + 1)::TIMESTAMP AT TIME ZONE 'UTC'
+        AND COALESCE(a.subject, 'Unknown') = d.subject
+        AND COALESCE(a.difficulty_at_attempt, 'unknown') = d.difficulty
+    )
+    FROM (
+      SELECT DISTINCT o.user_id,
+             (o.created_at AT TIME ZONE 'UTC')::DATE AS day,
+             COALESCE(o.subject, 'Unknown') AS subject,
+             COALESCE(o.difficulty_at_attempt, 'unknown') AS difficulty
+      FROM old_attempts o
+    ) removed
+    WHERE d.user_id = removed.user_id
+      AND d.day = removed.day
+      AND d.subject = removed.subject
+      AND d.difficulty = removed.difficulty;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Transition tables require one trigger per event
+DROP TRIGGER IF EXISTS trigger_question_attempt_rollups_insert ON public.question_attempts;
+CREATE TRIGGER trigger_question_attempt_rollups_insert
+AFTER INSERT ON public.question_attempts
+REFERENCING NEW TABLE AS new_attempts
+FOR EACH STATEMENT EXECUTE FUNCTION track_question_attempt_rollups();
+
+DROP TRIGGER IF EXISTS trigger_question_attempt_rollups_update ON public.question_attempts;
+CREATE TRIGGER trigger_question_attempt_rollups_update
+AFTER UPDATE ON public.question_attempts
+REFERENCING OLD TABLE AS old_attempts NEW TABLE AS new_attempts
+FOR EACH STATEMENT EXECUTE FUNCTION track_question_attempt_rollups();
+
+DROP TRIGGER IF EXISTS trigger_question_attempt_rollups_delete ON public.question_attempts;
+CREATE TRIGGER trigger_question_attempt_rollups_delete
+AFTER DELETE ON public.question_attempts
+REFERENCING OLD TABLE AS old_attempts
+FOR EACH STATEMENT EXECUTE FUNCTION track_question_attempt_rollups();
+
+-- ============================================================================
+-- 3. SEED FROM THE CURRENT TABLE
+-- ============================================================================
+
+-- CREATE TRIGGER blocks writes to question_attempts until this migration
+-- commits, so the seed and the triggers agree exactly.
+DELETE FROM public.question_attempt_daily;
+INSERT INTO public.question_attempt_daily
+  (user_id, day, subject, difficulty, attempts, correct, timed_attempts, time_seconds, last_attempt)
+SELECT a.user_id,
+       (a.created_at AT TIME ZONE 'UTC')::DATE,
+       COALESCE(a.subject, 'Unknown'),
+       COALESCE(a.difficulty_at_attempt, 'unknown'),
+       COUNT(*),
+       COUNT(*) FILTER (WHERE a.is_correct),
+       COUNT(a.time_taken_seconds),
+       COALESCE(SUM(a.time_taken_seconds), 0),
+       MAX(a.created_at)
+FROM public.question_attempts a
+GROUP BY 1, 2, 3, 4;
+
+DELETE FROM public.user_pyq_attempts;
+INSERT INTO public.user_pyq_attempts (user_id, question_id, attempts)
+SELECT user_id, question_id, COUNT(*)
+FROM public.question_attempts
+WHERE question_source = 'pyq'
+GROUP BY 1, 2;
+
+-- ============================================================================
+-- 4. WINDOW READER
+-- ============================================================================
+
+-- A user's attempts since NOW() - p_days, aggregated like the rollup: whole
+-- days after the window's first day come from question_attempt_daily, and
+-- only the first, partial day is read from question_attempts.
+CREATE OR REPLACE FUNCTION question_attempt_window(
+  p_user_id UUID,
+  p_days INTEGER DEFAULT 30
+)
+RETURNS TABLE (
+  day DATE,
+  subject TEXT,
+  difficulty TEXT,
+  attempts BIGINT,
+  correct BIGINT,
+  timed_attempts BIGINT,
+  time_seconds BIGINT,
+  last_attempt TIMESTAMPTZ
+) AS $$
+  WITH bounds AS (
+    SELECT NOW() - (p_days || ' days')::INTERVAL AS since,
+           ((NOW() - (p_days || ' days')::INTERVAL) AT TIME ZONE 'UTC')::DATE AS first_day
+  )
+  SELECT d.day, d.subject, d.difficulty, d.attempts::BIGINT, d.correct::BIGINT,
+         d.timed_attempts::BIGINT, d.time_seconds, d.last_attempt
+  FROM public.question_attempt_daily d, bounds b
+  WHERE d.user_id = p_user_id
+    AND d.day > b.first_day
+    AND d.attempts > 0
+  UNION ALL
+  SELECT b.first_day,
+         COALESCE(a.subject, 'Unknown'),
+         COALESCE(a.difficulty_at_attempt, 'unknown'),
+         COUNT(*),
+         COUNT(*) FILTER (WHERE a.is_correct),
+         COUNT(a.time_taken_seconds),
+         COALESCE(SUM(a.time_taken_seconds), 0)::BIGINT,
+         MAX(a.created_at)
+  FROM bounds b
+  JOIN public.question_attempts a
+    ON a.user_id = p_user_id
+   AND a.created_at >= b.since
+   AND a.created_at < (b.first_day + 1)::TIMESTAMP AT TIME ZONE 'UTC'
+  GROUP BY b.first_day, 2, 3;
+$$ LANGUAGE sql STABLE;
+
+-- ============================================================================
+-- 5. ANALYTICS FUNCTIONS ON THE ROLLUPS (same signatures as 043)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION get_subject_analytics(
+  p_user_id UUID,
+  p_days INTEGER DEFAULT 30
+)
+RETURNS TABLE (
+  subject TEXT,
+  total_attempts INTEGER,
+  correct_attempts INTEGER,
+  accuracy DECIMAL(5,2),
+  avg_time_seconds INTEGER,
+  last_attempt TIMESTAMPTZ
+) AS $$
+  SELECT
+    w.subject,
+    SUM(w.attempts)::INTEGER,
+    SUM(w.correct)::INTEGER,
+    ROUND((SUM(w.correct)::DECIMAL / SUM(w.attempts)) * 100, 2),
+    COALESCE(ROUND(SUM(w.time_seconds)::DECIMAL / NULLIF(SUM(w.timed_attempts), 0))::INTEGER, 0),
+    MAX(w.last_attempt)
+  FROM question_attempt_window(p_user_id, p_days) w
+  GROUP BY w.subject
+  HAVING SUM(w.attempts) > 0
+  ORDER BY 2 DESC;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION get_time_analysis(
+  p_user_id UUID,
+  p_days INTEGER DEFAULT 30
+)
+RETURNS TABLE (
+  avg_time_per_question INTEGER,
+  total_practice_time_minutes INTEGER,
+  is_rushing BOOLEAN,
+  is_too_slow BOOLEAN,
+  time_status TEXT,
+  recommendation TEXT,
+  time_by_difficulty JSONB
+) AS $$
+DECLARE
+  v_avg_time INTEGER;
+  v_total_time INTEGER;
+  v_rushing BOOLEAN;
+  v_too_slow BOOLEAN;
+  v_status TEXT;
+  v_rec TEXT;
+  v_by_diff JSONB;
+BEGIN
+  SELECT
+    COALESCE(ROUND(SUM(time_seconds)::DECIMAL / NULLIF(SUM(timed_attempts), 0)), 0)::INTEGER,
+    COALESCE(SUM(time_seconds) / 60, 0)::INTEGER
+  INTO v_avg_time, v_total_time
+  FROM question_attempt_window(p_user_id, p_days);
+
+  -- Determine time status (AC 5 thresholds)
+  v_rushing := v_avg_time < 60;
+  v_too_slow := v_avg_time > 180;
+
+  IF v_rushing THEN
+    v_status := 'rushing';
+    v_rec := 'You''re answering too quickly (avg <60s). Take more time to read questions carefully.';
+  ELSIF v_too_slow THEN
+    v_status := 'too_slow';
+    v_rec := 'You''re taking too long (avg >3 min). Practice more to improve speed.';
+  ELSE
+    v_status := 'optimal';
+    v_rec := 'Your timing is good! Keep up the balanced approach.';
+  END IF;
+
+  SELECT jsonb_object_agg(diff, avg_t)
+  INTO v_by_diff
+  FROM (
+    SELECT
+      difficulty AS diff,
+      ROUND(SUM(time_seconds)::DECIMAL / NULLIF(SUM(timed_attempts), 0))::INTEGER AS avg_t
+    FROM question_attempt_window(p_user_id, p_days)
+    GROUP BY difficulty
+  ) t;
+
+  RETURN QUERY SELECT
+    v_avg_time,
+    v_total_time,
+    v_rushing,
+    v_too_slow,
+    v_status,
+    v_rec,
+    COALESCE(v_by_diff, '{}'::jsonb);
+END;
+$$ LANGUAGE plpgsql;
+
+-- 043 counted pyq_questions rows once per matching attempt and grouped by a
+-- pyq_questions.paper column that does not exist; year and paper type come
+-- from pyq_papers, which every schema variant has
+CREATE OR REPLACE FUNCTION get_pyq_coverage(p_user_id UUID)
+RETURNS TABLE (
+  total_pyqs INTEGER,
+  attempted_pyqs INTEGER,
+  coverage_percent DECIMAL(5,2),
+  by_year JSONB,
+  by_paper JSONB
+) AS $$
+DECLARE
+  v_total INTEGER;
+  v_attempted INTEGER;
+  v_by_year JSONB;
+  v_by_paper JSONB;
+BEGIN
+  SELECT COUNT(*) INTO v_total FROM public.pyq_questions;
+
+  SELECT COUNT(*) INTO v_attempted
+  FROM public.user_pyq_attempts
+  WHERE user_id = p_user_id AND attempts > 0;
+
+  WITH questions AS (
+    SELECT COALESCE(pp.year::TEXT, 'Unknown') AS year,
+           COALESCE(pp.paper_type, 'Unknown') AS paper,
+           (ua.question_id IS NOT NULL) AS attempted
+    FROM public.pyq_questions pq
+    LEFT JOIN public.pyq_papers pp ON pp.id = pq.paper_id
+    LEFT JOIN public.user_pyq_attempts ua
+      ON ua.question_id = pq.id AND ua.user_id = p_user_id AND ua.attempts > 0
+  )
+  SELECT
+    (SELECT jsonb_object_agg(year, jsonb_build_object(
+       'total', total, 'attempted', attempted,
+       'percent', ROUND((attempted::DECIMAL / NULLIF(total, 0)) * 100, 1)))
+     FROM (SELECT year, COUNT(*) AS total, COUNT(*) FILTER (WHERE attempted) AS attempted
+           FROM questions GROUP BY year) y),
+    (SELECT jsonb_object_agg(paper, jsonb_build_object(
+       'total', total, 'attempted', attempted,
+       'percent', ROUND((attempted::DECIMAL / NULLIF(total, 0)) * 100, 1)))
+     FROM (SELECT paper, COUNT(*) AS total, COUNT(*) FILTER (WHERE attempted) AS attempted
+           FROM questions GROUP BY paper) p)
+  INTO v_by_year, v_by_paper;
+
+  RETURN QUERY SELECT
+    v_total,
+    v_attempted,
+    CASE WHEN v_total > 0 THEN ROUND((v_attempted::DECIMAL / v_total) * 100, 2) ELSE 0 END,
+    COALESCE(v_by_year, '{}'::jsonb),
+    COALESCE(v_by_paper, '{}'::jsonb);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION get_ai_insights_data(p_user_id UUID)
+RETURNS TABLE (
+  insight_type TEXT,
+  priority INTEGER,
+  data JSONB
+) AS $$
+BEGIN
+  -- Strong subject insight
+  RETURN QUERY
+  SELECT 'strong_subject'::TEXT, 1, jsonb_build_object(
+    'subject', subject,
+    'accuracy', accuracy,
+    'message', 'You''re strong in ' || subject || ' (' || accuracy || '% accuracy). Consider tackling harder questions.'
+  )
+  FROM get_subject_analytics(p_user_id, 30)
+  WHERE accuracy >= 80 AND total_attempts >= 5
+  ORDER BY accuracy DESC
+  LIMIT 1;
+
+  -- Weak subject insight
+  RETURN QUERY
+  SELECT 'weak_subject'::TEXT, 2, jsonb_build_object(
+    'subject', subject,
+    'accuracy', accuracy,
+    'message', subject || ' needs attention (' || accuracy || '% accuracy). Practice ' || (20 - total_attempts) || ' more MCQs this week.'
+  )
+  FROM get_subject_analytics(p_user_id, 30)
+  WHERE accuracy < 50 AND total_attempts >= 3
+  ORDER BY accuracy ASC
+  LIMIT 1;
+
+  -- Time insight
+  RETURN QUERY
+  SELECT 'time_analysis'::TEXT, 3, jsonb_build_object(
+    'avg_time', avg_time_per_question,
+    'status', time_status,
+    'message', recommendation
+  )
+  FROM get_time_analysis(p_user_id, 30);
+
+  -- Streak insight (days with attempts, from the rollups)
+  RETURN QUERY
+  SELECT 'streak'::TEXT, 4, jsonb_build_object(
+    'current_streak', (SELECT COUNT(DISTINCT day) FROM question_attempt_window(p_user_id, 30)),
+    'message', CASE
+      WHEN (SELECT COUNT(DISTINCT day) FROM question_attempt_window(p_user_id, 7)) >= 7
+      THEN 'Amazing! You''ve practiced every day this week. Keep the momentum!'
+      ELSE 'Try to practice daily to build consistency.'
+    END
+  );
+
+  -- PYQ coverage insight
+  RETURN QUERY
+  SELECT 'pyq_coverage'::TEXT, 5, jsonb_build_object(
+    'coverage_percent', coverage_percent,
+    'message', CASE
+      WHEN coverage_percent < 10 THEN 'You''ve only attempted ' || coverage_percent || '% of PYQs. Start with recent years!'
+      WHEN coverage_percent < 50 THEN 'Good progress! ' || coverage_percent || '% PYQs covered. Keep going!'
+      ELSE 'Excellent! You''ve covered ' || coverage_percent || '% of all PYQs.'
+    END
+  )
+  FROM get_pyq_coverage(p_user_id);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION get_complete_analytics(
+  p_user_id UUID,
+  p_days INTEGER DEFAULT 30
+)
+RETURNS TABLE (
+  overall_stats JSONB,
+  subject_breakdown JSONB,
+  difficulty_breakdown JSONB,
+  time_analysis JSONB,
+  topic_analysis JSONB,
+  pyq_coverage JSONB,
+  daily_trend JSONB,
+  ai_insights JSONB
+) AS $$
+DECLARE
+  v_overall JSONB;
+  v_subjects JSONB;
+  v_difficulty JSONB;
+  v_time JSONB;
+  v_topics JSONB;
+  v_pyq JSONB;
+  v_trend JSONB;
+  v_insights JSONB;
+BEGIN
+  -- Overall stats and daily trend from one pass over the window
+  WITH w AS (
+    SELECT * FROM question_attempt_window(p_user_id, p_days)
+  ),
+  daily AS (
+    SELECT day AS d, SUM(attempts) AS attempts, SUM(correct) AS correct
+    FROM w
+    GROUP BY day
+  )
+  SELECT
+    (SELECT jsonb_build_object(
+       'total_attempts', COALESCE(SUM(attempts), 0),
+       'correct_attempts', COALESCE(SUM(correct), 0),
+       'accuracy', CASE WHEN SUM(attempts) > 0
+         THEN ROUND((SUM(correct)::DECIMAL / SUM(attempts)) * 100, 1)
+         ELSE 0 END,
+       'avg_time', COALESCE(ROUND(SUM(time_seconds)::DECIMAL / NULLIF(SUM(timed_attempts), 0)), 0)::INTEGER
+     ) FROM w),
+    (SELECT jsonb_agg(jsonb_build_object(
+       'date', d,
+       'attempts', attempts,
+       'correct', correct,
+       'accuracy', CASE WHEN attempts > 0 THEN ROUND((correct::DECIMAL / attempts) * 100, 1) ELSE 0 END
+     ) ORDER BY d) FROM daily)
+  INTO v_overall, v_trend;
+
+  -- Subject breakdown
+  SELECT jsonb_agg(jsonb_build_object(
+    'subject', subject,
+    'attempts', total_attempts,
+    'correct', correct_attempts,
+    'accuracy', accuracy,
+    'avg_time', avg_time_seconds
+  ))
+  INTO v_subjects
+  FROM get_subject_analytics(p_user_id, p_days);
+
+  -- Difficulty breakdown
+  SELECT jsonb_agg(jsonb_build_object(
+    'difficulty', difficulty_level,
+    'attempts', total_attempts,
+    'correct', correct_attempts,
+    'accuracy', success_rate,
+    'avg_time', avg_time_seconds
+  ))
+  INTO v_difficulty
+  FROM public.user_difficulty_stats
+  WHERE user_id = p_user_id;
+
+  -- Time analysis
+  SELECT jsonb_build_object(
+    'avg_time', avg_time_per_question,
+    'total_minutes', total_practice_time_minutes,
+    'is_rushing', is_rushing,
+    'is_too_slow', is_too_slow,
+    'status', time_status,
+    'recommendation', recommendation,
+    'by_difficulty', time_by_difficulty
+  )
+  INTO v_time
+  FROM get_time_analysis(p_user_id, p_days);
+
+  -- Topic analysis
+  SELECT jsonb_build_object(
+    'weak', weak_topics,
+    'strong', strong_topics
+  )
+  INTO v_topics
+  FROM get_topic_analysis(p_user_id);
+
+  -- PYQ coverage
+  SELECT jsonb_build_object(
+    'total', total_pyqs,
+    'attempted', attempted_pyqs,
+    'percent', coverage_percent,
+    'by_year', by_year,
+    'by_paper', by_paper
+  )
+  INTO v_pyq
+  FROM get_pyq_coverage(p_user_id);
+
+  -- AI insights
+  SELECT jsonb_agg(jsonb_build_object(
+    'type', insight_type,
+    'priority', priority,
+    'data', data
+  ) ORDER BY priority)
+  INTO v_insights
+  FROM get_ai_insights_data(p_user_id);
+
+  RETURN QUERY SELECT
+    COALESCE(v_overall, '{}'::jsonb),
+    COALESCE(v_subjects, '[]'::jsonb),
+    COALESCE(v_difficulty, '[]'::jsonb),
+    COALESCE(v_time, '{}'::jsonb),
+    COALESCE(v_topics, '{}'::jsonb),
+    COALESCE(v_pyq, '{}'::jsonb),
+    COALESCE(v_trend, '[]'::jsonb),
+    COALESCE(v_insights, '[]'::jsonb);
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON TABLE public.question_attempt_daily IS 'Per-user daily question_attempts rollup by subject and difficulty, maintained by trigger_question_attempt_rollups_*';
+COMMENT ON COLUMN public.question_attempts.subject IS 'Rollup subject (question topic or PYQ subject) fixed at insert by trigger_question_attempt_subject';
+COMMENT ON TABLE public.user_pyq_attempts IS 'Attempts per (user, PYQ), maintained by trigger_question_attempt_rollups_*';
+COMMENT ON FUNCTION question_attempt_window IS 'A user''s attempts in the last p_days: rollups plus the raw rows of the first partial day';
+COMMENT ON FUNCTION get_complete_analytics IS 'Story 8.10: Comprehensive analytics dashboard data (from question_attempt_daily)';
@@ -0,0 +1,471 @@
+-- ============================================================================
+-- Migration: 077_finance_analytics.sql
+-- Description: Admin finance analytics without full-history scans.
+--              refund_analytics becomes a view over daily summaries of
+--              refunds and payment_transactions maintained by triggers;
+--              revenue_analytics becomes a materialized view refreshed
+--              concurrently on a schedule; both report their freshness
+-- ============================================================================
+
+-- ============================================================================
+-- 1. SUMMARY TABLES
+-- ============================================================================
+
+-- Refunds per UTC day of requested_at, status and type. processing_seconds
+-- sums completed_at - requested_at (whole seconds) over the "processed"
+-- refunds that have a completed_at.
+CREATE TABLE IF NOT EXISTS public.refund_daily_stats (
+  day DATE NOT NULL,
+  status TEXT NOT NULL,
+  refund_type TEXT NOT NULL,
+  refunds BIGINT NOT NULL DEFAULT 0,
+  amount BIGINT NOT NULL DEFAULT 0,
+  processed BIGINT NOT NULL DEFAULT 0,
+  processing_seconds BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, status, refund_type)
+);
+
+-- Transactions per UTC day of created_at and status; amount sums final_amount
+CREATE TABLE IF NOT EXISTS public.payment_daily_stats (
+  day DATE NOT NULL,
+  status TEXT NOT NULL,
+  transactions BIGINT NOT NULL DEFAULT 0,
+  amount BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, status)
+);
+
+-- One row per user who has a captured payment: how many of their
+-- transactions are captured and when the first one was created.
+-- revenue_analytics counts these rows instead of COUNT(DISTINCT user_id)
+-- over every transaction.
+CREATE TABLE IF NOT EXISTS public.paying_users (
+  user_id UUID PRIMARY KEY,
+  captured BIGINT NOT NULL DEFAULT 0,
+  first_captured_at TIMESTAMPTZ
+);
+
+-- When each analytics relation was last refreshed (materialized) or
+-- reconciled against its source tables (incremental), and by how much the
+-- last reconcile had to correct it
+CREATE TABLE IF NOT EXISTS public.analytics_freshness (
+  name TEXT PRIMARY KEY,
+  method TEXT NOT NULL CHECK (method IN ('incremental', 'materialized')),
+  refreshed_at TIMESTAMPTZ,
+  duration_ms INTEGER,
+  drift_rows INTEGER,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Written only by the SECURITY DEFINER functions below and the migrator
+ALTER TABLE public.refund_daily_stats ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.payment_daily_stats ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.paying_users ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.analytics_freshness ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- 2. MAINTENANCE TRIGGERS
+-- ============================================================================
+
+-- Statement-level with transition tables. On UPDATE, rows whose summarised
+-- columns did not change (most updates only touch notes, ids or updated_at)
+-- are skipped on both sides.
+CREATE OR REPLACE FUNCTION track_refund_daily_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+  v_change RECORD;
+BEGIN
+  FOR v_change IN
+    SELECT source, other, sign
+    FROM (VALUES ('old_refunds', 'new_refunds', -1), ('new_refunds', 'old_refunds', 1)) AS c(source, other, sign)
+    WHERE (source = 'old_refunds' AND TG_OP IN ('UPDATE', 'DELETE'))
+       OR (source = 'new_refunds' AND TG_OP IN ('INSERT', 'UPDATE'))
+  LOOP
+    EXECUTE format($sql$
+      INSERT INTO public.refund_daily_stats AS s
+        (day, status, refund_type, refunds, amount, processed, processing_seconds)
+      SELECT (r.requested_at AT TIME ZONE 'UTC')::DATE, r.status, r.refund_type,
+             $1 * COUNT(*),
+             $1 * COALESCE(SUM(r.amount), 0),
+             $1 * COUNT(r.completed_at),
+             $1 * COALESCE(SUM(ROUND(EXTRACT(EPOCH FROM r.completed_at - r.requested_at))), 0)
+      FROM %I r
+      WHERE %s
+      GROUP BY 1, 2, 3
+      ON CONFLICT (day, status, refund_type) DO UPDATE SET
+        refunds = s.refunds + EXCLUDED.refunds,
+        amount = s.amount + EXCLUDED.amount,
+        processed = s.processed + EXCLUDED.processed,
+        processing_seconds = s.processing_seconds + EXCLUDED.processing_seconds
+    $sql$,
+      v_change.source,
+      CASE WHEN TG_OP = 'UPDATE' THEN format(
+        'NOT EXISTS (SELECT 1 FROM %I o WHERE o.id = r.id AND '
+        '(o.requested_at, o.status, o.refund_type, o.amount, o.completed_at) IS NOT DISTINCT FROM '
+        '(r.requested_at, r.status, r.refund_type, r.amount, r.completed_at))', v_change.other)
+      ELSE 'TRUE' END
+    ) USING v_change.sign;
+  END LOOP;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION track_payment_daily_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+  v_change RECORD;
+BEGIN
+  FOR v_change IN
+    SELECT source, other, sign
+    FROM (VALUES ('old_payments', 'new_payments', -1), ('new_payments', 'old_payments', 1)) AS c(source, other, sign)
+    WHERE (source = 'old_payments' AND TG_OP IN ('UPDATE', 'DELETE'))
+       OR (source = 'new_payments' AND TG_OP IN ('INSERT', 'UPDATE'))
+  LOOP
+    EXECUTE format($sql$
+      INSERT INTO public.payment_daily_stats AS s (day, status, transactions, amount)
+      SELECT (p.created_at AT TIME ZONE 'UTC')::DATE, p.status,
+             $1 * COUNT(*),
+             $1 * COALESCE(SUM(p.final_amount), 0)
+      FROM %I p
+      WHERE %s
+      GROUP BY 1, 2
+      ON CONFLICT (day, status) DO UPDATE SET
+        transactions = s.transactions + EXCLUDED.transactions,
+        amount = s.amount + EXCLUDED.amount
+    $sql$,
+      v_change.source,
+      CASE WHEN TG_OP = 'UPDATE' THEN format(
+        'NOT EXISTS (SELECT 1 FROM %I o WHERE o.id = p.id AND '
+        '(o.created_at, o.status, o.final_amount, o.user_id) IS NOT DISTINCT FROM '
+        '(p.created_at, p.status, p.final_amount, p.user_id))',
+        v_change.other)
+      ELSE 'TRUE' END
+    ) USING v_change.sign;
+
+    EXECUTE format($sql$
+      INSERT INTO public.paying_users AS u (user_id, captured, first_captured_at)
+      SELECT p.user_id, $1 * COUNT(*), MIN(p.created_at)
+      FROM %I p
+      WHERE p.status = 'captured'
+      GROUP BY 1
+      ON CONFLICT (user_id) DO UPDATE SET
+        captured = u.captured + EXCLUDED.captured,
+        first_captured_at = LEAST(u.first_captured_at, EXCLUDED.first_captured_at)
+    $sql$, v_change.source) USING v_change.sign;
+  END LOOP;
+
+  -- A removed capture may have been the user's first; re-read theirs
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE public.paying_users u
+    SET first_captured_at = (
+      SELECT MIN(p.created_at) FROM public.payment_transactions p
+      WHERE p.user_id = u.user_id AND p.status = 'captured'
+    )
+    WHERE u.user_id IN (SELECT o.user_id FROM old_payments o WHERE o.status = 'captured');
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Transition tables require one trigger per event
+DROP TRIGGER IF EXISTS trigger_refund_daily_stats_insert ON public.refunds;
+CREATE TRIGGER trigger_refund_daily_stats_insert
+AFTER INSERT ON public.refunds
+REFERENCING NEW TABLE AS new_refunds
+FOR EACH STATEMENT EXECUTE FUNCTION track_refund_daily_stats();
+
+DROP TRIGGER IF EXISTS trigger_refund_daily_stats_update ON public.refunds;
+CREATE TRIGGER trigger_refund_daily_stats_update
+AFTER UPDATE ON public.refunds
+REFERENCING OLD TABLE AS old_refunds NEW TABLE AS new_refunds
+FOR EACH STATEMENT EXECUTE FUNCTION track_refund_daily_stats();
+
+DROP TRIGGER IF EXISTS trigger_refund_daily_stats_delete ON public.refunds;
+CREATE TRIGGER trigger_refund_daily_stats_delete
+AFTER DELETE ON public.refunds
+REFERENCING OLD TABLE AS old_refunds
+FOR EACH STATEMENT EXECUTE FUNCTION track_refund_daily_stats();
+
+DROP TRIGGER IF EXISTS trigger_payment_daily_stats_insert ON public.payment_transactions;
+CREATE TRIGGER trigger_payment_daily_stats_insert
+AFTER INSERT ON public.payment_transactions
+REFERENCING NEW TABLE AS new_payments
+FOR EACH STATEMENT EXECUTE FUNCTION track_payment_daily_stats();
+
+DROP TRIGGER IF EXISTS trigger_payment_daily_stats_update ON public.payment_transactions;
+CREATE TRIGGER trigger_payment_daily_stats_update
+AFTER UPDATE ON public.payment_transactions
+REFERENCING OLD TABLE AS old_payments NEW TABLE AS new_payments
+FOR EACH STATEMENT EXECUTE FUNCTION track_payment_daily_stats();
+
+DROP TRIGGER IF EXISTS trigger_payment_daily_stats_delete ON public.payment_transactions;
+CREATE TRIGGER trigger_payment_daily_stats_delete
+AFTER DELETE ON public.payment_transactions
+REFERENCING OLD TABLE AS old_payments
+FOR EACH STATEMENT EXECUTE FUNCTION track_payment_daily_stats();
+
+-- ============================================================================
+-- 3. RECONCILE ONE DAY
+-- ============================================================================
+
+-- Recompute one UTC day of both summaries (and the paying_users rows of
+-- that day's payers) from the source tables and replace it if it drifted (e.g. rows written with triggers disabled during
+-- a restore). Holds SHARE locks on the sources until commit so no write can
+-- land between the recount and the replace; call it in its own short
+-- transaction with a lock_timeout (python -m migrator refresh-analytics).
+-- Returns the number of summary rows that differed.
+CREATE OR REPLACE FUNCTION reconcile_finance_daily_stats(p_day DATE)
+RETURNS INTEGER AS $$
+DECLARE
+  v_from TIMESTAMPTZ := p_day::TIMESTAMP AT TIME ZONE 'UTC';
+  v_to TIMESTAMPTZ := (p_day + 1)::TIMESTAMP AT TIME ZONE 'UTC';
+  v_refund_drift INTEGER;
+  v_payment_drift INTEGER;
+  v_paying_drift INTEGER;
+BEGIN
+  LOCK TABLE public.refunds, public.payment_transactions IN SHARE MODE;
+
+  CREATE TEMP TABLE IF NOT EXISTS reconcile_refunds (LIKE public.refund_daily_stats) ON COMMIT DELETE ROWS;
+  CREATE TEMP TABLE IF NOT EXISTS reconcile_payments (LIKE public.payment_daily_stats) ON COMMIT DELETE ROWS;
+  DELETE FROM reconcile_refunds;
+  DELETE FROM reconcile_payments;
+
+  INSERT INTO reconcile_refunds
+  SELECT p_day, status, refund_type, COUNT(*), COALESCE(SUM(amount), 0), COUNT(completed_at),
+         COALESCE(SUM(ROUND(EXTRACT(EPOCH FROM completed_at - requested_at))), 0)
+  FROM public.refunds
+  WHERE requested_at >= v_from AND requested_at < v_to
+  GROUP BY status, refund_type;
+
+  INSERT INTO reconcile_payments
+  SELECT p_day, status, COUNT(*), COALESCE(SUM(final_amount), 0)
+  FROM public.payment_transactions
+  WHERE created_at >= v_from AND created_at < v_to
+  GROUP BY status;
+
+  SELECT COUNT(*) INTO v_refund_drift FROM (
+    (SELECT * FROM public.refund_daily_stats WHERE day = p_day AND refunds <> 0
+     EXCEPT SELECT * FROM reconcile_refunds)
+    UNION ALL
+    (SELECT * FROM reconcile_refunds
+     EXCEPT SELECT * FROM public.refund_daily_stats WHERE day = p_day)
+  ) d;
+
+  SELECT COUNT(*) INTO v_payment_drift FROM (
+    (SELECT * FROM public.payment_daily_stats WHERE day = p_day AND transactions <> 0
+     EXCEPT SELECT * FROM reconcile_payments)
+    UNION ALL
+    (SELECT * FROM reconcile_payments
+     EXCEPT SELECT * FROM public.payment_daily_stats WHERE day = p_day)
+  ) d;
+
+  IF v_refund_drift > 0 THEN
+    DELETE FROM public.refund_daily_stats WHERE day = p_day;
+    INSERT INTO public.refund_daily_stats SELECT * FROM reconcile_refunds;
+  END IF;
+
+  IF v_payment_drift > 0 THEN
+    DELETE FROM public.payment_daily_stats WHERE day = p_day;
+    INSERT INTO public.payment_daily_stats SELECT * FROM reconcile_payments;
+  END IF;
+
+  -- paying_users rows of everyone with a transaction created that day,
+  -- recounted over all of their transactions
+  WITH users AS (
+    SELECT DISTINCT user_id FROM public.payment_transactions
+    WHERE created_at >= v_from AND created_at < v_to
+  ),
+  actual AS (
+    SELECT us.user_id,
+           COUNT(p.id) FILTER (WHERE p.status = 'captured') AS captured,
+           MIN(p.created_at) FILTER (WHERE p.status = 'captured') AS first_captured_at
+    FROM users us
+    JOIN public.payment_transactions p ON p.user_id = us.user_id
+    GROUP BY us.user_id
+  ),
+  fixed AS (
+    INSERT INTO public.paying_users AS u (user_id, captured, first_captured_at)
+    SELECT a.user_id, a.captured, a.first_captured_at
+    FROM actual a
+    LEFT JOIN public.paying_users cur ON cur.user_id = a.user_id
+    WHERE (COALESCE(cur.captured, 0), CASE WHEN COALESCE(cur.captured, 0) > 0 THEN cur.first_captured_at END)
+          IS DISTINCT FROM (a.captured, a.first_captured_at)
+    ON CONFLICT (user_id) DO UPDATE SET
+      captured = EXCLUDED.captured,
+      first_captured_at = EXCLUDED.first_captured_at
+    RETURNING 1
+  )
+  SELECT COUNT(*) INTO v_paying_drift FROM fixed;
+
+  RETURN v_refund_drift + v_payment_drift + v_paying_drift;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- ============================================================================
+-- 4. SEED FROM THE CURRENT TABLES
+-- ============================================================================
+
+-- CREATE TRIGGER blocks writes to both tables until this migration commits,
+-- so the seed and the triggers agree exactly.
+DELETE FROM public.refund_daily_stats;
+INSERT INTO public.refund_daily_stats
+  (day, status, refund_type, refunds, amount, processed, processing_seconds)
+SELECT (requested_at AT TIME ZONE 'UTC')::DATE, status, refund_type, COUNT(*), COALESCE(SUM(amount), 0),
+       COUNT(completed_at), COALESCE(SUM(ROUND(EXTRACT(EPOCH FROM completed_at - requested_at))), 0)
+FROM public.refunds
+GROUP BY 1, 2, 3;
+
+DELETE FROM public.payment_daily_stats;
+INSERT INTO public.payment_daily_stats (day, status, transactions, amount)
+SELECT (created_at AT TIME ZONE 'UTC')::DATE, status, COUNT(*), COALESCE(SUM(final_amount), 0)
+FROM public.payment_transactions
+GROUP BY 1, 2;
+
+DELETE FROM public.paying_users;
+INSERT INTO public.paying_users (user_id, captured, first_captured_at)
+SELECT user_id, COUNT(*), MIN(created_at)
+FROM public.payment_transactions
+WHERE status = 'captured'
+GROUP BY user_id;
+
+INSERT INTO public.analytics_freshness (name, method, refreshed_at, drift_rows)
+VALUES ('refund_analytics', 'incremental', NOW(), 0)
+ON CONFLICT (name) DO UPDATE SET refreshed_at = NOW(), drift_rows = 0, updated_at = NOW();
+
+-- ============================================================================
+-- 5. REFUND ANALYTICS (same columns as the 022 view, plus reconciled_at)
+-- ============================================================================
+
+-- The 30-day refund rate counts whole UTC days from the day 30 days ago
+DROP VIEW IF EXISTS public.refund_analytics;
+CREATE VIEW public.refund_analytics AS
+WITH recent AS (
+  SELECT ((NOW() - INTERVAL '30 days') AT TIME ZONE 'UTC')::DATE AS since
+)
+SELECT
+  -- Overall stats
+  COALESCE(SUM(s.refunds), 0)::BIGINT AS total_refunds,
+  COALESCE(SUM(s.refunds) FILTER (WHERE s.status = 'completed'), 0)::BIGINT AS completed_refunds,
+  COALESCE(SUM(s.refunds) FILTER (WHERE s.status = 'pending'), 0)::BIGINT AS pending_refunds,
+  COALESCE(SUM(s.refunds) FILTER (WHERE s.status = 'rejected'), 0)::BIGINT AS rejected_refunds,
+
+  -- Amounts
+  COALESCE(SUM(s.amount) FILTER (WHERE s.status = 'completed'), 0)::BIGINT AS total_refunded_amount,
+  COALESCE(SUM(s.amount) FILTER (WHERE s.status = 'completed')
+           / NULLIF(SUM(s.refunds) FILTER (WHERE s.status = 'completed'), 0), 0) AS avg_refund_amount,
+
+  -- Refund rate (last 30 days)
+  CASE
+    WHEN SUM(s.refunds) FILTER (WHERE s.day >= r.since) > 0
+    THEN ROUND(
+      SUM(s.refunds) FILTER (WHERE s.status = 'completed' AND s.day >= r.since)::NUMERIC /
+      NULLIF((SELECT SUM(p.transactions) FROM public.payment_daily_stats p
+              WHERE p.status = 'captured' AND p.day >= r.since), 0) * 100, 2
+    )
+    ELSE 0
+  END AS refund_rate_percent,
+
+  -- By type
+  COALESCE(SUM(s.refunds) FILTER (WHERE s.refund_type = 'full'), 0)::BIGINT AS full_refunds,
+  COALESCE(SUM(s.refunds) FILTER (WHERE s.refund_type = 'partial'), 0)::BIGINT AS partial_refunds,
+  COALESCE(SUM(s.refunds) FILTER (WHERE s.refund_type = 'prorated'), 0)::BIGINT AS prorated_refunds,
+
+  -- Timing
+  COALESCE(SUM(s.processing_seconds) FILTER (WHERE s.status = 'completed')::NUMERIC
+           / NULLIF(SUM(s.processed) FILTER (WHERE s.status = 'completed'), 0) / 3600, 0) AS avg_processing_hours,
+
+  -- Freshness: the summary is current; this is when it was last checked against refunds
+  (SELECT f.refreshed_at FROM public.analytics_freshness f WHERE f.name = 'refund_analytics') AS reconciled_at
+
+FROM recent r
+LEFT JOIN public.refund_daily_stats s ON TRUE
+GROUP BY r.since;
+
+-- ============================================================================
+-- 6. REVENUE ANALYTICS (materialized; same columns as the 021 view, plus
+--    captured revenue, paying users and refreshed_at)
+-- ============================================================================
+
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'public' AND c.relname = 'revenue_analytics' AND c.relkind = 'v'
+  ) THEN
+    DROP VIEW public.revenue_analytics;
+  END IF;
+END $$;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS public.revenue_analytics AS
+SELECT
+  -- MRR Calculation (Placeholder until plans table schema is aligned)
+  0::numeric AS mrr,
+
+  -- Subscription counts
+  COUNT(*) FILTER (WHERE s.status = 'active') AS active_subscriptions,
+  COUNT(*) FILTER (WHERE s.status = 'trial') AS trial_subscriptions,
+  COUNT(*) FILTER (WHERE s.status = 'canceled') AS canceled_subscriptions,
+  COUNT(*) FILTER (WHERE s.status = 'expired') AS expired_subscriptions,
+
+  -- Trial metrics
+  COUNT(*) FILTER (WHERE s.created_at >= NOW() - INTERVAL '30 days' AND s.status = 'trial') AS trials_last_30_days,
+
+  -- Churn rate (canceled in last 30 days / active at start of period)
+  CASE
+    WHEN COUNT(*) FILTER (WHERE s.status = 'active' OR s.status = 'canceled') > 0
+    THEN ROUND(
+      COUNT(*) FILTER (WHERE s.status = 'canceled' AND s.updated_at >= NOW() - INTERVAL '30 days')::NUMERIC /
+      NULLIF(COUNT(*) FILTER (WHERE s.status = 'active' OR s.status = 'canceled'), 0) * 100, 2
+    )
+    ELSE 0
+  END AS churn_rate_percent,
+
+  -- Lifetime value inputs (paise), so the admin page need not fetch every transaction
+  (SELECT COALESCE(SUM(amount), 0) FROM public.payment_daily_stats WHERE status = 'captured')::BIGINT AS captured_revenue,
+  (SELECT COUNT(*) FROM public.paying_users WHERE captured > 0) AS paying_users,
+
+  NOW() AS refreshed_at
+
+FROM public.subscriptions s;
+
+-- REFRESH ... CONCURRENTLY needs a unique index; the view has one row
+CREATE UNIQUE INDEX IF NOT EXISTS idx_revenue_analytics_refreshed_at
+  ON public.revenue_analytics(refreshed_at);
+
+-- Refresh without blocking readers and record it; every 5 minutes where
+-- pg_cron is installed, otherwise from python -m migrator refresh-analytics
+CREATE OR REPLACE FUNCTION refresh_revenue_analytics()
+RETURNS TIMESTAMPTZ AS $$
+DECLARE
+  v_started TIMESTAMPTZ := clock_timestamp();
+BEGIN
+  REFRESH MATERIALIZED VIEW CONCURRENTLY public.revenue_analytics;
+
+  INSERT INTO public.analytics_freshness (name, method, refreshed_at, duration_ms)
+  VALUES ('revenue_analytics', 'materialized', NOW(),
+          (EXTRACT(EPOCH FROM clock_timestamp() - v_started) * 1000)::INTEGER)
+  ON CONFLICT (name) DO UPDATE SET
+    refreshed_at = EXCLUDED.refreshed_at,
+    duration_ms = EXCLUDED.duration_ms,
+    updated_at = NOW();
+
+  RETURN NOW();
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+INSERT INTO public.analytics_freshness (name, method, refreshed_at)
+VALUES ('revenue_analytics', 'materialized', NOW())
+ON CONFLICT (name) DO UPDATE SET method = 'materialized', refreshed_at = NOW(), updated_at = NOW();
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('refresh-revenue-analytics', '*/5 * * * *', 'SELECT refresh_revenue_analytics()');
+  END IF;
+END $$;
+
+COMMENT ON TABLE public.refund_daily_stats IS 'Refunds per day/status/type, maintained by trigger_refund_daily_stats_*';
+COMMENT ON TABLE public.payment_daily_stats IS 'Payment transactions per day/status, maintained by trigger_payment_daily_stats_*';
+COMMENT ON TABLE public.paying_users IS 'Captured payments and first capture per user, maintained by trigger_payment_daily_stats_*';
+COMMENT ON TABLE public.analytics_freshness IS 'Last refresh (materialized) or reconcile (incremental) of each analytics relation';
+COMMENT ON VIEW public.refund_analytics IS 'Refund statistics for admin dashboard (AC#10), from refund_daily_stats';
+COMMENT ON MATERIALIZED VIEW public.revenue_analytics IS 'Revenue metrics for admin dashboard (Story 5.8); see refreshed_at';
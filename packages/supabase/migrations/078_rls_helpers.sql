@@ -0,0 +1,122 @@
+-- ============================================================================
+-- Migration: 078_rls_helpers.sql
+-- Description: Helpers for RLS policies that are evaluated once per query
+--              instead of once per row: is_admin() replaces the repeated
+--              user_profiles role lookup, optimize_rls_policies() rewrites
+--              applied policies the way python -m migrator up
+--              --optimize-rls rewrites migration files, and the user
+--              columns policies filter on get the indexes they lacked.
+--              Restores user_profiles.role, which the admin checks read
+-- ============================================================================
+
+-- ============================================================================
+-- 1. ADMIN CHECK
+-- ============================================================================
+
+-- 00101 defined user_profiles.role, but 00102 recreated the table without
+-- it, so the admin policies of 020-022 and the admin API routes' role
+-- lookups fail on a database built from these files. A constant default is
+-- a catalog-only change.
+ALTER TABLE public.user_profiles ADD COLUMN IF NOT EXISTS role TEXT NOT NULL DEFAULT 'student';
+
+-- Same definition the migrator's RLS pass emits ahead of files older than
+-- this one (migrator/rewrite.py ADMIN_HELPER); plpgsql so that it can be
+-- created before the role column exists. SECURITY DEFINER skips the
+-- user_profiles policies for the lookup; wrapped as (SELECT is_admin()) in
+-- a policy it runs once per statement as an InitPlan.
+CREATE OR REPLACE FUNCTION public.is_admin()
+RETURNS BOOLEAN LANGUAGE plpgsql STABLE SECURITY DEFINER SET search_path = public AS $migrator_is_admin$
+BEGIN
+  RETURN EXISTS (SELECT 1 FROM public.user_profiles WHERE user_id = auth.uid() AND role = 'admin');
+END
+$migrator_is_admin$;
+
+-- ============================================================================
+-- 2. REWRITE APPLIED POLICIES
+-- ============================================================================
+
+-- Rewrites one policy expression as deparsed by pg_policies:
+--   EXISTS ( SELECT 1 FROM user_profiles WHERE ((user_id = auth.uid())
+--     AND (role = 'admin'::text)))      -> (SELECT public.is_admin())
+--   auth.uid() / jwt() / role() / email() -> (SELECT auth.uid()) ...
+-- Calls already inside a SELECT (deparsed "( SELECT auth.uid() AS uid)")
+-- are left alone, so the result is stable under repeated rewrites.
+CREATE OR REPLACE FUNCTION public.rls_optimize_expression(p_expr TEXT)
+RETURNS TEXT AS $$
+  SELECT regexp_replace(
+    regexp_replace(
+      p_expr,
+      'EXISTS \( SELECT 1\s+FROM (public\.)?user_profiles\s+WHERE \(\('
+        || '(?:(?:user_profiles\.)?user_id = auth\.uid\(\)|auth\.uid\(\) = (?:user_profiles\.)?user_id)'
+        || '\) AND \((?:user_profiles\.)?role = ''admin''::text\)\)\)',
+      '(SELECT public.is_admin())',
+      'g'
+    ),
+    '(?<!SELECT )auth\.(uid|jwt|role|email)\(\)',
+    '(SELECT auth.\1())',
+    'g'
+  );
+$$ LANGUAGE sql IMMUTABLE;
+
+-- ALTER POLICY every policy in p_schema whose expressions change; returns
+-- how many were altered. Each ALTER POLICY takes a brief ACCESS EXCLUSIVE
+-- lock on its table. Policies on tables the caller does not own are
+-- skipped. Run again after applying migrations without --optimize-rls.
+CREATE OR REPLACE FUNCTION public.optimize_rls_policies(p_schema TEXT DEFAULT 'public')
+RETURNS INTEGER AS $$
+DECLARE
+  v_policy RECORD;
+  v_qual TEXT;
+  v_check TEXT;
+  v_sql TEXT;
+  v_altered INTEGER := 0;
+BEGIN
+  FOR v_policy IN
+    SELECT schemaname, tablename, policyname, qual, with_check
+    FROM pg_policies
+    WHERE schemaname = p_schema
+    ORDER BY tablename, policyname
+  LOOP
+    v_qual := rls_optimize_expression(v_policy.qual);
+    v_check := rls_optimize_expression(v_policy.with_check);
+    CONTINUE WHEN v_qual IS NOT DISTINCT FROM v_policy.qual
+             AND v_check IS NOT DISTINCT FROM v_policy.with_check;
+
+    v_sql := format('ALTER POLICY %I ON %I.%I', v_policy.policyname, v_policy.schemaname, v_policy.tablename);
+    IF v_qual IS NOT NULL THEN
+      v_sql := v_sql || ' USING (' || v_qual || ')';
+    END IF;
+    IF v_check IS NOT NULL THEN
+      v_sql := v_sql || ' WITH CHECK (' || v_check || ')';
+    END IF;
+    BEGIN
+      EXECUTE v_sql;
+      v_altered := v_altered + 1;
+    EXCEPTION WHEN insufficient_privilege THEN
+      RAISE NOTICE 'optimize_rls_policies: skipped % on %.%', v_policy.policyname, p_schema, v_policy.tablename;
+    END;
+  END LOOP;
+  RETURN v_altered;
+END;
+$$ LANGUAGE plpgsql SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.optimize_rls_policies(TEXT) FROM PUBLIC;
+
+-- ============================================================================
+-- 3. INDEXES FOR POLICY FILTERS (python -m migrator lint --rules L007)
+-- ============================================================================
+
+-- The runner builds these CONCURRENTLY after the migration commits
+CREATE INDEX IF NOT EXISTS idx_subscriptions_user_id ON public.subscriptions (user_id);
+CREATE INDEX IF NOT EXISTS idx_video_renders_user_id ON public.video_renders (user_id);
+CREATE INDEX IF NOT EXISTS idx_discussion_threads_user_id ON public.discussion_threads (user_id);
+CREATE INDEX IF NOT EXISTS idx_discussion_posts_user_id ON public.discussion_posts (user_id);
+CREATE INDEX IF NOT EXISTS idx_schedule_notifications_user_id ON public.schedule_notifications (user_id);
+CREATE INDEX IF NOT EXISTS idx_mindmap_shares_created_by ON public.mindmap_shares (created_by);
+CREATE INDEX IF NOT EXISTS idx_mindmap_edit_history_user_id ON public.mindmap_edit_history (user_id);
+CREATE INDEX IF NOT EXISTS idx_debrief_notifications_user_id ON public.debrief_notifications (user_id);
+CREATE INDEX IF NOT EXISTS idx_prediction_reports_user_id ON public.prediction_reports (user_id);
+
+COMMENT ON FUNCTION public.is_admin() IS 'True when the calling user''s profile has role admin; use as (SELECT is_admin()) in policies';
+COMMENT ON FUNCTION public.rls_optimize_expression(TEXT) IS 'One policy expression with auth.*() and admin checks evaluated once per query';
+COMMENT ON FUNCTION public.optimize_rls_policies(TEXT) IS 'Rewrite applied policies with rls_optimize_expression; returns policies altered';
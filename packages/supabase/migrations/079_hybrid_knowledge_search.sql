@@ -0,0 +1,179 @@
+-- ============================================================================
+-- Migration: 079_hybrid_knowledge_search.sql
+-- Description: RAG retrieval over knowledge_chunks. Ships the vector search
+--              035 left commented out (match_knowledge_chunks) and a hybrid
+--              search that fuses full-text and cosine rankings with
+--              reciprocal rank fusion, filters by syllabus node and
+--              metadata, and takes the HNSW ef_search per call
+-- ============================================================================
+
+-- ============================================================================
+-- 1. PER-CALL HNSW SETTINGS
+-- ============================================================================
+
+-- Transaction-local, so one RPC call (one PostgREST transaction) never
+-- changes the next. An HNSW scan returns at most ef_search rows, so it is
+-- raised to p_limit when that is larger. pgvector 0.8+ also gets iterative
+-- scans, which keep walking the graph until enough rows pass the filters
+-- instead of returning fewer than asked for.
+CREATE OR REPLACE FUNCTION public.set_vector_search_params(p_ef_search INTEGER, p_limit INTEGER)
+RETURNS VOID AS $$
+BEGIN
+  IF p_ef_search IS NOT NULL OR p_limit > 40 THEN
+    PERFORM set_config(
+      'hnsw.ef_search',
+      GREATEST(COALESCE(p_ef_search, current_setting('hnsw.ef_search', true)::INTEGER, 40), p_limit)::TEXT,
+      true
+    );
+  END IF;
+  IF EXISTS (
+    SELECT 1 FROM pg_extension
+    WHERE extname = 'vector' AND string_to_array(extversion, '.')::INTEGER[] >= ARRAY[0, 8]
+  ) THEN
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- 2. VECTOR SEARCH (035's match_knowledge_chunks, as the notes API calls it)
+-- ============================================================================
+
+-- Databases that created 035's three-argument version by hand would make
+-- the notes API's named-argument call ambiguous
+DROP FUNCTION IF EXISTS public.match_knowledge_chunks(vector, FLOAT, INTEGER);
+
+-- Top match_count by cosine distance through idx_knowledge_chunks_vector,
+-- then the threshold; the same rows 035's WHERE ... > match_threshold
+-- returned, without scanning past the top match_count.
+CREATE OR REPLACE FUNCTION public.match_knowledge_chunks(
+  query_embedding vector(1536),
+  match_threshold FLOAT DEFAULT 0.7,
+  match_count INTEGER DEFAULT 10,
+  ef_search INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  chunk_text TEXT,
+  source_page INTEGER,
+  chunk_index INTEGER,
+  metadata JSONB,
+  pdf_upload_id UUID,
+  similarity FLOAT
+) AS $$
+BEGIN
+  PERFORM set_vector_search_params(ef_search, match_count);
+  RETURN QUERY
+  SELECT nearest.id, nearest.chunk_text, nearest.source_page, nearest.chunk_index,
+         nearest.metadata, nearest.pdf_upload_id, 1 - nearest.distance
+  FROM (
+    SELECT kc.id, kc.chunk_text, kc.source_page, kc.chunk_index, kc.metadata, kc.pdf_upload_id,
+           kc.content_vector <=> query_embedding AS distance
+    FROM public.knowledge_chunks kc
+    WHERE kc.content_vector IS NOT NULL
+    ORDER BY kc.content_vector <=> query_embedding
+    LIMIT match_count
+  ) nearest
+  WHERE 1 - nearest.distance > match_threshold
+  ORDER BY nearest.distance;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- 3. HYBRID SEARCH
+-- ============================================================================
+
+-- Filters on metadata (e.g. {"subject": "Polity"}) in the full-text branch
+CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_metadata
+  ON public.knowledge_chunks USING gin (metadata jsonb_path_ops);
+
+-- Each branch ranks its own candidate_count best chunks (default: four
+-- times match_count, at least 40):
+--   semantic: cosine distance via idx_knowledge_chunks_vector
+--   lexical:  ts_rank_cd over idx_knowledge_chunks_fts, normalised by
+--             document length (there is no BM25 in core PostgreSQL; RRF
+--             only uses the order, which this approximates)
+-- and a chunk scores semantic_weight / (rrf_k + semantic rank) +
+-- full_text_weight / (rrf_k + lexical rank), a branch it is missing from
+-- contributing nothing. A NULL query_embedding searches text only; a query
+-- text without lexemes searches vectors only. syllabus_filter keeps chunks
+-- mapped to any of the given nodes, metadata_filter those whose metadata
+-- contains it.
+CREATE OR REPLACE FUNCTION public.hybrid_search_knowledge_chunks(
+  query_text TEXT,
+  query_embedding vector(1536),
+  match_count INTEGER DEFAULT 10,
+  syllabus_filter UUID[] DEFAULT NULL,
+  metadata_filter JSONB DEFAULT NULL,
+  ef_search INTEGER DEFAULT NULL,
+  candidate_count INTEGER DEFAULT NULL,
+  rrf_k INTEGER DEFAULT 60,
+  full_text_weight FLOAT DEFAULT 1.0,
+  semantic_weight FLOAT DEFAULT 1.0
+)
+RETURNS TABLE (
+  id UUID,
+  chunk_text TEXT,
+  source_page INTEGER,
+  chunk_index INTEGER,
+  metadata JSONB,
+  pdf_upload_id UUID,
+  syllabus_node_ids UUID[],
+  similarity FLOAT,
+  text_rank REAL,
+  score FLOAT
+) AS $$
+DECLARE
+  v_candidates INTEGER := COALESCE(candidate_count, GREATEST(match_count * 4, 40));
+  v_query tsquery := websearch_to_tsquery('english', COALESCE(query_text, ''));
+  v_has_text BOOLEAN := numnode(v_query) > 0;
+BEGIN
+  PERFORM set_vector_search_params(ef_search, v_candidates);
+  RETURN QUERY
+  WITH semantic AS (
+    SELECT s.id, s.distance, ROW_NUMBER() OVER (ORDER BY s.distance) AS rank_position
+    FROM (
+      SELECT kc.id, kc.content_vector <=> query_embedding AS distance
+      FROM public.knowledge_chunks kc
+      WHERE query_embedding IS NOT NULL
+        AND kc.content_vector IS NOT NULL
+        AND (syllabus_filter IS NULL OR kc.syllabus_node_ids && syllabus_filter)
+        AND (metadata_filter IS NULL OR kc.metadata @> metadata_filter)
+      ORDER BY kc.content_vector <=> query_embedding
+      LIMIT v_candidates
+    ) s
+  ),
+  lexical AS (
+    SELECT l.id, l.rank_cd, ROW_NUMBER() OVER (ORDER BY l.rank_cd DESC, l.id) AS rank_position
+    FROM (
+      SELECT kc.id, ts_rank_cd(to_tsvector('english', kc.chunk_text), v_query, 1) AS rank_cd
+      FROM public.knowledge_chunks kc
+      WHERE v_has_text
+        AND to_tsvector('english', kc.chunk_text) @@ v_query
+        AND (syllabus_filter IS NULL OR kc.syllabus_node_ids && syllabus_filter)
+        AND (metadata_filter IS NULL OR kc.metadata @> metadata_filter)
+      ORDER BY rank_cd DESC, kc.id
+      LIMIT v_candidates
+    ) l
+  ),
+  fused AS (
+    SELECT COALESCE(s.id, l.id) AS id,
+           s.distance,
+           l.rank_cd,
+           COALESCE(semantic_weight / (rrf_k + s.rank_position), 0)
+             + COALESCE(full_text_weight / (rrf_k + l.rank_position), 0) AS fused_score
+    FROM semantic s
+    FULL OUTER JOIN lexical l ON l.id = s.id
+  )
+  SELECT kc.id, kc.chunk_text, kc.source_page, kc.chunk_index, kc.metadata, kc.pdf_upload_id,
+         kc.syllabus_node_ids, (1 - f.distance)::FLOAT, f.rank_cd, f.fused_score::FLOAT
+  FROM fused f
+  JOIN public.knowledge_chunks kc ON kc.id = f.id
+  ORDER BY f.fused_score DESC, f.distance NULLS LAST, kc.id
+  LIMIT match_count;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION public.set_vector_search_params(INTEGER, INTEGER) IS 'Transaction-local hnsw.ef_search (at least p_limit) and iterative scans for one search call';
+COMMENT ON FUNCTION public.match_knowledge_chunks(vector, FLOAT, INTEGER, INTEGER) IS 'Vector similarity search for RAG - returns chunks matching embedding';
+COMMENT ON FUNCTION public.hybrid_search_knowledge_chunks(TEXT, vector, INTEGER, UUID[], JSONB, INTEGER, INTEGER, INTEGER, FLOAT, FLOAT) IS 'Full-text + vector search over knowledge_chunks fused with reciprocal rank fusion';
@@ -0,0 +1,170 @@
+-- ============================================================================
+-- Migration: 080_knowledge_vector_quantization.sql
+-- Description: Compact HNSW indexes over knowledge_chunks.content_vector
+--              (half precision and binary quantized) and a search that takes
+--              its candidates from one of them and re-ranks them against the
+--              full-precision vectors, so retrieval no longer needs the
+--              float32 index resident in memory
+-- ============================================================================
+
+-- ============================================================================
+-- 1. QUANTIZED INDEXES (pgvector 0.7+)
+-- ============================================================================
+
+-- Expression indexes rather than extra columns: the table keeps only the
+-- full vector (which re-ranking reads), and the concurrent build after the
+-- commit is the whole backfill. Per 1536-d chunk the index stores
+-- 6 KB as vector, 3 KB as halfvec and 192 bytes as bit. Older pgvector
+-- lacks both types; the builds then fail with a notice and only the
+-- 'vector' mode of the search below works.
+DO $migration$ BEGIN
+  BEGIN
+    CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_halfvec
+      ON public.knowledge_chunks
+      USING hnsw ((content_vector::halfvec(1536)) halfvec_cosine_ops);
+  EXCEPTION
+    WHEN undefined_object THEN RAISE NOTICE 'halfvec needs pgvector 0.7+, skipping index';
+  END;
+END $migration$;
+
+DO $migration$ BEGIN
+  BEGIN
+    CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_binary
+      ON public.knowledge_chunks
+      USING hnsw ((binary_quantize(content_vector)::bit(1536)) bit_hamming_ops);
+  EXCEPTION
+    WHEN undefined_function THEN RAISE NOTICE 'binary_quantize needs pgvector 0.7+, skipping index';
+  END;
+END $migration$;
+
+-- ============================================================================
+-- 2. QUANTIZED SEARCH WITH RE-RANKING
+-- ============================================================================
+
+-- quantization:
+--   'vector'  - the float32 index as in match_knowledge_chunks (no re-rank)
+--   'halfvec' - cosine distance on half precision
+--   'binary'  - Hamming distance on the sign bits; coarse, so it needs more
+--               candidates
+-- The first pass takes rerank_count candidates (default 4 x match_count for
+-- halfvec, 10 x for binary) in index order; their exact cosine distance
+-- to query_embedding picks and orders the top match_count, and the
+-- threshold applies to that exact similarity. The index expressions above
+-- must match the ORDER BY expressions here exactly.
+CREATE OR REPLACE FUNCTION public.match_knowledge_chunks_quantized(
+  query_embedding vector(1536),
+  match_threshold FLOAT DEFAULT 0.7,
+  match_count INTEGER DEFAULT 10,
+  quantization TEXT DEFAULT 'halfvec',
+  rerank_count INTEGER DEFAULT NULL,
+  ef_search INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  chunk_text TEXT,
+  source_page INTEGER,
+  chunk_index INTEGER,
+  metadata JSONB,
+  pdf_upload_id UUID,
+  similarity FLOAT
+) AS $$
+DECLARE
+  v_candidates INTEGER;
+BEGIN
+  IF quantization NOT IN ('vector', 'halfvec', 'binary') THEN
+    RAISE EXCEPTION 'Unknown quantization %, expected vector, halfvec or binary', quantization
+      USING ERRCODE = 'invalid_parameter_value';
+  END IF;
+  v_candidates := CASE quantization
+    WHEN 'vector' THEN match_count
+    ELSE GREATEST(COALESCE(rerank_count, match_count * CASE quantization WHEN 'binary' THEN 10 ELSE 4 END), match_count)
+  END;
+  PERFORM set_vector_search_params(ef_search, v_candidates);
+
+  IF quantization = 'vector' THEN
+    RETURN QUERY
+    SELECT m.id, m.chunk_text, m.source_page, m.chunk_index, m.metadata, m.pdf_upload_id, m.similarity
+    FROM match_knowledge_chunks(query_embedding, match_threshold, match_count, ef_search) m;
+  ELSIF quantization = 'halfvec' THEN
+    RETURN QUERY
+    SELECT c.id, c.chunk_text, c.source_page, c.chunk_index, c.metadata, c.pdf_upload_id, 1 - c.distance
+    FROM (
+      SELECT kc.id, kc.chunk_text, kc.source_page, kc.chunk_index, kc.metadata, kc.pdf_upload_id,
+             kc.content_vector <=> query_embedding AS distance
+      FROM public.knowledge_chunks kc
+      WHERE kc.content_vector IS NOT NULL
+      ORDER BY kc.content_vector::halfvec(1536) <=> query_embedding::halfvec(1536)
+      LIMIT v_candidates
+    ) c
+    WHERE 1 - c.distance > match_threshold
+    ORDER BY c.distance
+    LIMIT match_count;
+  ELSE
+    RETURN QUERY
+    SELECT c.id, c.chunk_text, c.source_page, c.chunk_index, c.metadata, c.pdf_upload_id, 1 - c.distance
+    FROM (
+      SELECT kc.id, kc.chunk_text, kc.source_page, kc.chunk_index, kc.metadata, kc.pdf_upload_id,
+             kc.content_vector <=> query_embedding AS distance
+      FROM public.knowledge_chunks kc
+      WHERE kc.content_vector IS NOT NULL
+      ORDER BY binary_quantize(kc.content_vector)::bit(1536) <~> binary_quantize(query_embedding)
+      LIMIT v_candidates
+    ) c
+    WHERE 1 - c.distance > match_threshold
+    ORDER BY c.distance
+    LIMIT match_count;
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- 3. INDEX FOOTPRINT
+-- ============================================================================
+
+-- On-disk size of each vector index over knowledge_chunks and how much of
+-- it is in shared_buffers (pg_buffercache, when installed). Once the
+-- compact search is in use, dropping the float32 index (DROP INDEX
+-- CONCURRENTLY) is what frees the memory; match_knowledge_chunks and the
+-- hybrid search then scan exactly.
+CREATE OR REPLACE FUNCTION public.knowledge_vector_index_sizes()
+RETURNS TABLE (
+  index_name TEXT,
+  quantization TEXT,
+  size_bytes BIGINT,
+  cached_bytes BIGINT
+) AS $$
+DECLARE
+  v_index RECORD;
+  v_cached BIGINT;
+BEGIN
+  FOR v_index IN
+    SELECT c.oid, c.relname::TEXT AS relname, pg_get_indexdef(c.oid) AS definition
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_am am ON am.oid = c.relam
+    WHERE i.indrelid = 'public.knowledge_chunks'::regclass
+      AND am.amname IN ('hnsw', 'ivfflat')
+    ORDER BY c.relname
+  LOOP
+    v_cached := NULL;
+    IF to_regclass('pg_buffercache') IS NOT NULL THEN
+      EXECUTE 'SELECT count(*) * current_setting(''block_size'')::BIGINT FROM pg_buffercache
+               WHERE relfilenode = pg_relation_filenode($1)
+                 AND reldatabase = (SELECT oid FROM pg_database WHERE datname = current_database())'
+        INTO v_cached USING v_index.oid;
+    END IF;
+    index_name := v_index.relname;
+    quantization := CASE
+      WHEN v_index.definition LIKE '%bit_hamming_ops%' THEN 'binary'
+      WHEN v_index.definition LIKE '%halfvec_%' THEN 'halfvec'
+      ELSE 'vector'
+    END;
+    size_bytes := pg_relation_size(v_index.oid);
+    cached_bytes := v_cached;
+    RETURN NEXT;
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMENT ON FUNCTION public.match_knowledge_chunks_quantized(vector, FLOAT, INTEGER, TEXT, INTEGER, INTEGER) IS 'Vector search on a halfvec or binary index, re-ranked by exact cosine similarity';
+COMMENT ON FUNCTION public.knowledge_vector_index_sizes() IS 'Size and cached bytes of each vector index on knowledge_chunks';
@@ -0,0 +1,141 @@
+-- ============================================================================
+-- Migration: 081_time_partitioning.sql
+-- Description: Monthly range partitions for append-only tables. The
+--              conversion itself runs from python -m migrator partitions
+--              --convert (it needs concurrent index builds and a retried
+--              lock); this file adds the registry it records into, partition
+--              pre-creation on a daily schedule, and an inspection function
+--              the detach/archive step reads
+-- ============================================================================
+
+-- ============================================================================
+-- 1. REGISTRY
+-- ============================================================================
+
+-- One row per converted table. legacy_partition is the table as it was
+-- before the conversion, attached FROM (MINVALUE) TO (legacy_until); monthly
+-- partitions start at legacy_until. retention_months NULL keeps every month.
+CREATE TABLE IF NOT EXISTS public.time_partitioned_tables (
+  table_name TEXT PRIMARY KEY,
+  partition_column TEXT NOT NULL,
+  premake_months INTEGER NOT NULL DEFAULT 3 CHECK (premake_months >= 1),
+  retention_months INTEGER CHECK (retention_months >= 1),
+  legacy_partition TEXT,
+  legacy_until DATE NOT NULL,
+  converted_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  maintained_at TIMESTAMPTZ
+);
+
+-- Written only by the functions below and the migrator
+ALTER TABLE public.time_partitioned_tables ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- 2. PARTITION CREATION
+-- ============================================================================
+
+-- One partition per UTC month in [p_from, p_to), named <table>_pYYYYMM,
+-- skipping months that already have one; returns how many were created.
+-- Partitions get row level security with no policies: PostgREST exposes
+-- every table in public and the parent's policies do not apply to a
+-- partition queried directly, so direct reads are denied.
+CREATE OR REPLACE FUNCTION public.create_monthly_partitions(p_table REGCLASS, p_from DATE, p_to DATE)
+RETURNS INTEGER AS $$
+DECLARE
+  v_schema TEXT;
+  v_name TEXT;
+  v_month DATE := date_trunc('month', p_from)::DATE;
+  v_partition TEXT;
+  v_created INTEGER := 0;
+BEGIN
+  SELECT n.nspname, c.relname INTO v_schema, v_name
+  FROM pg_class c
+  JOIN pg_namespace n ON n.oid = c.relnamespace
+  WHERE c.oid = p_table;
+
+  WHILE v_month < p_to LOOP
+    v_partition := v_name || '_p' || to_char(v_month, 'YYYYMM');
+    IF to_regclass(format('%I.%I', v_schema, v_partition)) IS NULL THEN
+      EXECUTE format(
+        'CREATE TABLE %I.%I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+        v_schema, v_partition, p_table,
+        to_char(v_month, 'YYYY-MM-DD') || ' 00:00:00+00',
+        to_char(v_month + INTERVAL '1 month', 'YYYY-MM-DD') || ' 00:00:00+00'
+      );
+      EXECUTE format('ALTER TABLE %I.%I ENABLE ROW LEVEL SECURITY', v_schema, v_partition);
+      v_created := v_created + 1;
+    END IF;
+    v_month := (v_month + INTERVAL '1 month')::DATE;
+  END LOOP;
+
+  RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Keeps premake_months future months (beyond the current one) partitioned
+-- for every registered table. Inserts into a month without a partition
+-- fail, so this runs daily where pg_cron is installed and from
+-- python -m migrator partitions --maintain otherwise. A table that fails
+-- is reported and skipped. Returns the number of partitions created.
+CREATE OR REPLACE FUNCTION public.premake_time_partitions()
+RETURNS INTEGER AS $$
+DECLARE
+  v_table RECORD;
+  v_month DATE := date_trunc('month', NOW() AT TIME ZONE 'UTC')::DATE;
+  v_created INTEGER := 0;
+BEGIN
+  FOR v_table IN SELECT * FROM public.time_partitioned_tables ORDER BY table_name LOOP
+    BEGIN
+      v_created := v_created + create_monthly_partitions(
+        v_table.table_name::REGCLASS,
+        GREATEST(v_month, v_table.legacy_until),
+        (v_month + make_interval(months => v_table.premake_months + 1))::DATE
+      );
+      UPDATE public.time_partitioned_tables SET maintained_at = NOW()
+      WHERE table_name = v_table.table_name;
+    EXCEPTION WHEN OTHERS THEN
+      RAISE WARNING 'premake_time_partitions: %: %', v_table.table_name, SQLERRM;
+    END;
+  END LOOP;
+  RETURN v_created;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.premake_time_partitions() FROM PUBLIC;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('premake-time-partitions', '30 2 * * *', 'SELECT premake_time_partitions()');
+  END IF;
+END $$;
+
+-- ============================================================================
+-- 3. INSPECTION
+-- ============================================================================
+
+-- Partitions of p_table with their bounds (NULL lower_bound: MINVALUE),
+-- estimated rows and size, oldest first
+CREATE OR REPLACE FUNCTION public.time_partitions(p_table REGCLASS)
+RETURNS TABLE (
+  partition_name TEXT,
+  lower_bound TIMESTAMPTZ,
+  upper_bound TIMESTAMPTZ,
+  estimated_rows BIGINT,
+  total_bytes BIGINT
+) AS $$
+  SELECT format('%I.%I', n.nspname, c.relname),
+         (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'FROM \(''([^'']+)''\)'))[1]::TIMESTAMPTZ,
+         (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'TO \(''([^'']+)''\)'))[1]::TIMESTAMPTZ,
+         GREATEST(c.reltuples, 0)::BIGINT,
+         pg_total_relation_size(c.oid)
+  FROM pg_inherits i
+  JOIN pg_class c ON c.oid = i.inhrelid
+  JOIN pg_namespace n ON n.oid = c.relnamespace
+  WHERE i.inhparent = p_table
+  ORDER BY 2 NULLS FIRST, 1;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON TABLE public.time_partitioned_tables IS 'Tables converted to monthly range partitions by python -m migrator partitions --convert';
+COMMENT ON FUNCTION public.create_monthly_partitions(REGCLASS, DATE, DATE) IS 'Create <table>_pYYYYMM partitions for each UTC month in [p_from, p_to)';
+COMMENT ON FUNCTION public.premake_time_partitions() IS 'Create the next premake_months partitions of every registered table; returns partitions created';
+COMMENT ON FUNCTION public.time_partitions(REGCLASS) IS 'Partitions of a range-partitioned table with bounds, estimated rows and size';
@@ -0,0 +1,279 @@
+-- ============================================================================
+-- Migration: 082_batch_spaced_repetition.sql
+-- Description: Set-based SM-2 scheduling for bookmark reviews. A whole review
+--              session is submitted as one process_bookmark_reviews call
+--              (one statement for every card) instead of one
+--              process_bookmark_review round trip per card, and the due-card
+--              lookups read a covering index instead of the user's bookmarks
+-- ============================================================================
+
+-- ============================================================================
+-- 1. DUE LOOKUP INDEX
+-- ============================================================================
+
+-- Every bookmark of a user in review order, including the ones never
+-- scheduled (NULL next_review_date), with the id alongside: the due list
+-- and the due count below are two range scans of this index each (NULL,
+-- then up to NOW()) and never visit the table for bookmarks that are not
+-- due. Heap fetches depend on the visibility map, so they grow between
+-- vacuums on users who review a lot.
+CREATE INDEX IF NOT EXISTS idx_bookmarks_review_due
+  ON public.bookmarks(user_id, next_review_date) INCLUDE (id);
+
+-- Superseded by the index above (it could not serve the NULL half)
+DROP INDEX IF EXISTS public.idx_bookmarks_due_review;
+
+-- ============================================================================
+-- 2. INLINABLE SM-2
+-- ============================================================================
+
+-- Same results as the 051 PL/pgSQL versions. As single-SELECT SQL functions
+-- the planner inlines them into the calling query, so scheduling a batch
+-- costs no per-row function calls.
+CREATE OR REPLACE FUNCTION response_to_quality(p_response TEXT)
+RETURNS INTEGER AS $$
+  SELECT CASE p_response
+    WHEN 'easy' THEN 5
+    WHEN 'medium' THEN 3
+    WHEN 'hard' THEN 2
+    WHEN 'again' THEN 0
+    ELSE 3
+  END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION calculate_sm2_interval(
+  p_current_interval INTEGER,
+  p_ease_factor DECIMAL,
+  p_quality INTEGER  -- 0-5 where 5=perfect, 0=complete blackout
+)
+RETURNS TABLE (
+  new_interval INTEGER,
+  new_ease_factor DECIMAL
+) AS $$
+  SELECT
+    LEAST(
+      CASE
+        WHEN p_quality < 3 THEN 1
+        WHEN p_current_interval = 1 THEN 3
+        WHEN p_current_interval = 3 THEN 7
+        ELSE ROUND(p_current_interval * ef.value)::INTEGER
+      END,
+      365
+    ),
+    ROUND(ef.value, 2)::DECIMAL
+  FROM (
+    SELECT GREATEST(p_ease_factor + (0.1 - (5 - p_quality) * (0.08 + (5 - p_quality) * 0.02)), 1.3) AS value
+  ) ef;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- ============================================================================
+-- 3. BATCH REVIEW
+-- ============================================================================
+
+-- p_reviews: [{"bookmark_id": ..., "response": "easy|medium|hard|again",
+--              "review_time_seconds": ...}, ...]
+-- Locks the reviewed bookmarks in id order, schedules them, writes their
+-- bookmark_reviews rows and updates the streak once, all in one statement.
+-- A bookmark answered more than once in the batch (an 'again' card repeated
+-- later in the session) is scheduled once, by its last answer. Returns one
+-- row per distinct bookmark in the order first submitted; success is false
+-- for bookmarks that are missing or not p_user_id's.
+CREATE OR REPLACE FUNCTION process_bookmark_reviews(
+  p_user_id UUID,
+  p_reviews JSONB
+)
+RETURNS TABLE (
+  bookmark_id UUID,
+  success BOOLEAN,
+  new_interval INTEGER,
+  next_review TIMESTAMPTZ
+) AS $$
+BEGIN
+  IF jsonb_typeof(p_reviews) IS DISTINCT FROM 'array' THEN
+    RAISE EXCEPTION 'p_reviews must be a JSON array of {bookmark_id, response}'
+      USING ERRCODE = 'invalid_parameter_value';
+  END IF;
+  IF EXISTS (
+    SELECT 1 FROM jsonb_array_elements(p_reviews) e(item)
+    WHERE e.item->>'bookmark_id' IS NULL
+       OR e.item->>'response' IS NULL
+       OR e.item->>'response' NOT IN ('easy', 'medium', 'hard', 'again')
+  ) THEN
+    RAISE EXCEPTION 'Each review needs a bookmark_id and a response of easy, medium, hard or again'
+      USING ERRCODE = 'invalid_parameter_value';
+  END IF;
+
+  RETURN QUERY
+  WITH submitted AS (
+    SELECT (e.item->>'bookmark_id')::UUID AS id,
+           e.item->>'response' AS response,
+           (e.item->>'review_time_seconds')::INTEGER AS review_time_seconds,
+           e.ord
+    FROM jsonb_array_elements(p_reviews) WITH ORDINALITY AS e(item, ord)
+  ),
+  answers AS (
+    SELECT DISTINCT ON (s.id) s.id, s.response, s.review_time_seconds,
+           min(s.ord) OVER (PARTITION BY s.id) AS first_ord
+    FROM submitted s
+    ORDER BY s.id, s.ord DESC
+  ),
+  prior AS (
+    SELECT b.id, a.response, a.review_time_seconds,
+           response_to_quality(a.response) AS quality,
+           COALESCE(b.interval_days, 1) AS previous_interval,
+           COALESCE(b.ease_factor, 2.5) AS previous_ease_factor
+    FROM public.bookmarks b
+    JOIN answers a ON a.id = b.id
+    WHERE b.user_id = p_user_id
+    ORDER BY b.id
+    FOR UPDATE OF b
+  ),
+  planned AS (
+    SELECT p.*, sm2.new_interval AS interval_days, sm2.new_ease_factor AS ease_factor,
+           NOW() + make_interval(days => sm2.new_interval) AS next_review_date
+    FROM prior p
+    CROSS JOIN LATERAL calculate_sm2_interval(p.previous_interval, p.previous_ease_factor, p.quality) sm2
+  ),
+  rescheduled AS (
+    UPDATE public.bookmarks b SET
+      review_count = COALESCE(b.review_count, 0) + 1,
+      interval_days = p.interval_days,
+      ease_factor = p.ease_factor,
+      next_review_date = p.next_review_date,
+      last_reviewed_at = NOW(),
+      updated_at = NOW()
+    FROM planned p
+    WHERE b.id = p.id
+  ),
+  logged AS (
+    INSERT INTO public.bookmark_reviews (
+      user_id, bookmark_id, quality, response,
+      previous_interval, previous_ease_factor,
+      new_interval, new_ease_factor, next_review_date,
+      review_time_seconds
+    )
+    SELECT p_user_id, p.id, p.quality, p.response,
+           p.previous_interval, p.previous_ease_factor,
+           p.interval_days, p.ease_factor, p.next_review_date,
+           p.review_time_seconds
+    FROM planned p
+  ),
+  -- update_review_streak applied once with total_reviews advanced by the
+  -- number of bookmarks reviewed
+  streak AS (
+    INSERT INTO public.review_streaks AS rs (user_id, current_streak, longest_streak, last_review_date, total_reviews)
+    SELECT p_user_id, 1, 1, CURRENT_DATE, count(*)
+    FROM planned
+    HAVING count(*) > 0
+    ON CONFLICT (user_id) DO UPDATE SET
+      current_streak = CASE
+        WHEN rs.last_review_date = CURRENT_DATE THEN rs.current_streak
+        WHEN rs.last_review_date = CURRENT_DATE - 1 THEN rs.current_streak + 1
+        ELSE 1
+      END,
+      longest_streak = CASE
+        WHEN rs.last_review_date = CURRENT_DATE - 1 THEN GREATEST(rs.longest_streak, rs.current_streak + 1)
+        ELSE rs.longest_streak
+      END,
+      last_review_date = CURRENT_DATE,
+      total_reviews = rs.total_reviews + EXCLUDED.total_reviews,
+      updated_at = NOW()
+  )
+  SELECT a.id, p.id IS NOT NULL, COALESCE(p.interval_days, 0), p.next_review_date
+  FROM answers a
+  LEFT JOIN planned p ON p.id = a.id
+  ORDER BY a.first_ord;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The single-review call (POST /api/bookmarks/review) is now a batch of one
+CREATE OR REPLACE FUNCTION process_bookmark_review(
+  p_user_id UUID,
+  p_bookmark_id UUID,
+  p_response TEXT,  -- 'easy', 'medium', 'hard', 'again'
+  p_review_time_seconds INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+  success BOOLEAN,
+  new_interval INTEGER,
+  next_review TIMESTAMPTZ
+) AS $$
+  SELECT r.success, r.new_interval, r.next_review
+  FROM process_bookmark_reviews(
+    p_user_id,
+    jsonb_build_array(jsonb_build_object(
+      'bookmark_id', p_bookmark_id,
+      'response', p_response,
+      'review_time_seconds', p_review_time_seconds
+    ))
+  ) r;
+$$ LANGUAGE sql;
+
+-- ============================================================================
+-- 4. DUE LOOKUPS
+-- ============================================================================
+
+-- The due ids come from idx_bookmarks_review_due (never scheduled first,
+-- then oldest due); only the p_limit bookmarks returned are read from the
+-- table.
+CREATE OR REPLACE FUNCTION get_due_bookmarks(
+  p_user_id UUID,
+  p_limit INTEGER DEFAULT 50
+)
+RETURNS TABLE (
+  id UUID,
+  title TEXT,
+  snippet TEXT,
+  content_type TEXT,
+  content_id UUID,
+  review_count INTEGER,
+  ease_factor DECIMAL,
+  interval_days INTEGER,
+  next_review_date TIMESTAMPTZ
+) AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    b.id,
+    b.title,
+    b.snippet,
+    b.content_type,
+    b.content_id,
+    COALESCE(b.review_count, 0),
+    COALESCE(b.ease_factor, 2.5),
+    COALESCE(b.interval_days, 1),
+    b.next_review_date
+  FROM (
+    (SELECT d.id AS due_id, d.next_review_date AS due_at
+     FROM public.bookmarks d
+     WHERE d.user_id = p_user_id AND d.next_review_date IS NULL
+     LIMIT p_limit)
+    UNION ALL
+    (SELECT d.id, d.next_review_date
+     FROM public.bookmarks d
+     WHERE d.user_id = p_user_id AND d.next_review_date <= NOW()
+     ORDER BY d.next_review_date
+     LIMIT p_limit)
+  ) due
+  JOIN public.bookmarks b ON b.id = due.due_id
+  ORDER BY due.due_at ASC NULLS FIRST
+  LIMIT p_limit;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION count_due_bookmarks(p_user_id UUID)
+RETURNS INTEGER AS $$
+BEGIN
+  RETURN (
+    SELECT COUNT(*)::INTEGER FROM public.bookmarks
+    WHERE user_id = p_user_id AND next_review_date IS NULL
+  ) + (
+    SELECT COUNT(*)::INTEGER FROM public.bookmarks
+    WHERE user_id = p_user_id AND next_review_date <= NOW()
+  );
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION process_bookmark_reviews(UUID, JSONB) IS 'Story 9.9 AC 7: Process a session of reviews in one set-based statement';
+COMMENT ON FUNCTION process_bookmark_review(UUID, UUID, TEXT, INTEGER) IS 'Story 9.9 AC 7: Process review and update schedule (batch of one)';
+COMMENT ON FUNCTION get_due_bookmarks(UUID, INTEGER) IS 'Story 9.9 AC 4: Due bookmarks from the idx_bookmarks_review_due range scans';
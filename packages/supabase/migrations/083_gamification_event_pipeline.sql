@@ -0,0 +1,636 @@
+-- ============================================================================
+-- Migration: 083_gamification_event_pipeline.sql
+-- Description: XP, study time and room visits are appended to xp_events and
+--              applied in batches by process_xp_events (pg_cron, or
+--              python -m migrator process-xp-events). Badge rules are
+--              re-checked only for the inputs a batch changed, against
+--              running totals instead of the user's whole history, and the
+--              XP leaderboards are a materialized view refreshed on a
+--              schedule
+-- ============================================================================
+
+-- ============================================================================
+-- 1. EVENT LOG
+-- ============================================================================
+
+-- One row per gamification event, deleted by the batch that applies it.
+-- amount is the XP to award (0 for events that only count something);
+-- study_minutes feeds daily_activity and the streak. Reward XP earned while
+-- applying a batch (streak bonus, badge rewards) is appended here too and
+-- applied by the next batch.
+CREATE TABLE IF NOT EXISTS public.xp_events (
+  id BIGSERIAL PRIMARY KEY,
+  user_id UUID NOT NULL,
+  activity_type TEXT NOT NULL, -- xp_transactions types, plus 'study_session' and 'room_visited'
+  amount INTEGER NOT NULL DEFAULT 0,
+  study_minutes INTEGER NOT NULL DEFAULT 0 CHECK (study_minutes >= 0),
+  source_id TEXT,
+  description TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Lifetime activity counters the count badges compare against (065 summed
+-- daily_activity over the user's whole history on every check)
+CREATE TABLE IF NOT EXISTS public.user_activity_totals (
+  user_id UUID PRIMARY KEY,
+  videos_watched INTEGER NOT NULL DEFAULT 0,
+  quizzes_completed INTEGER NOT NULL DEFAULT 0,
+  doubts_asked INTEGER NOT NULL DEFAULT 0,
+  notes_generated INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO public.user_activity_totals (user_id, videos_watched, quizzes_completed, doubts_asked, notes_generated)
+SELECT user_id,
+       COALESCE(SUM(videos_watched), 0),
+       COALESCE(SUM(quizzes_completed), 0),
+       COALESCE(SUM(doubts_asked), 0),
+       COALESCE(SUM(notes_generated), 0)
+FROM public.daily_activity
+GROUP BY user_id
+ON CONFLICT (user_id) DO NOTHING;
+
+-- Written only by the SECURITY DEFINER functions below
+ALTER TABLE public.xp_events ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.user_activity_totals ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- 2. LEVELS
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION xp_level(p_total_xp INTEGER)
+RETURNS INTEGER AS $$
+  SELECT COALESCE(MAX(level), 1) FROM public.level_definitions WHERE xp_required <= p_total_xp;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION xp_to_next_level(p_total_xp INTEGER)
+RETURNS INTEGER AS $$
+  SELECT COALESCE(
+    (SELECT xp_required FROM public.level_definitions WHERE level = xp_level(p_total_xp) + 1),
+    p_total_xp + 1000
+  ) - p_total_xp;
+$$ LANGUAGE sql STABLE;
+
+-- ============================================================================
+-- 3. INCREMENTAL BADGES
+-- ============================================================================
+
+-- The input a badge criteria type reads; a batch re-checks a rule only for
+-- users whose input it changed
+CREATE OR REPLACE FUNCTION badge_criteria_input(p_criteria_type TEXT)
+RETURNS TEXT AS $$
+  SELECT CASE p_criteria_type
+    WHEN 'first_topic' THEN 'rooms'
+    WHEN 'visit_papers' THEN 'rooms'
+    WHEN 'streak_days' THEN 'streak'
+    WHEN 'quiz_perfect' THEN 'quizzes'
+    WHEN 'notes_count' THEN 'notes'
+    WHEN 'doubts_count' THEN 'doubts'
+    WHEN 'videos_count' THEN 'videos'
+    WHEN 'level' THEN 'level'
+  END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Check the unearned badges whose input changed for each (user, input)
+-- pair and award the ones now met: user_badges row, badge_earned milestone,
+-- and the XP reward appended to xp_events. Returns the badges awarded.
+CREATE OR REPLACE FUNCTION award_badges(p_user_ids UUID[], p_inputs TEXT[])
+RETURNS TABLE (
+  user_id UUID,
+  badge_slug TEXT,
+  badge_name TEXT
+) AS $$
+  WITH changed AS (
+    SELECT DISTINCT c.user_id, c.input
+    FROM unnest(p_user_ids, p_inputs) AS c(user_id, input)
+  ),
+  candidates AS (
+    SELECT c.user_id, bd.id AS badge_id, bd.slug, bd.name, bd.xp_reward,
+           bd.criteria->>'type' AS criteria_type, (bd.criteria->>'value')::INTEGER AS target
+    FROM changed c
+    JOIN public.badge_definitions bd ON badge_criteria_input(bd.criteria->>'type') = c.input
+    WHERE NOT EXISTS (
+      SELECT 1 FROM public.user_badges ub WHERE ub.user_id = c.user_id AND ub.badge_id = bd.id
+    )
+  ),
+  measured AS (
+    SELECT c.*, CASE c.criteria_type
+      WHEN 'first_topic' THEN
+        (SELECT COUNT(*) FROM public.user_room_progress p WHERE p.user_id = c.user_id AND p.visited = true)
+      WHEN 'visit_papers' THEN
+        (SELECT COUNT(DISTINCT p.room_id) FROM public.user_room_progress p WHERE p.user_id = c.user_id AND p.visited = true)
+      WHEN 'streak_days' THEN
+        (SELECT s.current_streak FROM public.user_streaks s WHERE s.user_id = c.user_id)
+      WHEN 'quiz_perfect' THEN
+        (SELECT COALESCE(m.quizzes_perfect, 0) FROM public.monthly_stats m
+         WHERE m.user_id = c.user_id ORDER BY m.month_year DESC LIMIT 1)
+      WHEN 'notes_count' THEN
+        (SELECT t.notes_generated FROM public.user_activity_totals t WHERE t.user_id = c.user_id)
+      WHEN 'doubts_count' THEN
+        (SELECT t.doubts_asked FROM public.user_activity_totals t WHERE t.user_id = c.user_id)
+      WHEN 'videos_count' THEN
+        (SELECT t.videos_watched FROM public.user_activity_totals t WHERE t.user_id = c.user_id)
+      WHEN 'level' THEN
+        (SELECT x.current_level FROM public.user_xp x WHERE x.user_id = c.user_id)
+    END AS value
+    FROM candidates c
+  ),
+  earned AS (
+    INSERT INTO public.user_badges (user_id, badge_id)
+    SELECT m.user_id, m.badge_id FROM measured m WHERE m.value >= m.target
+    ON CONFLICT (user_id, badge_id) DO NOTHING
+    RETURNING user_id, badge_id
+  ),
+  awarded AS (
+    SELECT m.* FROM measured m
+    JOIN earned e ON e.user_id = m.user_id AND e.badge_id = m.badge_id
+  ),
+  milestones AS (
+    INSERT INTO public.user_milestones (user_id, milestone_type, milestone_value, data)
+    SELECT a.user_id, 'badge_earned', 1,
+           jsonb_build_object('badge_id', a.badge_id, 'badge_name', a.name, 'badge_slug', a.slug)
+    FROM awarded a
+  ),
+  rewards AS (
+    INSERT INTO public.xp_events (user_id, activity_type, amount, source_id, description)
+    SELECT a.user_id, 'badge_reward', a.xp_reward, a.badge_id::TEXT, 'Badge earned: ' || a.name
+    FROM awarded a
+    WHERE a.xp_reward > 0
+  )
+  SELECT a.user_id, a.slug, a.name FROM awarded a;
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION award_badges(UUID[], TEXT[]) FROM PUBLIC;
+
+-- Same signature and result as 065; every input is re-checked, but from the
+-- running totals
+CREATE OR REPLACE FUNCTION check_and_award_badges(p_user_id UUID)
+RETURNS JSONB AS $$
+  SELECT COALESCE(jsonb_agg(jsonb_build_object('badge', b.badge_slug, 'name', b.badge_name)), '[]'::jsonb)
+  FROM award_badges(
+    array_fill(p_user_id, ARRAY[7]),
+    ARRAY['rooms', 'streak', 'quizzes', 'notes', 'doubts', 'videos', 'level']
+  ) b;
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+-- ============================================================================
+-- 4. BATCH WORKER
+-- ============================================================================
+
+-- Apply up to p_limit events, oldest first, and delete them. Events are
+-- claimed with SKIP LOCKED, so concurrent workers take disjoint batches;
+-- upserts go in user_id order to keep them from deadlocking each other.
+-- Per batch:
+--   xp_transactions rows; daily_activity, monthly_stats and
+--   user_activity_totals counters; user_xp totals, then levels (level_up
+--   milestones); for each day with study time, the streak of users whose
+--   day total reached their daily goal (streak bonus appended as an event);
+--   then award_badges for the inputs that changed.
+-- XP events of users who have opted out are dropped. Returns the number of
+-- events claimed (0 when the log is empty).
+CREATE OR REPLACE FUNCTION process_xp_events(p_limit INTEGER DEFAULT 1000)
+RETURNS INTEGER AS $$
+DECLARE
+  v_events public.xp_events[];
+  v_claimed INTEGER;
+  v_xp_users UUID[];
+  v_streak_users UUID[] := '{}';
+  v_day DATE;
+  v_day_users UUID[];
+  v_streaked UUID[];
+  v_badge_users UUID[];
+  v_badge_inputs TEXT[];
+BEGIN
+  WITH claimed AS (
+    DELETE FROM public.xp_events e
+    WHERE e.id IN (
+      SELECT q.id FROM public.xp_events q ORDER BY q.id LIMIT p_limit FOR UPDATE SKIP LOCKED
+    )
+    RETURNING e AS event
+  )
+  SELECT COALESCE(array_agg(c.event ORDER BY (c.event).id) FILTER (
+           WHERE (c.event).amount = 0 OR NOT EXISTS (
+             SELECT 1 FROM public.gamification_settings gs
+             WHERE gs.user_id = (c.event).user_id AND gs.enabled = false
+           )
+         ), '{}'),
+         COUNT(*)
+  INTO v_events, v_claimed
+  FROM claimed c;
+
+  IF v_claimed = 0 THEN
+    RETURN 0;
+  END IF;
+
+  -- Ledger and counters
+  WITH events AS (
+    SELECT e.*, e.created_at::DATE AS day FROM unnest(v_events) e
+  ),
+  ledger AS (
+    INSERT INTO public.xp_transactions (user_id, amount, activity_type, source_id, description, created_at)
+    SELECT e.user_id, e.amount, e.activity_type, e.source_id, e.description, e.created_at
+    FROM events e
+    WHERE e.amount <> 0
+  ),
+  per_day AS (
+    SELECT e.user_id, e.day,
+           SUM(e.amount)::INTEGER AS xp,
+           SUM(e.study_minutes)::INTEGER AS study_minutes,
+           COUNT(*) FILTER (WHERE e.activity_type = 'video_watched')::INTEGER AS videos,
+           COUNT(*) FILTER (WHERE e.activity_type = 'quiz_completed')::INTEGER AS quizzes,
+           COUNT(*) FILTER (WHERE e.activity_type = 'doubt_asked')::INTEGER AS doubts,
+           COUNT(*) FILTER (WHERE e.activity_type = 'notes_generated')::INTEGER AS notes
+    FROM events e
+    GROUP BY e.user_id, e.day
+  ),
+  daily AS (
+    INSERT INTO public.daily_activity AS da
+      (user_id, activity_date, xp_earned, study_minutes, videos_watched, quizzes_completed, doubts_asked, notes_generated)
+    SELECT d.user_id, d.day, d.xp, d.study_minutes, d.videos, d.quizzes, d.doubts, d.notes
+    FROM per_day d
+    ORDER BY d.user_id, d.day
+    ON CONFLICT (user_id, activity_date) DO UPDATE SET
+      xp_earned = COALESCE(da.xp_earned, 0) + EXCLUDED.xp_earned,
+      study_minutes = da.study_minutes + EXCLUDED.study_minutes,
+      videos_watched = COALESCE(da.videos_watched, 0) + EXCLUDED.videos_watched,
+      quizzes_completed = COALESCE(da.quizzes_completed, 0) + EXCLUDED.quizzes_completed,
+      doubts_asked = COALESCE(da.doubts_asked, 0) + EXCLUDED.doubts_asked,
+      notes_generated = COALESCE(da.notes_generated, 0) + EXCLUDED.notes_generated,
+      updated_at = now()
+  ),
+  monthly AS (
+    INSERT INTO public.monthly_stats AS ms
+      (user_id, month_year, total_xp, study_minutes, videos_watched, quizzes_completed, doubts_asked, notes_generated)
+    SELECT d.user_id, to_char(d.day, 'YYYY-MM'), SUM(d.xp), SUM(d.study_minutes),
+           SUM(d.videos), SUM(d.quizzes), SUM(d.doubts), SUM(d.notes)
+    FROM per_day d
+    GROUP BY d.user_id, to_char(d.day, 'YYYY-MM')
+    ORDER BY d.user_id, to_char(d.day, 'YYYY-MM')
+    ON CONFLICT (user_id, month_year) DO UPDATE SET
+      total_xp = COALESCE(ms.total_xp, 0) + EXCLUDED.total_xp,
+      study_minutes = COALESCE(ms.study_minutes, 0) + EXCLUDED.study_minutes,
+      videos_watched = COALESCE(ms.videos_watched, 0) + EXCLUDED.videos_watched,
+      quizzes_completed = COALESCE(ms.quizzes_completed, 0) + EXCLUDED.quizzes_completed,
+      doubts_asked = COALESCE(ms.doubts_asked, 0) + EXCLUDED.doubts_asked,
+      notes_generated = COALESCE(ms.notes_generated, 0) + EXCLUDED.notes_generated,
+      updated_at = now()
+  )
+  INSERT INTO public.user_activity_totals AS t (user_id, videos_watched, quizzes_completed, doubts_asked, notes_generated)
+  SELECT d.user_id, SUM(d.videos), SUM(d.quizzes), SUM(d.doubts), SUM(d.notes)
+  FROM per_day d
+  GROUP BY d.user_id
+  HAVING SUM(d.videos) + SUM(d.quizzes) + SUM(d.doubts) + SUM(d.notes) > 0
+  ORDER BY d.user_id
+  ON CONFLICT (user_id) DO UPDATE SET
+    videos_watched = t.videos_watched + EXCLUDED.videos_watched,
+    quizzes_completed = t.quizzes_completed + EXCLUDED.quizzes_completed,
+    doubts_asked = t.doubts_asked + EXCLUDED.doubts_asked,
+    notes_generated = t.notes_generated + EXCLUDED.notes_generated,
+    updated_at = now();
+
+  -- XP totals, then levels against the new totals (a separate statement so
+  -- the previous level can be read back for the milestone)
+  WITH gained AS (
+    INSERT INTO public.user_xp AS ux (user_id, total_xp, lifetime_xp)
+    SELECT e.user_id, SUM(e.amount), SUM(e.amount)
+    FROM unnest(v_events) e
+    WHERE e.amount <> 0
+    GROUP BY e.user_id
+    ORDER BY e.user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+      total_xp = ux.total_xp + EXCLUDED.total_xp,
+      lifetime_xp = ux.lifetime_xp + EXCLUDED.lifetime_xp,
+      updated_at = now()
+    RETURNING ux.user_id
+  )
+  SELECT array_agg(g.user_id) INTO v_xp_users FROM gained g;
+
+  WITH leveled AS (
+    UPDATE public.user_xp ux SET
+      current_level = GREATEST(ux.current_level, xp_level(ux.total_xp)),
+      xp_to_next_level = xp_to_next_level(ux.total_xp)
+    FROM public.user_xp prior
+    WHERE prior.user_id = ux.user_id
+      AND ux.user_id = ANY(v_xp_users)
+    RETURNING ux.user_id, prior.current_level AS previous_level, ux.current_level AS new_level
+  )
+  INSERT INTO public.user_milestones (user_id, milestone_type, milestone_value, data)
+  SELECT l.user_id, 'level_up', l.new_level,
+         jsonb_build_object('previous_level', l.previous_level, 'new_level', l.new_level)
+  FROM leveled l
+  WHERE l.new_level > l.previous_level;
+
+  -- Streaks, one day at a time (a batch spans more than one only around
+  -- midnight). A day counts once, when its study time first reaches the
+  -- user's daily goal; a day late enough to be older than the streak's
+  -- last day is not counted.
+  FOR v_day IN
+    SELECT DISTINCT e.created_at::DATE FROM unnest(v_events) e WHERE e.study_minutes > 0 ORDER BY 1
+  LOOP
+    WITH reached AS (
+      UPDATE public.daily_activity da SET streak_counted = true
+      FROM (
+        SELECT DISTINCT e.user_id FROM unnest(v_events) e
+        WHERE e.study_minutes > 0 AND e.created_at::DATE = v_day
+      ) u
+      LEFT JOIN public.gamification_settings gs ON gs.user_id = u.user_id
+      WHERE da.user_id = u.user_id
+        AND da.activity_date = v_day
+        AND da.streak_counted IS NOT TRUE
+        AND da.study_minutes >= COALESCE(gs.daily_goal_minutes, 30)
+      RETURNING da.user_id
+    )
+    SELECT array_agg(r.user_id ORDER BY r.user_id) INTO v_day_users FROM reached r;
+
+    CONTINUE WHEN v_day_users IS NULL;
+
+    INSERT INTO public.user_streaks (user_id)
+    SELECT unnest(v_day_users)
+    ON CONFLICT (user_id) DO NOTHING;
+
+    WITH streaks AS (
+      UPDATE public.user_streaks s SET
+        current_streak = CASE
+          WHEN s.last_activity_date IS NULL OR s.last_activity_date = v_day - 1 THEN s.current_streak + 1
+          ELSE 1
+        END,
+        longest_streak = GREATEST(s.longest_streak, CASE
+          WHEN s.last_activity_date IS NULL OR s.last_activity_date = v_day - 1 THEN s.current_streak + 1
+          ELSE 1
+        END),
+        last_activity_date = v_day,
+        streak_start_date = CASE
+          WHEN s.last_activity_date IS NULL OR s.last_activity_date = v_day - 1 THEN COALESCE(s.streak_start_date, v_day)
+          ELSE v_day
+        END,
+        updated_at = now()
+      FROM public.user_streaks prior
+      WHERE prior.user_id = s.user_id
+        AND s.user_id = ANY(v_day_users)
+        AND (prior.last_activity_date IS NULL OR prior.last_activity_date < v_day)
+      RETURNING s.user_id, (prior.last_activity_date IS NULL OR prior.last_activity_date = v_day - 1) AS continued
+    ),
+    streak_days AS (
+      INSERT INTO public.monthly_stats AS ms (user_id, month_year, streak_days)
+      SELECT s.user_id, to_char(v_day, 'YYYY-MM'), 1
+      FROM streaks s
+      ORDER BY s.user_id
+      ON CONFLICT (user_id, month_year) DO UPDATE SET
+        streak_days = COALESCE(ms.streak_days, 0) + 1,
+        updated_at = now()
+    ),
+    bonus AS (
+      INSERT INTO public.xp_events (user_id, activity_type, amount, description)
+      SELECT s.user_id, 'streak_bonus', 50, 'Daily streak bonus'
+      FROM streaks s
+      WHERE s.continued
+    )
+    SELECT array_agg(s.user_id) INTO v_streaked FROM streaks s;
+
+    v_streak_users := v_streak_users || COALESCE(v_streaked, '{}');
+  END LOOP;
+
+  -- Badges whose inputs changed
+  SELECT array_agg(c.user_id), array_agg(c.input)
+  INTO v_badge_users, v_badge_inputs
+  FROM (
+    SELECT DISTINCT e.user_id, CASE e.activity_type
+      WHEN 'video_watched' THEN 'videos'
+      WHEN 'quiz_completed' THEN 'quizzes'
+      WHEN 'doubt_asked' THEN 'doubts'
+      WHEN 'notes_generated' THEN 'notes'
+      WHEN 'room_visited' THEN 'rooms'
+    END AS input
+    FROM unnest(v_events) e
+    UNION
+    SELECT unnest(v_xp_users), 'level'
+    UNION
+    SELECT unnest(v_streak_users), 'streak'
+  ) c
+  WHERE c.input IS NOT NULL;
+
+  IF v_badge_users IS NOT NULL THEN
+    PERFORM 1 FROM award_badges(v_badge_users, v_badge_inputs);
+  END IF;
+
+  RETURN v_claimed;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION process_xp_events(INTEGER) FROM PUBLIC;
+
+-- Every minute where pg_cron is installed; python -m migrator
+-- process-xp-events drains the log in a loop where it is not (or to catch
+-- up). A run stops at the first batch that comes back short.
+CREATE OR REPLACE FUNCTION drain_xp_events(p_batch INTEGER DEFAULT 1000, p_max_batches INTEGER DEFAULT 50)
+RETURNS INTEGER AS $$
+DECLARE
+  v_total INTEGER := 0;
+  v_claimed INTEGER;
+BEGIN
+  FOR i IN 1..p_max_batches LOOP
+    v_claimed := process_xp_events(p_batch);
+    v_total := v_total + v_claimed;
+    EXIT WHEN v_claimed < p_batch;
+  END LOOP;
+  RETURN v_total;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION drain_xp_events(INTEGER, INTEGER) FROM PUBLIC;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('process-xp-events', '* * * * *', 'SELECT drain_xp_events()');
+  END IF;
+END $$;
+
+-- ============================================================================
+-- 5. PRODUCERS (same signatures as 065)
+-- ============================================================================
+
+-- Appends the event and returns at once; totals, level, counters and
+-- badges follow with the next batch. Returns 0 for users who opted out.
+CREATE OR REPLACE FUNCTION award_xp(
+  p_user_id UUID,
+  p_amount INTEGER,
+  p_activity_type TEXT,
+  p_source_id TEXT DEFAULT NULL,
+  p_description TEXT DEFAULT NULL
+) RETURNS INTEGER AS $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM gamification_settings WHERE user_id = p_user_id AND enabled = false) THEN
+    RETURN 0;
+  END IF;
+
+  INSERT INTO public.xp_events (user_id, activity_type, amount, source_id, description)
+  VALUES (p_user_id, p_activity_type, p_amount, p_source_id, p_description);
+
+  RETURN p_amount;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Appends the study time and returns the streak as last applied, marked
+-- queued; the streak (and its bonus) moves when the batch sees the day's
+-- total reach the daily goal
+CREATE OR REPLACE FUNCTION update_user_streak(p_user_id UUID, p_study_minutes INTEGER)
+RETURNS JSONB AS $$
+DECLARE
+  v_streak RECORD;
+  v_daily_goal INTEGER;
+BEGIN
+  INSERT INTO public.xp_events (user_id, activity_type, study_minutes)
+  VALUES (p_user_id, 'study_session', p_study_minutes);
+
+  SELECT daily_goal_minutes INTO v_daily_goal
+  FROM gamification_settings WHERE user_id = p_user_id;
+
+  SELECT current_streak, longest_streak INTO v_streak
+  FROM user_streaks WHERE user_id = p_user_id;
+
+  RETURN jsonb_build_object(
+    'current_streak', COALESCE(v_streak.current_streak, 0),
+    'longest_streak', COALESCE(v_streak.longest_streak, 0),
+    'daily_goal', COALESCE(v_daily_goal, 30),
+    'study_minutes', p_study_minutes,
+    'queued', true
+  );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- ============================================================================
+-- 6. SELF-COMPARISON
+-- ============================================================================
+
+-- monthly_stats is now kept current by the batches (065 only ever added
+-- total_xp, so the other figures stayed 0), which makes this two unique-key
+-- reads of precomputed rows; same result shape as 065
+CREATE OR REPLACE FUNCTION get_self_comparison(p_user_id UUID)
+RETURNS JSONB AS $$
+  WITH months AS (
+    SELECT to_char(CURRENT_DATE, 'YYYY-MM') AS current_month,
+           to_char(CURRENT_DATE - INTERVAL '1 month', 'YYYY-MM') AS previous_month
+  ),
+  stats AS (
+    SELECT mo.current_month, mo.previous_month,
+           COALESCE(c.total_xp, 0) AS c_xp, COALESCE(c.study_minutes, 0) AS c_minutes,
+           COALESCE(c.videos_watched, 0) AS c_videos, COALESCE(c.quizzes_completed, 0) AS c_quizzes,
+           COALESCE(c.notes_generated, 0) AS c_notes, COALESCE(c.streak_days, 0) AS c_streak,
+           COALESCE(p.total_xp, 0) AS p_xp, COALESCE(p.study_minutes, 0) AS p_minutes,
+           COALESCE(p.videos_watched, 0) AS p_videos, COALESCE(p.quizzes_completed, 0) AS p_quizzes,
+           COALESCE(p.notes_generated, 0) AS p_notes, COALESCE(p.streak_days, 0) AS p_streak
+    FROM months mo
+    LEFT JOIN public.monthly_stats c ON c.user_id = p_user_id AND c.month_year = mo.current_month
+    LEFT JOIN public.monthly_stats p ON p.user_id = p_user_id AND p.month_year = mo.previous_month
+  )
+  SELECT jsonb_build_object(
+    'current_month', s.current_month,
+    'previous_month', s.previous_month,
+    'current', jsonb_build_object(
+      'xp', s.c_xp, 'study_minutes', s.c_minutes, 'videos', s.c_videos,
+      'quizzes', s.c_quizzes, 'notes', s.c_notes, 'streak_days', s.c_streak
+    ),
+    'previous', jsonb_build_object(
+      'xp', s.p_xp, 'study_minutes', s.p_minutes, 'videos', s.p_videos,
+      'quizzes', s.p_quizzes, 'notes', s.p_notes, 'streak_days', s.p_streak
+    ),
+    'change', jsonb_build_object(
+      'xp', s.c_xp - s.p_xp,
+      'study_minutes', s.c_minutes - s.p_minutes,
+      'videos', s.c_videos - s.p_videos,
+      'quizzes', s.c_quizzes - s.p_quizzes,
+      'notes', s.c_notes - s.p_notes
+    )
+  )
+  FROM stats s;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+-- ============================================================================
+-- 7. LEADERBOARDS (materialized)
+-- ============================================================================
+
+-- Weekly and monthly boards sum daily_activity.xp_earned (one row per user
+-- and day) rather than xp_transactions; all_time reads user_xp. Users who
+-- opted out are left off. Ranks are ties-share (rank()).
+CREATE MATERIALIZED VIEW IF NOT EXISTS public.xp_leaderboards AS
+WITH eligible AS (
+  SELECT ux.user_id, ux.total_xp, ux.current_level
+  FROM public.user_xp ux
+  LEFT JOIN public.gamification_settings gs ON gs.user_id = ux.user_id
+  WHERE gs.enabled IS DISTINCT FROM false
+),
+boards AS (
+  SELECT 'all_time' AS board, e.user_id, e.total_xp::BIGINT AS xp
+  FROM eligible e
+  WHERE e.total_xp > 0
+  UNION ALL
+  SELECT 'weekly', da.user_id, SUM(da.xp_earned)::BIGINT
+  FROM public.daily_activity da
+  WHERE da.activity_date >= date_trunc('week', CURRENT_DATE)::DATE
+  GROUP BY da.user_id
+  UNION ALL
+  SELECT 'monthly', da.user_id, SUM(da.xp_earned)::BIGINT
+  FROM public.daily_activity da
+  WHERE da.activity_date >= date_trunc('month', CURRENT_DATE)::DATE
+  GROUP BY da.user_id
+)
+SELECT b.board, b.user_id, b.xp, e.current_level,
+       rank() OVER (PARTITION BY b.board ORDER BY b.xp DESC) AS rank,
+       NOW() AS refreshed_at
+FROM boards b
+JOIN eligible e ON e.user_id = b.user_id
+WHERE b.xp > 0;
+
+-- REFRESH ... CONCURRENTLY needs a unique index
+CREATE UNIQUE INDEX IF NOT EXISTS idx_xp_leaderboards_board_user
+  ON public.xp_leaderboards(board, user_id);
+
+CREATE INDEX IF NOT EXISTS idx_xp_leaderboards_board_rank
+  ON public.xp_leaderboards(board, rank);
+
+-- The weekly/monthly ranges above
+CREATE INDEX IF NOT EXISTS idx_daily_activity_date
+  ON public.daily_activity(activity_date);
+
+-- A materialized view has no row level security; only the service role
+-- (the gamification pipe) reads it
+REVOKE ALL ON public.xp_leaderboards FROM PUBLIC, anon, authenticated;
+
+-- Every 5 minutes where pg_cron is installed, otherwise from
+-- python -m migrator refresh-analytics
+CREATE OR REPLACE FUNCTION refresh_xp_leaderboards()
+RETURNS TIMESTAMPTZ AS $$
+DECLARE
+  v_started TIMESTAMPTZ := clock_timestamp();
+BEGIN
+  REFRESH MATERIALIZED VIEW CONCURRENTLY public.xp_leaderboards;
+
+  INSERT INTO public.analytics_freshness (name, method, refreshed_at, duration_ms)
+  VALUES ('xp_leaderboards', 'materialized', NOW(),
+          (EXTRACT(EPOCH FROM clock_timestamp() - v_started) * 1000)::INTEGER)
+  ON CONFLICT (name) DO UPDATE SET
+    refreshed_at = EXCLUDED.refreshed_at,
+    duration_ms = EXCLUDED.duration_ms,
+    updated_at = NOW();
+
+  RETURN NOW();
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+INSERT INTO public.analytics_freshness (name, method, refreshed_at)
+VALUES ('xp_leaderboards', 'materialized', NOW())
+ON CONFLICT (name) DO UPDATE SET method = 'materialized', refreshed_at = NOW(), updated_at = NOW();
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('refresh-xp-leaderboards', '*/5 * * * *', 'SELECT refresh_xp_leaderboards()');
+  END IF;
+END $$;
+
+COMMENT ON TABLE public.xp_events IS 'Pending gamification events, applied and deleted by process_xp_events';
+COMMENT ON TABLE public.user_activity_totals IS 'Lifetime activity counters for the count badges, maintained by process_xp_events';
+COMMENT ON FUNCTION process_xp_events(INTEGER) IS 'Apply one batch of xp_events; returns the number of events claimed';
+COMMENT ON FUNCTION award_badges(UUID[], TEXT[]) IS 'Award the badges whose criteria input changed for each (user, input) pair';
+COMMENT ON MATERIALIZED VIEW public.xp_leaderboards IS 'Weekly, monthly and all-time XP ranks (Story 14.1); see refreshed_at';
@@ -0,0 +1,52 @@
+-- ============================================================================
+-- Migration: 084_question_difficulty_trigger.sql
+-- Description: 040 renamed question_attempts.question_type to
+--              question_source, which broke the 036
+--              update_question_difficulty trigger on every insert. It also
+--              has to write user_difficulty_stats past that table's
+--              read-only RLS
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION update_question_difficulty()
+RETURNS TRIGGER AS $$
+DECLARE
+  v_success_rate DECIMAL(5,2);
+BEGIN
+  SELECT (COUNT(*) FILTER (WHERE is_correct = true)::DECIMAL / NULLIF(COUNT(*), 0)) * 100
+  INTO v_success_rate
+  FROM public.question_attempts
+  WHERE question_id = NEW.question_id;
+
+  v_success_rate := COALESCE(v_success_rate, 50.0);
+
+  IF NEW.question_source = 'pyq' THEN
+    UPDATE public.pyq_questions
+    SET
+      attempt_count = COALESCE(attempt_count, 0) + 1,
+      success_rate = v_success_rate,
+      difficulty = CASE
+        WHEN v_success_rate > 70 THEN 'easy'
+        WHEN v_success_rate < 40 THEN 'hard'
+        ELSE 'medium'
+      END
+    WHERE id = NEW.question_id;
+  END IF;
+
+  INSERT INTO public.user_difficulty_stats (user_id, difficulty_level, total_attempts, correct_attempts, success_rate)
+  VALUES (
+    NEW.user_id,
+    NEW.difficulty_at_attempt,
+    1,
+    CASE WHEN NEW.is_correct THEN 1 ELSE 0 END,
+    CASE WHEN NEW.is_correct THEN 100.00 ELSE 0.00 END
+  )
+  ON CONFLICT (user_id, difficulty_level) DO UPDATE SET
+    total_attempts = user_difficulty_stats.total_attempts + 1,
+    correct_attempts = user_difficulty_stats.correct_attempts + CASE WHEN NEW.is_correct THEN 1 ELSE 0 END,
+    success_rate = ((user_difficulty_stats.correct_attempts + CASE WHEN NEW.is_correct THEN 1 ELSE 0 END)::DECIMAL /
+                    (user_difficulty_stats.total_attempts + 1)) * 100,
+    last_updated = now();
+
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
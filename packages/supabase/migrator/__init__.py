@@ -0,0 +1,5 @@
+"""
+Migration tooling for the UPSC PrepX-AI Supabase database.
+
+Run from packages/supabase:  python -m migrator --help
+"""
@@ -0,0 +1,33 @@
+"""Command-line entry point: python -m migrator <command>"""
+
+import argparse
+import sys
+
+from . import backfill, baseline, bench, drift, gamification, indexes, lint, partitions, planner, refresh, rest, rewrite, runner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m migrator", description=__doc__)
+    parser.add_argument("--dsn", help="libpq connection string (defaults to PG* env / config.DB_CONFIG)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    runner.add_arguments(subparsers)
+    rewrite.add_arguments(subparsers)
+    lint.add_arguments(subparsers)
+    planner.add_arguments(subparsers)
+    indexes.add_arguments(subparsers)
+    backfill.add_arguments(subparsers)
+    baseline.add_arguments(subparsers)
+    drift.add_arguments(subparsers)
+    rest.add_arguments(subparsers)
+    refresh.add_arguments(subparsers)
+    gamification.add_arguments(subparsers)
+    partitions.add_arguments(subparsers)
+    bench.add_arguments(subparsers)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,385 @@
+"""
+Resumable, throttled data backfills.
+
+A backfill walks a table in key order (keyset pagination, never OFFSET)
+and updates one batch per transaction, so no lock or snapshot is held for
+longer than a batch and WAL is produced at a pace replicas can follow.
+The position of the last committed batch is stored in schema_backfills in
+the same transaction as the batch, so an interrupted run resumes exactly
+where it stopped.
+
+Before every batch the runner checks replication lag (pg_stat_replication)
+and the number of active client backends and sleeps while either is above
+its limit. Batch size adapts to keep each batch near --target-seconds, and
+a batch that waits longer than lock_timeout is retried at half the size
+instead of queueing behind application traffic.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+CHECKPOINT_DDL = """
+CREATE TABLE IF NOT EXISTS public.schema_backfills (
+  name TEXT PRIMARY KEY,
+  table_name TEXT NOT NULL,
+  last_key TEXT,
+  rows_scanned BIGINT NOT NULL DEFAULT 0,
+  rows_updated BIGINT NOT NULL DEFAULT 0,
+  batches INTEGER NOT NULL DEFAULT 0,
+  status TEXT NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'done')),
+  started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  finished_at TIMESTAMPTZ
+);
+"""
+
+BATCH_SQL = """
+WITH batch AS (
+  SELECT {key} AS batch_key FROM {table}
+  {after}
+  ORDER BY {key}
+  LIMIT %(limit)s
+),
+updated AS (
+  UPDATE {table} AS t SET {set_sql}
+  FROM batch
+  WHERE t.{key} = batch.batch_key AND ({where})
+  RETURNING 1
+)
+SELECT (SELECT batch_key::text FROM batch ORDER BY batch_key DESC LIMIT 1),
+       (SELECT count(*) FROM batch),
+       (SELECT count(*) FROM updated)
+"""
+
+LAG_QUERY = """
+SELECT COALESCE(max(EXTRACT(EPOCH FROM replay_lag)), 0),
+       COALESCE(max(pg_wal_lsn_diff(pg_current_wal_lsn(), replay_lsn)), 0)
+FROM pg_stat_replication
+"""
+
+ACTIVE_QUERY = """
+SELECT count(*) FROM pg_stat_activity
+WHERE state = 'active' AND backend_type = 'client backend' AND pid <> pg_backend_pid()
+"""
+
+# lock_not_available, query_canceled (statement/lock timeout)
+RETRYABLE = {"55P03", "57014"}
+
+# Every character Python's str.isspace() accepts, spelled out: Postgres \s
+# depends on the database locale (often ASCII only) and would hash text with
+# a no-break or em space differently from the crawler. The same class is
+# WHITESPACE_CLASS in crawl4ai-vps/writer.py; the syntax is valid in both
+# Postgres AREs and Python's re.
+WHITESPACE_CLASS = (
+    r"[\u0009-\u000d\u001c-\u0020\u0085\u00a0\u1680\u2000-\u200a"
+    r"\u2028\u2029\u202f\u205f\u3000]"
+)
+
+# Same normalisation as the crawler's writer.content_hash: whitespace runs
+# collapsed to one space, trimmed, sha256 hex
+_CONTENT_HASH = (
+    "encode(sha256(convert_to(btrim(regexp_replace({col}, '" + WHITESPACE_CLASS + "+', ' ', 'g')), "
+    "'UTF8')), 'hex')"
+)
+
+
+@dataclass
+class Backfill:
+    """One keyset-paginated UPDATE"""
+    name: str
+    table: str
+    set_sql: str  # assignments, e.g. "content_hash = md5(content)"
+    where: str = "TRUE"  # rows that still need the update
+    key: str = "id"  # unique, indexed column to paginate on
+    description: str = ""
+
+
+BACKFILLS = {
+    b.name: b
+    for b in (
+        Backfill(
+            name="daily_updates_content_hash",
+            table="public.daily_updates",
+            set_sql=f"content_hash = {_CONTENT_HASH.format(col='content')}",
+            where="content_hash IS NULL",
+            description="content_hash for rows ingested before 073",
+        ),
+        Backfill(
+            name="knowledge_chunks_content_hash",
+            table="public.knowledge_chunks",
+            set_sql=f"content_hash = {_CONTENT_HASH.format(col='chunk_text')}",
+            where="content_hash IS NULL",
+            description="content_hash for chunks ingested before 073",
+        ),
+    )
+}
+
+
+@dataclass
+class Throttle:
+    max_lag_seconds: float = 5.0
+    max_lag_bytes: int = 256 * 1024 * 1024
+    max_active: int = 16
+    pause: float = 0.05  # seconds between batches
+    backoff: float = 2.0  # seconds to sleep while over a limit
+
+    def reason(self, cur):
+        """Why the next batch should wait, or None"""
+        cur.execute(LAG_QUERY)
+        lag_seconds, lag_bytes = cur.fetchone()
+        if lag_seconds > self.max_lag_seconds:
+            return f"replication lag {lag_seconds:.1f}s"
+        if lag_bytes > self.max_lag_bytes:
+            return f"replication lag {lag_bytes / 1_048_576:.0f} MiB"
+        cur.execute(ACTIVE_QUERY)
+        active = cur.fetchone()[0]
+        if active > self.max_active:
+            return f"{active} active backends"
+        return None
+
+
+class BackfillRunner:
+    def __init__(self, conn, backfill: Backfill, throttle: Optional[Throttle] = None,
+                 batch_size=1000, max_batch_size=20000, target_seconds=0.5,
+                 lock_timeout="2s", report_interval=10.0):
+        self.conn = conn
+        self.backfill = backfill
+        self.throttle = throttle or Throttle()
+        self.batch_size = batch_size
+        self.max_batch_size = max_batch_size
+        self.target_seconds = target_seconds
+        self.lock_timeout = lock_timeout
+        self.report_interval = report_interval
+
+    # -- checkpoint ---------------------------------------------------------
+
+    def _load(self, cur, reset):
+        if reset:
+            cur.execute("DELETE FROM public.schema_backfills WHERE name = %s", (self.backfill.name,))
+        cur.execute(
+            """
+            INSERT INTO public.schema_backfills (name, table_name) VALUES (%s, %s)
+            ON CONFLICT (name) DO NOTHING
+            """,
+            (self.backfill.name, self.backfill.table),
+        )
+        cur.execute(
+            """
+            SELECT last_key, rows_scanned, rows_updated, batches, status
+            FROM public.schema_backfills WHERE name = %s
+            """,
+            (self.backfill.name,),
+        )
+        return cur.fetchone()
+
+    def _save(self, cur, last_key, scanned, updated, done=False):
+        cur.execute(
+            """
+            UPDATE public.schema_backfills SET
+              last_key = COALESCE(%s, last_key),
+              rows_scanned = rows_scanned + %s,
+              rows_updated = rows_updated + %s,
+              batches = batches + 1,
+              status = CASE WHEN %s THEN 'done' ELSE 'running' END,
+              finished_at = CASE WHEN %s THEN NOW() END,
+              updated_at = NOW()
+            WHERE name = %s
+            """,
+            (last_key, scanned, updated, done, done, self.backfill.name),
+        )
+
+    # -- batches ------------------------------------------------------------
+
+    def _batch_sql(self, after):
+        b = self.backfill
+        # Fragments are SQL text; keep their % signs away from psycopg2
+        return BATCH_SQL.format(
+            key=b.key,
+            table=b.table,
+            set_sql=b.set_sql.replace("%", "%%"),
+            where=b.where.replace("%", "%%"),
+            after=f"WHERE {b.key} > %(after)s" if after is not None else "",
+        )
+
+    def _run_batch(self, after):
+        """One batch in its own transaction -> (last_key, scanned, updated)"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT set_config('lock_timeout', %s, true)", (self.lock_timeout,))
+            # The checkpoint commits with the batch, so a lost commit loses both
+            cur.execute("SET LOCAL synchronous_commit = off")
+            cur.execute(self._batch_sql(after), {"after": after, "limit": self.batch_size})
+            last_key, scanned, updated = cur.fetchone()
+            self._save(cur, last_key, scanned, updated, done=scanned == 0)
+        self.conn.commit()
+        return last_key, scanned, updated
+
+    def _estimate_rows(self):
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", (self.backfill.table,))
+            row = cur.fetchone()
+        self.conn.commit()
+        return max(row[0], 0) if row else 0
+
+    def run(self, reset=False, max_batches=None):
+        """Run (or resume) the backfill; returns a summary dict"""
+        b = self.backfill
+        with self.conn.cursor() as cur:
+            cur.execute(CHECKPOINT_DDL)
+            after, scanned_total, updated_total, batches, status = self._load(cur, reset)
+        self.conn.commit()
+        if status == "done":
+            print(f"Backfill {b.name} already complete ({updated_total} rows updated); use --reset to run again.")
+            return {"name": b.name, "status": "done", "rows_updated": updated_total}
+
+        estimate = self._estimate_rows()
+        verb = "Resuming" if after is not None else "Starting"
+        print(f"{verb} backfill {b.name} on {b.table} (~{estimate} rows)"
+              + (f" after key {after}" if after is not None else "") + "...")
+
+        started = last_report = time.perf_counter()
+        run_scanned = run_updated = window_updated = 0
+        run_batches = 0
+        finished = False
+        while max_batches is None or run_batches < max_batches:
+            with self.conn.cursor() as cur:
+                reason = self.throttle.reason(cur)
+            self.conn.commit()
+            if reason:
+                print(f"  throttled: {reason}; sleeping {self.throttle.backoff}s")
+                time.sleep(self.throttle.backoff)
+                continue
+
+            batch_started = time.perf_counter()
+            try:
+                last_key, scanned, updated = self._run_batch(after)
+            except Exception as e:
+                self.conn.rollback()
+                if getattr(e, "pgcode", None) not in RETRYABLE:
+                    raise
+                self.batch_size = max(self.batch_size // 2, 10)
+                print(f"  batch timed out waiting for a lock; retrying with {self.batch_size} rows")
+                time.sleep(self.throttle.backoff)
+                continue
+            elapsed = time.perf_counter() - batch_started
+            run_batches += 1
+
+            if scanned == 0:
+                finished = True
+                break
+            after = last_key
+            run_scanned += scanned
+            run_updated += updated
+            window_updated += updated
+
+            # Keep batches near the target duration
+            if elapsed < self.target_seconds / 2:
+                self.batch_size = min(self.batch_size * 2, self.max_batch_size)
+            elif elapsed > self.target_seconds * 1.5:
+                self.batch_size = max(self.batch_size // 2, 10)
+
+            now = time.perf_counter()
+            if now - last_report >= self.report_interval:
+                done_pct = f" {100 * (scanned_total + run_scanned) / estimate:.0f}%," if estimate else ""
+                print(f"  {b.name}:{done_pct} {updated_total + run_updated} updated / "
+                      f"{scanned_total + run_scanned} scanned, {window_updated / (now - last_report):.0f} rows/s "
+                      f"(avg {run_updated / (now - started):.0f}), batch {self.batch_size}, key {after}")
+                last_report, window_updated = now, 0
+            time.sleep(self.throttle.pause)
+
+        seconds = time.perf_counter() - started
+        rate = run_updated / seconds if seconds else 0.0
+        state = "SUCCESS" if finished else "PAUSED"
+        print(f"{state}: {b.name}: {run_updated} rows updated ({run_scanned} scanned) "
+              f"in {seconds:.1f}s, {rate:.0f} rows/s")
+        return {
+            "name": b.name,
+            "status": "done" if finished else "running",
+            "rows_scanned": run_scanned,
+            "rows_updated": run_updated,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(rate, 1),
+        }
+
+
+# -- CLI ---------------------------------------------------------------------
+
+def run_list(conn):
+    with conn.cursor() as cur:
+        cur.execute(CHECKPOINT_DDL)
+        cur.execute(
+            "SELECT name, table_name, status, rows_updated, rows_scanned, last_key, updated_at "
+            "FROM public.schema_backfills ORDER BY name"
+        )
+        checkpoints = {row[0]: row for row in cur.fetchall()}
+    conn.commit()
+    for name in sorted(set(BACKFILLS) | set(checkpoints)):
+        row = checkpoints.get(name)
+        description = BACKFILLS[name].description if name in BACKFILLS else "ad-hoc"
+        if row is None:
+            print(f"  {name:<32} not started      {description}")
+        else:
+            print(f"  {name:<32} {row[2]:<8} {row[3]} updated / {row[4]} scanned, "
+                  f"last key {row[5]}, {row[6]:%Y-%m-%d %H:%M}")
+    return 0
+
+
+def run_backfill(args):
+    from .config import connect
+
+    conn = connect(args.dsn)
+    if args.list or not args.name:
+        return run_list(conn)
+
+    if args.name in BACKFILLS:
+        backfill = BACKFILLS[args.name]
+    elif args.table and args.set:
+        backfill = Backfill(args.name, args.table, args.set, args.where or "TRUE", args.key)
+    else:
+        conn.close()
+        raise SystemExit(f"Unknown backfill {args.name!r}; pass --table and --set for an ad-hoc one")
+
+    throttle = Throttle(
+        max_lag_seconds=args.max_lag,
+        max_active=args.max_active,
+        pause=args.pause,
+    )
+    runner = BackfillRunner(
+        conn, backfill, throttle,
+        batch_size=args.batch_size,
+        max_batch_size=args.max_batch_size,
+        target_seconds=args.target_seconds,
+        lock_timeout=args.lock_timeout,
+        report_interval=args.report_interval,
+    )
+    summary = runner.run(reset=args.reset, max_batches=args.max_batches)
+
+    if args.vacuum and summary.get("rows_updated"):
+        print(f"Vacuuming {backfill.table}...")
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"VACUUM (ANALYZE) {backfill.table}")
+    conn.close()
+    return 0
+
+
+def add_arguments(subparsers):
+    backfill = subparsers.add_parser("backfill", help="Run or resume a batched, throttled data backfill")
+    backfill.add_argument("name", nargs="?", help="Registered backfill, or a name for an ad-hoc one")
+    backfill.add_argument("--list", action="store_true", help="List backfills and their checkpoints")
+    backfill.add_argument("--table", help="Ad-hoc: table to update")
+    backfill.add_argument("--set", help="Ad-hoc: SET assignments, e.g. \"col = expr\"")
+    backfill.add_argument("--where", help="Ad-hoc: condition for rows that still need the update")
+    backfill.add_argument("--key", default="id", help="Ad-hoc: unique indexed column to paginate on")
+    backfill.add_argument("--reset", action="store_true", help="Discard the checkpoint and start over")
+    backfill.add_argument("--batch-size", type=int, default=1000, help="Initial rows per batch")
+    backfill.add_argument("--max-batch-size", type=int, default=20000)
+    backfill.add_argument("--target-seconds", type=float, default=0.5, help="Batch duration to adapt towards")
+    backfill.add_argument("--max-batches", type=int, help="Stop (resumably) after this many batches")
+    backfill.add_argument("--max-lag", type=float, default=5.0, help="Pause while replica replay lag exceeds this (s)")
+    backfill.add_argument("--max-active", type=int, default=16, help="Pause while more client backends are active")
+    backfill.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between batches")
+    backfill.add_argument("--lock-timeout", default="2s", help="Per-batch lock_timeout; timed-out batches shrink and retry")
+    backfill.add_argument("--report-interval", type=float, default=10.0, help="Seconds between progress lines")
+    backfill.add_argument("--vacuum", action="store_true", help="VACUUM (ANALYZE) the table when done")
+    backfill.set_defaults(func=run_backfill)
@@ -0,0 +1,292 @@
+"""
+Schema baselines: one file that stands in for a prefix of the migrations.
+
+`squash` applies the migrations (up to --target) to a throwaway database,
+dumps the resulting public schema plus any rows the migrations seeded, and
+writes baselines/baseline_<prefix>.sql. Statements that act on the
+Supabase-managed auth and storage schemas (triggers on auth.users, storage
+policies and buckets) are copied from the migrations instead of dumped.
+The header lists every migration the baseline covers with its checksum:
+
+    -- migrator:covers supabase/migrations/00101_core_schema.sql <sha256>
+
+When `up` finds an empty database it loads the newest baseline whose
+covered files are all unchanged, in a single round trip, records the
+covered migrations in schema_migrations, and then applies only the later
+migrations. A stale baseline (any covered file edited) is ignored.
+
+The throwaway database must provide what the migrations expect from
+Supabase (auth schema, anon/authenticated roles, extensions), e.g. a
+fresh `supabase start` instance or the supabase/postgres image; pg_dump
+must match its major version.
+"""
+
+import glob
+import os
+import re
+import subprocess
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from . import ledger
+from .config import BASE_DIR
+from .sql_lexer import DOLLAR, LexError, read_name, split_statements
+
+BASELINE_DIR = os.path.join(BASE_DIR, "baselines")
+COVERS_PREFIX = "-- migrator:covers "
+
+# Migrator bookkeeping lives in public but is never part of a baseline
+LEDGER_TABLES = ("schema_migrations", "schema_migration_indexes", "schema_backfills")
+
+# Owned by Supabase, so not dumped; statements that touch them are replayed
+MANAGED_SCHEMAS = ("auth", "storage")
+
+EMPTY_QUERY = """
+SELECT count(*) FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p', 'v', 'm')
+  AND c.relname <> ALL(%s)
+"""
+
+# psql meta-commands (\restrict ...) and settings older servers reject
+_DUMP_NOISE_RE = re.compile(r"^(\\\S+.*|SET transaction_timeout = .*)$", re.MULTILINE)
+
+
+@dataclass
+class Baseline:
+    path: str
+    covers: List[Tuple[str, str]]  # (version, checksum) in apply order
+
+    @property
+    def version(self):
+        return os.path.relpath(self.path, BASE_DIR).replace(os.sep, "/")
+
+    def read(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
+def read_baseline(path):
+    covers = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(COVERS_PREFIX):
+                version, file_checksum = line[len(COVERS_PREFIX):].split()
+                covers.append((version, file_checksum))
+            elif line.strip() and not line.startswith("--"):
+                break
+    return Baseline(path, covers)
+
+
+def latest_baseline(migrations, directory=BASELINE_DIR) -> Optional[Baseline]:
+    """Newest baseline that covers an unchanged prefix of migrations"""
+    for path in sorted(glob.glob(os.path.join(directory, "baseline_*.sql")), reverse=True):
+        baseline = read_baseline(path)
+        if not baseline.covers or len(baseline.covers) > len(migrations):
+            continue
+        stale = [
+            version
+            for (version, file_checksum), migration in zip(baseline.covers, migrations)
+            if version != migration.version or file_checksum != ledger.checksum(migration.read())
+        ]
+        if stale:
+            print(f"Ignoring stale baseline {baseline.version}: {stale[0]} changed since it was squashed")
+            continue
+        return baseline
+    return None
+
+
+def database_is_empty(conn):
+    """True when public holds nothing but migrator bookkeeping"""
+    with conn.cursor() as cur:
+        cur.execute(EMPTY_QUERY, (list(LEDGER_TABLES),))
+        empty = cur.fetchone()[0] == 0
+    conn.commit()
+    return empty
+
+
+def load_baseline(conn, baseline):
+    """Load a baseline and record what it covers, in one transaction"""
+    started = time.perf_counter()
+    try:
+        with conn.cursor() as cur:
+            # One simple-query round trip for the whole file
+            cur.execute(baseline.read())
+            # pg_dump output changes session settings (search_path = '')
+            cur.execute("RESET ALL")
+            for version, file_checksum in baseline.covers:
+                ledger.record(cur, version, file_checksum, 0)
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            ledger.record(cur, baseline.version, ledger.checksum(baseline.read()), duration_ms)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"FAILED: {baseline.version}")
+        print(f"Error: {e}")
+        return None
+    return duration_ms
+
+
+# -- squash ------------------------------------------------------------------
+
+def _pg_dump(dsn, *args):
+    result = subprocess.run(
+        ["pg_dump", "--dbname", dsn, "--no-owner", *args],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"pg_dump failed: {result.stderr.strip()}")
+    return _DUMP_NOISE_RE.sub("", result.stdout)
+
+
+def _extensions(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT e.extname, n.nspname FROM pg_extension e "
+            "JOIN pg_namespace n ON n.oid = e.extnamespace "
+            "WHERE e.extname <> 'plpgsql' ORDER BY 1"
+        )
+        return cur.fetchall()
+
+
+def _seeded_tables(conn):
+    """public tables the migrations left rows in"""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p') AND c.relname <> ALL(%s) "
+            "ORDER BY 1",
+            (list(LEDGER_TABLES),),
+        )
+        tables = [row[0] for row in cur.fetchall()]
+        seeded = []
+        for table in tables:
+            cur.execute(f'SELECT EXISTS (SELECT 1 FROM public."{table}")')
+            if cur.fetchone()[0]:
+                seeded.append(table)
+    conn.commit()
+    return seeded
+
+
+def _targets_managed(stmt):
+    """True if stmt creates, changes or fills something in a managed schema"""
+    tokens = stmt.significant
+    for i, token in enumerate(tokens):
+        if token.upper in ("ON", "INTO") or (token.upper == "TABLE" and i == 1 and stmt.startswith("ALTER")):
+            name, _ = read_name(tokens, i + 1)
+            return bool(name) and name.split(".")[0] in MANAGED_SCHEMAS
+    return False
+
+
+def managed_statements(migration):
+    """Top-level statements of a migration that act on managed schemas"""
+    from .runner import preprocess
+
+    sql = preprocess(migration, migration.read())
+    out = []
+    for stmt in split_statements(sql).statements:
+        if stmt.startswith("INSERT") or stmt.startswith("CREATE") or stmt.startswith("DROP") \
+                or stmt.startswith("ALTER"):
+            if _targets_managed(stmt):
+                out.append(stmt.text)
+        elif stmt.startswith("DO") and any(_targets_managed(inner) for inner in _do_body(stmt)):
+            out.append(stmt.text)
+    return out
+
+
+def _do_body(stmt):
+    tokens = stmt.significant
+    if len(tokens) < 2 or tokens[1].kind != DOLLAR:
+        return []
+    tag = tokens[1].dollar_tag
+    try:
+        return split_statements(tokens[1].text[len(tag):-len(tag)]).statements
+    except LexError:
+        return []
+
+
+def replay(conn, migrations):
+    """
+    Apply migrations to an empty throwaway database; returns the
+    (version, checksum) pairs applied, or None on failure
+    """
+    from .runner import apply_migration
+
+    if not database_is_empty(conn):
+        raise SystemExit("Refusing to replay into a database whose public schema is not empty; "
+                         "point --scratch-dsn at a throwaway database.")
+    ledger.ensure_ledger(conn)
+
+    started = time.perf_counter()
+    print(f"Applying {len(migrations)} migration(s) to the scratch database...")
+    covers = []
+    for migration in migrations:
+        file_checksum = ledger.checksum(migration.read())
+        if apply_migration(conn, migration, file_checksum) is None:
+            print("Stopping due to error.")
+            return None
+        covers.append((migration.version, file_checksum))
+    print(f"Replayed in {time.perf_counter() - started:.1f}s.")
+    return covers
+
+
+def run_squash(args):
+    from .config import connect
+    from .runner import discover_migrations, select
+
+    migrations = select(discover_migrations(include_destructive=True), args.target)
+    conn = connect(args.scratch_dsn)
+    covers = replay(conn, migrations)
+    if covers is None:
+        conn.close()
+        return 1
+
+    extensions = _extensions(conn)
+    seeded = _seeded_tables(conn)
+    conn.close()
+    managed = [(m.version, text) for m in migrations for text in managed_statements(m)]
+
+    exclude = [f"--exclude-table=public.{table}" for table in LEDGER_TABLES]
+    schema_sql = _pg_dump(args.scratch_dsn, "--schema-only", "--schema=public", *exclude)
+    schema_sql = schema_sql.replace("CREATE SCHEMA public;", "CREATE SCHEMA IF NOT EXISTS public;")
+    data_sql = ""
+    if seeded:
+        data_sql = _pg_dump(
+            args.scratch_dsn, "--data-only", "--rows-per-insert=500",
+            *[f"--table=public.{table}" for table in seeded],
+        )
+
+    prefix = migrations[-1].filename.split("_")[0]
+    output = args.output or os.path.join(BASELINE_DIR, f"baseline_{prefix}.sql")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    lines = [
+        f"-- migrator baseline: schema and seed data after {migrations[-1].version}",
+        f"-- Generated {datetime.now().isoformat(timespec='seconds')} by python -m migrator squash; do not edit.",
+    ]
+    lines += [f"{COVERS_PREFIX}{version} {file_checksum}" for version, file_checksum in covers]
+    lines.append("")
+    for name, schema in extensions:
+        lines.append(f'CREATE SCHEMA IF NOT EXISTS "{schema}";')
+        lines.append(f'CREATE EXTENSION IF NOT EXISTS "{name}" WITH SCHEMA "{schema}";')
+    with open(output, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n\n" + schema_sql.strip() + "\n")
+        if data_sql:
+            f.write(f"\n-- Seed data ({', '.join(seeded)})\n\n" + data_sql.strip() + "\n")
+        if managed:
+            f.write(f"\n-- Objects in {'/'.join(MANAGED_SCHEMAS)} schemas, replayed from the migrations\n")
+            for version, text in managed:
+                f.write(f"\n-- {version}\n{text}\n")
+
+    print(f"SUCCESS: wrote {output}: {len(covers)} migrations, {len(extensions)} extension(s), "
+          f"{len(seeded)} seeded table(s), {len(managed)} managed-schema statement(s)")
+    return 0
+
+
+def add_arguments(subparsers):
+    squash = subparsers.add_parser("squash", help="Squash migrations into a baseline via a throwaway database")
+    squash.add_argument("--scratch-dsn", required=True, help="Empty throwaway database to replay migrations into")
+    squash.add_argument("--target", help="Squash up to the migration whose filename starts with this prefix")
+    squash.add_argument("--output", help="Baseline path (default: baselines/baseline_<prefix>.sql)")
+    squash.set_defaults(func=run_squash)
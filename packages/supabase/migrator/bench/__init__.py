@@ -0,0 +1,22 @@
+"""
+Load tests and benchmarks against a disposable Postgres with the
+migrations applied:
+
+    python -m migrator --dsn postgresql://postgres@localhost/bench bench <scenario>
+
+Scenarios insert synthetic rows (tagged so they can be found again) and
+remove them afterwards, but they also claim, update and lock whatever else
+is in the tables they exercise, so --dsn is required: the default
+DB_CONFIG points at the shared server and is never benchmarked.
+"""
+
+from . import analytics, gamification, partitions, quantization, queue, reviews, rls, search
+
+SCENARIOS = (queue, analytics, rls, search, quantization, partitions, reviews, gamification)
+
+
+def add_arguments(subparsers):
+    bench = subparsers.add_parser("bench", help="Load-test the schema on a disposable database")
+    scenarios = bench.add_subparsers(dest="scenario", required=True)
+    for module in SCENARIOS:
+        module.add_arguments(scenarios)
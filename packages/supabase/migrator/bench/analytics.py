@@ -0,0 +1,210 @@
+"""
+Benchmark for the question bank analytics (migrations 043 and 076).
+
+For each size in --attempts one synthetic user is given that many
+question_attempts, spread over --history-days and over --subjects bench
+generated_questions, then measured for:
+
+- get_complete_analytics(user, --days) latency
+- single-attempt INSERT latency, which now includes the rollup triggers
+- whether the rollup totals match a raw count over the same window
+
+--legacy also times the raw scans the 043 functions ran per call (the
+overall, subject, time, streak, PYQ and trend passes over
+question_attempts, each as often as get_complete_analytics reached it).
+
+Bench users and questions have fixed ids, so a run that was interrupted is
+cleaned up by the next one.
+"""
+
+import time
+import uuid
+
+from .common import connect_bench, latency_summary, print_report, timed
+
+APPLICATION = "migrator-bench-analytics"
+NAMESPACE = uuid.UUID("5d0c4a8e-2f6b-4e61-9a57-1f3b8c0d7e42")
+AUTHOR = uuid.uuid5(NAMESPACE, "author")
+QUESTIONS_PER_SUBJECT = 50
+
+QUESTIONS_SQL = """
+INSERT INTO public.generated_questions (user_id, topic, question_text, question_type, difficulty, model_answer)
+SELECT %(author)s, 'Bench subject ' || (g %% %(subjects)s), 'bench question ' || g, 'mcq',
+       (ARRAY['easy', 'medium', 'hard'])[1 + g %% 3], 'bench'
+FROM generate_series(1, %(count)s) AS g
+RETURNING id
+"""
+
+ATTEMPTS_SQL = """
+INSERT INTO public.question_attempts
+  (user_id, question_id, question_source, selected_option, is_correct, time_taken_seconds,
+   difficulty_at_attempt, created_at)
+SELECT %(user)s,
+       CASE WHEN g %% 5 = 0 THEN gen_random_uuid() ELSE (%(questions)s::uuid[])[1 + g %% %(question_count)s] END,
+       CASE WHEN g %% 5 = 0 THEN 'pyq' ELSE 'generated' END,
+       'A',
+       random() < 0.6,
+       CASE WHEN g %% 10 = 0 THEN NULL ELSE 20 + (random() * 200)::int END,
+       (ARRAY['easy', 'medium', 'hard'])[1 + g %% 3],
+       NOW() - random() * %(history_days)s * INTERVAL '1 day'
+FROM generate_series(1, %(count)s) AS g
+"""
+
+INSERT_ONE_SQL = """
+INSERT INTO public.question_attempts
+  (user_id, question_id, question_source, selected_option, is_correct, time_taken_seconds, difficulty_at_attempt)
+VALUES (%s, %s, 'generated', 'A', true, 90, 'medium')
+RETURNING id
+"""
+
+RAW_TOTAL_SQL = """
+SELECT count(*) FROM public.question_attempts
+WHERE user_id = %(user)s AND created_at >= NOW() - (%(days)s || ' days')::INTERVAL
+"""
+
+_TOPIC_SQL = """
+SELECT COALESCE(gq.topic, pq.subject, 'Unknown') AS topic, COUNT(*), COUNT(*) FILTER (WHERE qa.is_correct),
+       AVG(qa.time_taken_seconds), MAX(qa.created_at)
+FROM public.question_attempts qa
+LEFT JOIN public.generated_questions gq ON qa.question_id = gq.id AND qa.question_source = 'generated'
+LEFT JOIN public.pyq_questions pq ON qa.question_id = pq.id AND qa.question_source = 'pyq'
+WHERE qa.user_id = %(user)s AND qa.created_at >= NOW() - (%(days)s || ' days')::INTERVAL
+GROUP BY 1
+"""
+
+# (query, times get_complete_analytics ran it) for the 043 functions
+LEGACY_QUERIES = [
+    ("""SELECT COUNT(*), COUNT(*) FILTER (WHERE is_correct), AVG(time_taken_seconds)
+        FROM public.question_attempts
+        WHERE user_id = %(user)s AND created_at >= NOW() - (%(days)s || ' days')::INTERVAL""", 3),
+    (_TOPIC_SQL, 5),
+    ("""SELECT difficulty_at_attempt, AVG(time_taken_seconds) FROM public.question_attempts
+        WHERE user_id = %(user)s AND created_at >= NOW() - (%(days)s || ' days')::INTERVAL
+        GROUP BY 1""", 2),
+    ("""SELECT COUNT(DISTINCT DATE(created_at)) FROM public.question_attempts
+        WHERE user_id = %(user)s AND created_at >= NOW() - INTERVAL '30 days'""", 1),
+    ("""SELECT COUNT(DISTINCT DATE(created_at)) FROM public.question_attempts
+        WHERE user_id = %(user)s AND created_at >= NOW() - INTERVAL '7 days'""", 1),
+    ("""SELECT COUNT(DISTINCT question_id) FROM public.question_attempts
+        WHERE user_id = %(user)s AND question_source = 'pyq'""", 2),
+    ("""SELECT DATE(created_at), COUNT(*), COUNT(*) FILTER (WHERE is_correct) FROM public.question_attempts
+        WHERE user_id = %(user)s AND created_at >= NOW() - (%(days)s || ' days')::INTERVAL
+        GROUP BY 1""", 1),
+]
+
+COLUMNS = [
+    ("attempts", "attempts"), ("rollup rows", "rollup_rows"), ("seed s", "seed_seconds"),
+    ("analytics p50", "analytics_p50_ms"), ("analytics p95", "analytics_p95_ms"),
+    ("raw p50", "raw_p50_ms"), ("insert p50", "insert_p50_ms"), ("exact", "exact"),
+]
+
+
+def _user(size):
+    return str(uuid.uuid5(NAMESPACE, f"user-{size}"))
+
+
+def _cleanup(conn, sizes):
+    users = [_user(size) for size in sizes]
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM public.question_attempts WHERE user_id = ANY(%s::uuid[])", (users,))
+        cur.execute("DELETE FROM public.question_attempt_daily WHERE user_id = ANY(%s::uuid[])", (users,))
+        cur.execute("DELETE FROM public.user_pyq_attempts WHERE user_id = ANY(%s::uuid[])", (users,))
+        cur.execute("DELETE FROM public.user_difficulty_stats WHERE user_id = ANY(%s::uuid[])", (users,))
+        cur.execute("DELETE FROM public.generated_questions WHERE user_id = %s", (str(AUTHOR),))
+    conn.commit()
+
+
+def _questions(conn, subjects):
+    with conn.cursor() as cur:
+        cur.execute(QUESTIONS_SQL, {
+            "author": str(AUTHOR), "subjects": subjects, "count": subjects * QUESTIONS_PER_SUBJECT,
+        })
+        ids = [str(row[0]) for row in cur.fetchall()]
+    conn.commit()
+    return ids
+
+
+def _query(conn, sql, params):
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+    conn.commit()
+    return rows
+
+
+def run_size(args, conn, size, questions):
+    user = _user(size)
+    params = {"user": user, "days": args.days}
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(ATTEMPTS_SQL, {
+            "user": user, "questions": questions, "question_count": len(questions),
+            "history_days": args.history_days, "count": size,
+        })
+        cur.execute("ANALYZE public.question_attempts")
+        cur.execute("ANALYZE public.question_attempt_daily")
+    conn.commit()
+    seed_seconds = time.perf_counter() - started
+
+    rollup_rows = _query(conn, "SELECT count(*) FROM public.question_attempt_daily WHERE user_id = %s", (user,))[0][0]
+    analytics = timed(lambda: _query(conn, "SELECT * FROM get_complete_analytics(%(user)s, %(days)s)", params),
+                      args.samples)
+    overall = _query(conn, "SELECT overall_stats FROM get_complete_analytics(%(user)s, %(days)s)", params)[0][0]
+    raw_total = _query(conn, RAW_TOTAL_SQL, params)[0][0]
+
+    raw = None
+    if args.legacy:
+        def legacy():
+            for sql, calls in LEGACY_QUERIES:
+                for _ in range(calls):
+                    _query(conn, sql, params)
+        raw = latency_summary(timed(legacy, args.samples))
+
+    insert = timed(lambda: _query(conn, INSERT_ONE_SQL, (user, questions[0])), args.samples)
+
+    return {
+        "attempts": size,
+        "days": args.days,
+        "rollup_rows": rollup_rows,
+        "seed_seconds": round(seed_seconds, 1),
+        "analytics_p50_ms": latency_summary(analytics)["p50_ms"],
+        "analytics_p95_ms": latency_summary(analytics)["p95_ms"],
+        "raw_p50_ms": raw["p50_ms"] if raw else "",
+        "raw_p95_ms": raw["p95_ms"] if raw else "",
+        "insert_p50_ms": latency_summary(insert)["p50_ms"],
+        "insert_p95_ms": latency_summary(insert)["p95_ms"],
+        "window_attempts": raw_total,
+        "exact": "yes" if overall.get("total_attempts") == raw_total else f"no ({overall.get('total_attempts')})",
+    }
+
+
+def run_analytics(args):
+    conn = connect_bench(args, APPLICATION)
+    sizes = [int(size) for size in args.attempts.split(",")]
+    results = []
+    try:
+        _cleanup(conn, sizes)
+        questions = _questions(conn, args.subjects)
+        for size in sizes:
+            print(f"User with {size} attempts: seeding, timing get_complete_analytics "
+                  f"({args.days} days){' and the raw scans' if args.legacy else ''}...", flush=True)
+            results.append(run_size(args, conn, size, questions))
+    finally:
+        if not args.keep:
+            _cleanup(conn, sizes)
+        conn.close()
+    print_report(results, args.format, COLUMNS)
+    return 0
+
+
+def add_arguments(subparsers):
+    analytics = subparsers.add_parser("analytics", help="get_complete_analytics latency on rollups vs raw scans")
+    analytics.add_argument("--attempts", default="1000,50000,200000", help="Comma-separated attempts per user")
+    analytics.add_argument("--subjects", type=int, default=20, help="Distinct subjects the attempts spread over")
+    analytics.add_argument("--history-days", type=int, default=365, help="Days the attempts spread over")
+    analytics.add_argument("--days", type=int, default=30, help="Analytics window (p_days)")
+    analytics.add_argument("--samples", type=int, default=20, help="Calls to time per user")
+    analytics.add_argument("--legacy", action="store_true", help="Also time the raw scans of the 043 functions")
+    analytics.add_argument("--keep", action="store_true", help="Leave the bench rows in the tables")
+    analytics.add_argument("--format", choices=("text", "json"), default="text")
+    analytics.set_defaults(func=run_analytics)
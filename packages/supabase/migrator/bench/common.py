@@ -0,0 +1,93 @@
+"""Helpers shared by the bench scenarios"""
+
+import json
+import sys
+import threading
+import time
+
+LOCK_WAIT_QUERY = """
+SELECT count(*) FROM pg_stat_activity
+WHERE application_name = %s AND wait_event_type = 'Lock'
+"""
+
+
+def connect_bench(args, application_name):
+    """Connection to the --dsn database, tagged so its backends can be sampled"""
+    from ..config import connect
+
+    if not args.dsn:
+        raise SystemExit("bench needs an explicit --dsn pointing at a disposable database")
+    conn = connect(args.dsn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT set_config('application_name', %s, false)", (application_name,))
+    conn.commit()
+    return conn
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_summary(seconds):
+    """{p50, p95, p99, max} in ms for a list of durations in seconds"""
+    return {
+        "p50_ms": round(percentile(seconds, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(seconds, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(seconds, 0.99) * 1000, 2),
+        "max_ms": round(max(seconds, default=0.0) * 1000, 2),
+    }
+
+
+def timed(fn, samples):
+    """Durations of samples calls of fn()"""
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+class LockWaitSampler(threading.Thread):
+    """Counts backends of one application_name waiting on heavyweight locks"""
+
+    def __init__(self, conn, application_name, interval=0.01):
+        super().__init__(daemon=True)
+        self.conn = conn
+        self.application_name = application_name
+        self.interval = interval
+        self.samples = 0
+        self.waiting_samples = 0
+        self.wait_seconds = 0.0  # backend-seconds spent waiting, estimated
+        self._stopped = threading.Event()
+
+    def run(self):
+        self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            while not self._stopped.wait(self.interval):
+                cur.execute(LOCK_WAIT_QUERY, (self.application_name,))
+                waiting = cur.fetchone()[0]
+                self.samples += 1
+                if waiting:
+                    self.waiting_samples += 1
+                    self.wait_seconds += waiting * self.interval
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.conn.close()
+
+
+def print_report(results, fmt, columns):
+    """results: list of dicts; columns: [(header, key)] for the text table"""
+    if fmt == "json":
+        json.dump(results, sys.stdout, indent=1)
+        print()
+        return
+    widths = [max(len(header), *(len(str(r.get(key, ""))) for r in results)) for header, key in columns]
+    print("  ".join(header.rjust(width) for (header, _), width in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result.get(key, "")).rjust(width) for (_, key), width in zip(columns, widths)))
@@ -0,0 +1,236 @@
+"""
+Benchmark for the gamification event pipeline (migrations 065 and 083).
+
+For each size in --history, --users bench users are given that many days
+of daily_activity, then each user records a --session-event study session
+(videos, quizzes, doubts, notes, study time) through award_xp and
+update_user_streak. Reported per size:
+
+- enqueue p50/p99 per event: the producer call and its commit, which is
+  all the request path now pays
+- batch ms per event: process_xp_events draining the whole session log in
+  --batch sized transactions, badge rewards included
+- legacy p50 per event: the 065 per-event path replayed as plain SQL (its
+  ledger, total, level and counter statements plus the full-history badge
+  scans check_and_award_badges ran), one transaction per event
+- refresh_xp_leaderboards time and a weekly top-50 read p50
+- whether user_xp.total_xp matches the xp_transactions sum for every bench
+  user once the log is drained
+
+Draining also applies any other pending events; run it on a database
+nobody else is writing to. Bench users have fixed ids, so a run that was
+interrupted is cleaned up by the next one.
+"""
+
+import uuid
+
+from .common import connect_bench, latency_summary, print_report, timed
+
+APPLICATION = "migrator-bench-gamification"
+NAMESPACE = uuid.UUID("8a3d6f15-4c2e-4b97-b0d8-7e1f9a5c2d63")
+
+# (activity_type, XP) cycled through a session, as the web route awards them
+ACTIVITIES = (
+    ("video_watched", 10), ("quiz_completed", 20), ("doubt_asked", 5), ("notes_generated", 15),
+)
+STUDY_MINUTES = 15
+
+TABLES = (
+    "xp_events", "xp_transactions", "user_xp", "daily_activity", "monthly_stats",
+    "user_activity_totals", "user_streaks", "user_badges", "user_milestones",
+)
+
+HISTORY_SQL = """
+INSERT INTO public.daily_activity
+  (user_id, activity_date, xp_earned, study_minutes, videos_watched, quizzes_completed, doubts_asked, notes_generated)
+SELECT u.user_id, CURRENT_DATE - g, (random() * 200)::int, (random() * 60)::int,
+       (random() * 3)::int, (random() * 3)::int, (random() * 2)::int, (random() * 2)::int
+FROM unnest(%(users)s::uuid[]) AS u(user_id)
+CROSS JOIN generate_series(1, %(days)s) AS g
+"""
+
+# The statements 065's award_xp ran for every event
+LEGACY_EVENT_SQL = """
+INSERT INTO public.xp_transactions (user_id, amount, activity_type) VALUES (%(user)s, %(amount)s, %(type)s);
+INSERT INTO public.user_xp (user_id, total_xp, lifetime_xp) VALUES (%(user)s, %(amount)s, %(amount)s)
+ON CONFLICT (user_id) DO UPDATE SET
+  total_xp = user_xp.total_xp + EXCLUDED.total_xp,
+  lifetime_xp = user_xp.lifetime_xp + EXCLUDED.lifetime_xp,
+  updated_at = now();
+UPDATE public.user_xp SET current_level = GREATEST(current_level, COALESCE((
+  SELECT max(level) FROM public.level_definitions WHERE xp_required <= user_xp.total_xp), 1))
+WHERE user_id = %(user)s;
+INSERT INTO public.daily_activity (user_id, activity_date, xp_earned) VALUES (%(user)s, CURRENT_DATE, %(amount)s)
+ON CONFLICT (user_id, activity_date) DO UPDATE SET
+  xp_earned = daily_activity.xp_earned + EXCLUDED.xp_earned, updated_at = now();
+INSERT INTO public.monthly_stats (user_id, month_year, total_xp)
+VALUES (%(user)s, to_char(CURRENT_DATE, 'YYYY-MM'), %(amount)s)
+ON CONFLICT (user_id, month_year) DO UPDATE SET
+  total_xp = monthly_stats.total_xp + EXCLUDED.total_xp, updated_at = now();
+"""
+
+# The reads check_and_award_badges made for the unearned badges, whole
+# history each time (the count rules once per badge in 065; once here)
+LEGACY_BADGES_SQL = """
+SELECT
+  (SELECT COUNT(*) FROM public.user_room_progress WHERE user_id = %(user)s AND visited = true),
+  (SELECT COUNT(DISTINCT room_id) FROM public.user_room_progress WHERE user_id = %(user)s AND visited = true),
+  (SELECT current_streak FROM public.user_streaks WHERE user_id = %(user)s),
+  (SELECT quizzes_perfect FROM public.monthly_stats WHERE user_id = %(user)s ORDER BY month_year DESC LIMIT 1),
+  (SELECT SUM(notes_generated) FROM public.daily_activity WHERE user_id = %(user)s),
+  (SELECT SUM(doubts_asked) FROM public.daily_activity WHERE user_id = %(user)s),
+  (SELECT SUM(videos_watched) FROM public.daily_activity WHERE user_id = %(user)s),
+  (SELECT current_level FROM public.user_xp WHERE user_id = %(user)s)
+"""
+
+TOTALS_SQL = """
+SELECT COUNT(*) FROM public.user_xp ux
+WHERE ux.user_id = ANY(%(users)s::uuid[])
+  AND ux.total_xp IS DISTINCT FROM (
+    SELECT COALESCE(SUM(t.amount), 0) FROM public.xp_transactions t WHERE t.user_id = ux.user_id
+  )
+"""
+
+BOARD_SQL = "SELECT user_id, xp, rank FROM public.xp_leaderboards WHERE board = 'weekly' ORDER BY rank LIMIT 50"
+
+COLUMNS = [
+    ("history days", "days"), ("events", "events"),
+    ("enqueue p50", "enqueue_p50_ms"), ("enqueue p99", "enqueue_p99_ms"),
+    ("batch per event", "batch_ms_per_event"), ("legacy p50", "legacy_p50_ms"), ("speedup", "speedup"),
+    ("board refresh", "refresh_ms"), ("board read p50", "board_p50_ms"), ("totals match", "totals"),
+]
+
+
+def _users(days, count):
+    return [str(uuid.uuid5(NAMESPACE, f"user-{days}-{n}")) for n in range(count)]
+
+
+def _cleanup(conn, users):
+    with conn.cursor() as cur:
+        for table in TABLES:
+            cur.execute(f"DELETE FROM public.{table} WHERE user_id = ANY(%s::uuid[])", (users,))
+    conn.commit()
+
+
+def _execute(conn, sql, params):
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+    conn.commit()
+
+
+def _session(count):
+    """[(activity_type, amount)] for a session of count events"""
+    events = []
+    for n in range(count):
+        if n % 5 == 4:
+            events.append(("study_session", 0))
+        else:
+            events.append(ACTIVITIES[n % len(ACTIVITIES)])
+    return events
+
+
+def _enqueue(conn, user, activity_type, amount):
+    if activity_type == "study_session":
+        _execute(conn, "SELECT update_user_streak(%s, %s)", (user, STUDY_MINUTES))
+    else:
+        _execute(conn, "SELECT award_xp(%s, %s, %s)", (user, amount, activity_type))
+
+
+def _legacy(conn, user, activity_type, amount):
+    with conn.cursor() as cur:
+        if activity_type != "study_session":
+            cur.execute(LEGACY_EVENT_SQL, {"user": user, "amount": amount, "type": activity_type})
+        cur.execute(LEGACY_BADGES_SQL, {"user": user})
+        cur.fetchone()
+    conn.commit()
+
+
+def _drain(conn, batch):
+    """Apply process_xp_events batches until the log is empty; returns the events applied"""
+    applied = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute("SELECT process_xp_events(%s)", (batch,))
+            claimed = cur.fetchone()[0]
+        conn.commit()
+        applied += claimed
+        if not claimed:
+            return applied
+
+
+def run_size(args, conn, days):
+    users = _users(days, args.users)
+    _cleanup(conn, users)
+    _execute(conn, HISTORY_SQL, {"users": users, "days": days})
+    session = _session(args.session)
+
+    enqueue = []
+    for user in users:
+        for activity_type, amount in session:
+            enqueue.extend(timed(lambda: _enqueue(conn, user, activity_type, amount), 1))
+    drained = timed(lambda: _drain(conn, args.batch), 1)[0]
+    with conn.cursor() as cur:
+        cur.execute(TOTALS_SQL, {"users": users})
+        mismatched = cur.fetchone()[0]
+    conn.commit()
+
+    legacy = []
+    for user in users[:args.legacy_users]:
+        for activity_type, amount in session:
+            legacy.extend(timed(lambda: _legacy(conn, user, activity_type, amount), 1))
+
+    refresh = timed(lambda: _execute(conn, "SELECT refresh_xp_leaderboards()", None), 1)
+    board = timed(lambda: _execute(conn, BOARD_SQL, None), args.samples)
+
+    events = len(users) * len(session)
+    batch_per_event = round(drained * 1000 / events, 3) if events else 0
+    legacy_p50 = latency_summary(legacy)["p50_ms"]
+    return {
+        "days": days,
+        "events": events,
+        "enqueue_p50_ms": latency_summary(enqueue)["p50_ms"],
+        "enqueue_p99_ms": latency_summary(enqueue)["p99_ms"],
+        "batch_ms_per_event": batch_per_event,
+        "legacy_p50_ms": legacy_p50 if legacy else "",
+        "speedup": f"{legacy_p50 / batch_per_event:.1f}x" if legacy and batch_per_event else "",
+        "refresh_ms": latency_summary(refresh)["p50_ms"],
+        "board_p50_ms": latency_summary(board)["p50_ms"],
+        "totals": "yes" if not mismatched else f"NO ({mismatched} users)",
+    }
+
+
+def run_gamification(args):
+    conn = connect_bench(args, APPLICATION)
+    sizes = [int(size) for size in args.history.split(",")]
+    users = [user for size in sizes for user in _users(size, args.users)]
+    results = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regprocedure('public.process_xp_events(integer)') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                raise SystemExit("bench gamification needs migration 083 (process_xp_events)")
+        conn.commit()
+        for size in sizes:
+            print(f"{args.users} users with {size} days of history: timing {args.session}-event sessions "
+                  f"queued and per event...", flush=True)
+            results.append(run_size(args, conn, size))
+    finally:
+        if not args.keep:
+            _cleanup(conn, users)
+        conn.close()
+    print_report(results, args.format, COLUMNS)
+    return 0
+
+
+def add_arguments(subparsers):
+    gamification = subparsers.add_parser(
+        "gamification", help="XP events queued and batched vs the per-event path, and leaderboard refresh")
+    gamification.add_argument("--history", default="30,365,1095", help="Comma-separated days of activity per user")
+    gamification.add_argument("--users", type=int, default=50, help="Users recording a session per size")
+    gamification.add_argument("--session", type=int, default=40, help="Events per study session")
+    gamification.add_argument("--batch", type=int, default=1000, help="Events per process_xp_events call")
+    gamification.add_argument("--legacy-users", type=int, default=5, help="Sessions to replay on the per-event path")
+    gamification.add_argument("--samples", type=int, default=50, help="Leaderboard reads to time")
+    gamification.add_argument("--keep", action="store_true", help="Leave the bench rows in place")
+    gamification.add_argument("--format", choices=("text", "json"), default="text")
+    gamification.set_defaults(func=run_gamification)
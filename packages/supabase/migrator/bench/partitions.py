@@ -0,0 +1,228 @@
+"""
+Benchmark for monthly range partitioning (migration 081, partitions).
+
+Two bench tables get the same --rows rows spread over the last --months
+months: one plain, one partitioned by month through
+create_monthly_partitions(). Both have the (user_id, created_at DESC) and
+created_at indexes the append-only tables have. For each query the report
+gives p50/p99 on both tables and, from EXPLAIN ANALYZE, how many of the
+partitions the partitioned one actually scanned:
+
+- count(*) over the last 7 days
+- one user's newest 20 rows from the last 30 days
+- a sum over one whole calendar month (bounds known at plan time)
+- VACUUM after deleting --churn of the current month's rows: the whole
+  plain table against the current partition only
+
+A query that scans more partitions than its window covers is flagged as
+NOT PRUNED.
+"""
+
+import json
+import uuid
+
+from .common import connect_bench, latency_summary, print_report, timed
+
+APPLICATION = "migrator-bench-partitions"
+NAMESPACE = uuid.UUID("c4f1d7a2-9b3e-4e85-8d60-2a7f5e1b3c94")
+PLAIN = "public.bench_partition_plain"
+MONTHLY = "public.bench_partition_monthly"
+
+COLUMNS_SQL = """
+  id UUID NOT NULL DEFAULT gen_random_uuid(),
+  user_id UUID NOT NULL,
+  amount INTEGER NOT NULL,
+  payload TEXT,
+  created_at TIMESTAMPTZ NOT NULL
+"""
+
+SETUP_SQL = f"""
+DROP TABLE IF EXISTS {PLAIN}, {MONTHLY};
+CREATE TABLE {PLAIN} ({COLUMNS_SQL}, PRIMARY KEY (id));
+CREATE TABLE {MONTHLY} ({COLUMNS_SQL}, PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at);
+CREATE INDEX idx_bench_partition_plain_user ON {PLAIN} (user_id, created_at DESC);
+CREATE INDEX idx_bench_partition_plain_created ON {PLAIN} (created_at);
+CREATE INDEX idx_bench_partition_monthly_user ON {MONTHLY} (user_id, created_at DESC);
+CREATE INDEX idx_bench_partition_monthly_created ON {MONTHLY} (created_at);
+"""
+
+PARTITIONS_SQL = f"""
+SELECT create_monthly_partitions(
+  '{MONTHLY}'::regclass,
+  (date_trunc('month', NOW() AT TIME ZONE 'UTC') - make_interval(months => %(months)s))::date,
+  (date_trunc('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '2 months')::date
+)
+"""
+
+ROWS_SQL = f"""
+INSERT INTO {PLAIN} (user_id, amount, payload, created_at)
+SELECT (%(users)s::uuid[])[1 + g %% %(user_count)s], (random() * 10000)::int, repeat('x', 80),
+       NOW() - random() * make_interval(days => %(months)s * 30)
+FROM generate_series(1, %(count)s) AS g;
+INSERT INTO {MONTHLY} SELECT * FROM {PLAIN};
+ANALYZE {PLAIN};
+ANALYZE {MONTHLY};
+"""
+
+CHURN_SQL = """
+WITH doomed AS (
+  SELECT id FROM {plain}
+  WHERE created_at >= date_trunc('month', NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+    AND random() < %(churn)s
+)
+, gone AS (DELETE FROM {plain} p USING doomed WHERE p.id = doomed.id RETURNING p.id)
+DELETE FROM {monthly} m USING gone WHERE m.id = gone.id
+  AND m.created_at >= date_trunc('month', NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+""".format(plain=PLAIN, monthly=MONTHLY)
+
+CURRENT_PARTITION_SQL = f"""
+SELECT partition_name FROM time_partitions('{MONTHLY}'::regclass)
+WHERE lower_bound <= NOW() AND upper_bound > NOW()
+"""
+
+# (name, sql with {table}, partitions the window can touch)
+QUERIES = [
+    ("last 7 days count", "SELECT count(*) FROM {table} WHERE created_at >= NOW() - INTERVAL '7 days'", 2),
+    ("user last 30 days",
+     "SELECT * FROM {table} WHERE user_id = %(user)s AND created_at >= NOW() - INTERVAL '30 days' "
+     "ORDER BY created_at DESC LIMIT 20", 2),
+    ("one month sum",
+     "SELECT sum(amount) FROM {table} WHERE created_at >= %(month)s::timestamptz "
+     "AND created_at < %(month)s::timestamptz + INTERVAL '1 month'", 1),
+]
+
+COLUMNS = [
+    ("rows", "rows"), ("query", "query"),
+    ("plain p50", "plain_p50_ms"), ("plain p99", "plain_p99_ms"),
+    ("partitioned p50", "partitioned_p50_ms"), ("partitioned p99", "partitioned_p99_ms"),
+    ("partitions scanned", "scanned"),
+]
+
+
+def _users(count):
+    return [str(uuid.uuid5(NAMESPACE, f"user-{n}")) for n in range(count)]
+
+
+def _cleanup(conn):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {PLAIN}, {MONTHLY}")
+    conn.commit()
+
+
+def _run(conn, sql, params):
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+    conn.commit()
+    return rows
+
+
+def _scanned(conn, sql, params):
+    """Partitions of MONTHLY that EXPLAIN ANALYZE shows were executed"""
+    plan = _run(conn, "EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)[0][0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    prefix = MONTHLY.split(".", 1)[1] + "_p"
+    seen = set()
+
+    def walk(node):
+        if node.get("Relation Name", "").startswith(prefix) and node.get("Actual Loops", 0) > 0:
+            seen.add(node["Relation Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return len(seen)
+
+
+def _vacuum_seconds(conn, table, samples):
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            return timed(lambda: cur.execute(f"VACUUM {table}"), samples)
+    finally:
+        conn.autocommit = False
+
+
+def run_size(args, conn, size, users):
+    with conn.cursor() as cur:
+        cur.execute(f"TRUNCATE {PLAIN}, {MONTHLY}")
+        cur.execute(ROWS_SQL, {"users": users, "user_count": len(users), "count": size, "months": args.months})
+        cur.execute(f"SELECT count(*) FROM time_partitions('{MONTHLY}'::regclass)")
+        partitions = cur.fetchone()[0]
+        cur.execute("SELECT to_char(date_trunc('month', NOW() AT TIME ZONE 'UTC') - INTERVAL '2 months', "
+                    "'YYYY-MM-DD') || ' 00:00:00+00'")
+        month = cur.fetchone()[0]
+    conn.commit()
+    params = {"user": users[0], "month": month}
+
+    results = []
+    for name, sql, expected in QUERIES:
+        plain = timed(lambda: _run(conn, sql.format(table=PLAIN), params), args.samples)
+        monthly_sql = sql.format(table=MONTHLY)
+        monthly = timed(lambda: _run(conn, monthly_sql, params), args.samples)
+        scanned = _scanned(conn, monthly_sql, params)
+        results.append({
+            "rows": size,
+            "query": name,
+            "plain_p50_ms": latency_summary(plain)["p50_ms"],
+            "plain_p99_ms": latency_summary(plain)["p99_ms"],
+            "partitioned_p50_ms": latency_summary(monthly)["p50_ms"],
+            "partitioned_p99_ms": latency_summary(monthly)["p99_ms"],
+            "scanned": f"{scanned}/{partitions}" + (" NOT PRUNED" if scanned > expected else ""),
+        })
+
+    with conn.cursor() as cur:
+        cur.execute(CHURN_SQL, {"churn": args.churn})
+        cur.execute(CURRENT_PARTITION_SQL)
+        current = cur.fetchone()[0]
+    conn.commit()
+    plain = _vacuum_seconds(conn, PLAIN, 1)
+    monthly = _vacuum_seconds(conn, current, 1)
+    results.append({
+        "rows": size,
+        "query": f"vacuum after {args.churn:.0%} churn",
+        "plain_p50_ms": latency_summary(plain)["p50_ms"],
+        "plain_p99_ms": "",
+        "partitioned_p50_ms": latency_summary(monthly)["p50_ms"],
+        "partitioned_p99_ms": "",
+        "scanned": f"1/{partitions}",
+    })
+    return results
+
+
+def run_partitions(args):
+    conn = connect_bench(args, APPLICATION)
+    sizes = [int(size) for size in args.rows.split(",")]
+    users = _users(args.users)
+    results = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regprocedure('public.create_monthly_partitions(regclass, date, date)') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                raise SystemExit("bench partitions needs migration 081 (create_monthly_partitions)")
+            cur.execute(SETUP_SQL)
+            cur.execute(PARTITIONS_SQL, {"months": args.months})
+        conn.commit()
+        for size in sizes:
+            print(f"{size} rows over {args.months} months: timing plain and partitioned...", flush=True)
+            results.extend(run_size(args, conn, size, users))
+    finally:
+        if not args.keep:
+            _cleanup(conn)
+        conn.close()
+    print_report(results, args.format, COLUMNS)
+    return 0
+
+
+def add_arguments(subparsers):
+    partitions = subparsers.add_parser(
+        "partitions", help="Recent-window queries and VACUUM on a plain vs a monthly partitioned table")
+    partitions.add_argument("--rows", default="100000,1000000,10000000", help="Comma-separated bench table sizes")
+    partitions.add_argument("--months", type=int, default=24, help="History the rows are spread over")
+    partitions.add_argument("--users", type=int, default=1000, help="Users the rows are spread over")
+    partitions.add_argument("--churn", type=float, default=0.05, help="Share of the current month deleted before VACUUM")
+    partitions.add_argument("--samples", type=int, default=20, help="Runs to time per query and table")
+    partitions.add_argument("--keep", action="store_true", help="Leave the bench tables in place")
+    partitions.add_argument("--format", choices=("text", "json"), default="text")
+    partitions.set_defaults(func=run_partitions)
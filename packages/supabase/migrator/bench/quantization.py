@@ -0,0 +1,129 @@
+"""
+Benchmark for quantized knowledge chunk search (migration 080).
+
+Uses the synthetic chunks and queries of bench search (same options, same
+seeding) and, at each size in --chunks, runs
+match_knowledge_chunks_quantized in each of --modes:
+
+- vector:  the float32 HNSW index, no re-ranking
+- halfvec: half precision HNSW index, re-ranked on the full vectors
+- binary:  Hamming distance HNSW index, re-ranked on the full vectors
+
+For halfvec and binary every --rerank factor is tried (candidates =
+factor x k). Each row gives recall@k against an exact scan, p50/p99
+latency, and the size of the mode's index with how much of it sits in
+shared_buffers (when pg_buffercache is installed). Index sizes cover the
+whole table, not just the bench chunks.
+"""
+
+from .common import connect_bench, latency_summary, print_report, timed
+from .search import add_data_arguments, cleanup, exact_ids, fetch_ids, prepare, seed_chunks
+
+APPLICATION = "migrator-bench-quantization"
+MODES = ("vector", "halfvec", "binary")
+
+SEARCH_SQL = """
+SELECT id FROM match_knowledge_chunks_quantized(
+  (SELECT embedding FROM bench_search_queries WHERE query_id = %(query)s),
+  -2, %(k)s, %(mode)s, %(candidates)s, %(ef)s)
+"""
+
+SIZES_SQL = "SELECT quantization, sum(size_bytes), sum(cached_bytes) FROM knowledge_vector_index_sizes() GROUP BY 1"
+
+COLUMNS = [
+    ("chunks", "chunks"), ("mode", "mode"), ("candidates", "candidates"), ("recall@k", "recall"),
+    ("p50", "p50_ms"), ("p99", "p99_ms"), ("index MB", "index_mb"), ("cached MB", "cached_mb"),
+]
+
+
+def _mb(size):
+    return round(size / 1_048_576, 1) if size is not None else ""
+
+
+def _index_sizes(conn):
+    """{mode: (bytes, cached bytes)}"""
+    with conn.cursor() as cur:
+        cur.execute(SIZES_SQL)
+        sizes = {mode: (size, cached) for mode, size, cached in cur.fetchall()}
+    conn.commit()
+    return sizes
+
+
+def run_size(args, conn, size, queries):
+    exact, _ = exact_ids(args, conn, queries)
+    expected = sum(len(ids) for ids in exact.values())
+    sizes = _index_sizes(conn)
+    rounds = max(1, args.samples // len(queries))
+
+    results = []
+    for mode in args.modes:
+        factors = [1] if mode == "vector" else args.rerank
+        for factor in factors:
+            params = [
+                {"query": query, "k": args.k, "mode": mode, "candidates": factor * args.k, "ef": args.ef_search}
+                for query in queries
+            ]
+            found = sum(len(exact[p["query"]] & set(fetch_ids(conn, SEARCH_SQL, p))) for p in params)
+            seconds = []
+            for _ in range(rounds):
+                for p in params:
+                    seconds.extend(timed(lambda: fetch_ids(conn, SEARCH_SQL, p), 1))
+            latency = latency_summary(seconds)
+            index_bytes, cached_bytes = sizes.get(mode, (None, None))
+            results.append({
+                "chunks": size,
+                "mode": mode,
+                "candidates": factor * args.k,
+                "recall": round(found / expected, 3) if expected else "",
+                "p50_ms": latency["p50_ms"],
+                "p99_ms": latency["p99_ms"],
+                "index_mb": _mb(index_bytes),
+                "cached_mb": _mb(cached_bytes),
+            })
+    return results
+
+
+def run_quantization(args):
+    args.modes = args.modes.split(",")
+    unknown = set(args.modes) - set(MODES)
+    if unknown:
+        raise SystemExit(f"Unknown mode(s) {', '.join(sorted(unknown))}; expected {', '.join(MODES)}")
+    args.rerank = [int(factor) for factor in args.rerank.split(",")]
+    conn = connect_bench(args, APPLICATION)
+    sizes = [int(size) for size in args.chunks.split(",")]
+    results = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regprocedure('public.knowledge_vector_index_sizes()') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                raise SystemExit("bench quantization needs migration 080 (match_knowledge_chunks_quantized)")
+        conn.commit()
+        missing = set(args.modes) - set(_index_sizes(conn))
+        if missing:
+            print(f"Warning: no index for {', '.join(sorted(missing))}; those modes scan exactly, or fail before pgvector 0.7")
+        queries = prepare(args, conn)
+        seeded = 0
+        for size in sorted(sizes):
+            print(f"{size} bench chunks: seeding, then timing {', '.join(args.modes)} search...", flush=True)
+            seed_chunks(args, conn, seeded + 1, size)
+            seeded = size
+            results.extend(run_size(args, conn, size, queries))
+    finally:
+        if not args.keep:
+            cleanup(conn)
+        conn.close()
+    print_report(results, args.format, COLUMNS)
+    return 0
+
+
+def add_arguments(subparsers):
+    quantization = subparsers.add_parser(
+        "quantization", help="Recall, latency and index size of float32, halfvec and binary vector search")
+    add_data_arguments(quantization)
+    quantization.add_argument("--modes", default=",".join(MODES), help="Comma-separated modes to compare")
+    quantization.add_argument("--rerank", default="2,4,10", help="Comma-separated candidate multiples of k to re-rank")
+    quantization.add_argument("--ef-search", type=int, help="hnsw.ef_search (default: at least the candidates)")
+    quantization.add_argument("--samples", type=int, default=200, help="Timed searches per mode and factor")
+    quantization.add_argument("--keep", action="store_true", help="Leave the bench chunks in the table")
+    quantization.add_argument("--format", choices=("text", "json"), default="text")
+    quantization.set_defaults(func=run_quantization)
@@ -0,0 +1,318 @@
+"""
+Load test for the video job queue (migrations 074 and 075).
+
+For each queue size the jobs table is seeded with that many queued jobs,
+then measured for:
+
+- enqueue latency (single-row INSERT + commit)
+- get_queue_position latency for random queued jobs
+- get_queue_stats latency (the dashboard poll)
+- throughput of --workers concurrent workers, each claiming --batch jobs
+  with dequeue_jobs and completing them, until --drain jobs are done
+- lock waits of those workers, sampled from pg_stat_activity
+
+--legacy repeats each size with the design 074 replaced: the statement
+trigger that renumbers queue_position on every write, a dequeue that
+takes the head of the queue with a plain FOR UPDATE, and the full-table
+COUNT(*) FILTER scan that get_queue_stats ran before 075. Every legacy write
+costs O(queue), so those runs drain only --legacy-drain jobs. The trigger
+is created under a bench_ name and always dropped again.
+"""
+
+import random
+import threading
+import time
+
+from .common import LockWaitSampler, connect_bench, latency_summary, print_report, timed
+
+APPLICATION = "migrator-bench-queue"
+TAG = "queue"
+
+SEED_SQL = """
+INSERT INTO public.jobs (job_type, priority, status, payload)
+SELECT (ARRAY['doubt', 'topic_short', 'daily_ca'])[1 + g %% 3],
+       (ARRAY['high', 'medium', 'low'])[1 + g %% 3],
+       'queued',
+       jsonb_build_object('bench', %(tag)s, 'n', g)
+FROM generate_series(1, %(count)s) AS g
+"""
+
+ENQUEUE_SQL = """
+INSERT INTO public.jobs (job_type, priority, status, payload)
+VALUES ('doubt', 'high', 'queued', jsonb_build_object('bench', %s))
+"""
+
+DEQUEUE_SQL = "SELECT id FROM dequeue_jobs(%s)"
+
+COMPLETE_SQL = """
+UPDATE public.jobs SET status = 'completed', completed_at = NOW(), updated_at = NOW()
+WHERE id = ANY(%s::uuid[])
+"""
+
+LEGACY_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION bench_update_queue_positions()
+RETURNS TRIGGER AS $$
+BEGIN
+  WITH ranked_jobs AS (
+    SELECT id, ROW_NUMBER() OVER (
+      ORDER BY CASE priority WHEN 'high' THEN 1 WHEN 'medium' THEN 2 WHEN 'low' THEN 3 END, created_at ASC
+    ) AS new_position
+    FROM public.jobs
+    WHERE status = 'queued'
+  )
+  UPDATE public.jobs SET queue_position = ranked_jobs.new_position
+  FROM ranked_jobs WHERE jobs.id = ranked_jobs.id;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS bench_update_queue_positions ON public.jobs;
+CREATE TRIGGER bench_update_queue_positions
+AFTER INSERT OR UPDATE OF status, priority ON public.jobs
+FOR EACH STATEMENT EXECUTE FUNCTION bench_update_queue_positions();
+"""
+
+LEGACY_CLEANUP_SQL = """
+DROP TRIGGER IF EXISTS bench_update_queue_positions ON public.jobs;
+DROP FUNCTION IF EXISTS bench_update_queue_positions();
+"""
+
+LEGACY_DEQUEUE_SQL = """
+UPDATE public.jobs SET status = 'processing', started_at = NOW(), updated_at = NOW()
+WHERE id IN (
+  SELECT id FROM public.jobs WHERE status = 'queued'
+  ORDER BY CASE priority WHEN 'high' THEN 1 WHEN 'medium' THEN 2 ELSE 3 END, queue_position
+  LIMIT %s
+  FOR UPDATE
+)
+RETURNING id
+"""
+
+LEGACY_POSITION_SQL = """
+SELECT count(*) FROM public.jobs
+WHERE status = 'queued' AND queue_position < (SELECT queue_position FROM public.jobs WHERE id = %s)
+"""
+
+LEGACY_STATS_SQL = """
+SELECT
+  COUNT(*) FILTER (WHERE status = 'queued'),
+  COUNT(*) FILTER (WHERE status = 'processing'),
+  COUNT(*) FILTER (WHERE status = 'completed' AND completed_at >= CURRENT_DATE),
+  COUNT(*) FILTER (WHERE status = 'failed' AND updated_at >= CURRENT_DATE),
+  AVG(EXTRACT(EPOCH FROM (COALESCE(started_at, NOW()) - created_at)) / 60) FILTER (WHERE status IN ('processing', 'completed')),
+  COUNT(*) FILTER (WHERE status = 'queued' AND priority = 'high'),
+  COUNT(*) FILTER (WHERE status = 'queued' AND priority = 'medium'),
+  COUNT(*) FILTER (WHERE status = 'queued' AND priority = 'low')
+FROM public.jobs
+"""
+
+COLUMNS = [
+    ("design", "design"), ("queued", "queued"), ("workers", "workers"), ("drained", "drained"),
+    ("jobs/s", "jobs_per_second"), ("dequeue p50", "dequeue_p50_ms"), ("dequeue p95", "dequeue_p95_ms"),
+    ("enqueue p50", "enqueue_p50_ms"), ("position p50", "position_p50_ms"), ("stats p50", "stats_p50_ms"),
+    ("lock-wait s", "lock_wait_seconds"), ("waiting %", "lock_wait_percent"),
+]
+
+
+def _cleanup(conn):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM public.jobs WHERE payload->>'bench' = %s", (TAG,))
+        cur.execute(LEGACY_CLEANUP_SQL)
+    conn.commit()
+
+
+def _foreign_queued(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT count(*) FROM public.jobs WHERE status IN ('queued', 'processing') "
+            "AND payload->>'bench' IS DISTINCT FROM %s",
+            (TAG,),
+        )
+        count = cur.fetchone()[0]
+    conn.commit()
+    return count
+
+
+def _seed(conn, count):
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(SEED_SQL, {"tag": TAG, "count": count})
+        cur.execute("ANALYZE public.jobs")
+    conn.commit()
+    return time.perf_counter() - started
+
+
+class Worker(threading.Thread):
+    def __init__(self, conn, dequeue_sql, batch, quota, quota_lock):
+        super().__init__(daemon=True)
+        self.conn = conn
+        self.dequeue_sql = dequeue_sql
+        self.batch = batch
+        self.quota = quota  # [jobs left to claim], shared by all workers
+        self.quota_lock = quota_lock
+        self.done = 0
+        self.latencies = []
+        self.error = None
+
+    def _take(self):
+        with self.quota_lock:
+            n = min(self.batch, self.quota[0])
+            self.quota[0] -= n
+            return n
+
+    def run(self):
+        try:
+            with self.conn.cursor() as cur:
+                while True:
+                    n = self._take()
+                    if n <= 0:
+                        return
+                    started = time.perf_counter()
+                    cur.execute(self.dequeue_sql, (n,))
+                    ids = [row[0] for row in cur.fetchall()]
+                    self.conn.commit()
+                    self.latencies.append(time.perf_counter() - started)
+                    if not ids:
+                        return
+                    cur.execute(COMPLETE_SQL, (ids,))
+                    self.conn.commit()
+                    self.done += len(ids)
+        except Exception as e:
+            self.conn.rollback()
+            self.error = e
+
+
+def _drain(args, dequeue_sql, total):
+    quota, lock = [total], threading.Lock()
+    workers = [
+        Worker(connect_bench(args, APPLICATION), dequeue_sql, args.batch, quota, lock)
+        for _ in range(args.workers)
+    ]
+    sampler = LockWaitSampler(connect_bench(args, APPLICATION + "-sampler"), APPLICATION, args.sample_interval)
+    sampler.start()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    sampler.stop()
+    for worker in workers:
+        worker.conn.close()
+        if worker.error is not None:
+            raise SystemExit(f"Worker failed: {worker.error}")
+    return workers, sampler, elapsed
+
+
+def run_size(args, conn, size, legacy):
+    _cleanup(conn)
+    if legacy:
+        with conn.cursor() as cur:
+            cur.execute(LEGACY_TRIGGER_SQL)
+        conn.commit()
+    seed_seconds = _seed(conn, size)
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM public.jobs WHERE status = 'queued' AND payload->>'bench' = %s", (TAG,))
+        ids = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    # Every legacy write renumbers the whole queue, so it gets fewer samples
+    samples = min(args.samples, args.legacy_drain) if legacy else args.samples
+    sample_ids = random.sample(ids, min(samples, len(ids)))
+
+    def enqueue():
+        with conn.cursor() as cur:
+            cur.execute(ENQUEUE_SQL, (TAG,))
+        conn.commit()
+
+    position_sql = LEGACY_POSITION_SQL if legacy else "SELECT * FROM get_queue_position(%s)"
+    pending_ids = iter(sample_ids)
+
+    def position():
+        with conn.cursor() as cur:
+            cur.execute(position_sql, (next(pending_ids),))
+            cur.fetchall()
+        conn.commit()
+
+    stats_sql = LEGACY_STATS_SQL if legacy else "SELECT * FROM get_queue_stats()"
+
+    def stats():
+        with conn.cursor() as cur:
+            cur.execute(stats_sql)
+            cur.fetchall()
+        conn.commit()
+
+    enqueue_latency = timed(enqueue, samples)
+    position_latency = timed(position, len(sample_ids))
+    stats_latency = timed(stats, samples)
+
+    drain = min(args.legacy_drain if legacy else (args.drain or size), size)
+    workers, sampler, elapsed = _drain(args, LEGACY_DEQUEUE_SQL if legacy else DEQUEUE_SQL, drain)
+    drained = sum(w.done for w in workers)
+    dequeue = latency_summary([s for w in workers for s in w.latencies])
+
+    if legacy:
+        with conn.cursor() as cur:
+            cur.execute(LEGACY_CLEANUP_SQL)
+        conn.commit()
+    return {
+        "design": "legacy" if legacy else "074",
+        "queued": size,
+        "seed_rows_per_second": round(size / seed_seconds) if seed_seconds else None,
+        "workers": args.workers,
+        "batch": args.batch,
+        "drained": drained,
+        "seconds": round(elapsed, 3),
+        "jobs_per_second": round(drained / elapsed) if elapsed else 0,
+        "dequeue_p50_ms": dequeue["p50_ms"],
+        "dequeue_p95_ms": dequeue["p95_ms"],
+        "enqueue_p50_ms": latency_summary(enqueue_latency)["p50_ms"],
+        "enqueue_p95_ms": latency_summary(enqueue_latency)["p95_ms"],
+        "position_p50_ms": latency_summary(position_latency)["p50_ms"],
+        "position_p95_ms": latency_summary(position_latency)["p95_ms"],
+        "stats_p50_ms": latency_summary(stats_latency)["p50_ms"],
+        "stats_p95_ms": latency_summary(stats_latency)["p95_ms"],
+        "lock_wait_seconds": round(sampler.wait_seconds, 3),
+        "lock_wait_percent": round(100 * sampler.waiting_samples / sampler.samples, 1) if sampler.samples else 0.0,
+    }
+
+
+def run_queue(args):
+    conn = connect_bench(args, APPLICATION + "-driver")
+    foreign = _foreign_queued(conn)
+    if foreign:
+        conn.close()
+        raise SystemExit(f"{foreign} real job(s) are queued or processing; the bench would claim them. "
+                         "Use a disposable database.")
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = []
+    try:
+        for size in sizes:
+            for legacy in ((False, True) if args.legacy else (False,)):
+                label = "legacy" if legacy else "074"
+                print(f"Queue of {size} ({label}): seeding, sampling, draining with {args.workers} worker(s)...",
+                      flush=True)
+                results.append(run_size(args, conn, size, legacy))
+    finally:
+        if not args.keep:
+            _cleanup(conn)
+        conn.close()
+    print_report(results, args.format, COLUMNS)
+    return 0
+
+
+def add_arguments(subparsers):
+    queue = subparsers.add_parser("queue", help="Enqueue/dequeue throughput and lock waits of the job queue")
+    queue.add_argument("--sizes", default="10000,100000", help="Comma-separated queued-job counts")
+    queue.add_argument("--workers", type=int, default=8, help="Concurrent dequeuing workers")
+    queue.add_argument("--batch", type=int, default=10, help="Jobs claimed per dequeue call")
+    queue.add_argument("--drain", type=int, default=20000, help="Jobs to dequeue per size (0 = all)")
+    queue.add_argument("--samples", type=int, default=200, help="Enqueue, position and stats lookups to time")
+    queue.add_argument("--sample-interval", type=float, default=0.01, help="Seconds between lock-wait samples")
+    queue.add_argument("--legacy", action="store_true", help="Also measure the pre-074 trigger and dequeue")
+    queue.add_argument("--legacy-drain", type=int, default=200,
+                       help="Jobs to dequeue (and samples to time) in the slow legacy runs")
+    queue.add_argument("--keep", action="store_true", help="Leave the bench jobs in the table")
+    queue.add_argument("--format", choices=("text", "json"), default="text")
+    queue.set_defaults(func=run_queue)
@@ -0,0 +1,232 @@
+"""
+Benchmark for batch SM-2 review scheduling (migrations 051 and 082).
+
+For each size in --cards, 2 x --sessions bench users are given that many
+bookmarks each, with schedules spread from 30 days overdue to 30 days
+ahead. Half the users review --session due cards the per-item way (one
+process_bookmark_review call and commit per card, as
+POST /api/bookmarks/review does), the other half submit the same kind of
+session as one process_bookmark_reviews call. Reported per size:
+
+- session p50/p99 for each path, and per card
+- get_due_bookmarks and count_due_bookmarks p50
+- whether the due-id lookup is an index-only scan, and its heap fetches
+- whether both paths give the same schedule (checked on one user inside a
+  rolled-back transaction)
+
+Bench users have fixed ids, so a run that was interrupted is cleaned up by
+the next one.
+"""
+
+import json
+import uuid
+
+from .common import connect_bench, latency_summary, print_report, timed
+
+APPLICATION = "migrator-bench-reviews"
+NAMESPACE = uuid.UUID("2b7e9c41-6d08-4f3a-a1c5-9e4d2f7b0c68")
+RESPONSES = ("easy", "medium", "hard", "again")
+
+BOOKMARKS_SQL = """
+INSERT INTO public.bookmarks (user_id, content_type, content_id, title, snippet)
+SELECT u.user_id, 'custom', gen_random_uuid(), 'bench card ' || g, repeat('x', 100)
+FROM unnest(%(users)s::uuid[]) AS u(user_id)
+CROSS JOIN generate_series(1, %(count)s) AS g
+"""
+
+# The insert trigger schedules every new bookmark for tomorrow
+SCHEDULES_SQL = """
+UPDATE public.bookmarks SET
+  next_review_date = NOW() + (random() * 60 - 30) * INTERVAL '1 day',
+  review_count = (random() * 6)::int,
+  interval_days = (ARRAY[1, 3, 7, 14, 30, 60])[1 + (random() * 5)::int],
+  ease_factor = round((1.3 + random() * 1.5)::numeric, 2)
+WHERE user_id = ANY(%(users)s::uuid[])
+"""
+
+# The NULL half of get_due_bookmarks is the same shape
+DUE_IDS_SQL = """
+SELECT d.id, d.next_review_date
+FROM public.bookmarks d
+WHERE d.user_id = %(user)s AND d.next_review_date <= NOW()
+ORDER BY d.next_review_date
+LIMIT %(limit)s
+"""
+
+STATE_SQL = """
+SELECT id, interval_days, ease_factor, review_count, next_review_date - last_reviewed_at
+FROM public.bookmarks WHERE id = ANY(%s::uuid[]) ORDER BY id
+"""
+
+COLUMNS = [
+    ("cards", "cards"), ("session", "session"),
+    ("per-item p50", "per_item_p50_ms"), ("per-item p99", "per_item_p99_ms"),
+    ("batch p50", "batch_p50_ms"), ("batch p99", "batch_p99_ms"), ("speedup", "speedup"),
+    ("due p50", "due_p50_ms"), ("count p50", "count_p50_ms"),
+    ("index only", "index_only"), ("heap fetches", "heap_fetches"), ("same schedule", "same"),
+]
+
+
+def _users(size, count):
+    return [str(uuid.uuid5(NAMESPACE, f"user-{size}-{n}")) for n in range(count)]
+
+
+def _cleanup(conn, users):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM public.bookmarks WHERE user_id = ANY(%s::uuid[])", (users,))
+        cur.execute("DELETE FROM public.review_streaks WHERE user_id = ANY(%s::uuid[])", (users,))
+    conn.commit()
+
+
+def _query(conn, sql, params):
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+    conn.commit()
+    return rows
+
+
+def _vacuum(conn):
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE public.bookmarks")
+    finally:
+        conn.autocommit = False
+
+
+def _session(conn, user, limit):
+    """[(bookmark_id, response)] for the user's next limit due cards"""
+    due = _query(conn, "SELECT id FROM get_due_bookmarks(%s, %s)", (user, limit))
+    return [(str(row[0]), RESPONSES[n % len(RESPONSES)]) for n, row in enumerate(due)]
+
+
+def _per_item(conn, user, reviews):
+    for bookmark_id, response in reviews:
+        _query(conn, "SELECT * FROM process_bookmark_review(%s, %s, %s, 30)", (user, bookmark_id, response))
+
+
+def _batch_payload(reviews):
+    return json.dumps([
+        {"bookmark_id": bookmark_id, "response": response, "review_time_seconds": 30}
+        for bookmark_id, response in reviews
+    ])
+
+
+def _batch(conn, user, reviews):
+    _query(conn, "SELECT * FROM process_bookmark_reviews(%s, %s::jsonb)", (user, _batch_payload(reviews)))
+
+
+def _same_schedule(conn, user, reviews):
+    """Both paths over the same cards, each rolled back; True if they agree"""
+    ids = [bookmark_id for bookmark_id, _ in reviews]
+    states = []
+    for apply in ("per-item", "batch"):
+        with conn.cursor() as cur:
+            if apply == "per-item":
+                for bookmark_id, response in reviews:
+                    cur.execute("SELECT * FROM process_bookmark_review(%s, %s, %s, 30)",
+                                (user, bookmark_id, response))
+            else:
+                cur.execute("SELECT * FROM process_bookmark_reviews(%s, %s::jsonb)",
+                            (user, _batch_payload(reviews)))
+            cur.execute(STATE_SQL, (ids,))
+            states.append(cur.fetchall())
+        conn.rollback()
+    return states[0] == states[1]
+
+
+def _due_plan(conn, user, limit):
+    """(every bookmarks scan index-only, heap fetches) for the due-id lookup"""
+    plan = _query(conn, "EXPLAIN (ANALYZE, FORMAT JSON) " + DUE_IDS_SQL, {"user": user, "limit": limit})[0][0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans = []
+
+    def walk(node):
+        if node.get("Relation Name") == "bookmarks":
+            scans.append(node)
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    index_only = bool(scans) and all(node["Node Type"] == "Index Only Scan" for node in scans)
+    return index_only, sum(node.get("Heap Fetches", 0) for node in scans)
+
+
+def run_size(args, conn, size):
+    users = _users(size, 2 * args.sessions)
+    per_item_users, batch_users = users[:args.sessions], users[args.sessions:]
+    _cleanup(conn, users)
+    with conn.cursor() as cur:
+        cur.execute(BOOKMARKS_SQL, {"users": users, "count": size})
+        cur.execute(SCHEDULES_SQL, {"users": users})
+    conn.commit()
+    _vacuum(conn)
+
+    user = batch_users[0]
+    due = timed(lambda: _query(conn, "SELECT * FROM get_due_bookmarks(%s, 50)", (user,)), args.samples)
+    count = timed(lambda: _query(conn, "SELECT count_due_bookmarks(%s)", (user,)), args.samples)
+    index_only, heap_fetches = _due_plan(conn, user, 50)
+    same = _same_schedule(conn, user, _session(conn, user, args.session))
+
+    per_item, batch, reviewed = [], [], 0
+    for user in per_item_users:
+        reviews = _session(conn, user, args.session)
+        per_item.extend(timed(lambda: _per_item(conn, user, reviews), 1))
+        reviewed += len(reviews)
+    for user in batch_users:
+        reviews = _session(conn, user, args.session)
+        batch.extend(timed(lambda: _batch(conn, user, reviews), 1))
+        reviewed += len(reviews)
+
+    per_item_p50 = latency_summary(per_item)["p50_ms"]
+    batch_p50 = latency_summary(batch)["p50_ms"]
+    return {
+        "cards": size,
+        "session": reviewed // len(users) if users else 0,
+        "per_item_p50_ms": per_item_p50,
+        "per_item_p99_ms": latency_summary(per_item)["p99_ms"],
+        "batch_p50_ms": batch_p50,
+        "batch_p99_ms": latency_summary(batch)["p99_ms"],
+        "speedup": f"{per_item_p50 / batch_p50:.1f}x" if batch_p50 else "",
+        "due_p50_ms": latency_summary(due)["p50_ms"],
+        "count_p50_ms": latency_summary(count)["p50_ms"],
+        "index_only": "yes" if index_only else "no",
+        "heap_fetches": heap_fetches,
+        "same": "yes" if same else "no",
+    }
+
+
+def run_reviews(args):
+    conn = connect_bench(args, APPLICATION)
+    sizes = [int(size) for size in args.cards.split(",")]
+    users = [user for size in sizes for user in _users(size, 2 * args.sessions)]
+    results = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regprocedure('public.process_bookmark_reviews(uuid, jsonb)') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                raise SystemExit("bench reviews needs migration 082 (process_bookmark_reviews)")
+        conn.commit()
+        for size in sizes:
+            print(f"{2 * args.sessions} users with {size} cards: timing {args.session}-card sessions "
+                  f"per item and batched...", flush=True)
+            results.append(run_size(args, conn, size))
+    finally:
+        if not args.keep:
+            _cleanup(conn, users)
+        conn.close()
+    print_report(results, args.format, COLUMNS)
+    return 0
+
+
+def add_arguments(subparsers):
+    reviews = subparsers.add_parser("reviews", help="Review sessions per item vs batched, and due-card lookups")
+    reviews.add_argument("--cards", default="100,1000,10000", help="Comma-separated bookmarks per user")
+    reviews.add_argument("--session", type=int, default=100, help="Cards reviewed per session")
+    reviews.add_argument("--sessions", type=int, default=10, help="Sessions to time per path")
+    reviews.add_argument("--samples", type=int, default=50, help="Due lookups to time")
+    reviews.add_argument("--keep", action="store_true", help="Leave the bench bookmarks in place")
+    reviews.add_argument("--format", choices=("text", "json"), default="text")
+    reviews.set_defaults(func=run_reviews)
@@ -0,0 +1,201 @@
+"""
+Benchmark for the RLS policy pass (migration 078, rewrite.optimize_policies).
+
+A bench table gets --rows rows spread over --owners users and the two
+policies public.refunds has had since 022: owners read their own rows, and
+admins read everything through the user_profiles role lookup. Every query
+runs as `authenticated` with request.jwt.claims set, first under the
+policies as written and then under optimize_policies() of the same CREATE
+POLICY text:
+
+- count(*) as an owner, which applies the policies to every row scanned
+- the owner's newest 20 rows
+- count(*) as an admin
+
+Bench users have fixed ids, so a run that was interrupted is cleaned up by
+the next one.
+"""
+
+import json
+import uuid
+
+from ..rewrite import optimize_policies
+from .common import connect_bench, latency_summary, print_report, timed
+
+APPLICATION = "migrator-bench-rls"
+NAMESPACE = uuid.UUID("8e3b6f0a-71c4-4d2e-b5a9-3c6d0f2e9a17")
+ADMIN = str(uuid.uuid5(NAMESPACE, "admin"))
+TABLE = "public.bench_rls_items"
+
+SETUP_SQL = f"""
+DROP TABLE IF EXISTS {TABLE};
+CREATE TABLE {TABLE} (
+  id BIGSERIAL PRIMARY KEY,
+  user_id UUID NOT NULL,
+  amount INTEGER NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX idx_bench_rls_items_user_created ON {TABLE} (user_id, created_at DESC);
+ALTER TABLE {TABLE} ENABLE ROW LEVEL SECURITY;
+GRANT SELECT ON {TABLE} TO authenticated;
+"""
+
+ROWS_SQL = f"""
+INSERT INTO {TABLE} (user_id, amount, created_at)
+SELECT (%(owners)s::uuid[])[1 + g %% %(owner_count)s], (random() * 10000)::int,
+       NOW() - random() * INTERVAL '365 days'
+FROM generate_series(1, %(count)s) AS g
+"""
+
+# As written in supabase/migrations/022_refund_system.sql
+POLICIES_SQL = f"""
+CREATE POLICY "Users can view own bench items"
+  ON {TABLE} FOR SELECT
+  USING (auth.uid() = user_id);
+
+CREATE POLICY "Admins can manage all bench items"
+  ON {TABLE} FOR ALL
+  USING (
+    EXISTS (
+      SELECT 1 FROM public.user_profiles
+      WHERE user_id = auth.uid() AND role = 'admin'
+    )
+  );
+"""
+
+DROP_POLICIES_SQL = f"""
+DROP POLICY IF EXISTS "Users can view own bench items" ON {TABLE};
+DROP POLICY IF EXISTS "Admins can manage all bench items" ON {TABLE};
+"""
+
+QUERIES = [
+    ("owner count", "owner", f"SELECT count(*) FROM {TABLE}"),
+    ("owner page", "owner", f"SELECT * FROM {TABLE} ORDER BY created_at DESC LIMIT 20"),
+    ("admin count", "admin", f"SELECT count(*) FROM {TABLE}"),
+]
+
+COLUMNS = [
+    ("rows", "rows"), ("query", "query"), ("visible", "visible"),
+    ("as written p50", "legacy_p50_ms"), ("optimized p50", "optimized_p50_ms"),
+    ("optimized p95", "optimized_p95_ms"), ("speedup", "speedup"),
+]
+
+
+def _owners(count):
+    return [str(uuid.uuid5(NAMESPACE, f"owner-{n}")) for n in range(count)]
+
+
+def _cleanup(conn, owners):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute("DELETE FROM public.user_profiles WHERE user_id = ANY(%s::uuid[])", (owners + [ADMIN],))
+    conn.commit()
+
+
+def _profiles(conn, owners):
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO public.user_profiles (user_id, role) SELECT unnest(%s::uuid[]), 'student'",
+            (owners,),
+        )
+        cur.execute("INSERT INTO public.user_profiles (user_id, role) VALUES (%s, 'admin')", (ADMIN,))
+    conn.commit()
+
+
+def _as_user(conn, user, sql):
+    """Run sql as the authenticated role with user's JWT claims; returns its rows"""
+    with conn.cursor() as cur:
+        cur.execute("SET LOCAL ROLE authenticated")
+        cur.execute("SELECT set_config('request.jwt.claims', %s, true)",
+                    (json.dumps({"sub": user, "role": "authenticated"}),))
+        cur.execute(sql)
+        rows = cur.fetchall()
+    conn.commit()
+    return rows
+
+
+def _set_policies(conn, sql):
+    with conn.cursor() as cur:
+        cur.execute(DROP_POLICIES_SQL)
+        cur.execute(sql)
+    conn.commit()
+
+
+def _measure(args, conn, owner):
+    """{query: (durations, visible rows)} under the current policies"""
+    out = {}
+    for name, who, sql in QUERIES:
+        user = owner if who == "owner" else ADMIN
+        rows = _as_user(conn, user, sql)
+        visible = rows[0][0] if sql.startswith("SELECT count") else len(rows)
+        out[name] = (timed(lambda: _as_user(conn, user, sql), args.samples), visible)
+    return out
+
+
+def run_size(args, conn, size, owners):
+    with conn.cursor() as cur:
+        cur.execute(f"TRUNCATE {TABLE}")
+        cur.execute(ROWS_SQL, {"owners": owners, "owner_count": len(owners), "count": size})
+        cur.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+
+    _set_policies(conn, POLICIES_SQL)
+    legacy = _measure(args, conn, owners[0])
+    _set_policies(conn, optimize_policies(POLICIES_SQL))
+    optimized = _measure(args, conn, owners[0])
+
+    results = []
+    for name, _, _ in QUERIES:
+        before, visible = legacy[name]
+        after, optimized_visible = optimized[name]
+        before_p50 = latency_summary(before)["p50_ms"]
+        after_p50 = latency_summary(after)["p50_ms"]
+        results.append({
+            "rows": size,
+            "query": name,
+            "visible": visible if visible == optimized_visible else f"{visible} vs {optimized_visible}",
+            "legacy_p50_ms": before_p50,
+            "legacy_p95_ms": latency_summary(before)["p95_ms"],
+            "optimized_p50_ms": after_p50,
+            "optimized_p95_ms": latency_summary(after)["p95_ms"],
+            "speedup": f"{before_p50 / after_p50:.1f}x" if after_p50 else "",
+        })
+    return results
+
+
+def run_rls(args):
+    conn = connect_bench(args, APPLICATION)
+    sizes = [int(size) for size in args.rows.split(",")]
+    owners = _owners(args.owners)
+    results = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regprocedure('public.is_admin()') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                raise SystemExit("bench rls needs migration 078 (public.is_admin())")
+        conn.commit()
+        _cleanup(conn, owners)
+        _profiles(conn, owners)
+        with conn.cursor() as cur:
+            cur.execute(SETUP_SQL)
+        conn.commit()
+        for size in sizes:
+            print(f"{size} rows over {len(owners)} owners: timing the policies as written "
+                  f"and optimized...", flush=True)
+            results.extend(run_size(args, conn, size, owners))
+    finally:
+        if not args.keep:
+            _cleanup(conn, owners)
+        conn.close()
+    print_report(results, args.format, COLUMNS)
+    return 0
+
+
+def add_arguments(subparsers):
+    rls = subparsers.add_parser("rls", help="SELECT latency as authenticated under per-row vs per-query policies")
+    rls.add_argument("--rows", default="10000,100000,1000000", help="Comma-separated bench table sizes")
+    rls.add_argument("--owners", type=int, default=100, help="Users the rows are spread over")
+    rls.add_argument("--samples", type=int, default=20, help="Runs to time per query and policy set")
+    rls.add_argument("--keep", action="store_true", help="Leave the bench table and profiles in place")
+    rls.add_argument("--format", choices=("text", "json"), default="text")
+    rls.set_defaults(func=run_rls)
@@ -0,0 +1,229 @@
+"""
+Benchmark for knowledge chunk retrieval (migration 079).
+
+knowledge_chunks is filled with synthetic 1536-d embeddings, up to each
+size in --chunks in turn: --clusters random centres, each chunk its
+centre plus uniform noise (--spread), with chunk text drawn from a
+per-cluster vocabulary so that the full-text branch has something to
+match. Queries are fresh points around the same centres. For each
+--ef-search value the report gives:
+
+- recall@k of match_knowledge_chunks (HNSW) against an exact scan
+- p50/p99 latency of match_knowledge_chunks
+- p50/p99 latency of hybrid_search_knowledge_chunks, unfiltered and with
+  a metadata filter on the query's cluster
+
+Bench chunks are tagged {"bench": "search"} in metadata and removed
+afterwards unless --keep; other chunks in the table take part in the
+searches like they would in production. Data is seeded with setseed(),
+so runs with the same options are comparable.
+"""
+
+import json
+import time
+
+from .common import connect_bench, latency_summary, print_report, timed
+
+APPLICATION = "migrator-bench-search"
+TAG = {"bench": "search"}
+DIMENSIONS = 1536
+VOCABULARY = 30  # words per cluster
+
+CENTERS_SQL = f"""
+CREATE TEMP TABLE bench_search_centers AS
+SELECT c AS cluster,
+       ARRAY(SELECT random() - 0.5 + c * 0 FROM generate_series(1, {DIMENSIONS})) AS center
+FROM generate_series(0, %(clusters)s - 1) AS c
+"""
+
+# Points around a cluster's centre; the reference to ctr makes the
+# subquery correlated, so it is evaluated again for every row
+_POINT = f"""(SELECT array_agg(ctr.center[d] + (random() - 0.5) * %(spread)s ORDER BY d)
+     FROM generate_series(1, {DIMENSIONS}) AS d)::vector"""
+_WORD = "'w' || ctr.cluster || 'x' || (random() * {n})::int".format(n=VOCABULARY - 1)
+
+SEED_SQL = f"""
+INSERT INTO public.knowledge_chunks (chunk_text, content_vector, chunk_index, metadata)
+SELECT 'bench chunk ' || array_to_string(ARRAY(SELECT {_WORD} FROM generate_series(1, 40)), ' '),
+       {_POINT},
+       g,
+       jsonb_build_object('bench', 'search', 'cluster', ctr.cluster)
+FROM generate_series(%(start)s, %(stop)s) AS g
+JOIN bench_search_centers ctr ON ctr.cluster = g %% %(clusters)s
+"""
+
+QUERIES_SQL = f"""
+CREATE TEMP TABLE bench_search_queries AS
+SELECT g AS query_id, ctr.cluster, {_POINT} AS embedding,
+       {_WORD} || ' ' || {_WORD} AS query_text
+FROM generate_series(1, %(queries)s) AS g
+JOIN bench_search_centers ctr ON ctr.cluster = (g * 7) %% %(clusters)s
+"""
+
+EXACT_SQL = """
+SELECT kc.id FROM public.knowledge_chunks kc
+WHERE kc.content_vector IS NOT NULL
+ORDER BY kc.content_vector <=> (SELECT embedding FROM bench_search_queries WHERE query_id = %(query)s)
+LIMIT %(k)s
+"""
+
+VECTOR_SQL = """
+SELECT id FROM match_knowledge_chunks(
+  (SELECT embedding FROM bench_search_queries WHERE query_id = %(query)s), -2, %(k)s, %(ef)s)
+"""
+
+HYBRID_SQL = """
+SELECT id FROM hybrid_search_knowledge_chunks(
+  (SELECT query_text FROM bench_search_queries WHERE query_id = %(query)s),
+  (SELECT embedding FROM bench_search_queries WHERE query_id = %(query)s),
+  %(k)s, NULL,
+  (SELECT jsonb_build_object('cluster', cluster) FROM bench_search_queries WHERE query_id = %(query)s
+     AND %(filtered)s),
+  %(ef)s)
+"""
+
+INDEX_SQL = """
+SELECT EXISTS (SELECT 1 FROM pg_indexes WHERE schemaname = 'public' AND indexname = 'idx_knowledge_chunks_vector')
+"""
+
+COLUMNS = [
+    ("chunks", "chunks"), ("ef_search", "ef_search"), ("recall@k", "recall"),
+    ("exact p50", "exact_p50_ms"), ("vector p50", "vector_p50_ms"), ("vector p99", "vector_p99_ms"),
+    ("hybrid p50", "hybrid_p50_ms"), ("hybrid p99", "hybrid_p99_ms"), ("filtered p50", "filtered_p50_ms"),
+]
+
+
+def cleanup(conn):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM public.knowledge_chunks WHERE metadata @> %s::jsonb", (json.dumps(TAG),))
+        cur.execute("DROP TABLE IF EXISTS bench_search_centers, bench_search_queries")
+    conn.commit()
+
+
+def fetch_ids(conn, sql, params, exact=False):
+    with conn.cursor() as cur:
+        if exact:
+            cur.execute("SET LOCAL enable_indexscan = off")
+        cur.execute(sql, params)
+        ids = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    return ids
+
+
+def seed_chunks(args, conn, start, stop):
+    """Insert bench chunks start..stop in --batch sized transactions"""
+    for first in range(start, stop + 1, args.batch):
+        last = min(first + args.batch - 1, stop)
+        with conn.cursor() as cur:
+            cur.execute(SEED_SQL, {"start": first, "stop": last, "clusters": args.clusters, "spread": args.spread})
+        conn.commit()
+        print(f"  seeded {last} chunks", flush=True)
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE public.knowledge_chunks")
+    conn.commit()
+
+
+def prepare(args, conn):
+    """Remove leftover bench chunks and create the centres and queries; returns the query ids"""
+    cleanup(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT setseed(%s)", (args.seed,))
+        cur.execute(CENTERS_SQL, {"clusters": args.clusters})
+        cur.execute(QUERIES_SQL, {"queries": args.queries, "clusters": args.clusters, "spread": args.spread})
+    conn.commit()
+    return list(range(1, args.queries + 1))
+
+
+def exact_ids(args, conn, queries):
+    """({query: ids of the exact top k}, durations) from sequential scans"""
+    exact = {}
+    seconds = []
+    for query in queries:
+        started = time.perf_counter()
+        exact[query] = set(fetch_ids(conn, EXACT_SQL, {"query": query, "k": args.k}, exact=True))
+        seconds.append(time.perf_counter() - started)
+    return exact, seconds
+
+
+def add_data_arguments(parser):
+    """Options for the synthetic chunks and queries, shared with bench quantization"""
+    parser.add_argument("--chunks", default="10000,100000", help="Comma-separated bench chunk counts")
+    parser.add_argument("--clusters", type=int, default=200, help="Embedding clusters (topics)")
+    parser.add_argument("--spread", type=float, default=0.5, help="Per-dimension noise around a cluster centre")
+    parser.add_argument("--queries", type=int, default=50, help="Distinct query points")
+    parser.add_argument("--k", type=int, default=10, help="Results per search (recall@k)")
+    parser.add_argument("--batch", type=int, default=5000, help="Chunks inserted per transaction")
+    parser.add_argument("--seed", type=float, default=0.42, help="setseed() value for the synthetic data")
+
+
+def run_size(args, conn, size, queries):
+    exact, exact_seconds = exact_ids(args, conn, queries)
+    results = []
+    for ef in args.ef_search:
+        params = [{"query": query, "k": args.k, "ef": ef} for query in queries]
+        found = 0
+        for p in params:
+            found += len(exact[p["query"]] & set(fetch_ids(conn, VECTOR_SQL, p)))
+        rounds = max(1, args.samples // len(queries))
+
+        def each(sql, extra=None):
+            """One duration per search, --samples spread over the queries"""
+            seconds = []
+            for _ in range(rounds):
+                for p in params:
+                    seconds.extend(timed(lambda: fetch_ids(conn, sql, dict(p, **(extra or {}))), 1))
+            return seconds
+
+        vector = latency_summary(each(VECTOR_SQL))
+        hybrid = latency_summary(each(HYBRID_SQL, {"filtered": False}))
+        filtered = latency_summary(each(HYBRID_SQL, {"filtered": True}))
+        expected = sum(len(ids) for ids in exact.values())
+        results.append({
+            "chunks": size,
+            "ef_search": ef,
+            "k": args.k,
+            "recall": round(found / expected, 3) if expected else "",
+            "exact_p50_ms": latency_summary(exact_seconds)["p50_ms"],
+            "vector_p50_ms": vector["p50_ms"],
+            "vector_p99_ms": vector["p99_ms"],
+            "hybrid_p50_ms": hybrid["p50_ms"],
+            "hybrid_p99_ms": hybrid["p99_ms"],
+            "filtered_p50_ms": filtered["p50_ms"],
+        })
+    return results
+
+
+def run_search(args):
+    conn = connect_bench(args, APPLICATION)
+    sizes = [int(size) for size in args.chunks.split(",")]
+    args.ef_search = [int(ef) for ef in args.ef_search.split(",")]
+    results = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute(INDEX_SQL)
+            if not cur.fetchone()[0]:
+                print("Warning: idx_knowledge_chunks_vector is missing; every search is an exact scan")
+        conn.commit()
+        queries = prepare(args, conn)
+        seeded = 0
+        for size in sorted(sizes):
+            print(f"{size} bench chunks: seeding, then timing exact, vector and hybrid search...", flush=True)
+            seed_chunks(args, conn, seeded + 1, size)
+            seeded = size
+            results.extend(run_size(args, conn, size, queries))
+    finally:
+        if not args.keep:
+            cleanup(conn)
+        conn.close()
+    print_report(results, args.format, COLUMNS)
+    return 0
+
+
+def add_arguments(subparsers):
+    search = subparsers.add_parser("search", help="Recall and latency of vector and hybrid knowledge chunk search")
+    add_data_arguments(search)
+    search.add_argument("--ef-search", default="40,100,200", help="Comma-separated hnsw.ef_search values")
+    search.add_argument("--samples", type=int, default=200, help="Timed searches per function and ef_search")
+    search.add_argument("--keep", action="store_true", help="Leave the bench chunks in the table")
+    search.add_argument("--format", choices=("text", "json"), default="text")
+    search.set_defaults(func=run_search)
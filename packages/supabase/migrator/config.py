@@ -0,0 +1,60 @@
+"""
+Connection settings and migration sources shared by the migrator commands.
+
+Defaults match the hard-coded values in apply_migrations.py; override with
+the standard libpq variables (PGHOST, PGPORT, ...) or --dsn. The REST
+settings (see rest) default to the values apply-migration-022-v2.py used;
+override with SUPABASE_URL, SUPABASE_ANON_KEY and SUPABASE_SERVICE_KEY.
+"""
+
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DB_CONFIG = {
+    "host": os.getenv("PGHOST", "89.117.60.144"),
+    "port": int(os.getenv("PGPORT", "5432")),
+    "user": os.getenv("PGUSER", "postgres"),
+    "password": os.getenv("PGPASSWORD", "postgres"),
+    "dbname": os.getenv("PGDATABASE", "postgres"),
+    "sslmode": os.getenv("PGSSLMODE", "disable"),
+}
+
+_DEMO_ANON_KEY = (
+    "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJpc3MiOiJzdXBhYmFzZS1kZW1vIiwicm9sZSI6ImFub24iLCJleHAiOjE5ODM4MTI5OTZ9"
+    ".CRXP1A7WOeoJeXxjNni43kdQwgnWNReilDMblYTn_I0"
+)
+
+REST_CONFIG = {
+    "url": os.getenv("SUPABASE_URL", "http://89.117.60.144:54321"),
+    "anon_key": os.getenv("SUPABASE_ANON_KEY", _DEMO_ANON_KEY),
+    "service_key": os.getenv("SUPABASE_SERVICE_KEY", _DEMO_ANON_KEY),
+}
+
+# Migration directories in apply order, relative to packages/supabase.
+# `rewrite` marks sources that need the idempotency rewrites
+# apply_custom_migrations.py has always applied to them.
+MIGRATION_SOURCES = [
+    {"dir": "supabase/migrations", "rewrite": False},
+    {"dir": "migrations", "rewrite": True},
+]
+
+# Early files that DROP ... CASCADE tables holding live data (users,
+# user_profiles, jobs, daily_updates, knowledge_chunks, ...) before
+# recreating them empty. Commands that execute migrations against a real
+# database leave them out unless --include-destructive is given; a new
+# database gets them through a baseline instead.
+DESTRUCTIVE_MIGRATIONS = (
+    "supabase/migrations/00001_cleanup.sql",
+    "supabase/migrations/00102_initial_schema.sql",
+    "supabase/migrations/003_knowledge_base_tables.sql",
+)
+
+
+def connect(dsn=None):
+    """Open a psycopg2 connection from a DSN or DB_CONFIG"""
+    import psycopg2
+
+    if dsn:
+        return psycopg2.connect(dsn)
+    return psycopg2.connect(**DB_CONFIG)
@@ -0,0 +1,246 @@
+"""
+Schema drift detection from one bulk pg_catalog snapshot.
+
+A snapshot is a single query that returns every table, column, index,
+constraint, policy, trigger and function of the chosen schemas (plus the
+installed extensions) as one JSON document, so it costs one round trip
+regardless of schema size. The expected snapshot comes from replaying the
+migrations into a throwaway database (--scratch-dsn) or from a file saved
+earlier with --save-expected; the live one from --dsn. With neither
+source, the live snapshot itself is printed as JSON.
+
+Because most migrations swallow errors in DO ... EXCEPTION blocks, a
+failed CREATE INDEX or CREATE POLICY leaves no trace at apply time; here
+it shows up as a "missing" entry. INVALID indexes show up as "changed".
+"""
+
+import contextlib
+import json
+import sys
+import time
+
+from .baseline import LEDGER_TABLES
+
+KINDS = ("extensions", "tables", "columns", "indexes", "constraints", "policies", "triggers", "functions")
+SINGULAR = {
+    "extensions": "extension", "tables": "table", "columns": "column", "indexes": "index",
+    "constraints": "constraint", "policies": "policy", "triggers": "trigger", "functions": "function",
+}
+
+SNAPSHOT_QUERY = """
+WITH rels AS (
+  SELECT c.oid, c.relname, c.relkind, c.relrowsecurity, n.nspname,
+         n.nspname || '.' || c.relname AS qualified
+  FROM pg_class c
+  JOIN pg_namespace n ON n.oid = c.relnamespace
+  WHERE n.nspname = ANY(%(schemas)s)
+    AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+    AND c.relname <> ALL(%(ignore)s)
+)
+SELECT json_build_object(
+  'extensions', (
+    SELECT json_agg(json_build_object('name', e.extname) ORDER BY e.extname)
+    FROM pg_extension e
+  ),
+  'tables', (
+    SELECT json_agg(json_build_object(
+      'name', r.qualified, 'kind', r.relkind, 'rls', r.relrowsecurity
+    ) ORDER BY r.qualified)
+    FROM rels r
+  ),
+  'columns', (
+    SELECT json_agg(json_build_object(
+      'name', r.qualified || '.' || a.attname,
+      'type', format_type(a.atttypid, a.atttypmod),
+      'not_null', a.attnotnull,
+      'default', pg_get_expr(d.adbin, d.adrelid)
+    ) ORDER BY r.qualified, a.attnum)
+    FROM rels r
+    JOIN pg_attribute a ON a.attrelid = r.oid AND a.attnum > 0 AND NOT a.attisdropped
+    LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+  ),
+  'indexes', (
+    SELECT json_agg(json_build_object(
+      'name', r.nspname || '.' || ic.relname,
+      'table', r.qualified,
+      'definition', pg_get_indexdef(i.indexrelid),
+      'valid', i.indisvalid
+    ) ORDER BY r.nspname, ic.relname)
+    FROM rels r
+    JOIN pg_index i ON i.indrelid = r.oid
+    JOIN pg_class ic ON ic.oid = i.indexrelid
+  ),
+  'constraints', (
+    SELECT json_agg(json_build_object(
+      'name', r.qualified || '.' || con.conname,
+      'type', con.contype,
+      'definition', pg_get_constraintdef(con.oid),
+      'validated', con.convalidated
+    ) ORDER BY r.qualified, con.conname)
+    FROM rels r
+    JOIN pg_constraint con ON con.conrelid = r.oid
+  ),
+  'policies', (
+    SELECT json_agg(json_build_object(
+      'name', r.qualified || '.' || p.polname,
+      'command', p.polcmd,
+      'permissive', p.polpermissive,
+      'roles', (
+        SELECT array_agg(role ORDER BY role) FROM (
+          SELECT CASE WHEN oid = 0 THEN 'public' ELSE pg_get_userbyid(oid) END AS role
+          FROM unnest(p.polroles) AS oid
+        ) roles
+      ),
+      'using', pg_get_expr(p.polqual, p.polrelid),
+      'check', pg_get_expr(p.polwithcheck, p.polrelid)
+    ) ORDER BY r.qualified, p.polname)
+    FROM rels r
+    JOIN pg_policy p ON p.polrelid = r.oid
+  ),
+  'triggers', (
+    SELECT json_agg(json_build_object(
+      'name', r.qualified || '.' || t.tgname,
+      'definition', pg_get_triggerdef(t.oid),
+      'enabled', t.tgenabled
+    ) ORDER BY r.qualified, t.tgname)
+    FROM rels r
+    JOIN pg_trigger t ON t.tgrelid = r.oid AND NOT t.tgisinternal
+  ),
+  'functions', (
+    SELECT json_agg(json_build_object(
+      'name', n.nspname || '.' || p.proname || '(' || pg_get_function_identity_arguments(p.oid) || ')',
+      'returns', pg_get_function_result(p.oid),
+      'security_definer', p.prosecdef,
+      'volatility', p.provolatile,
+      'body_md5', md5(p.prosrc)
+    ) ORDER BY n.nspname, p.proname, pg_get_function_identity_arguments(p.oid))
+    FROM pg_proc p
+    JOIN pg_namespace n ON n.oid = p.pronamespace
+    WHERE n.nspname = ANY(%(schemas)s)
+      AND NOT EXISTS (
+        SELECT 1 FROM pg_depend dep
+        WHERE dep.classid = 'pg_proc'::regclass AND dep.objid = p.oid AND dep.deptype = 'e'
+      )
+  )
+)
+"""
+
+
+def snapshot(conn, schemas=("public",)):
+    """The catalog snapshot of conn as {kind: [item, ...]}"""
+    with conn.cursor() as cur:
+        cur.execute(SNAPSHOT_QUERY, {"schemas": list(schemas), "ignore": list(LEDGER_TABLES)})
+        data = cur.fetchone()[0]
+    conn.commit()
+    if isinstance(data, str):
+        data = json.loads(data)
+    return {kind: data.get(kind) or [] for kind in KINDS}
+
+
+def diff(expected, actual):
+    """Machine-readable differences between two snapshots"""
+    changes = []
+    for kind in KINDS:
+        want = {item["name"]: item for item in expected.get(kind, [])}
+        have = {item["name"]: item for item in actual.get(kind, [])}
+        for name in sorted(want.keys() - have.keys()):
+            changes.append({"kind": kind, "change": "missing", "name": name, "expected": want[name]})
+        for name in sorted(have.keys() - want.keys()):
+            changes.append({"kind": kind, "change": "unexpected", "name": name, "actual": have[name]})
+        for name in sorted(want.keys() & have.keys()):
+            fields = {
+                key: {"expected": want[name].get(key), "actual": have[name].get(key)}
+                for key in want[name].keys() | have[name].keys()
+                if key != "name" and want[name].get(key) != have[name].get(key)
+            }
+            if fields:
+                changes.append({"kind": kind, "change": "changed", "name": name, "fields": fields})
+
+    summary = {}
+    for change in changes:
+        counts = summary.setdefault(change["kind"], {"missing": 0, "unexpected": 0, "changed": 0})
+        counts[change["change"]] += 1
+    return {"drift": bool(changes), "summary": summary, "changes": changes}
+
+
+def print_diff(result):
+    if not result["drift"]:
+        print("No drift.")
+        return
+    for change in result["changes"]:
+        line = f"  {change['change'].upper():<10} {SINGULAR[change['kind']]:<10} {change['name']}"
+        if change["change"] == "changed":
+            line += "  (" + ", ".join(
+                f"{key}: {value['expected']!r} -> {value['actual']!r}"
+                for key, value in sorted(change["fields"].items())
+            ) + ")"
+        print(line)
+    totals = {name: sum(counts[name] for counts in result["summary"].values())
+              for name in ("missing", "unexpected", "changed")}
+    print(f"{totals['missing']} missing, {totals['unexpected']} unexpected, {totals['changed']} changed.")
+
+
+# -- CLI ---------------------------------------------------------------------
+
+def run_drift(args):
+    from .baseline import replay
+    from .config import connect
+    from .runner import discover_migrations
+
+    schemas = [schema.strip() for schema in args.schemas.split(",") if schema.strip()]
+    log = sys.stderr if args.format == "json" else sys.stdout
+
+    if args.expected:
+        with open(args.expected, "r", encoding="utf-8") as f:
+            expected = json.load(f)
+    elif args.scratch_dsn:
+        scratch = connect(args.scratch_dsn)
+        with contextlib.redirect_stdout(log):
+            covers = replay(scratch, discover_migrations(include_destructive=True))
+        if covers is None:
+            scratch.close()
+            return 2
+        expected = snapshot(scratch, schemas)
+        scratch.close()
+    else:
+        expected = None
+
+    if expected is not None and args.save_expected:
+        with open(args.save_expected, "w", encoding="utf-8") as f:
+            json.dump(expected, f, indent=1, sort_keys=True)
+        print(f"Expected snapshot written to {args.save_expected}", file=log)
+
+    conn = connect(args.dsn)
+    started = time.perf_counter()
+    actual = snapshot(conn, schemas)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    conn.close()
+    print(f"Snapshot of {', '.join(schemas)}: " + ", ".join(
+        f"{len(actual[kind])} {kind}" for kind in KINDS
+    ) + f" in {elapsed_ms:.0f} ms", file=log)
+
+    if expected is None:
+        json.dump(actual, sys.stdout, indent=1, sort_keys=True)
+        print()
+        return 0
+
+    result = diff(expected, actual)
+    if args.format == "json":
+        json.dump(result, sys.stdout, indent=1, sort_keys=True)
+        print()
+    else:
+        print_diff(result)
+    return 1 if result["drift"] else 0
+
+
+def add_arguments(subparsers):
+    drift = subparsers.add_parser(
+        "drift", help="Diff the live catalog against the schema the migrations should produce"
+    )
+    source = drift.add_mutually_exclusive_group()
+    source.add_argument("--expected", help="Expected snapshot JSON saved earlier")
+    source.add_argument("--scratch-dsn", help="Empty throwaway database to replay the migrations into")
+    drift.add_argument("--save-expected", help="Also write the expected snapshot to this file")
+    drift.add_argument("--schemas", default="public", help="Comma-separated schemas to compare")
+    drift.add_argument("--format", choices=("text", "json"), default="text")
+    drift.set_defaults(func=run_drift)
@@ -0,0 +1,131 @@
+"""
+Batch worker for the gamification event log (migration 083).
+
+award_xp, update_user_streak and room visits only append to xp_events;
+process_xp_events(batch) applies the oldest batch in one transaction
+(ledger, counters, totals, levels, streaks, and the badge rules whose
+inputs changed) and deletes it. This driver drains the log: it calls
+process_xp_events until a batch comes back short, each call in its own
+transaction under --lock-timeout, and retries lock timeouts and deadlocks
+with backoff. Batches claim their events with SKIP LOCKED, so several
+workers (and the pg_cron job) can run at once.
+
+--every repeats the drain for use as a long-running worker where pg_cron
+is not available; --status shows how far behind the log is.
+"""
+
+import time
+
+# lock_not_available, query_canceled (statement/lock timeout), deadlock_detected
+RETRYABLE = {"55P03", "57014", "40P01"}
+
+STATUS_SQL = """
+SELECT COUNT(*), COUNT(DISTINCT user_id), EXTRACT(EPOCH FROM NOW() - MIN(created_at))
+FROM public.xp_events
+"""
+
+
+class EventWorker:
+    def __init__(self, conn, batch=1000, lock_timeout="2s", statement_timeout="1min", retries=5, backoff=1.0):
+        self.conn = conn
+        self.batch = batch
+        self.lock_timeout = lock_timeout
+        self.statement_timeout = statement_timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    def _process(self):
+        """One process_xp_events call in its own transaction; returns the events claimed"""
+        for attempt in range(self.retries + 1):
+            try:
+                with self.conn.cursor() as cur:
+                    cur.execute("SELECT set_config('lock_timeout', %s, true)", (self.lock_timeout,))
+                    cur.execute("SELECT set_config('statement_timeout', %s, true)", (self.statement_timeout,))
+                    cur.execute("SELECT process_xp_events(%s)", (self.batch,))
+                    claimed = cur.fetchone()[0]
+                self.conn.commit()
+                return claimed
+            except Exception as e:
+                self.conn.rollback()
+                if getattr(e, "pgcode", None) not in RETRYABLE or attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                print(f"  batch hit a lock timeout or deadlock; retrying in {delay:.0f}s")
+                time.sleep(delay)
+
+    def drain(self):
+        """Apply batches until one comes back short; returns {events, batches, ms}"""
+        started = time.perf_counter()
+        events = batches = 0
+        while True:
+            claimed = self._process()
+            events += claimed
+            batches += 1
+            if claimed < self.batch:
+                break
+        return {"events": events, "batches": batches, "ms": round((time.perf_counter() - started) * 1000)}
+
+
+def print_status(conn):
+    with conn.cursor() as cur:
+        cur.execute(STATUS_SQL)
+        pending, users, age = cur.fetchone()
+    conn.commit()
+    if not pending:
+        print("  xp_events is empty")
+    else:
+        print(f"  {pending} pending event(s) for {users} user(s), oldest {age:.0f}s ago")
+    return 0
+
+
+# -- CLI ---------------------------------------------------------------------
+
+def run_process_xp_events(args):
+    from .config import connect
+
+    conn = connect(args.dsn)
+    if args.status:
+        status = print_status(conn)
+        conn.close()
+        return status
+
+    worker = EventWorker(
+        conn,
+        batch=args.batch,
+        lock_timeout=args.lock_timeout,
+        statement_timeout=args.statement_timeout,
+        retries=args.retries,
+    )
+    try:
+        while True:
+            try:
+                result = worker.drain()
+            except Exception as e:
+                conn.rollback()
+                print(f"FAILED: {e}")
+                if not args.every:
+                    return 1
+            else:
+                if result["events"] or not args.every:
+                    print(f"Applied {result['events']} event(s) in {result['batches']} batch(es) "
+                          f"({result['ms']} ms)")
+            if not args.every:
+                return 0
+            time.sleep(args.every)
+    except KeyboardInterrupt:
+        print("Stopped.")
+        return 0
+    finally:
+        conn.close()
+
+
+def add_arguments(subparsers):
+    process = subparsers.add_parser(
+        "process-xp-events", help="Apply pending gamification events (xp_events) in batches")
+    process.add_argument("--batch", type=int, default=1000, help="Events per process_xp_events transaction")
+    process.add_argument("--status", action="store_true", help="Show how many events are pending and exit")
+    process.add_argument("--every", type=float, help="Drain again every this many seconds until interrupted")
+    process.add_argument("--lock-timeout", default="2s", help="lock_timeout per batch transaction")
+    process.add_argument("--statement-timeout", default="1min", help="statement_timeout per batch transaction")
+    process.add_argument("--retries", type=int, default=5, help="Retries after a lock timeout or deadlock")
+    process.set_defaults(func=run_process_xp_events)
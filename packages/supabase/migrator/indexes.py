@@ -0,0 +1,377 @@
+"""
+Post-transaction index phase.
+
+A plain CREATE INDEX inside a migration's transaction holds a SHARE lock on
+its table, blocking every write, until the whole file commits. During `up`,
+a CREATE INDEX on a table that already exists before the file runs is
+taken out of the transaction instead: it is recorded in
+schema_migration_indexes together with the file and built after the commit
+with CREATE INDEX CONCURRENTLY, which blocks only other DDL.
+
+Two shapes are recognised: top-level CREATE INDEX statements and DO blocks
+that only wrap one CREATE INDEX in an exception handler (the $migration$
+pattern). Errors from the latter were swallowed before, so their failures
+are reported but do not stop the run.
+
+Builds use a session-level maintenance_work_mem and
+max_parallel_maintenance_workers and print pg_stat_progress_create_index
+as they go. An index left INVALID by an interrupted concurrent build is
+rebuilt with REINDEX INDEX CONCURRENTLY; IF NOT EXISTS would skip it.
+"""
+
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import List
+
+from . import ledger
+from .sql_lexer import DOLLAR, ddl_statements, read_name, skip_words
+
+PROGRESS_QUERY = """
+SELECT phase, blocks_done, blocks_total, tuples_done, tuples_total
+FROM pg_stat_progress_create_index
+WHERE pid = %s
+"""
+
+VALIDITY_QUERY = "SELECT i.indisvalid FROM pg_index i WHERE i.indexrelid = to_regclass(%s)"
+
+INVALID_QUERY = """
+SELECT n.nspname, c.relname, t.relname, pg_relation_size(c.oid)
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_class t ON t.oid = i.indrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE NOT i.indisvalid
+  AND n.nspname NOT IN ('pg_catalog', 'information_schema', 'pg_toast')
+ORDER BY 1, 2
+"""
+
+# Left behind by an interrupted REINDEX CONCURRENTLY; the original is intact
+_CCNEW_RE = re.compile(r"_ccnew\d*$")
+_WRAPPER_RE = re.compile(r"DO\s+\$\w*\$\s*(?:BEGIN\s+)+$", re.IGNORECASE)
+
+
+@dataclass
+class DeferredIndex:
+    version: str
+    name: str
+    table: str
+    definition: str  # CREATE INDEX CONCURRENTLY IF NOT EXISTS ...
+    guarded: bool = False  # wrapped in an exception handler in the migration
+
+
+def parse_index(stmt):
+    """(name, table, unique) of a named CREATE INDEX statement, else None"""
+    tokens = stmt.significant
+    if not stmt.startswith("CREATE"):
+        return None
+    i = skip_words(tokens, 1, "UNIQUE")
+    unique = i == 2
+    if i >= len(tokens) or tokens[i].upper != "INDEX":
+        return None
+    i = skip_words(tokens, i + 1, "CONCURRENTLY")
+    i = skip_words(tokens, i, "IF", "NOT", "EXISTS")
+    if i >= len(tokens) or tokens[i].upper == "ON":
+        return None  # unnamed: cannot be tracked or guarded with IF NOT EXISTS
+    name, i = read_name(tokens, i)
+    i = skip_words(tokens, i, "ON")
+    i = skip_words(tokens, i, "ONLY")
+    table, _ = read_name(tokens, i)
+    if name is None or table is None:
+        return None
+    # Indexes live in their table's schema
+    if "." in table and "." not in name:
+        name = f"{table.rsplit('.', 1)[0]}.{name}"
+    return name, table, unique
+
+
+def concurrent_definition(stmt):
+    """The statement as CREATE INDEX CONCURRENTLY IF NOT EXISTS, without ';'"""
+    tokens = stmt.significant
+    k = next(n for n, t in enumerate(tokens) if t.upper == "INDEX")
+    anchor = tokens[k]
+    insert = ""
+    if tokens[k + 1].upper == "CONCURRENTLY":
+        anchor = tokens[k + 1]
+    else:
+        insert += " CONCURRENTLY"
+    following = tokens[tokens.index(anchor) + 1]
+    if following.upper != "IF":
+        insert += " IF NOT EXISTS"
+    offset = anchor.end - stmt.start
+    text = stmt.text[:offset] + insert + stmt.text[offset:]
+    return text.rstrip().rstrip(";").rstrip()
+
+
+def _index_statement(stmt):
+    """(CREATE INDEX statement, guarded) for deferrable statements, else None"""
+    if parse_index(stmt):
+        return stmt, False
+    tokens = stmt.significant
+    if not (len(tokens) >= 2 and stmt.startswith("DO") and tokens[1].kind == DOLLAR):
+        return None
+    inner = ddl_statements(stmt.text)[1:]
+    if len(inner) != 1 or not parse_index(inner[0]):
+        return None
+    # Only a bare BEGIN ... EXCEPTION wrapper; anything conditional stays put
+    if not _WRAPPER_RE.match(stmt.text[:inner[0].start]):
+        return None
+    return inner[0], True
+
+
+def format_progress(phase, blocks_done, blocks_total, tuples_done, tuples_total):
+    if blocks_total:
+        return f"{phase} {100 * blocks_done / blocks_total:.0f}% ({blocks_done}/{blocks_total} blocks)"
+    if tuples_total:
+        return f"{phase} {100 * tuples_done / tuples_total:.0f}% ({tuples_done}/{tuples_total} tuples)"
+    return phase
+
+
+class ProgressMonitor(threading.Thread):
+    """Prints pg_stat_progress_create_index for one backend"""
+
+    def __init__(self, conn, backend_pid, label, interval):
+        super().__init__(daemon=True)
+        self.conn = conn
+        self.backend_pid = backend_pid
+        self.label = label
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        last = None
+        with self.conn.cursor() as cur:
+            while not self._stopped.wait(self.interval):
+                cur.execute(PROGRESS_QUERY, (self.backend_pid,))
+                row = cur.fetchone()
+                if row and row != last:
+                    print(f"    {self.label}: {format_progress(*row)}")
+                    last = row
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.conn.close()
+
+
+class IndexPhase:
+    """Pulls index builds out of migrations and runs them CONCURRENTLY"""
+
+    def __init__(self, connect_fn=None, maintenance_work_mem="1GB", parallel_workers=2,
+                 progress_interval=5.0):
+        self.connect_fn = connect_fn
+        self.maintenance_work_mem = maintenance_work_mem
+        self.parallel_workers = parallel_workers
+        self.progress_interval = progress_interval
+
+    # -- extraction ---------------------------------------------------------
+
+    def extract(self, cur, version, statements):
+        """Split statements into (kept, deferred) before the file runs"""
+        kept, deferred = [], []
+        for position, stmt in enumerate(statements):
+            found = _index_statement(stmt)
+            index = None
+            if found is not None:
+                index = self._deferrable(cur, version, found, statements[position + 1:])
+            if index is None:
+                kept.append(stmt)
+            else:
+                deferred.append(index)
+        return kept, deferred
+
+    @staticmethod
+    def _deferrable(cur, version, found, later):
+        inner, guarded = found
+        name, table, unique = parse_index(inner)
+        short = re.escape(name.rsplit(".", 1)[-1])
+        for stmt in later:
+            # The rest of the file uses the index (COMMENT ON / ALTER INDEX ...)
+            if re.search(rf"\b{short}\b", stmt.text, re.IGNORECASE):
+                return None
+            # ... or may rely on it for ON CONFLICT arbitration
+            if unique and "CONFLICT" in stmt.words:
+                return None
+        # New tables are empty; building inline costs nothing
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+        if not cur.fetchone()[0]:
+            return None
+        return DeferredIndex(version, name, table, concurrent_definition(inner), guarded)
+
+    # -- building -----------------------------------------------------------
+
+    def build_all(self, conn, indexes: List[DeferredIndex]):
+        """Build deferred indexes after their migration committed; False on failure"""
+        conn.autocommit = True
+        try:
+            self._configure(conn)
+            for index in indexes:
+                if not self.build(conn, index) and not index.guarded:
+                    return False
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("RESET maintenance_work_mem")
+                cur.execute("RESET max_parallel_maintenance_workers")
+            conn.autocommit = False
+        return True
+
+    def _configure(self, conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('maintenance_work_mem', %s, false)",
+                        (self.maintenance_work_mem,))
+            cur.execute("SELECT set_config('max_parallel_maintenance_workers', %s, false)",
+                        (str(self.parallel_workers),))
+
+    def build(self, conn, index):
+        """Build one deferred index on an autocommit connection; True on success"""
+        started = time.perf_counter()
+        error = None
+        with conn.cursor() as cur:
+            valid = self._validity(cur, index.name)
+            try:
+                if valid is None:
+                    print(f"  Building {index.name} on {index.table} CONCURRENTLY...")
+                    self._run(conn, cur, index.definition, index.name)
+                elif valid is False:
+                    print(f"  {index.name} exists but is INVALID; rebuilding CONCURRENTLY...")
+                    self._run(conn, cur, f"REINDEX INDEX CONCURRENTLY {index.name}", index.name)
+            except Exception as e:
+                error = str(e).strip()
+                # A failed concurrent build leaves an INVALID index that
+                # still slows every write; drop it so a retry starts clean
+                if self._validity(cur, index.name) is False:
+                    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}")
+
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            ledger.set_index_status(cur, index.name, "failed" if error else "built", duration_ms, error)
+
+        if error is None:
+            print(f"  BUILT: {index.name} ({duration_ms} ms)")
+            return True
+        label = "SKIPPED (guarded in the migration)" if index.guarded else "FAILED"
+        print(f"  {label}: {index.name}")
+        print(f"  Error: {error}")
+        return False
+
+    def reindex(self, conn, name):
+        """REINDEX INDEX CONCURRENTLY on an autocommit connection; True on success"""
+        conn.autocommit = True
+        started = time.perf_counter()
+        try:
+            self._configure(conn)
+            with conn.cursor() as cur:
+                print(f"  Rebuilding {name} CONCURRENTLY...")
+                self._run(conn, cur, f"REINDEX INDEX CONCURRENTLY {name}", name)
+        except Exception as e:
+            print(f"  FAILED: {name}")
+            print(f"  Error: {str(e).strip()}")
+            return False
+        finally:
+            conn.autocommit = False
+        print(f"  REBUILT: {name} ({int((time.perf_counter() - started) * 1000)} ms)")
+        return True
+
+    def _run(self, conn, cur, sql, label):
+        monitor = None
+        if self.connect_fn is not None and self.progress_interval > 0:
+            monitor_conn = self.connect_fn()
+            monitor_conn.autocommit = True
+            monitor = ProgressMonitor(monitor_conn, conn.get_backend_pid(), label, self.progress_interval)
+            monitor.start()
+        try:
+            cur.execute(sql)
+        finally:
+            if monitor is not None:
+                monitor.stop()
+
+    @staticmethod
+    def _validity(cur, name):
+        """True/False for an existing index's indisvalid, None if it does not exist"""
+        cur.execute(VALIDITY_QUERY, (name,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+def invalid_indexes(conn):
+    """(qualified name, table, size bytes) of every INVALID index"""
+    with conn.cursor() as cur:
+        cur.execute(INVALID_QUERY)
+        return [
+            (f'"{schema}"."{name}"', table, size)
+            for schema, name, table, size in cur.fetchall()
+        ]
+
+
+# -- CLI ---------------------------------------------------------------------
+
+def phase_from_args(args):
+    from .config import connect
+
+    return IndexPhase(
+        lambda: connect(args.dsn),
+        maintenance_work_mem=args.maintenance_work_mem,
+        parallel_workers=args.parallel_workers,
+        progress_interval=args.progress_interval,
+    )
+
+
+def run_indexes(args):
+    from .config import connect
+
+    conn = connect(args.dsn)
+    ledger.ensure_ledger(conn)
+    phase = phase_from_args(args)
+    status = 0
+
+    if args.reindex:
+        for name in args.reindex:
+            if not phase.reindex(conn, name):
+                status = 1
+
+    if args.build:
+        rows = ledger.deferred_indexes(conn)
+        indexes = [DeferredIndex(version, name, table, definition, guarded)
+                   for name, version, table, definition, guarded, _ in rows]
+        print(f"Building {len(indexes)} deferred index(es)...")
+        if indexes and not phase.build_all(conn, indexes):
+            status = 1
+
+    invalid = invalid_indexes(conn)
+    if args.rebuild_invalid:
+        for name, table, _ in invalid:
+            if _CCNEW_RE.search(name.strip('"')):
+                print(f"  Dropping leftover {name} on {table}")
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                conn.autocommit = False
+            elif not phase.reindex(conn, name):
+                status = 1
+        invalid = invalid_indexes(conn)
+
+    pending = ledger.deferred_indexes(conn)
+    conn.close()
+    print(f"{len(pending)} deferred index build(s) pending or failed, {len(invalid)} invalid index(es).")
+    for name, version, table, _, guarded, state in pending:
+        print(f"  {state.upper():<7} {name} on {table} ({version}{', guarded' if guarded else ''})")
+    for name, table, size in invalid:
+        print(f"  INVALID {name} on {table} ({size / 1_048_576:.1f} MiB)")
+    return status
+
+
+def add_build_arguments(parser):
+    parser.add_argument("--maintenance-work-mem", default="1GB", help="maintenance_work_mem for index builds")
+    parser.add_argument("--parallel-workers", type=int, default=2, help="max_parallel_maintenance_workers for index builds")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between build progress lines (0 disables)")
+
+
+def add_arguments(subparsers):
+    indexes = subparsers.add_parser(
+        "indexes", help="Build deferred indexes, rebuild invalid ones, or REINDEX CONCURRENTLY"
+    )
+    indexes.add_argument("--build", action="store_true", help="Build pending and failed deferred indexes")
+    indexes.add_argument("--rebuild-invalid", action="store_true", help="REINDEX CONCURRENTLY every INVALID index")
+    indexes.add_argument("--reindex", nargs="+", metavar="INDEX", help="Rebuild these indexes without blocking writes")
+    add_build_arguments(indexes)
+    indexes.set_defaults(func=run_indexes)
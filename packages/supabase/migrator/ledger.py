@@ -0,0 +1,112 @@
+"""
+schema_migrations ledger: one row per applied migration file with the
+checksum of the file as applied and how long it took.
+
+schema_migration_indexes tracks index builds deferred out of a migration's
+transaction (see indexes): recorded as pending together with the file,
+then marked built or failed by the index phase.
+"""
+
+import hashlib
+
+LEDGER_DDL = """
+CREATE TABLE IF NOT EXISTS public.schema_migrations (
+  version TEXT PRIMARY KEY,
+  checksum TEXT NOT NULL,
+  duration_ms INTEGER NOT NULL DEFAULT 0,
+  applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  applied_by TEXT NOT NULL DEFAULT CURRENT_USER
+);
+
+CREATE TABLE IF NOT EXISTS public.schema_migration_indexes (
+  index_name TEXT PRIMARY KEY,
+  version TEXT NOT NULL,
+  table_name TEXT NOT NULL,
+  definition TEXT NOT NULL,
+  guarded BOOLEAN NOT NULL DEFAULT FALSE,
+  status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'built', 'failed')),
+  error TEXT,
+  duration_ms INTEGER,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+"""
+
+
+def checksum(sql):
+    """sha256 of the file contents with line endings normalised"""
+    return hashlib.sha256(sql.replace("\r\n", "\n").encode("utf-8")).hexdigest()
+
+
+def ensure_ledger(conn):
+    with conn.cursor() as cur:
+        cur.execute(LEDGER_DDL)
+    conn.commit()
+
+
+def applied_migrations(conn):
+    """{version: checksum} for everything recorded in the ledger"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT version, checksum FROM public.schema_migrations")
+        return dict(cur.fetchall())
+
+
+def record(cur, version, file_checksum, duration_ms):
+    """Insert or refresh a ledger row; runs inside the migration's transaction"""
+    cur.execute(
+        """
+        INSERT INTO public.schema_migrations (version, checksum, duration_ms)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (version) DO UPDATE SET
+          checksum = EXCLUDED.checksum,
+          duration_ms = EXCLUDED.duration_ms,
+          applied_at = NOW(),
+          applied_by = CURRENT_USER
+        """,
+        (version, file_checksum, duration_ms),
+    )
+
+
+def record_index(cur, index):
+    """Queue a deferred index build; runs inside the migration's transaction"""
+    cur.execute(
+        """
+        INSERT INTO public.schema_migration_indexes
+          (index_name, version, table_name, definition, guarded)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (index_name) DO UPDATE SET
+          version = EXCLUDED.version,
+          table_name = EXCLUDED.table_name,
+          definition = EXCLUDED.definition,
+          guarded = EXCLUDED.guarded,
+          status = 'pending',
+          error = NULL,
+          updated_at = NOW()
+        """,
+        (index.name, index.version, index.table, index.definition, index.guarded),
+    )
+
+
+def set_index_status(cur, index_name, status, duration_ms=None, error=None):
+    cur.execute(
+        """
+        UPDATE public.schema_migration_indexes
+        SET status = %s, duration_ms = %s, error = %s, updated_at = NOW()
+        WHERE index_name = %s
+        """,
+        (status, duration_ms, error, index_name),
+    )
+
+
+def deferred_indexes(conn, statuses=("pending", "failed")):
+    """(index_name, version, table_name, definition, guarded, status) rows"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT index_name, version, table_name, definition, guarded, status
+            FROM public.schema_migration_indexes
+            WHERE status = ANY(%s)
+            ORDER BY updated_at, index_name
+            """,
+            (list(statuses),),
+        )
+        return cur.fetchall()
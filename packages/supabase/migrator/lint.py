@@ -0,0 +1,611 @@
+"""
+Static performance linter for migration SQL.
+
+Flags statements that are instant on an empty dev database but lock or
+rewrite large tables in production:
+
+L001  CREATE INDEX without CONCURRENTLY on an existing table
+L002  foreign key without an index on its referencing column(s)
+L003  ALTER COLUMN ... TYPE that rewrites the table
+L004  ADD COLUMN with a volatile default / serial / stored generated column
+L005  ADD FOREIGN KEY / CHECK without NOT VALID on an existing table
+L006  SET NOT NULL on an existing table (full scan under ACCESS EXCLUSIVE)
+L007  RLS policy comparing a column with auth.uid() that no index supports
+
+"Existing table" means one not created earlier in the same file; tables
+(and materialized views) created in the same migration are empty, or
+populated as part of it, so none of this matters there.
+Every file is parsed (including the DDL inside DO blocks) so that indexes
+added by later migrations count towards L002.
+
+Silence a finding with a comment on the statement's line or the line
+above it: -- migrator:lint-ignore L001,L005
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass
+
+from .sql_lexer import (
+    PUNCT,
+    QUOTED_IDENT,
+    SEMI,
+    WORD,
+    LexError,
+    ddl_statements,
+    identifier,
+    read_name,
+    skip_words,
+)
+
+ERROR = "error"
+WARNING = "warning"
+
+RULES = {
+    "L001": (WARNING, "index-not-concurrent"),
+    "L002": (WARNING, "fk-without-index"),
+    "L003": (ERROR, "type-change-rewrite"),
+    "L004": (ERROR, "volatile-default"),
+    "L005": (WARNING, "constraint-validates"),
+    "L006": (WARNING, "set-not-null"),
+    "L007": (WARNING, "policy-without-index"),
+}
+
+VOLATILE_FUNCTIONS = {
+    "GEN_RANDOM_UUID", "UUID_GENERATE_V1", "UUID_GENERATE_V4", "RANDOM",
+    "CLOCK_TIMESTAMP", "TIMEOFDAY", "NEXTVAL",
+}
+SERIAL_TYPES = {"SERIAL", "BIGSERIAL", "SMALLSERIAL", "SERIAL4", "SERIAL8", "SERIAL2"}
+TEXT_TYPES = {"TEXT", "VARCHAR", "CHARACTER VARYING"}
+
+# Words that end the type of a column definition
+_COLUMN_CONSTRAINTS = {
+    "NOT", "NULL", "DEFAULT", "PRIMARY", "UNIQUE", "REFERENCES", "CHECK",
+    "CONSTRAINT", "GENERATED", "COLLATE",
+}
+_TABLE_CONSTRAINTS = {"CONSTRAINT", "PRIMARY", "UNIQUE", "FOREIGN", "CHECK", "EXCLUDE", "LIKE"}
+_IGNORE_RE = re.compile(r"--\s*migrator:lint-ignore\s+([\w, ]+)")
+
+
+@dataclass
+class Finding:
+    version: str
+    line: int
+    rule: str
+    severity: str
+    message: str
+    suggestion: str
+
+    def format(self):
+        return (f"{self.version}:{self.line}: {self.rule} {self.severity}: {self.message}\n"
+                f"    fix: {self.suggestion}")
+
+
+# -- token helpers -----------------------------------------------------------
+
+def _split_top_level(tokens):
+    """Split tokens on commas at parenthesis depth 0"""
+    parts, current, depth = [], [], 0
+    for token in tokens:
+        if token.kind == PUNCT and token.text in "([":
+            depth += 1
+        elif token.kind == PUNCT and token.text in ")]":
+            depth -= 1
+        elif token.kind == PUNCT and token.text == "," and depth == 0:
+            parts.append(current)
+            current = []
+            continue
+        current.append(token)
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _parenthesised(tokens, i):
+    """Tokens inside the parenthesis group opening at or after tokens[i]"""
+    while i < len(tokens) and tokens[i].text != "(":
+        i += 1
+    depth = 0
+    for j in range(i, len(tokens)):
+        if tokens[j].kind != PUNCT:
+            continue
+        if tokens[j].text == "(":
+            depth += 1
+        elif tokens[j].text == ")":
+            depth -= 1
+            if depth == 0:
+                return tokens[i + 1:j], j + 1
+    return tokens[i + 1:], len(tokens)
+
+
+def _column_list(tokens, i):
+    inner, end = _parenthesised(tokens, i)
+    return [identifier(part[0]) for part in _split_top_level(inner) if part], end
+
+
+def _type_of(tokens):
+    """Normalised type name of a column definition's tokens"""
+    words = []
+    for token in tokens:
+        if token.upper in _COLUMN_CONSTRAINTS:
+            break
+        words.append(token.upper if token.kind == WORD else token.text)
+    return " ".join(words).replace(" (", "(").replace("( ", "(").replace(" )", ")")
+
+
+def _type_length(type_name):
+    match = re.search(r"\((\d+)\)", type_name)
+    return int(match.group(1)) if match else None
+
+
+# -- linter ------------------------------------------------------------------
+
+class Linter:
+    """Walks migrations in apply order, tracking the schema they build"""
+
+    def __init__(self):
+        self.findings = []
+        self.indexed = set()  # (table, leading column)
+        self.column_types = {}  # (table, column) -> type
+        self.foreign_keys = []  # (version, line, table, columns, target)
+        self.policies = []  # (version, line, table, column, policy)
+        self.tables = set()
+        self._order = {}  # version -> apply position
+        self._version = None
+        self._sql = ""
+        self._created_here = set()
+        self._ignores = {}
+        self._deferred_ignores = {}  # (version, line) -> codes, checked in finish()
+
+    # -- driving ----------------------------------------------------------
+
+    def lint_file(self, version, sql):
+        self._version = version
+        self._order[version] = len(self._order)
+        self._sql = sql
+        self._created_here = set()
+        self._ignores = {}
+        for number, text in enumerate(sql.split("\n"), 1):
+            match = _IGNORE_RE.search(text)
+            if match:
+                codes = {code.strip() for code in match.group(1).replace(",", " ").split()}
+                self._ignores[number] = codes
+                self._ignores.setdefault(number + 1, set()).update(codes)
+
+        try:
+            statements = ddl_statements(sql)
+        except LexError as e:
+            print(f"{version}: cannot lint ({e})", file=sys.stderr)
+            return
+        for stmt in statements:
+            tokens = [t for t in stmt.significant if t.kind != SEMI]
+            if stmt.startswith("CREATE"):
+                self._create(stmt, tokens)
+            elif stmt.startswith("ALTER", "TABLE"):
+                self._alter_table(stmt, tokens)
+            elif stmt.startswith("DROP", "TABLE"):
+                self._drop_table(tokens)
+            elif stmt.startswith("DROP", "MATERIALIZED", "VIEW"):
+                self._drop_table(tokens[1:])
+
+    def finish(self):
+        """Report foreign keys and policies that no index ended up supporting"""
+        reported = set()
+        for version, line, table, columns, target in self.foreign_keys:
+            if (table, columns[0]) in self.indexed or (table, columns) in reported:
+                continue
+            reported.add((table, columns))
+            if "L002" in self._deferred_ignores.get((version, line), ()):
+                continue
+            cols = ", ".join(columns)
+            self.findings.append(Finding(
+                version, line, "L002", RULES["L002"][0],
+                f"foreign key {table}({cols}) -> {target} has no supporting index; "
+                f"deletes/updates on {target} and joins scan {table}",
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_{table.split('.')[-1]}_{columns[0]} "
+                f"ON {table} ({cols});",
+            ))
+        for version, line, table, column, policy in self.policies:
+            if (table, column) in self.indexed or (table, (column,)) in reported:
+                continue
+            reported.add((table, (column,)))
+            if "L007" in self._deferred_ignores.get((version, line), ()):
+                continue
+            self.findings.append(Finding(
+                version, line, "L007", RULES["L007"][0],
+                f"policy {policy} on {table} filters on {column} = auth.uid() but no index "
+                f"leads with {column}; every query as a user scans {table}",
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_{table.split('.')[-1]}_{column} "
+                f"ON {table} ({column});",
+            ))
+        self.findings.sort(key=lambda f: (self._order.get(f.version, 0), f.line))
+        return self.findings
+
+    # -- helpers ------------------------------------------------------------
+
+    def _line(self, stmt, token):
+        return stmt.line + self._sql.count("\n", stmt.start, token.start)
+
+    def _report(self, stmt, token, rule, message, suggestion):
+        line = self._line(stmt, token)
+        if rule in self._ignores.get(line, ()) or rule in self._ignores.get(stmt.line, ()):
+            return
+        self.findings.append(Finding(self._version, line, rule, RULES[rule][0], message, suggestion))
+
+    def _existing(self, table):
+        return table not in self._created_here
+
+    def _defer_ignores(self, stmt, line):
+        ignored = self._ignores.get(line, set()) | self._ignores.get(stmt.line, set())
+        if ignored:
+            self._deferred_ignores[(self._version, line)] = ignored
+
+    def _add_fk(self, stmt, token, table, columns, target):
+        line = self._line(stmt, token)
+        self.foreign_keys.append((self._version, line, table, tuple(columns), target))
+        self._defer_ignores(stmt, line)
+
+    # -- CREATE TABLE / CREATE INDEX ---------------------------------------
+
+    def _create(self, stmt, tokens):
+        i = 1
+        i = skip_words(tokens, i, "OR", "REPLACE")
+        while i < len(tokens) and tokens[i].upper in ("UNLOGGED", "TEMP", "TEMPORARY", "UNIQUE"):
+            i += 1
+        if i < len(tokens) and tokens[i].upper == "TABLE":
+            self._create_table(stmt, tokens, i + 1)
+        elif i + 1 < len(tokens) and tokens[i].upper == "MATERIALIZED" and tokens[i + 1].upper == "VIEW":
+            self._create_relation(tokens, i + 2)
+        elif i < len(tokens) and tokens[i].upper == "INDEX":
+            self._create_index(stmt, tokens, i + 1)
+        elif i < len(tokens) and tokens[i].upper == "POLICY":
+            self._create_policy(stmt, tokens, i + 1)
+
+    def _create_relation(self, tokens, i):
+        """Record a table or materialized view created by this file; returns its name"""
+        i = skip_words(tokens, i, "IF", "NOT", "EXISTS")
+        name, _ = read_name(tokens, i)
+        if name is None:
+            return None
+        # CREATE ... IF NOT EXISTS on a relation from an earlier file is a no-op
+        if name in self.tables and name not in self._created_here:
+            return None
+        self.tables.add(name)
+        self._created_here.add(name)
+        return name
+
+    def _create_table(self, stmt, tokens, i):
+        i = skip_words(tokens, i, "IF", "NOT", "EXISTS")
+        table, j = read_name(tokens, i)
+        if table is None:
+            return
+        if j >= len(tokens) or tokens[j].text != "(":
+            # CREATE TABLE ... AS is created here too; PARTITION OF is not
+            # a new table as far as its parent's rules go
+            if j < len(tokens) and tokens[j].upper == "AS":
+                self._create_relation(tokens, i)
+            return
+        if self._create_relation(tokens, i) is None:
+            return
+        inner, _ = _parenthesised(tokens, i)
+        for element in _split_top_level(inner):
+            if not element:
+                continue
+            if element[0].upper in _TABLE_CONSTRAINTS:
+                self._table_constraint(stmt, table, element)
+            else:
+                self._column(stmt, table, element)
+
+    def _drop_table(self, tokens):
+        i = skip_words(tokens, 2, "IF", "EXISTS")
+        for part in _split_top_level(tokens[i:]):
+            table, _ = read_name(part, 0)
+            self.tables.discard(table)
+            self._created_here.discard(table)
+            self.indexed = {entry for entry in self.indexed if entry[0] != table}
+            self.policies = [entry for entry in self.policies if entry[2] != table]
+
+    def _column(self, stmt, table, element):
+        column = identifier(element[0])
+        self.column_types[(table, column)] = _type_of(element[1:])
+        words = [t.upper for t in element if t.kind == WORD]
+        if "PRIMARY" in words or "UNIQUE" in words:
+            self.indexed.add((table, column))
+        for k, token in enumerate(element):
+            if token.upper == "REFERENCES":
+                target, _ = read_name(element, k + 1)
+                self._add_fk(stmt, element[0], table, [column], target)
+                break
+
+    def _table_constraint(self, stmt, table, element):
+        i = 0
+        if element[0].upper == "CONSTRAINT":
+            i = 2
+        if i >= len(element):
+            return
+        keyword = element[i].upper
+        if keyword in ("PRIMARY", "UNIQUE"):
+            columns, _ = _column_list(element, i)
+            if columns:
+                self.indexed.add((table, columns[0]))
+        elif keyword == "FOREIGN":
+            columns, end = _column_list(element, i)
+            end = skip_words(element, end, "REFERENCES")
+            target, _ = read_name(element, end)
+            if columns:
+                self._add_fk(stmt, element[0], table, columns, target)
+
+    def _create_index(self, stmt, tokens, i):
+        concurrently = i < len(tokens) and tokens[i].upper == "CONCURRENTLY"
+        while i < len(tokens) and tokens[i].upper != "ON":
+            i += 1
+        i = skip_words(tokens, i + 1, "ONLY")
+        table, i = read_name(tokens, i)
+        if table is None:
+            return
+        inner, _ = _parenthesised(tokens, i)
+        elements = _split_top_level(inner)
+        if elements and elements[0] and elements[0][0].kind in (WORD, QUOTED_IDENT):
+            first = elements[0]
+            # A bare column, optionally followed by opclass / ASC / DESC
+            if len(first) == 1 or first[1].kind == WORD:
+                self.indexed.add((table, identifier(first[0])))
+        if not concurrently and self._existing(table):
+            self._report(
+                stmt, stmt.significant[0], "L001",
+                f"CREATE INDEX on existing table {table} blocks writes for the whole build",
+                "CREATE INDEX CONCURRENTLY outside the migration transaction "
+                "(the runner's index phase does this)",
+            )
+
+    # -- CREATE POLICY ------------------------------------------------------
+
+    def _create_policy(self, stmt, tokens, i):
+        if i >= len(tokens):
+            return
+        policy = tokens[i].text
+        i = skip_words(tokens, i + 1, "ON")
+        table, i = read_name(tokens, i)
+        if table not in self.tables:
+            return  # storage.objects and other tables the migrations don't define
+        # Only USING filters rows that are read; WITH CHECK sees one new row
+        while i < len(tokens) and tokens[i].upper != "USING":
+            i += 1
+        if i == len(tokens):
+            return
+        _, end = _parenthesised(tokens, i)
+        # Comparisons at the policy's own level (subqueries filter other
+        # tables); an OR there keeps any single index from being used
+        subquery = []
+        found = []
+        for k in range(i + 1, end):
+            token = tokens[k]
+            if token.text == "(":
+                subquery.append(_select_follows(tokens, k) and _uid_call_end(tokens, k) is None)
+            elif token.text == ")" and subquery:
+                subquery.pop()
+            elif any(subquery):
+                continue
+            elif token.upper == "OR":
+                return
+            elif token.text == "=":
+                column = _compared_column(tokens, k)
+                if column is not None:
+                    found.append((self._line(stmt, token), column))
+        for line, column in found:
+            self.policies.append((self._version, line, table, column, policy))
+            self._defer_ignores(stmt, line)
+
+    # -- ALTER TABLE --------------------------------------------------------
+
+    def _alter_table(self, stmt, tokens):
+        i = skip_words(tokens, 2, "IF", "EXISTS")
+        i = skip_words(tokens, i, "ONLY")
+        table, i = read_name(tokens, i)
+        if table is None:
+            return
+        existing = self._existing(table)
+        for action in _split_top_level(tokens[i:]):
+            if action:
+                self._alter_action(stmt, table, action, existing)
+
+    def _alter_action(self, stmt, table, action, existing):
+        words = [t.upper for t in action]
+        head = action[0]
+
+        if words[0] == "ADD" and (len(words) < 2 or words[1] not in ("CONSTRAINT", "PRIMARY", "UNIQUE", "FOREIGN", "CHECK", "EXCLUDE")):
+            i = skip_words(action, 1, "COLUMN")
+            i = skip_words(action, i, "IF", "NOT", "EXISTS")
+            if i >= len(action):
+                return
+            if "IF" in words[:i] and (table, identifier(action[i])) in self.column_types:
+                return  # ADD COLUMN IF NOT EXISTS on a column that is already there
+            self._column(stmt, table, action[i:])
+            if existing:
+                self._check_added_column(stmt, table, action, i)
+            return
+
+        if words[0] == "ADD":
+            self._table_constraint(stmt, table, action[1:])
+            kind = next((w for w in words[1:] if w in ("FOREIGN", "CHECK")), None)
+            if existing and kind and "NOT" not in words[-2:] and "VALID" not in words:
+                constraint = "FOREIGN KEY" if kind == "FOREIGN" else "CHECK"
+                self._report(
+                    stmt, head, "L005",
+                    f"ADD {constraint} on existing table {table} scans every row while holding its lock",
+                    f"ADD ... {constraint} ... NOT VALID, then ALTER TABLE {table} "
+                    "VALIDATE CONSTRAINT ... in a later migration",
+                )
+            return
+
+        if words[0] != "ALTER" or not existing:
+            return
+        i = skip_words(action, 1, "COLUMN")
+        if i >= len(action):
+            return
+        column = identifier(action[i])
+        rest = words[i + 1:]
+        if rest[:2] == ["SET", "NOT"]:
+            self._report(
+                stmt, head, "L006",
+                f"SET NOT NULL on {table}.{column} scans the table under ACCESS EXCLUSIVE",
+                f"ADD CONSTRAINT {column}_not_null CHECK ({column} IS NOT NULL) NOT VALID; "
+                "VALIDATE CONSTRAINT; then SET NOT NULL (uses the validated check)",
+            )
+        elif rest[:1] == ["TYPE"] or rest[:3] == ["SET", "DATA", "TYPE"]:
+            start = i + 1 + (1 if rest[0] == "TYPE" else 3)
+            type_tokens = action[start:]
+            if "USING" in rest:
+                type_tokens = type_tokens[:[t.upper for t in type_tokens].index("USING")]
+            new_type = _type_of(type_tokens)
+            old_type = self.column_types.get((table, column))
+            self.column_types[(table, column)] = new_type
+            if "USING" not in rest and _binary_coercible(old_type, new_type):
+                return
+            self._report(
+                stmt, head, "L003",
+                f"changing {table}.{column} from {old_type or 'unknown type'} to {new_type} "
+                "rewrites the table under ACCESS EXCLUSIVE",
+                f"add a new {new_type} column, backfill it in batches, then swap names "
+                "(varchar -> text and widening varchar(n) need no rewrite)",
+            )
+
+    def _check_added_column(self, stmt, table, action, i):
+        column = identifier(action[i])
+        words = [t.upper for t in action[i + 1:]]
+        type_words = _type_of(action[i + 1:]).split()
+        reason = None
+        if type_words and type_words[0] in SERIAL_TYPES:
+            reason = f"{type_words[0].lower()} fills every existing row from a sequence"
+        elif "GENERATED" in words and "STORED" in words:
+            reason = "a stored generated column is computed for every existing row"
+        elif "DEFAULT" in words:
+            default = words[words.index("DEFAULT") + 1:]
+            volatile = next((w for w in default if w in VOLATILE_FUNCTIONS), None)
+            if volatile:
+                reason = f"volatile default {volatile.lower()}() is evaluated for every existing row"
+        if reason:
+            self._report(
+                stmt, action[0], "L004",
+                f"ADD COLUMN {table}.{column}: {reason}, rewriting the table under ACCESS EXCLUSIVE",
+                "add the column without the default, SET DEFAULT for new rows, "
+                "then backfill existing rows in batches",
+            )
+
+
+def _select_follows(tokens, k):
+    return k + 1 < len(tokens) and tokens[k + 1].upper == "SELECT"
+
+
+def _uid_call_end(tokens, k):
+    """Index after auth.uid() or (SELECT auth.uid()) starting at tokens[k], or None"""
+    if tokens[k].text == "(" and _select_follows(tokens, k):
+        end = _uid_call_end(tokens, k + 2) if k + 2 < len(tokens) else None
+        return end + 1 if end is not None and end < len(tokens) and tokens[end].text == ")" else None
+    words = [t.upper for t in tokens[k:k + 5]]
+    return k + 5 if words == ["AUTH", ".", "UID", "(", ")"] else None
+
+
+def _compared_column(tokens, k):
+    """Column compared with auth.uid() by the = at tokens[k], or None"""
+    if k + 1 < len(tokens) and _uid_call_end(tokens, k + 1) is not None:
+        column = tokens[k - 1]
+    else:
+        # auth.uid() = column / (SELECT auth.uid()) = column
+        for start in (k - 5, k - 8):
+            if start >= 0 and _uid_call_end(tokens, start) == k:
+                break
+        else:
+            return None
+        column = tokens[k + 1] if k + 1 < len(tokens) else None
+    if column is None or column.kind not in (WORD, QUOTED_IDENT):
+        return None
+    return identifier(column)
+
+
+def _binary_coercible(old_type, new_type):
+    """True for type changes PostgreSQL performs without a rewrite"""
+    if not old_type:
+        return False
+    old_base = old_type.split("(")[0].strip()
+    new_base = new_type.split("(")[0].strip()
+    if old_base not in TEXT_TYPES or new_base not in TEXT_TYPES:
+        return old_type == new_type
+    if new_base == "TEXT":
+        return True
+    if old_base == "TEXT":
+        return _type_length(new_type) is None
+    old_len, new_len = _type_length(old_type), _type_length(new_type)
+    return new_len is None or (old_len is not None and new_len >= old_len)
+
+
+def lint_migrations(migrations, report_versions=None, rules=None):
+    """
+    Lint migrations in apply order. Findings are limited to report_versions
+    (default: all) and rules (default: all), but every file is parsed for
+    schema context.
+    """
+    linter = Linter()
+    for migration in migrations:
+        linter.lint_file(migration.version, migration.read())
+    findings = linter.finish()
+    return [
+        f for f in findings
+        if (report_versions is None or f.version in report_versions)
+        and (rules is None or f.rule in rules)
+    ]
+
+
+def print_findings(findings):
+    for finding in findings:
+        print(finding.format())
+    errors = sum(1 for f in findings if f.severity == ERROR)
+    print(f"{len(findings)} finding(s): {errors} error(s), {len(findings) - errors} warning(s).")
+
+
+# -- CLI ---------------------------------------------------------------------
+
+def run_lint(args):
+    from .runner import Migration, discover_migrations
+
+    started = time.perf_counter()
+    migrations = discover_migrations(include_destructive=True)
+    report_versions = None
+    if args.files:
+        by_path = {os.path.abspath(m.path): m for m in migrations}
+        report_versions = set()
+        for path in args.files:
+            migration = by_path.get(os.path.abspath(path))
+            if migration is None:
+                migration = Migration(version=path, path=path, rewrite=False)
+                migrations.append(migration)
+            report_versions.add(migration.version)
+    rules = set(args.rules.split(",")) if args.rules else None
+    findings = lint_migrations(migrations, report_versions, rules)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if args.format == "json":
+        print(json.dumps([asdict(f) for f in findings], indent=2))
+    else:
+        print_findings(findings)
+        print(f"Linted {len(migrations)} file(s) in {elapsed_ms:.0f} ms.")
+
+    if args.fail_on == "never":
+        return 0
+    failing = {ERROR} if args.fail_on == ERROR else {ERROR, WARNING}
+    return 1 if any(f.severity in failing for f in findings) else 0
+
+
+def add_arguments(subparsers):
+    lint = subparsers.add_parser("lint", help="Flag migration statements that lock or rewrite large tables")
+    lint.add_argument("files", nargs="*", help="Only report findings in these files (default: every migration)")
+    lint.add_argument("--format", choices=("text", "json"), default="text")
+    lint.add_argument("--rules", help="Comma-separated rule codes to report, e.g. L001,L002")
+    lint.add_argument(
+        "--fail-on", choices=(ERROR, WARNING, "never"), default=ERROR,
+        help="Exit non-zero when findings of this severity (or worse) exist",
+    )
+    lint.set_defaults(func=run_lint)
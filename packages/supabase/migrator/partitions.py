@@ -0,0 +1,604 @@
+"""
+Monthly range partitioning for append-only tables (migration 081).
+
+--convert turns a registered table into a table partitioned by month on
+its time column without copying it:
+
+1. A CHECK (column IS NOT NULL AND column < boundary) is added NOT VALID
+   and validated, which scans the table without blocking writes. The
+   boundary is the first UTC month start at least two days away.
+2. A unique index on the primary key columns plus the time column is
+   built CONCURRENTLY; a partitioned table's key must include the
+   partition column.
+3. One short transaction under lock_timeout (retried with backoff) renames
+   the table to <table>_legacy and creates the partitioned <table> in its
+   place: same columns, defaults, checks and indexes, monthly partitions
+   from the boundary, and the old table attached FROM (MINVALUE) TO
+   (boundary). The validated CHECK lets ATTACH skip its scan. Triggers,
+   policies, grants and owned sequences move to the new table, and views
+   over the old one are re-pointed at it.
+
+If a step fails before the swap commits (validation, the index build, or
+a swap that runs out of retries), the check and the key index are dropped
+again, so the table is left as it was.
+
+Tables that a partitioned table cannot replace transparently are refused:
+unique indexes without the time column (ON CONFLICT arbiters), incoming
+foreign keys, identity columns, materialized views and publications.
+
+--maintain pre-creates partitions (premake_time_partitions(), which pg_cron
+also runs daily) and detaches partitions past retention_months with
+DETACH PARTITION CONCURRENTLY. With --archive-dir each detached partition
+is written to <dir>/<partition>.csv.gz with COPY and dropped once the file
+is complete and its row count matches; without it, detached partitions
+are left as ordinary tables. Restore an archive into a scratch table with
+
+    gunzip -c <file> | psql -c "\\copy <table> FROM STDIN (FORMAT csv, HEADER)"
+
+Requires PostgreSQL 14+ (DETACH CONCURRENTLY).
+"""
+
+import gzip
+import os
+import time
+from dataclasses import dataclass, replace
+from typing import Optional
+
+# lock_not_available, query_canceled (statement/lock timeout)
+RETRYABLE = {"55P03", "57014"}
+
+
+@dataclass
+class TimePartitioned:
+    table: str  # schema-qualified
+    column: str = "created_at"
+    premake_months: int = 3
+    retention_months: Optional[int] = None  # None: keep every month
+    description: str = ""
+
+
+TABLES = {
+    t.table: t
+    for t in (
+        TimePartitioned(
+            table="public.jobs_archive",
+            column="archived_at",
+            retention_months=6,
+            description="finished jobs; archive_finished_jobs() keeps jobs itself small (075)",
+        ),
+        TimePartitioned(
+            table="public.daily_updates",
+            description="refused while date and canonical_url are unique on their own (073 upserts)",
+        ),
+        TimePartitioned(
+            table="public.xp_transactions",
+            retention_months=24,
+            description="XP ledger; totals live in user_xp",
+        ),
+        TimePartitioned(
+            table="public.search_history",
+            retention_months=12,
+            description="per-user search history",
+        ),
+        TimePartitioned(
+            table="public.question_attempts",
+            retention_months=24,
+            description="answers; aggregates live in the 076 rollups",
+        ),
+    )
+}
+
+BOUNDARY_SQL = """
+SELECT CASE WHEN next_month - (NOW() AT TIME ZONE 'UTC') < INTERVAL '2 days'
+            THEN (next_month + INTERVAL '1 month')::DATE ELSE next_month::DATE END
+FROM (SELECT date_trunc('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '1 month' AS next_month) m
+"""
+
+RELKIND_SQL = "SELECT relkind FROM pg_class WHERE oid = to_regclass(%(table)s)"
+
+COLUMN_SQL = """
+SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+WHERE attrelid = %(table)s::regclass AND attname = %(column)s AND NOT attisdropped
+"""
+
+BLOCKERS_SQL = """
+SELECT 'unique index ' || c.relname || ' does not include ' || %(column)s
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+WHERE i.indrelid = %(table)s::regclass AND i.indisunique AND NOT i.indisprimary
+  AND NOT EXISTS (
+    SELECT 1 FROM pg_attribute a
+    WHERE a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) AND a.attname = %(column)s
+  )
+UNION ALL
+SELECT 'foreign key ' || conname || ' on ' || conrelid::regclass || ' references it'
+FROM pg_constraint WHERE confrelid = %(table)s::regclass AND contype = 'f'
+UNION ALL
+SELECT 'identity column ' || attname
+FROM pg_attribute WHERE attrelid = %(table)s::regclass AND attidentity <> '' AND NOT attisdropped
+UNION ALL
+SELECT DISTINCT 'materialized view ' || v.oid::regclass || ' reads it'
+FROM pg_depend d
+JOIN pg_rewrite r ON r.oid = d.objid
+JOIN pg_class v ON v.oid = r.ev_class
+WHERE d.classid = 'pg_rewrite'::regclass AND d.refobjid = %(table)s::regclass AND v.relkind = 'm'
+UNION ALL
+SELECT 'publication ' || p.pubname || ' includes it'
+FROM pg_publication_rel pr JOIN pg_publication p ON p.oid = pr.prpubid
+WHERE pr.prrelid = %(table)s::regclass
+"""
+
+PRIMARY_KEY_SQL = """
+SELECT c.conname, array_agg(a.attname ORDER BY k.ord)
+FROM pg_constraint c
+CROSS JOIN LATERAL unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord)
+JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+WHERE c.conrelid = %(table)s::regclass AND c.contype = 'p'
+GROUP BY c.conname
+"""
+
+# Everything that has to move to the partitioned table, read under the lock
+INDEXES_SQL = """
+SELECT c.relname, pg_get_indexdef(i.indexrelid)
+FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+WHERE i.indrelid = %(table)s::regclass AND NOT i.indisprimary AND c.relname <> %(key_index)s
+ORDER BY c.relname
+"""
+
+TRIGGERS_SQL = """
+SELECT tgname, pg_get_triggerdef(oid)
+FROM pg_trigger WHERE tgrelid = %(table)s::regclass AND NOT tgisinternal
+ORDER BY tgname
+"""
+
+POLICIES_SQL = """
+SELECT policyname,
+       format('CREATE POLICY %%I ON %%s AS %%s FOR %%s TO %%s', policyname, %(table)s, permissive, cmd,
+              (SELECT string_agg(CASE WHEN r = 'public' THEN 'PUBLIC' ELSE quote_ident(r) END, ', ')
+               FROM unnest(roles) AS r))
+         || COALESCE(' USING (' || qual || ')', '')
+         || COALESCE(' WITH CHECK (' || with_check || ')', '')
+FROM pg_policies
+WHERE schemaname = %(schema)s AND tablename = %(name)s
+ORDER BY policyname
+"""
+
+GRANTS_SQL = """
+SELECT format('GRANT %%s ON %%s TO %%s%%s', a.privilege_type, %(table)s,
+              CASE WHEN a.grantee = 0 THEN 'PUBLIC' ELSE quote_ident(r.rolname) END,
+              CASE WHEN a.is_grantable THEN ' WITH GRANT OPTION' ELSE '' END)
+FROM pg_class c
+CROSS JOIN LATERAL aclexplode(c.relacl) AS a
+LEFT JOIN pg_roles r ON r.oid = a.grantee
+WHERE c.oid = %(table)s::regclass AND a.grantee <> c.relowner
+"""
+
+TABLE_SQL = """
+SELECT relrowsecurity, relforcerowsecurity, obj_description(oid, 'pg_class')
+FROM pg_class WHERE oid = %(table)s::regclass
+"""
+
+SEQUENCES_SQL = """
+SELECT s.oid::regclass::text, a.attname
+FROM pg_depend d
+JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S'
+JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid
+WHERE d.refobjid = %(table)s::regclass AND d.deptype = 'a'
+"""
+
+VIEWS_SQL = """
+SELECT DISTINCT v.oid::regclass::text, pg_get_viewdef(v.oid), array_to_string(v.reloptions, ', ')
+FROM pg_depend d
+JOIN pg_rewrite r ON r.oid = d.objid
+JOIN pg_class v ON v.oid = r.ev_class
+WHERE d.classid = 'pg_rewrite'::regclass AND d.refobjid = %(table)s::regclass
+  AND v.relkind = 'v' AND v.oid <> %(table)s::regclass
+"""
+
+REGISTER_SQL = """
+INSERT INTO public.time_partitioned_tables
+  (table_name, partition_column, premake_months, retention_months, legacy_partition, legacy_until)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON CONFLICT (table_name) DO UPDATE SET
+  partition_column = EXCLUDED.partition_column,
+  premake_months = EXCLUDED.premake_months,
+  retention_months = EXCLUDED.retention_months,
+  legacy_partition = EXCLUDED.legacy_partition,
+  legacy_until = EXCLUDED.legacy_until,
+  converted_at = NOW()
+"""
+
+REGISTERED_SQL = """
+SELECT table_name, partition_column, premake_months, retention_months, legacy_partition, legacy_until, maintained_at
+FROM public.time_partitioned_tables ORDER BY table_name
+"""
+
+EXPIRED_SQL = """
+SELECT partition_name, upper_bound FROM time_partitions(%(table)s::regclass)
+WHERE upper_bound <= (date_trunc('month', NOW() AT TIME ZONE 'UTC')
+                      - make_interval(months => %(retention)s)) AT TIME ZONE 'UTC'
+ORDER BY upper_bound
+"""
+
+# Left attached but invisible by an interrupted DETACH ... CONCURRENTLY
+DETACH_PENDING_SQL = """
+SELECT format('%%I.%%I', n.nspname, c.relname)
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE i.inhparent = %(table)s::regclass AND i.inhdetachpending
+"""
+
+RUNWAY_SQL = "SELECT max(upper_bound), count(*), sum(total_bytes) FROM time_partitions(%(table)s::regclass)"
+
+
+def _split(table):
+    schema, _, name = table.rpartition(".")
+    return schema or "public", name
+
+
+def _qualify(name):
+    return name if "." in name else f"public.{name}"
+
+
+def _suffixed(name, suffix):
+    """name + suffix within PostgreSQL's 63-byte identifier limit"""
+    return name[:63 - len(suffix)] + suffix
+
+
+class ConversionError(Exception):
+    pass
+
+
+class Partitioner:
+    def __init__(self, conn, lock_timeout="2s", retries=5, backoff=1.0):
+        self.conn = conn
+        self.lock_timeout = lock_timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    def _retry(self, fn, label):
+        """fn(cur) in its own transaction under lock_timeout, retrying lock timeouts"""
+        for attempt in range(self.retries + 1):
+            try:
+                with self.conn.cursor() as cur:
+                    cur.execute("SELECT set_config('lock_timeout', %s, true)", (self.lock_timeout,))
+                    result = fn(cur)
+                self.conn.commit()
+                return result
+            except Exception as e:
+                self.conn.rollback()
+                if getattr(e, "pgcode", None) not in RETRYABLE or attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                print(f"  {label}: timed out waiting for a lock; retrying in {delay:.0f}s")
+                time.sleep(delay)
+
+    def _fetch(self, sql, params):
+        with self.conn.cursor() as cur:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+        self.conn.commit()
+        return rows
+
+    # -- conversion ---------------------------------------------------------
+
+    def convert(self, spec: TimePartitioned):
+        """Convert spec.table; database errors are raised as ConversionError"""
+        try:
+            return self._convert(spec)
+        except ConversionError:
+            raise
+        except Exception as e:
+            self.conn.rollback()
+            raise ConversionError(f"{spec.table}: {str(e).strip()}") from e
+
+    def _drop_leftovers(self, table, schema, bound_check, key_index):
+        """Remove the bound check and key index of a conversion that did not swap"""
+        print(f"  Removing {bound_check} and {key_index}...")
+        try:
+            self.conn.rollback()
+            self.conn.autocommit = True
+            try:
+                with self.conn.cursor() as cur:
+                    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {schema}.{key_index}")
+            finally:
+                self.conn.autocommit = False
+            self._retry(lambda cur: cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {bound_check}"),
+                        "drop check")
+        except Exception as e:
+            self.conn.rollback()
+            print(f"  WARNING: could not remove them ({str(e).strip()}); drop them by hand with\n"
+                  f"    DROP INDEX CONCURRENTLY IF EXISTS {schema}.{key_index};\n"
+                  f"    ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {bound_check};")
+
+    def _convert(self, spec: TimePartitioned):
+        table, column = spec.table, spec.column
+        schema, name = _split(table)
+        legacy = _suffixed(name, "_legacy")
+        bound_check = _suffixed(name, "_partition_bound")
+        key_index = _suffixed(name, "_legacy_pkey")
+        params = {"table": table, "column": column, "schema": schema, "name": name, "key_index": key_index}
+
+        kind = self._fetch(RELKIND_SQL, params)
+        if not kind or kind[0][0] is None:
+            raise ConversionError(f"{table} does not exist")
+        if kind[0][0] == "p":
+            print(f"{table} is already partitioned.")
+            return False
+        column_type = self._fetch(COLUMN_SQL, params)
+        if not column_type:
+            raise ConversionError(f"{table} has no column {column}")
+        if column_type[0][0] not in ("timestamp with time zone", "timestamp without time zone", "date"):
+            raise ConversionError(f"{table}.{column} is {column_type[0][0]}, not a timestamp or date")
+        blockers = [row[0] for row in self._fetch(BLOCKERS_SQL, params)]
+        if blockers:
+            raise ConversionError(f"{table} cannot be partitioned transparently: " + "; ".join(blockers))
+        primary = self._fetch(PRIMARY_KEY_SQL, params)
+        pk_name, pk_columns = primary[0] if primary else (None, [])
+        key_columns = list(pk_columns) + ([column] if column not in pk_columns else [])
+
+        boundary = self._fetch(BOUNDARY_SQL, {})[0][0]
+        # The same UTC instant as the partition bound, typed like the column,
+        # so that ATTACH can prove the check implies the bound and skip its scan
+        bound = f"'{boundary} 00:00:00+00'::{column_type[0][0]}"
+        print(f"Converting {table}: rows before {boundary} stay in {schema}.{legacy}, "
+              f"monthly partitions from there on")
+
+        # 3. Swap, run below once the check is validated and the key index built
+        def swap(cur):
+            cur.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+
+            def rows(sql):
+                cur.execute(sql, params)
+                return cur.fetchall()
+
+            indexes = rows(INDEXES_SQL)
+            triggers = rows(TRIGGERS_SQL)
+            policies = rows(POLICIES_SQL)
+            grants = [row[0] for row in rows(GRANTS_SQL)]
+            rls, force_rls, comment = rows(TABLE_SQL)[0]
+            sequences = rows(SEQUENCES_SQL)
+            views = rows(VIEWS_SQL)
+
+            cur.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL")
+            cur.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+            legacy_table = f"{schema}.{legacy}"
+            for index, _ in indexes:
+                cur.execute(f'ALTER INDEX {schema}."{index}" RENAME TO "{_suffixed(index, "_legacy")}"')
+            for trigger, _ in triggers:
+                cur.execute(f'DROP TRIGGER "{trigger}" ON {legacy_table}')
+            for policy, _ in policies:
+                cur.execute(f'DROP POLICY "{policy}" ON {legacy_table}')
+            if pk_name:
+                cur.execute(f"ALTER TABLE {legacy_table} DROP CONSTRAINT {pk_name}")
+                cur.execute(f"ALTER TABLE {legacy_table} ADD CONSTRAINT {key_index} PRIMARY KEY USING INDEX {key_index}")
+
+            cur.execute(
+                f"CREATE TABLE {table} (LIKE {legacy_table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS "
+                f"INCLUDING GENERATED INCLUDING STORAGE INCLUDING COMMENTS) PARTITION BY RANGE ({column})"
+            )
+            cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT {bound_check}")
+            if pk_name:
+                cur.execute(f"ALTER TABLE {table} ADD CONSTRAINT {pk_name} PRIMARY KEY ({', '.join(key_columns)})")
+            for _, definition in indexes:
+                cur.execute(definition)
+            cur.execute(
+                "SELECT create_monthly_partitions(%s::regclass, %s, (%s::date + make_interval(months => %s))::date)",
+                (table, boundary, boundary, spec.premake_months + 1),
+            )
+            cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {legacy_table} FOR VALUES FROM (MINVALUE) TO ({bound})")
+            cur.execute(f"ALTER TABLE {legacy_table} DROP CONSTRAINT {bound_check}")
+
+            for _, definition in triggers:
+                cur.execute(definition)
+            if rls:
+                cur.execute(f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY")
+            if force_rls:
+                cur.execute(f"ALTER TABLE {table} FORCE ROW LEVEL SECURITY")
+            for _, definition in policies:
+                cur.execute(definition)
+            for grant in grants:
+                cur.execute(grant)
+            if comment is not None:
+                cur.execute(f"COMMENT ON TABLE {table} IS %s", (comment,))
+            for sequence, owner_column in sequences:
+                cur.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}."{owner_column}"')
+            for view, definition, options in views:
+                with_options = f" WITH ({options})" if options else ""
+                cur.execute(f"CREATE OR REPLACE VIEW {view}{with_options} AS {definition}")
+            cur.execute(REGISTER_SQL, (table, column, spec.premake_months, spec.retention_months,
+                                       legacy_table, boundary))
+            return len(indexes), len(triggers), len(policies), len(views)
+
+        # Until the swap commits, a failure leaves the table as it was apart
+        # from the check and the (possibly INVALID) key index; drop both
+        swapped = False
+        try:
+            # 1. Bound check, validated without blocking writes
+            def add_check(cur):
+                cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {bound_check}")
+                cur.execute(
+                    f"ALTER TABLE {table} ADD CONSTRAINT {bound_check} "
+                    f"CHECK ({column} IS NOT NULL AND {column} < {bound}) NOT VALID"
+                )
+            self._retry(add_check, "add check")
+            print(f"  Validating {bound_check}...")
+            started = time.perf_counter()
+            try:
+                with self.conn.cursor() as cur:
+                    cur.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {bound_check}")
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                raise ConversionError(
+                    f"{table} has rows with {column} NULL or on/after {boundary} ({str(e).strip()}); "
+                    f"backfill {column} first (python -m migrator backfill)"
+                )
+            print(f"  Validated in {time.perf_counter() - started:.1f}s")
+
+            # 2. Key index including the partition column
+            if pk_name:
+                print(f"  Building {key_index} ({', '.join(key_columns)}) CONCURRENTLY...")
+                self.conn.autocommit = True
+                try:
+                    with self.conn.cursor() as cur:
+                        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {schema}.{key_index}")
+                        cur.execute(f"CREATE UNIQUE INDEX CONCURRENTLY {key_index} ON {table} ({', '.join(key_columns)})")
+                finally:
+                    self.conn.autocommit = False
+
+            # 3. Swap
+            started = time.perf_counter()
+            moved = self._retry(swap, "swap")
+            swapped = True
+        finally:
+            if not swapped:
+                self._drop_leftovers(table, schema, bound_check, key_index)
+        print(f"  Swapped in {(time.perf_counter() - started) * 1000:.0f} ms: "
+              "{} index(es), {} trigger(s), {} polic(ies), {} view(s) moved".format(*moved))
+        with self.conn.cursor() as cur:
+            cur.execute(f"ANALYZE {table}")
+        self.conn.commit()
+        print(f"SUCCESS: {table} is partitioned by month on {column}")
+        return True
+
+    # -- maintenance --------------------------------------------------------
+
+    def premake(self):
+        def run(cur):
+            cur.execute("SELECT premake_time_partitions()")
+            return cur.fetchone()[0]
+
+        created = self._retry(run, "premake")
+        print(f"Pre-created {created} partition(s).")
+        return created
+
+    def expire(self, table, retention_months, archive_dir=None):
+        """Detach (and with archive_dir archive and drop) partitions past retention; returns the count"""
+        params = {"table": table, "retention": retention_months}
+        expired = 0
+        self.conn.autocommit = True
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(DETACH_PENDING_SQL, params)
+                for (partition,) in cur.fetchall():
+                    print(f"  Finishing the interrupted detach of {partition}...")
+                    cur.execute(f"ALTER TABLE {table} DETACH PARTITION {partition} FINALIZE")
+                    self._archive(cur, partition, archive_dir)
+                    expired += 1
+                cur.execute(EXPIRED_SQL, params)
+                for partition, upper in cur.fetchall():
+                    print(f"  Detaching {partition} (before {upper:%Y-%m-%d}) CONCURRENTLY...")
+                    cur.execute("SELECT set_config('lock_timeout', %s, false)", (self.lock_timeout,))
+                    cur.execute(f"ALTER TABLE {table} DETACH PARTITION {partition} CONCURRENTLY")
+                    cur.execute("RESET lock_timeout")
+                    self._archive(cur, partition, archive_dir)
+                    expired += 1
+        finally:
+            self.conn.autocommit = False
+        return expired
+
+    @staticmethod
+    def _archive(cur, partition, archive_dir):
+        if archive_dir is None:
+            print(f"  DETACHED: {partition} (kept as a table; pass --archive-dir to archive and drop)")
+            return
+        os.makedirs(archive_dir, exist_ok=True)
+        filename = partition.replace('"', "")
+        path = os.path.join(archive_dir, f"{filename}.csv.gz")
+        cur.execute(f"SELECT count(*) FROM {partition}")
+        count = cur.fetchone()[0]
+        with gzip.open(path + ".tmp", "wb") as f:
+            cur.copy_expert(f"COPY {partition} TO STDOUT (FORMAT csv, HEADER)", f)
+            copied = cur.rowcount
+        if copied not in (-1, count):
+            raise RuntimeError(f"{partition}: copied {copied} rows, expected {count}; kept the table")
+        with open(path + ".tmp", "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        cur.execute(f"DROP TABLE {partition}")
+        print(f"  ARCHIVED: {partition} -> {path} ({count} rows, {os.path.getsize(path) / 1_048_576:.1f} MiB)")
+
+
+def print_status(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('public.time_partitioned_tables') IS NOT NULL")
+        registered = {}
+        if cur.fetchone()[0]:
+            cur.execute(REGISTERED_SQL)
+            registered = {row[0]: row for row in cur.fetchall()}
+        for table in sorted(set(TABLES) | set(registered)):
+            row = registered.get(table)
+            description = TABLES[table].description if table in TABLES else "unregistered"
+            if row is None:
+                print(f"  {table:<28} not partitioned   {description}")
+                continue
+            cur.execute(RUNWAY_SQL, {"table": table})
+            until, partitions, size = cur.fetchone()
+            retention = f"{row[3]} month(s)" if row[3] else "forever"
+            runway = f"partitioned until {until:%Y-%m-%d}" if until else "NO PARTITIONS"
+            print(f"  {table:<28} {partitions} partition(s), {(size or 0) / 1_048_576:.0f} MiB, "
+                  f"{runway}, retention {retention}")
+    conn.commit()
+    return 0
+
+
+# -- CLI ---------------------------------------------------------------------
+
+def run_partitions(args):
+    from .config import connect
+
+    conn = connect(args.dsn)
+    partitioner = Partitioner(conn, lock_timeout=args.lock_timeout, retries=args.retries)
+    status = 0
+    try:
+        for name in args.convert or []:
+            table = _qualify(name)
+            spec = replace(
+                TABLES.get(table) or TimePartitioned(table),
+                **({"column": args.column} if args.column else {}),
+                **({"premake_months": args.premake} if args.premake else {}),
+            )
+            try:
+                partitioner.convert(spec)
+            except ConversionError as e:
+                print(f"FAILED: {e}")
+                status = 1
+
+        while args.maintain:
+            partitioner.premake()
+            with conn.cursor() as cur:
+                cur.execute(REGISTERED_SQL)
+                registered = cur.fetchall()
+            conn.commit()
+            for table, _, _, retention, *_ in registered:
+                if retention:
+                    expired = partitioner.expire(table, retention, args.archive_dir)
+                    print(f"{table}: {expired} partition(s) past {retention} month(s) detached.")
+            if not args.every:
+                break
+            time.sleep(args.every)
+
+        print_status(conn)
+    except KeyboardInterrupt:
+        print("Stopped.")
+    finally:
+        conn.close()
+    return status
+
+
+def add_arguments(subparsers):
+    partitions = subparsers.add_parser(
+        "partitions", help="Convert append-only tables to monthly partitions and maintain them")
+    partitions.add_argument("--convert", nargs="+", metavar="TABLE",
+                            help=f"Tables to convert (registered: {', '.join(TABLES)})")
+    partitions.add_argument("--column", help="Partition column for --convert (default: the registered one)")
+    partitions.add_argument("--premake", type=int, help="Future months to partition at conversion")
+    partitions.add_argument("--maintain", action="store_true",
+                            help="Pre-create partitions and detach those past retention")
+    partitions.add_argument("--archive-dir", help="Archive detached partitions here as .csv.gz and drop them")
+    partitions.add_argument("--every", type=float, help="With --maintain: repeat every this many seconds")
+    partitions.add_argument("--lock-timeout", default="2s", help="lock_timeout for the swap, checks and detaches")
+    partitions.add_argument("--retries", type=int, default=5, help="Retries after a lock timeout")
+    partitions.set_defaults(func=run_partitions)
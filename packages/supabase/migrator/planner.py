@@ -0,0 +1,391 @@
+"""
+Dependency planning for a batch of migrations, before anything runs.
+
+Every file is read, preprocessed and parsed in a process pool (the lexer
+is pure Python, so threads would serialise on the GIL). For each file the
+planner collects the objects it creates (tables, views, sequences,
+functions, types) and the objects it references:
+
+- definite references: REFERENCES targets, ON <table> of indexes, policies
+  and triggers, ALTER/COMMENT ON targets, EXECUTE FUNCTION of triggers,
+  FROM/JOIN of views, INSERT/UPDATE/DELETE targets
+- possible references: any word used as a type or called as a function,
+  kept only if some migration creates an object of that name
+
+Function bodies are not inspected: PL/pgSQL resolves names when the
+function runs, not when it is created. Names qualified with another
+schema (auth.users, extensions.vector) are provided by Supabase.
+
+Each reference becomes an edge to the first earlier file that creates the
+object. A reference only satisfied by a later file is an ordering error
+(a warning for possible references); one nobody satisfies is reported as
+unresolved. References made inside DO blocks only warn, since those
+blocks usually test for the object first or swallow the error. The graph answers which later migrations a failed file
+blocks, and with the forward edges added yields an order that would
+work. The lint runs in the same pool, concurrently with the extraction.
+"""
+
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Set, Tuple
+
+from .sql_lexer import WORD, LexError, ddl_statements, identifier, read_name, skip_words
+
+RELATION = "relation"
+FUNCTION = "function"
+TYPE = "type"
+
+_CREATE_KINDS = {
+    "TABLE": RELATION, "VIEW": RELATION, "SEQUENCE": RELATION,
+    "FUNCTION": FUNCTION, "PROCEDURE": FUNCTION, "TYPE": TYPE, "DOMAIN": TYPE,
+}
+_CREATE_MODIFIERS = ("TEMP", "TEMPORARY", "UNLOGGED", "MATERIALIZED", "RECURSIVE", "UNIQUE")
+_COMMENT_KINDS = {"TABLE": RELATION, "VIEW": RELATION, "COLUMN": RELATION, "FUNCTION": FUNCTION, "TYPE": TYPE}
+
+
+@dataclass
+class FileObjects:
+    version: str
+    creates: Dict[Tuple[str, str], int] = field(default_factory=dict)  # (kind, name) -> line
+    references: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    possible: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    unguarded: Set[Tuple[str, str]] = field(default_factory=set)  # referenced outside DO blocks
+    error: str = None
+    elapsed_ms: float = 0.0
+
+
+@dataclass
+class Problem:
+    severity: str  # error | warning
+    version: str
+    line: int
+    message: str
+
+    def format(self):
+        return f"{self.version}:{self.line}: {self.severity}: {self.message}"
+
+
+def _note(table, key, line):
+    table.setdefault(key, line)
+
+
+def _reference(objects, key, line, guarded):
+    _note(objects.references, key, line)
+    if not guarded:
+        objects.unguarded.add(key)
+
+
+def _external(name):
+    return "." in name
+
+
+def _scan_words(objects, stmt, tokens, start):
+    """Possible type and function references among tokens[start:]"""
+    for k in range(start, len(tokens)):
+        token = tokens[k]
+        if token.kind != WORD:
+            continue
+        name = identifier(token)
+        line = stmt.line + stmt.text.count("\n", 0, token.start - stmt.start)
+        if k + 1 < len(tokens) and tokens[k + 1].text == "(":
+            _note(objects.possible, (FUNCTION, name), line)
+        _note(objects.possible, (TYPE, name), line)
+
+
+def _relations_after(objects, stmt, tokens, start, words, guarded):
+    """Definite relation references following any of words (FROM, JOIN, ...)"""
+    ctes = set()
+    for k in range(start, len(tokens) - 2):
+        if tokens[k].kind == WORD and tokens[k + 1].upper == "AS" and tokens[k + 2].text == "(":
+            ctes.add(identifier(tokens[k]))
+    for k in range(start, len(tokens) - 1):
+        if tokens[k].upper not in words:
+            continue
+        name, end = read_name(tokens, skip_words(tokens, k + 1, "ONLY"))
+        called = tokens[k].upper in ("FROM", "JOIN") and end < len(tokens) and tokens[end].text == "("
+        if not name or name in ctes or called:
+            continue
+        line = stmt.line + stmt.text.count("\n", 0, tokens[k].start - stmt.start)
+        _reference(objects, (RELATION, name), line, guarded)
+
+
+def _statement(objects, stmt, guarded):
+    tokens = stmt.significant
+    if not tokens:
+        return
+    line = stmt.line
+    first = tokens[0].upper
+
+    if first == "CREATE":
+        i = skip_words(tokens, 1, "OR", "REPLACE")
+        while i < len(tokens) and tokens[i].upper in _CREATE_MODIFIERS:
+            i += 1
+        if i >= len(tokens):
+            return
+        keyword = tokens[i].upper
+        if keyword in _CREATE_KINDS:
+            name, end = read_name(tokens, skip_words(tokens, i + 1, "IF", "NOT", "EXISTS"))
+            if name and not _external(name):
+                _note(objects.creates, (_CREATE_KINDS[keyword], name), line)
+            if keyword == "VIEW":
+                _relations_after(objects, stmt, tokens, end, ("FROM", "JOIN"), guarded)
+            _relations_after(objects, stmt, tokens, end, ("REFERENCES",), guarded)
+            _scan_words(objects, stmt, tokens, end)
+        elif keyword in ("INDEX", "POLICY", "TRIGGER", "RULE"):
+            _relations_after(objects, stmt, tokens, i + 1, ("ON",), guarded)
+            for k in range(i + 1, len(tokens) - 2):
+                if tokens[k].upper == "EXECUTE" and tokens[k + 1].upper in ("FUNCTION", "PROCEDURE"):
+                    name, _ = read_name(tokens, k + 2)
+                    if name:
+                        _reference(objects, (FUNCTION, name), line, guarded)
+            _scan_words(objects, stmt, tokens, i + 1)
+        return
+
+    if first == "ALTER" and len(tokens) > 1 and tokens[1].upper in ("TABLE", "VIEW", "SEQUENCE"):
+        i = skip_words(tokens, 2, "IF", "EXISTS")
+        name, end = read_name(tokens, skip_words(tokens, i, "ONLY"))
+        if name:
+            _reference(objects, (RELATION, name), line, guarded)
+        _relations_after(objects, stmt, tokens, end, ("REFERENCES",), guarded)
+        _scan_words(objects, stmt, tokens, end)
+    elif first == "COMMENT" and len(tokens) > 2 and tokens[2].upper in _COMMENT_KINDS:
+        name, _ = read_name(tokens, 3)
+        if name:
+            kind = _COMMENT_KINDS[tokens[2].upper]
+            if tokens[2].upper == "COLUMN":
+                name = name.rsplit(".", 1)[0]
+            _reference(objects, (kind, name), line, guarded)
+    elif first == "INSERT":
+        _relations_after(objects, stmt, tokens, 1, ("INTO",), guarded)
+    elif first == "UPDATE":
+        _relations_after(objects, stmt, tokens, 0, ("UPDATE",), guarded)
+    elif first == "DELETE":
+        _relations_after(objects, stmt, tokens, 1, ("FROM",), guarded)
+
+
+def extract(migration):
+    """FileObjects for one migration; runs in a worker process"""
+    from .runner import preprocess
+
+    started = time.perf_counter()
+    objects = FileObjects(migration.version)
+    try:
+        block = None
+        for stmt in ddl_statements(preprocess(migration, migration.read())):
+            # DDL inside a DO block is usually conditional or has its errors
+            # swallowed, so what it references is not a hard requirement
+            inside = block is not None and block.start < stmt.start < block.start + len(block.text)
+            if not inside:
+                block = stmt if stmt.startswith("DO") else None
+            _statement(objects, stmt, guarded=inside)
+    except LexError as e:
+        objects.error = str(e)
+    for key in objects.creates:
+        objects.references.pop(key, None)
+        objects.possible.pop(key, None)
+    for key in list(objects.references):
+        if _external(key[1]):
+            del objects.references[key]
+    objects.elapsed_ms = (time.perf_counter() - started) * 1000
+    return objects
+
+
+@dataclass
+class Plan:
+    files: List[FileObjects]
+    edges: Dict[int, Dict[int, List[str]]]  # dependent index -> {provider index: [object, ...]}
+    problems: List[Problem]
+    order: List[str] = None  # a working order when the given one has ordering errors
+    findings: list = None  # lint findings, when linted
+
+    @property
+    def versions(self):
+        return [f.version for f in self.files]
+
+    def index(self, name):
+        """Index of the file whose version or filename starts with name"""
+        matches = [
+            i for i, version in enumerate(self.versions)
+            if version == name or os.path.basename(version).startswith(name)
+        ]
+        if len(matches) != 1:
+            raise SystemExit(f"{name!r} must name exactly one migration")
+        return matches[0]
+
+    def blocked_by(self, failed):
+        """Indexes of later files that depend, directly or not, on file failed"""
+        dependents = defaultdict(set)
+        for dependent, providers in self.edges.items():
+            for provider in providers:
+                if provider < dependent:
+                    dependents[provider].add(dependent)
+        blocked, stack = set(), [failed]
+        while stack:
+            for dependent in dependents[stack.pop()]:
+                if dependent not in blocked:
+                    blocked.add(dependent)
+                    stack.append(dependent)
+        return sorted(blocked)
+
+    def errors(self):
+        return [p for p in self.problems if p.severity == "error"]
+
+
+def build_plan(files: List[FileObjects]) -> Plan:
+    creators = defaultdict(list)
+    for index, objects in enumerate(files):
+        for key in objects.creates:
+            creators[key].append(index)
+
+    edges = defaultdict(dict)
+    problems = []
+    for index, objects in enumerate(files):
+        if objects.error:
+            problems.append(Problem("warning", objects.version, 0, f"not parsed: {objects.error}"))
+        candidates = [(key, line, True) for key, line in objects.references.items()]
+        candidates += [(key, line, False) for key, line in objects.possible.items()
+                       if key not in objects.references and key in creators]
+        for (kind, name), line, definite in candidates:
+            # a table can be referenced where a type is expected (row types)
+            keys = [(kind, name)] + ([(RELATION, name)] if kind == TYPE else [])
+            providers = sorted(i for key in keys for i in creators.get(key, ()) if i != index)
+            hard = definite and (kind, name) in objects.unguarded
+            if not providers:
+                if definite:
+                    problems.append(Problem("warning", objects.version, line,
+                                            f"{kind} {name} is not created by any migration"))
+                continue
+            earlier = [i for i in providers if i < index]
+            provider = earlier[0] if earlier else providers[0]
+            edges[index].setdefault(provider, []).append(f"{kind} {name}")
+            if not earlier:
+                problems.append(Problem(
+                    "error" if hard else "warning", objects.version, line,
+                    f"{kind} {name} is created later, by {files[provider].version}",
+                ))
+
+    plan = Plan(files=files, edges=dict(edges), problems=problems)
+    if any(p.severity == "error" for p in problems):
+        plan.order = _topological_order(plan)
+    return plan
+
+
+def _topological_order(plan):
+    """Files in an order that satisfies every edge (stable), or None on a cycle"""
+    remaining = {i: {p for p in plan.edges.get(i, {})} for i in range(len(plan.files))}
+    order = []
+    while remaining:
+        ready = [i for i, providers in remaining.items() if not providers & remaining.keys()]
+        if not ready:
+            return None
+        order.append(min(ready))
+        del remaining[min(ready)]
+    return [plan.files[i].version for i in order]
+
+
+def plan_migrations(migrations, jobs=None, lint=False, report_versions=None):
+    """
+    Extract every file in a process pool and build the plan; with lint,
+    the linter runs in the same pool at the same time
+    """
+    from .lint import lint_migrations
+
+    if jobs == 1:
+        files = [extract(m) for m in migrations]
+        findings = lint_migrations(migrations, report_versions=report_versions) if lint else None
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            linting = pool.submit(lint_migrations, migrations, report_versions) if lint else None
+            files = list(pool.map(extract, migrations, chunksize=4))
+            findings = linting.result() if linting is not None else None
+    plan = build_plan(files)
+    plan.findings = findings
+    return plan
+
+
+def print_blocked(plan, failed, pending_versions=None):
+    """Tell which later migrations cannot work because failed did not apply"""
+    blocked = [
+        plan.files[i] for i in plan.blocked_by(failed)
+        if pending_versions is None or plan.files[i].version in pending_versions
+    ]
+    if not blocked:
+        print("No later migration depends on it.")
+        return
+    print(f"This blocks {len(blocked)} later migration(s):")
+    for objects in blocked:
+        needs = plan.edges[plan.files.index(objects)].get(failed)
+        via = f" (needs {', '.join(needs)})" if needs else " (indirectly)"
+        print(f"  {objects.version}{via}")
+
+
+# -- CLI ---------------------------------------------------------------------
+
+def run_plan(args):
+    from .lint import print_findings
+    from .runner import discover_migrations, select
+
+    started = time.perf_counter()
+    migrations = select(discover_migrations(include_destructive=True), args.target)
+    plan = plan_migrations(migrations, jobs=args.jobs, lint=args.lint)
+    elapsed = time.perf_counter() - started
+    cpu_ms = sum(f.elapsed_ms for f in plan.files)
+
+    if args.format == "json":
+        json.dump({
+            "files": [
+                {"version": f.version,
+                 "creates": sorted(f"{k} {n}" for k, n in f.creates),
+                 "depends_on": {plan.files[p].version: objs for p, objs in sorted(plan.edges.get(i, {}).items())}}
+                for i, f in enumerate(plan.files)
+            ],
+            "problems": [asdict(p) for p in plan.problems],
+            "order": plan.order,
+            "blocked": ({plan.files[plan.index(args.blocked)].version: [
+                plan.files[i].version for i in plan.blocked_by(plan.index(args.blocked))]}
+                if args.blocked else None),
+        }, sys.stdout, indent=1)
+        print()
+        return 1 if plan.errors() else 0
+
+    edge_count = sum(len(providers) for providers in plan.edges.values())
+    print(f"Planned {len(plan.files)} migration(s) in {elapsed * 1000:.0f} ms "
+          f"({cpu_ms:.0f} ms of parsing across workers): {edge_count} dependency edge(s)")
+    shown = [p for p in plan.problems if args.warnings or p.severity == "error"]
+    for problem in shown:
+        print(f"  {problem.format()}")
+    errors = len(plan.errors())
+    print(f"{errors} ordering error(s), {len(plan.problems) - errors} warning(s)"
+          + ("" if args.warnings else " (show with --warnings)") + ".")
+    if plan.order is not None:
+        print("An order that satisfies every dependency:")
+        for version in plan.order:
+            print(f"  {version}")
+    elif errors:
+        print("The dependencies form a cycle; no file order satisfies them.")
+    if plan.findings:
+        print("Lint findings:")
+        print_findings(plan.findings)
+    if args.blocked:
+        failed = plan.index(args.blocked)
+        print(f"If {plan.files[failed].version} fails:")
+        print_blocked(plan, failed)
+    return 1 if errors else 0
+
+
+def add_arguments(subparsers):
+    plan = subparsers.add_parser(
+        "plan", help="Check migration ordering against what each file creates and references"
+    )
+    plan.add_argument("--target", help="Plan up to the migration whose filename starts with this prefix")
+    plan.add_argument("--jobs", type=int, help="Worker processes (default: CPU count; 1 = no pool)")
+    plan.add_argument("--lint", action="store_true", help="Run the lint concurrently with the planning")
+    plan.add_argument("--blocked", metavar="MIGRATION", help="Show what a failure of this migration blocks")
+    plan.add_argument("--warnings", action="store_true", help="Also list unresolved and possible references")
+    plan.add_argument("--format", choices=("text", "json"), default="text")
+    plan.set_defaults(func=run_plan)
@@ -0,0 +1,232 @@
+"""
+Refresh driver for the admin analytics relations (migration 077) and the
+XP leaderboards (migration 083).
+
+Two kinds of relation are registered in ANALYTICS:
+
+- materialized: a materialized view with a SQL refresh function that runs
+  REFRESH MATERIALIZED VIEW CONCURRENTLY (readers are never blocked) and
+  stamps analytics_freshness.
+- incremental: a view over summary tables that triggers keep current. The
+  driver reconciles the last --reconcile-days UTC days (today included)
+  against the source tables, one day per transaction, and records how
+  many summary rows had drifted. --full reconciles every day since the
+  oldest source row, e.g. after a restore that ran with triggers off.
+
+Each day's reconcile briefly SHARE-locks its source tables; it runs under
+--lock-timeout and is retried with backoff instead of queueing behind
+application writes. --every repeats the whole run for use as a
+long-running refresher where pg_cron is not available.
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+# lock_not_available, query_canceled (statement/lock timeout)
+RETRYABLE = {"55P03", "57014"}
+
+FRESHNESS_SQL = """
+INSERT INTO public.analytics_freshness (name, method, refreshed_at, duration_ms, drift_rows)
+VALUES (%s, 'incremental', NOW(), %s, %s)
+ON CONFLICT (name) DO UPDATE SET
+  refreshed_at = EXCLUDED.refreshed_at,
+  duration_ms = EXCLUDED.duration_ms,
+  drift_rows = EXCLUDED.drift_rows,
+  updated_at = NOW()
+"""
+
+STATUS_SQL = """
+SELECT name, method, refreshed_at, EXTRACT(EPOCH FROM NOW() - refreshed_at), duration_ms, drift_rows
+FROM public.analytics_freshness
+ORDER BY name
+"""
+
+
+@dataclass
+class Analytics:
+    name: str
+    method: str  # "materialized" or "incremental"
+    refresh_sql: Optional[str] = None  # materialized: one call refreshes and stamps
+    reconcile_sql: Optional[str] = None  # incremental: called with one date
+    oldest_sql: Optional[str] = None  # incremental: first day with source rows
+    description: str = ""
+
+
+ANALYTICS = {
+    a.name: a
+    for a in (
+        Analytics(
+            name="revenue_analytics",
+            method="materialized",
+            refresh_sql="SELECT refresh_revenue_analytics()",
+            description="subscription counts, churn, captured revenue",
+        ),
+        Analytics(
+            name="refund_analytics",
+            method="incremental",
+            reconcile_sql="SELECT reconcile_finance_daily_stats(%s)",
+            oldest_sql="""
+                SELECT LEAST(
+                  (SELECT MIN(requested_at) FROM public.refunds),
+                  (SELECT MIN(created_at) FROM public.payment_transactions)
+                ) AT TIME ZONE 'UTC'
+            """,
+            description="refund_daily_stats, payment_daily_stats and paying_users",
+        ),
+        Analytics(
+            name="xp_leaderboards",
+            method="materialized",
+            refresh_sql="SELECT refresh_xp_leaderboards()",
+            description="weekly, monthly and all-time XP ranks",
+        ),
+    )
+}
+
+
+def _utc_today():
+    return datetime.now(timezone.utc).date()
+
+
+class Refresher:
+    def __init__(self, conn, lock_timeout="2s", statement_timeout="5min", retries=5, backoff=1.0):
+        self.conn = conn
+        self.lock_timeout = lock_timeout
+        self.statement_timeout = statement_timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    def _call(self, sql, params=()):
+        """Run sql in its own transaction, retrying lock and statement timeouts"""
+        for attempt in range(self.retries + 1):
+            try:
+                with self.conn.cursor() as cur:
+                    cur.execute("SELECT set_config('lock_timeout', %s, true)", (self.lock_timeout,))
+                    cur.execute("SELECT set_config('statement_timeout', %s, true)", (self.statement_timeout,))
+                    cur.execute(sql, params)
+                    row = cur.fetchone()
+                self.conn.commit()
+                return row[0] if row else None
+            except Exception as e:
+                self.conn.rollback()
+                if getattr(e, "pgcode", None) not in RETRYABLE or attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                print(f"  timed out waiting for a lock; retrying in {delay:.0f}s")
+                time.sleep(delay)
+
+    def refresh(self, analytics):
+        started = time.perf_counter()
+        self._call(analytics.refresh_sql)
+        return {"drift_rows": None, "ms": round((time.perf_counter() - started) * 1000)}
+
+    def reconcile(self, analytics, days, full=False):
+        if full:
+            first = self._call(analytics.oldest_sql)
+            first = first.date() if first is not None else _utc_today()
+        else:
+            first = _utc_today() - timedelta(days=max(days, 1) - 1)
+        started = time.perf_counter()
+        drift = 0
+        day = first
+        while day <= _utc_today():
+            changed = self._call(analytics.reconcile_sql, (day,))
+            if changed:
+                print(f"  {analytics.name}: {day} corrected {changed} summary row(s)")
+            drift += changed or 0
+            day += timedelta(days=1)
+        ms = round((time.perf_counter() - started) * 1000)
+        with self.conn.cursor() as cur:
+            cur.execute(FRESHNESS_SQL, (analytics.name, ms, drift))
+        self.conn.commit()
+        return {"drift_rows": drift, "ms": ms, "days": (_utc_today() - first).days + 1}
+
+    def run(self, names, days, full=False):
+        """Refresh or reconcile each name; returns the number that failed"""
+        failed = 0
+        for name in names:
+            analytics = ANALYTICS[name]
+            verb = "Refreshing" if analytics.method == "materialized" else "Reconciling"
+            print(f"{verb} {name}...")
+            try:
+                if analytics.method == "materialized":
+                    result = self.refresh(analytics)
+                else:
+                    result = self.reconcile(analytics, days, full)
+            except Exception as e:
+                self.conn.rollback()
+                print(f"FAILED: {name}: {e}")
+                failed += 1
+                continue
+            detail = "" if result["drift_rows"] is None else \
+                f", {result['days']} day(s), {result['drift_rows']} drifted row(s)"
+            print(f"SUCCESS: {name} ({result['ms']} ms{detail})")
+        return failed
+
+
+def print_status(conn):
+    with conn.cursor() as cur:
+        cur.execute(STATUS_SQL)
+        rows = {row[0]: row for row in cur.fetchall()}
+    conn.commit()
+    for name in sorted(set(ANALYTICS) | set(rows)):
+        row = rows.get(name)
+        description = ANALYTICS[name].description if name in ANALYTICS else "unregistered"
+        if row is None or row[2] is None:
+            print(f"  {name:<24} never refreshed       {description}")
+            continue
+        extra = f", {row[5]} drifted" if row[5] is not None else ""
+        timing = f", took {row[4]} ms" if row[4] is not None else ""
+        print(f"  {name:<24} {row[1]:<12} {row[2]:%Y-%m-%d %H:%M:%S} ({row[3]:.0f}s ago{timing}{extra})")
+    return 0
+
+
+# -- CLI ---------------------------------------------------------------------
+
+def run_refresh(args):
+    from .config import connect
+
+    unknown = [name for name in args.names if name not in ANALYTICS]
+    if unknown:
+        raise SystemExit(f"Unknown analytics: {', '.join(unknown)} (known: {', '.join(sorted(ANALYTICS))})")
+
+    conn = connect(args.dsn)
+    if args.status:
+        status = print_status(conn)
+        conn.close()
+        return status
+
+    refresher = Refresher(
+        conn,
+        lock_timeout=args.lock_timeout,
+        statement_timeout=args.statement_timeout,
+        retries=args.retries,
+    )
+    names = args.names or list(ANALYTICS)
+    try:
+        while True:
+            failed = refresher.run(names, args.reconcile_days, full=args.full)
+            if not args.every:
+                return 1 if failed else 0
+            time.sleep(args.every)
+    except KeyboardInterrupt:
+        print("Stopped.")
+        return 0
+    finally:
+        conn.close()
+
+
+def add_arguments(subparsers):
+    refresh = subparsers.add_parser(
+        "refresh-analytics", help="Refresh materialized and reconcile incremental admin analytics")
+    refresh.add_argument("names", nargs="*", help=f"Analytics to refresh (default: all of {', '.join(ANALYTICS)})")
+    refresh.add_argument("--status", action="store_true", help="Show when each was last refreshed and exit")
+    refresh.add_argument("--reconcile-days", type=int, default=2,
+                         help="UTC days, today included, to reconcile for incremental analytics")
+    refresh.add_argument("--full", action="store_true", help="Reconcile every day since the oldest source row")
+    refresh.add_argument("--every", type=float, help="Repeat every this many seconds until interrupted")
+    refresh.add_argument("--lock-timeout", default="2s", help="lock_timeout per refresh/reconcile transaction")
+    refresh.add_argument("--statement-timeout", default="5min", help="statement_timeout per transaction")
+    refresh.add_argument("--retries", type=int, default=5, help="Retries after a lock or statement timeout")
+    refresh.set_defaults(func=run_refresh)
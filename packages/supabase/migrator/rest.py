@@ -0,0 +1,348 @@
+"""
+Apply migrations over the Supabase REST API when the database port is not
+reachable (what apply-migration-022-v2.py did for one hard-coded file).
+
+The statements of a migration are packed, in order, into as few POSTs to
+/rest/v1/rpc/<function> as --max-batch-kb allows; a file that fits is
+one round trip. Every request goes through one keep-alive session. The
+RPC function must take the SQL as its only argument and EXECUTE it. No
+migration creates it (it would let any caller holding its grant run
+arbitrary SQL), so it is a one-time prerequisite: run EXEC_SQL_DDL below in
+the Supabase SQL editor. rest-apply checks the function is exposed before
+sending anything and prints that DDL when it is not.
+
+Each request runs in its own transaction, so a file split over several
+batches can fail part-way: the report names the batches that committed
+and the one that did not. The ledger row is written by the last batch,
+so a partially applied file is never recorded as applied.
+
+Instead of sleeping between steps, the applier polls the REST endpoint
+until it answers before the first batch, and after the last one asks
+PostgREST to reload its schema cache and polls until the tables, views
+and functions the file creates are exposed.
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+from . import ledger
+from .config import BASE_DIR, REST_CONFIG
+from .sql_lexer import ddl_statements, read_name, skip_words, split_statements
+
+RELOAD_SCHEMA = "NOTIFY pgrst, 'reload schema';"
+
+# Supabase grants EXECUTE on new public functions to anon and authenticated
+# by default, hence the explicit REVOKE
+EXEC_SQL_DDL = """\
+CREATE OR REPLACE FUNCTION public.{rpc}({param} TEXT) RETURNS VOID
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public
+AS $$ BEGIN EXECUTE {param}; END $$;
+REVOKE ALL ON FUNCTION public.{rpc}(TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.{rpc}(TEXT) TO service_role;"""
+
+# Statements PostgreSQL refuses inside a function (and so inside an RPC call)
+_NOT_IN_FUNCTION = ("VACUUM", "BEGIN", "COMMIT", "ROLLBACK", "START", "END")
+
+
+class MissingPrerequisite(RuntimeError):
+    """The API answers but does not expose a path rest-apply needs"""
+
+
+@dataclass
+class Batch:
+    statements: list = field(default_factory=list)
+    size: int = 0
+
+    @property
+    def lines(self):
+        return f"{self.statements[0].line}-{self.statements[-1].line}" if self.statements else "-"
+
+    def sql(self):
+        return "\n".join(stmt.text for stmt in self.statements)
+
+
+def _literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def pack(statements, max_bytes) -> List[Batch]:
+    """Greedily pack statements, in order, into batches under max_bytes"""
+    batches = [Batch()]
+    for stmt in statements:
+        size = len(stmt.text.encode("utf-8")) + 1
+        if batches[-1].statements and batches[-1].size + size > max_bytes:
+            batches.append(Batch())
+        batches[-1].statements.append(stmt)
+        batches[-1].size += size
+    return [batch for batch in batches if batch.statements]
+
+
+def unbatchable(stmt):
+    """Why stmt cannot run through an RPC call, or None"""
+    if stmt.startswith("CREATE") and any(t.upper == "CONCURRENTLY" for t in stmt.significant[:4]):
+        return "CREATE INDEX CONCURRENTLY cannot run inside a function"
+    if stmt.significant and stmt.significant[0].upper in _NOT_IN_FUNCTION:
+        return f"{stmt.significant[0].upper} cannot run inside a function"
+    return None
+
+
+def exposed_objects(sql):
+    """OpenAPI paths (/table, /rpc/function) for what sql creates in public"""
+    paths = set()
+    for stmt in ddl_statements(sql):
+        tokens = stmt.significant
+        if not stmt.startswith("CREATE"):
+            continue
+        i = skip_words(tokens, 1, "OR", "REPLACE")
+        for word in ("MATERIALIZED", "UNLOGGED"):
+            i = skip_words(tokens, i, word)
+        if i >= len(tokens) or tokens[i].upper not in ("TABLE", "VIEW", "FUNCTION"):
+            continue
+        kind = tokens[i].upper
+        name, _ = read_name(tokens, skip_words(tokens, i + 1, "IF", "NOT", "EXISTS"))
+        if name and "." not in name:
+            paths.add(f"/rpc/{name}" if kind == "FUNCTION" else f"/{name}")
+    return paths
+
+
+class RestApplier:
+    def __init__(self, url, anon_key, service_key, rpc="exec_sql", param="sql_query",
+                 max_batch_bytes=512 * 1024, timeout=120, ready_timeout=30):
+        import requests
+
+        self.url = url.rstrip("/")
+        self.rpc = rpc
+        self.param = param
+        self.max_batch_bytes = max_batch_bytes
+        self.timeout = timeout
+        self.ready_timeout = ready_timeout
+        self.session = requests.Session()  # one keep-alive connection for every request
+        self.session.headers.update({
+            "apikey": anon_key,
+            "Authorization": f"Bearer {service_key}",
+            "Content-Type": "application/json",
+        })
+        self._exceptions = requests.RequestException
+
+    def close(self):
+        self.session.close()
+
+    def wait_ready(self, expect=(), require=()):
+        """
+        Poll the OpenAPI root until it answers 200 and lists every path in
+        expect; returns the seconds waited, or None on timeout. Paths in
+        require are prerequisites rather than pending schema changes: the
+        first answer that lacks one raises MissingPrerequisite.
+        """
+        started = time.perf_counter()
+        delay = 0.05
+        missing = set(expect)
+        while True:
+            try:
+                response = self.session.get(f"{self.url}/rest/v1/", timeout=self.timeout)
+                if response.status_code == 200:
+                    paths = set(response.json().get("paths", {}))
+                    absent = set(require) - paths
+                    if absent:
+                        raise MissingPrerequisite(", ".join(sorted(absent)))
+                    missing = set(expect) - paths
+                    if not missing:
+                        return time.perf_counter() - started
+            except (self._exceptions, ValueError):
+                pass
+            if time.perf_counter() - started + delay > self.ready_timeout:
+                if missing:
+                    print(f"  not exposed after {self.ready_timeout}s: {', '.join(sorted(missing))}")
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    def recorded_checksum(self, version):
+        """Checksum in schema_migrations, or None if absent or not readable over REST"""
+        try:
+            response = self.session.get(
+                f"{self.url}/rest/v1/schema_migrations",
+                params={"select": "checksum", "version": f"eq.{version}"},
+                timeout=self.timeout,
+            )
+            if response.status_code == 200 and response.json():
+                return response.json()[0]["checksum"]
+        except (self._exceptions, ValueError, KeyError, IndexError):
+            pass
+        return None
+
+    def execute(self, sql):
+        """POST sql to the RPC function -> (ok, detail, elapsed_ms); ok is None if unknown"""
+        started = time.perf_counter()
+        try:
+            response = self.session.post(
+                f"{self.url}/rest/v1/rpc/{self.rpc}", json={self.param: sql}, timeout=self.timeout,
+            )
+        except self._exceptions as e:
+            # The request may or may not have reached the database
+            return None, str(e), (time.perf_counter() - started) * 1000
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if response.status_code >= 300:
+            return False, f"HTTP {response.status_code}: {response.text[:500]}", elapsed_ms
+        try:
+            result = response.json() if response.content else None
+        except ValueError:
+            result = None
+        # Functions that trap errors themselves report them in the body
+        if isinstance(result, dict) and (result.get("error") or result.get("success") is False):
+            return False, json.dumps(result)[:500], elapsed_ms
+        return True, None, elapsed_ms
+
+    def apply(self, migration, sql, file_checksum, record=True, dry_run=False):
+        """Apply one migration file; returns the elapsed ms, or None on failure"""
+        statements = split_statements(sql).statements
+        refused = [(stmt, unbatchable(stmt)) for stmt in statements if unbatchable(stmt)]
+        if refused:
+            print(f"FAILED: {migration.version} cannot be applied over REST")
+            for stmt, reason in refused:
+                print(f"  line {stmt.line}: {reason}")
+            print("Apply it with python -m migrator up instead.")
+            return None
+
+        batches = pack(statements, self.max_batch_bytes)
+        if dry_run:
+            print(f"  would apply {migration.version} in {len(batches)} request(s)")
+            return 0
+        expect = exposed_objects(sql)
+        finish = [RELOAD_SCHEMA]
+        if record:
+            finish.insert(0, ledger.LEDGER_DDL + (
+                "INSERT INTO public.schema_migrations (version, checksum) "
+                f"VALUES ({_literal(migration.version)}, {_literal(file_checksum)}) "
+                "ON CONFLICT (version) DO UPDATE SET checksum = EXCLUDED.checksum, "
+                "applied_at = NOW(), applied_by = CURRENT_USER;"
+            ))
+
+        started = time.perf_counter()
+        for number, batch in enumerate(batches, 1):
+            payload = batch.sql()
+            if number == len(batches):
+                payload += "\n" + "\n".join(finish)
+            ok, detail, elapsed_ms = self.execute(payload)
+            print(f"  request {number}/{len(batches)}: {len(batch.statements)} statement(s), "
+                  f"lines {batch.lines}, {batch.size / 1024:.0f} KB, {elapsed_ms:.0f} ms")
+            if ok:
+                continue
+            print(f"FAILED: {migration.version}")
+            if ok is None:
+                print(f"Outcome of request {number} unknown (lines {batch.lines}); check the database "
+                      "before retrying.")
+            else:
+                print(f"Request {number} rolled back (lines {batch.lines}).")
+            if number > 1:
+                print(f"Requests 1-{number - 1} (lines {batches[0].statements[0].line}-"
+                      f"{batches[number - 2].statements[-1].line}) are committed: the file is "
+                      "partially applied and not recorded.")
+            print(f"Error: {detail}")
+            return None
+
+        waited = self.wait_ready(expect)
+        if expect:
+            state = f"{waited * 1000:.0f} ms" if waited is not None else "timed out"
+            print(f"  schema cache reload: {len(expect)} object(s) exposed, {state}")
+        return int((time.perf_counter() - started) * 1000)
+
+
+# -- CLI ---------------------------------------------------------------------
+
+def resolve(names, migrations):
+    """Migrations named by path or filename prefix, in apply order"""
+    from .runner import Migration
+
+    chosen = []
+    for name in names:
+        path = os.path.abspath(name)
+        matches = [m for m in migrations if os.path.abspath(m.path) == path]
+        if not matches and os.path.isfile(path):
+            version = os.path.relpath(path, BASE_DIR).replace(os.sep, "/")
+            matches = [Migration(version=version, path=path, rewrite=False)]
+        if not matches:
+            matches = [m for m in migrations if m.filename.startswith(name)]
+        if len(matches) != 1:
+            found = ", ".join(m.version for m in matches[:5]) or "nothing"
+            if len(matches) > 5:
+                found += f" and {len(matches) - 5} more"
+            raise SystemExit(f"{name!r} must name exactly one migration (matched {found})")
+        chosen.append(matches[0])
+    order = {m.version: index for index, m in enumerate(migrations)}
+    return sorted(chosen, key=lambda m: order.get(m.version, len(order)))
+
+
+def run_rest_apply(args):
+    from .runner import discover_migrations, preprocess
+
+    migrations = resolve(args.migrations, discover_migrations(include_destructive=True))
+    applier = RestApplier(
+        args.url, args.anon_key, args.service_key, rpc=args.rpc, param=args.param,
+        max_batch_bytes=args.max_batch_kb * 1024, timeout=args.timeout, ready_timeout=args.ready_timeout,
+    )
+    if not args.dry_run:
+        try:
+            waited = applier.wait_ready(require=[f"/rpc/{args.rpc}"])
+        except MissingPrerequisite:
+            print(f"FAILED: {applier.url} does not expose /rpc/{args.rpc} to the service key.")
+            print("rest-apply sends SQL through that function; create it once in the SQL editor:\n")
+            print(EXEC_SQL_DDL.format(rpc=args.rpc, param=args.param))
+            applier.close()
+            return 1
+        if waited is None:
+            print(f"FAILED: {applier.url}/rest/v1/ did not answer within {args.ready_timeout}s")
+            applier.close()
+            return 1
+        print(f"REST endpoint ready in {waited * 1000:.0f} ms")
+
+    print(f"Applying {len(migrations)} migration(s) over REST...")
+    total_ms = 0
+    status = 0
+    for migration in migrations:
+        sql = migration.read()
+        file_checksum = ledger.checksum(sql)
+        if not (args.force or args.no_record or args.dry_run) and applier.recorded_checksum(migration.version) == file_checksum:
+            print(f"  already applied {migration.version}")
+            continue
+        duration_ms = applier.apply(
+            migration, preprocess(migration, sql), file_checksum,
+            record=not args.no_record, dry_run=args.dry_run,
+        )
+        if duration_ms is None:
+            print("Stopping due to error.")
+            status = 1
+            break
+        total_ms += duration_ms
+        if not args.dry_run:
+            print(f"SUCCESS: {migration.version} ({duration_ms} ms)")
+
+    applier.close()
+    if status == 0 and not args.dry_run:
+        print(f"\nDone in {total_ms / 1000:.2f}s.")
+    return status
+
+
+def add_arguments(subparsers):
+    rest = subparsers.add_parser(
+        "rest-apply", help="Apply migration files through the Supabase REST API (no database port needed)"
+    )
+    rest.add_argument("migrations", nargs="+", help="Migration paths or filename prefixes (e.g. 022)")
+    rest.add_argument("--url", default=REST_CONFIG["url"], help="Supabase API URL (SUPABASE_URL)")
+    rest.add_argument("--anon-key", default=REST_CONFIG["anon_key"], help="apikey header (SUPABASE_ANON_KEY)")
+    rest.add_argument(
+        "--service-key", default=REST_CONFIG["service_key"], help="Bearer token (SUPABASE_SERVICE_KEY)"
+    )
+    rest.add_argument("--rpc", default="exec_sql", help="Function that EXECUTEs its SQL argument")
+    rest.add_argument("--param", default="sql_query", help="Name of that function's SQL argument")
+    rest.add_argument("--max-batch-kb", type=int, default=512, help="Request body limit per round trip")
+    rest.add_argument("--timeout", type=float, default=120, help="Seconds to wait for each request")
+    rest.add_argument("--ready-timeout", type=float, default=30,
+                      help="Seconds to wait for the API and the schema cache reload")
+    rest.add_argument("--force", action="store_true", help="Re-apply files the ledger already records")
+    rest.add_argument("--no-record", action="store_true", help="Do not write schema_migrations rows")
+    rest.add_argument("--dry-run", action="store_true", help="Show the request plan without sending SQL")
+    rest.set_defaults(func=run_rest_apply)
@@ -0,0 +1,425 @@
+"""
+Idempotency rewrite engine for migration SQL.
+
+Replaces the regex passes of fix_migrations*.py, fix_rls.py, fix_wrapper.py
+and apply_custom_migrations.fix_sql_content. Rewrites run on the statement
+list from sql_lexer, so dollar-quoted function bodies are never touched,
+and every edit is tagged so it can be recognised and undone:
+
+- inserted keywords carry a /*migrator*/ marker
+  (CREATE INDEX /*migrator*/ IF NOT EXISTS ...)
+- guarded statements are wrapped in a DO block quoted with $migrator$
+- OWNER TO statements are commented out line by line with -- migrator:owner
+
+rewrite_sql() is idempotent (already-rewritten statements no longer match
+any rule) and restore_sql(rewrite_sql(sql)) == sql.
+
+optimize_policies() is an opt-in pass over CREATE/ALTER POLICY statements,
+including those inside DO blocks, that makes per-row RLS checks per-query:
+
+- auth.uid(), auth.jwt(), auth.role() and auth.email() become
+  (SELECT /*migrator*/ auth.uid()), which PostgreSQL evaluates once per
+  statement as an InitPlan instead of once per row
+- EXISTS (SELECT 1 FROM user_profiles WHERE user_id = auth.uid() AND
+  role = 'admin') becomes (SELECT /*migrator*/ public.is_admin()), with the
+  original kept in a trailing /*migrator:was ...*/ comment; the helper
+  (migration 078) is emitted ahead of the first statement that uses it so
+  that files older than 078 can run through the pass too
+
+restore_sql() undoes this pass as well.
+"""
+
+import re
+import time
+
+from .sql_lexer import DOLLAR, SEMI, TRIVIA, WORD, LexError, split_statements, tokenize
+
+MARK = "/*migrator*/"
+GUARD_TAG = "$migrator$"
+OWNER_PREFIX = "-- migrator:owner "
+
+_GUARD_RE = re.compile(
+    r"^ BEGIN\n(?P<stmt>.*)\nEXCEPTION WHEN \w+ THEN NULL;\nEND $", re.DOTALL
+)
+_MARK_RE = re.compile(r" /\*migrator\*/ (?:IF NOT EXISTS|OR REPLACE|IF EXISTS)")
+
+AUTH_FUNCTIONS = {"UID", "JWT", "ROLE", "EMAIL"}
+ADMIN_CHECK = f"(SELECT {MARK} public.is_admin())"
+# Same definition as migrations/078_rls_helpers.sql
+ADMIN_HELPER = """-- migrator:is_admin
+CREATE OR REPLACE FUNCTION public.is_admin()
+RETURNS BOOLEAN LANGUAGE plpgsql STABLE SECURITY DEFINER SET search_path = public AS $migrator_is_admin$
+BEGIN
+  RETURN EXISTS (SELECT 1 FROM public.user_profiles WHERE user_id = auth.uid() AND role = 'admin');
+END
+$migrator_is_admin$;
+"""
+_ADMIN_RE = re.compile(
+    r"\(SELECT /\*migrator\*/ public\.is_admin\(\)\) /\*migrator:was (?P<check>.*?)\*/", re.DOTALL
+)
+_AUTH_CALL_RE = re.compile(
+    r"\(SELECT /\*migrator\*/ (?P<call>auth\s*\.\s*\w+\s*\(\s*\))\)", re.IGNORECASE
+)
+
+
+def _insert_after(stmt, token, text):
+    """Statement text with `text` inserted right after `token`"""
+    offset = token.end - stmt.start
+    return stmt.text[:offset] + text + stmt.text[offset:]
+
+
+def _guard(stmt, condition):
+    if not stmt.text.endswith(";") or GUARD_TAG in stmt.text:
+        return None
+    return (
+        f"DO {GUARD_TAG} BEGIN\n{stmt.text}\n"
+        f"EXCEPTION WHEN {condition} THEN NULL;\nEND {GUARD_TAG};"
+    )
+
+
+# -- rules: each returns the rewritten statement text or None --------------
+
+def guard_index(stmt):
+    """CREATE [UNIQUE] INDEX [CONCURRENTLY] name -> ... IF NOT EXISTS name"""
+    tokens = stmt.significant
+    i = 1
+    if not stmt.startswith("CREATE"):
+        return None
+    if i < len(tokens) and tokens[i].upper == "UNIQUE":
+        i += 1
+    if i >= len(tokens) or tokens[i].upper != "INDEX":
+        return None
+    if i + 1 < len(tokens) and tokens[i + 1].upper == "CONCURRENTLY":
+        i += 1
+    following = tokens[i + 1] if i + 1 < len(tokens) else None
+    # Unnamed indexes (CREATE INDEX ON ...) cannot take IF NOT EXISTS
+    if following is None or following.upper in ("IF", "ON"):
+        return None
+    return _insert_after(stmt, tokens[i], f" {MARK} IF NOT EXISTS")
+
+
+def replace_trigger(stmt):
+    """CREATE TRIGGER -> CREATE OR REPLACE TRIGGER (PostgreSQL 14+)"""
+    if not stmt.startswith("CREATE", "TRIGGER"):
+        return None
+    return _insert_after(stmt, stmt.significant[0], f" {MARK} OR REPLACE")
+
+
+def guard_drop(stmt):
+    """DROP POLICY/TRIGGER/INDEX name -> ... IF EXISTS name"""
+    tokens = stmt.significant
+    if not stmt.startswith("DROP") or len(tokens) < 3:
+        return None
+    if tokens[1].upper not in ("POLICY", "TRIGGER", "INDEX") or tokens[2].upper == "IF":
+        return None
+    if tokens[2].upper == "CONCURRENTLY":
+        if len(tokens) < 4 or tokens[3].upper == "IF":
+            return None
+        return _insert_after(stmt, tokens[2], f" {MARK} IF EXISTS")
+    return _insert_after(stmt, tokens[1], f" {MARK} IF EXISTS")
+
+
+def guard_policy(stmt):
+    """CREATE POLICY has no IF NOT EXISTS; ignore duplicate_object instead"""
+    if not stmt.startswith("CREATE", "POLICY"):
+        return None
+    return _guard(stmt, "duplicate_object")
+
+
+def guard_rls(stmt):
+    """ENABLE ROW LEVEL SECURITY fails for non-owners on shared Supabase tables"""
+    words = stmt.words
+    if not stmt.startswith("ALTER", "TABLE") or words[-4:] != ["ENABLE", "ROW", "LEVEL", "SECURITY"]:
+        return None
+    return _guard(stmt, "insufficient_privilege")
+
+
+def strip_owner(stmt):
+    """Comment out ALTER ... OWNER TO; roles differ between environments"""
+    tokens = stmt.significant
+    if not stmt.startswith("ALTER") or "RENAME" in stmt.words:
+        return None
+    # ... OWNER TO role ;
+    tail = [t.upper for t in tokens[-4:]]
+    if tail[-1] == ";":
+        tail = tail[:-1]
+    if len(tail) < 3 or tail[-3:-1] != ["OWNER", "TO"]:
+        return None
+    return "\n".join(OWNER_PREFIX + line for line in stmt.text.split("\n"))
+
+
+DEFAULT_RULES = (
+    strip_owner,
+    guard_index,
+    replace_trigger,
+    guard_drop,
+    guard_policy,
+    guard_rls,
+)
+
+RULES = {rule.__name__: rule for rule in DEFAULT_RULES}
+
+
+def rewrite_sql(sql, rules=DEFAULT_RULES):
+    """Apply the first matching rule to every top-level statement"""
+    script = split_statements(sql)
+    out = []
+    for stmt in script.statements:
+        text = stmt.text
+        for rule in rules:
+            rewritten = rule(stmt)
+            if rewritten is not None:
+                text = rewritten
+                break
+        out.append(stmt.prefix + text)
+    out.append(script.trailer)
+    return "".join(out)
+
+
+def restore_sql(sql):
+    """Undo every rewrite_sql and optimize_policies edit, leaving all other text untouched"""
+    sql = sql.replace(ADMIN_HELPER, "")
+    lines = sql.split("\n")
+    sql = "\n".join(
+        line[len(OWNER_PREFIX):] if line.startswith(OWNER_PREFIX) else line
+        for line in lines
+    )
+
+    script = split_statements(sql)
+    out = []
+    for stmt in script.statements:
+        text = stmt.text
+        tokens = stmt.significant
+        if (
+            len(tokens) == 3
+            and tokens[0].kind == WORD and tokens[0].upper == "DO"
+            and tokens[1].kind == DOLLAR and tokens[1].dollar_tag == GUARD_TAG
+            and tokens[2].kind == SEMI
+        ):
+            body = tokens[1].text[len(GUARD_TAG):-len(GUARD_TAG)]
+            match = _GUARD_RE.match(body)
+            if match:
+                text = match.group("stmt")
+        elif MARK in text:
+            text = _MARK_RE.sub("", text)
+        out.append(stmt.prefix + text)
+    out.append(script.trailer)
+    sql = _ADMIN_RE.sub(lambda m: m.group("check"), "".join(out))
+    return _AUTH_CALL_RE.sub(lambda m: m.group("call"), sql)
+
+
+# -- RLS policy pass ---------------------------------------------------------
+
+def _auth_call_end(sig, i):
+    """Index after auth.<fn>() starting at sig[i], or None"""
+    if (
+        i + 4 < len(sig)
+        and sig[i].upper == "AUTH" and (i == 0 or sig[i - 1].text != ".")
+        and sig[i + 1].text == "." and sig[i + 2].upper in AUTH_FUNCTIONS
+        and sig[i + 3].text == "(" and sig[i + 4].text == ")"
+    ):
+        return i + 5
+    return None
+
+
+def _admin_check_end(sql, sig, i):
+    """
+    Index after EXISTS (SELECT 1 FROM [public.]user_profiles WHERE
+    user_id = auth.uid() AND role = 'admin') starting at sig[i], or None.
+    The conditions may come in either order and either side of =.
+    """
+    if sig[i].upper != "EXISTS" or [t.upper for t in sig[i + 1:i + 5]] != ["(", "SELECT", "1", "FROM"]:
+        return None
+    j = i + 5
+    if [t.upper for t in sig[j:j + 2]] == ["PUBLIC", "."]:
+        j += 2
+    if j + 1 >= len(sig) or sig[j].upper != "USER_PROFILES" or sig[j + 1].upper != "WHERE":
+        return None
+    end = j + 2
+    depth = 1
+    while end < len(sig) and depth:
+        if sig[end].text == "(":
+            depth += 1
+        elif sig[end].text == ")":
+            depth -= 1
+        end += 1
+    if depth:
+        return None
+    conditions, current = [], []
+    for token in sig[j + 2:end - 1]:
+        if token.upper == "AND":
+            conditions.append(current)
+            current = []
+        else:
+            current.append(token.upper if token.kind == WORD else token.text)
+    conditions.append(current)
+    normalised = set()
+    for condition in conditions:
+        text = "".join(condition).replace("USER_PROFILES.", "")
+        left, _, right = text.partition("=")
+        normalised.add(frozenset((left, right)))
+    if normalised != {frozenset(("USER_ID", "AUTH.UID()")), frozenset(("ROLE", "'admin'"))}:
+        return None
+    span = sql[sig[i].start:sig[end - 1].end]
+    if "--" in span or "/*" in span:
+        return None  # keep comments out of the /*migrator:was*/ comment
+    return end
+
+
+def _policy_edits(sql, tokens):
+    """
+    (start, end, replacement) edits for the policy statements in tokens,
+    plus the offset the admin helper must precede (None if unused)
+    """
+    sig = [t for t in tokens if t.kind not in TRIVIA]
+    edits = []
+    helper_at = None
+    statement_start = None
+    in_policy = False
+    i = 0
+    while i < len(sig):
+        token = sig[i]
+        if statement_start is None:
+            statement_start = token.start
+        if token.kind == SEMI:
+            in_policy = False
+            statement_start = None
+        elif token.upper == "POLICY" and i and sig[i - 1].upper in ("CREATE", "ALTER"):
+            in_policy = True
+        elif token.kind == DOLLAR and i and sig[i - 1].upper == "DO":
+            tag = token.dollar_tag
+            body = token.text[len(tag):-len(tag)]
+            try:
+                inner_edits, inner_helper = _policy_edits(body, tokenize(body))
+            except LexError:
+                inner_edits, inner_helper = [], None
+            offset = token.start + len(tag)
+            edits.extend((start + offset, end + offset, text) for start, end, text in inner_edits)
+            if inner_helper is not None and helper_at is None:
+                helper_at = statement_start
+        elif in_policy:
+            end = _admin_check_end(sql, sig, i)
+            if end is not None:
+                was = sql[token.start:sig[end - 1].end]
+                edits.append((token.start, sig[end - 1].end, f"{ADMIN_CHECK} /*migrator:was {was}*/"))
+                if helper_at is None:
+                    helper_at = statement_start
+                i = end
+                continue
+            end = _auth_call_end(sig, i)
+            if end is not None:
+                if sig[i - 1].upper != "SELECT":
+                    call = sql[token.start:sig[end - 1].end]
+                    edits.append((token.start, sig[end - 1].end, f"(SELECT {MARK} {call})"))
+                i = end
+                continue
+        i += 1
+    return edits, helper_at
+
+
+def optimize_policies(sql):
+    """Evaluate auth.*() and admin checks in RLS policies once per statement"""
+    edits, helper_at = _policy_edits(sql, tokenize(sql))
+    if helper_at is not None:
+        edits.append((helper_at, helper_at, ADMIN_HELPER))
+    for start, end, text in sorted(edits, key=lambda edit: (edit[0], edit[1]), reverse=True):
+        sql = sql[:start] + text + sql[end:]
+    return sql
+
+
+# -- CLI ---------------------------------------------------------------------
+
+def run_rewrite(args):
+    from .runner import discover_migrations
+
+    paths = args.files or [m.path for m in discover_migrations(include_destructive=True)]
+    if args.restore:
+        transform = restore_sql
+    elif args.rls:
+        def transform(sql):
+            return rewrite_sql(optimize_policies(sql))
+    else:
+        transform = rewrite_sql
+    changed = 0
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            sql = f.read()
+        new_sql = transform(sql)
+        if new_sql == sql:
+            continue
+        changed += 1
+        if args.in_place:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(new_sql)
+            print(f"Rewrote {path}")
+        else:
+            print(f"Would rewrite {path}")
+    print(f"{changed} of {len(paths)} file(s) {'changed' if args.in_place else 'need changes'}.")
+    return 0
+
+
+def run_check(args):
+    """Round-trip and idempotency check plus throughput over every migration"""
+    from .runner import discover_migrations
+    from .sql_lexer import tokenize
+
+    migrations = discover_migrations(include_destructive=True)
+    sources = []
+    for migration in migrations:
+        sources.append((migration.version, migration.read()))
+    total_bytes = sum(len(sql) for _, sql in sources)
+
+    failures = []
+    statements = 0
+    for version, sql in sources:
+        script = split_statements(sql)
+        statements += len(script.statements)
+        rewritten = rewrite_sql(sql)
+        optimized = rewrite_sql(optimize_policies(sql))
+        checks = {
+            "lexer round-trip": "".join(t.text for t in tokenize(sql)) == sql,
+            "splitter round-trip": str(script) == sql,
+            "idempotent": rewrite_sql(rewritten) == rewritten,
+            "reversible": restore_sql(rewritten) == sql,
+            "rls idempotent": rewrite_sql(optimize_policies(optimized)) == optimized,
+            "rls reversible": restore_sql(optimized) == sql,
+        }
+        for name, ok in checks.items():
+            if not ok:
+                failures.append(f"{version}: {name}")
+
+    timings = {}
+    for name, fn in (("split", split_statements), ("rewrite", rewrite_sql), ("rls", optimize_policies)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            for _, sql in sources:
+                fn(sql)
+            best = min(best, time.perf_counter() - started)
+        timings[name] = best
+
+    print(f"{len(sources)} files, {statements} statements, {total_bytes / 1024:.0f} KiB")
+    for name, seconds in timings.items():
+        print(f"  {name:<8} {seconds * 1000:8.1f} ms  "
+              f"({total_bytes / seconds / 1_048_576:.1f} MiB/s, best of {args.repeat})")
+    if failures:
+        print(f"\n{len(failures)} check(s) failed:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("All round-trip, idempotency and reversibility checks passed.")
+    return 0
+
+
+def add_arguments(subparsers):
+    rewrite = subparsers.add_parser("rewrite", help="Apply (or undo) idempotency rewrites to migration files")
+    rewrite.add_argument("files", nargs="*", help="Files to process (default: every migration)")
+    rewrite.add_argument("--restore", action="store_true", help="Undo previous rewrites")
+    rewrite.add_argument("--rls", action="store_true",
+                         help="Also make RLS policies evaluate auth.*() and admin checks once per query")
+    rewrite.add_argument("--in-place", action="store_true", help="Write changes back to the files")
+    rewrite.set_defaults(func=run_rewrite)
+
+    check = subparsers.add_parser("check-rewrite", help="Round-trip tests and benchmark over all migrations")
+    check.add_argument("--repeat", type=int, default=5)
+    check.set_defaults(func=run_check)
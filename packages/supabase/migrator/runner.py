@@ -0,0 +1,412 @@
+"""
+Unified migration runner.
+
+Supersedes apply_migrations.py, apply_custom_migrations.py and the one-off
+apply_migration*.py scripts. Every file in MIGRATION_SOURCES is applied at
+most once and recorded in schema_migrations with its checksum:
+- unchanged files already in the ledger are skipped without being read twice
+- files edited after being applied are refused unless --force
+- pending files run in order, each in its own transaction together with
+  its ledger row, stopping at the first failure
+
+Files are executed statement by statement (see sql_lexer), so a failure
+names the statement that broke and --trace can time and lock-trace each
+statement (see tracing). Pending files are linted for locking hazards
+before anything runs (see lint) and checked against what earlier files
+create (see planner), so a failure also names the later migrations it
+blocks. Index builds on existing tables are moved out of the transaction
+and run CONCURRENTLY after it (see indexes). --optimize-rls runs every
+file through the RLS policy pass (see rewrite.optimize_policies).
+An empty database starts from the newest valid baseline (see baseline).
+
+A database that already holds tables but has no ledger yet is refused:
+it must be adopted first with --mark-applied or --baseline-version, so
+the early files are never replayed over live data. Those of them that
+drop and recreate populated tables (DESTRUCTIVE_MIGRATIONS) are not even
+discovered unless --include-destructive is given.
+"""
+
+import os
+import time
+from dataclasses import dataclass
+
+from . import ledger
+from .baseline import database_is_empty, latest_baseline, load_baseline
+from .config import BASE_DIR, DESTRUCTIVE_MIGRATIONS, MIGRATION_SOURCES, connect
+from .indexes import add_build_arguments, invalid_indexes, phase_from_args
+from .lint import ERROR, print_findings
+from .planner import plan_migrations, print_blocked
+from .rewrite import optimize_policies, rewrite_sql
+from .sql_lexer import split_statements
+from .tracing import Tracer
+
+
+@dataclass
+class Migration:
+    version: str  # path relative to packages/supabase
+    path: str
+    rewrite: bool
+    optimize_rls: bool = False  # see rewrite.optimize_policies
+
+    @property
+    def filename(self):
+        return os.path.basename(self.path)
+
+    def read(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
+def discover_migrations(sources=MIGRATION_SOURCES, include_destructive=False):
+    """
+    All migration files, source by source, sorted by name within a source.
+    DESTRUCTIVE_MIGRATIONS are left out unless include_destructive: pass it
+    for commands that only read the files or replay them into a scratch
+    database.
+    """
+    migrations = []
+    for source in sources:
+        directory = os.path.join(BASE_DIR, source["dir"])
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            prefix = filename.split("_")[0]
+            if not filename.endswith(".sql") or not prefix.isdigit():
+                continue
+            version = f"{source['dir']}/{filename}"
+            if version in DESTRUCTIVE_MIGRATIONS and not include_destructive:
+                continue
+            migrations.append(Migration(
+                version=version,
+                path=os.path.join(directory, filename),
+                rewrite=source["rewrite"],
+            ))
+    return migrations
+
+
+def preprocess(migration, sql):
+    """Apply the idempotency rewrites for sources that need them, and the opt-in RLS pass"""
+    if migration.optimize_rls:
+        sql = optimize_policies(sql)
+    return rewrite_sql(sql) if migration.rewrite else sql
+
+
+def plan(conn, migrations, force=False):
+    """Split migrations into (pending, edited) against the ledger"""
+    applied = ledger.applied_migrations(conn)
+    pending, edited = [], []
+    for migration in migrations:
+        file_checksum = ledger.checksum(migration.read())
+        recorded = applied.get(migration.version)
+        if recorded == file_checksum:
+            continue
+        if recorded is not None:
+            edited.append(migration)
+            if not force:
+                continue
+        pending.append((migration, file_checksum))
+    return pending, edited
+
+
+def apply_migration(conn, migration, file_checksum, execute=True, tracer=None, index_phase=None):
+    """
+    Run one migration and its ledger row in a single transaction, then
+    build the indexes index_phase deferred out of it
+    """
+    sql = preprocess(migration, migration.read())
+    statements = split_statements(sql).statements if execute else []
+    deferred = []
+    started = time.perf_counter()
+    current = None
+    if tracer is not None:
+        tracer.begin_file(conn)
+    try:
+        with conn.cursor() as cur:
+            if index_phase is not None and statements:
+                statements, deferred = index_phase.extract(cur, migration.version, statements)
+            for index, current in enumerate(statements):
+                if tracer is not None:
+                    tracer.execute(cur, migration.version, index, current)
+                else:
+                    cur.execute(current.text)
+            for deferred_index in deferred:
+                ledger.record_index(cur, deferred_index)
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            ledger.record(cur, migration.version, file_checksum, duration_ms)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        if tracer is not None:
+            tracer.end_file(committed=False)
+        print(f"FAILED: {migration.version}")
+        if current is not None:
+            print(f"Statement at line {current.line}: {' '.join(current.text.split())[:200]}")
+        print(f"Error: {e}")
+        return None
+    if tracer is not None:
+        tracer.end_file(committed=True)
+
+    if deferred and not index_phase.build_all(conn, deferred):
+        print(f"FAILED: index build for {migration.version} (the migration itself is committed)")
+        print("Retry with: python -m migrator indexes --build")
+        return None
+    return duration_ms
+
+
+def select(migrations, target=None):
+    """Migrations up to and including the one whose filename starts with target"""
+    if target is None:
+        return migrations
+    for index, migration in enumerate(migrations):
+        if migration.filename.startswith(target):
+            return migrations[:index + 1]
+    raise SystemExit(f"No migration matches target {target!r}")
+
+
+def optimize_applied_policies(conn):
+    """Give already-applied policies the --optimize-rls rewrite (migration 078)"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regprocedure('public.optimize_rls_policies(text)') IS NOT NULL")
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            print("Applied policies left as they are: optimize_rls_policies() needs migration 078")
+            return
+        cur.execute("SELECT public.optimize_rls_policies()")
+        altered = cur.fetchone()[0]
+    conn.commit()
+    print(f"Optimized {altered} applied RLS polic{'y' if altered == 1 else 'ies'}.")
+
+
+def run_status(args):
+    conn = connect(args.dsn)
+    ledger.ensure_ledger(conn)
+    migrations = discover_migrations(include_destructive=args.include_destructive)
+    pending, edited = plan(conn, migrations, force=True)
+    deferred = ledger.deferred_indexes(conn)
+    invalid = invalid_indexes(conn)
+    conn.close()
+
+    edited_versions = {m.version for m in edited}
+    print(f"{len(migrations)} migrations, {len(migrations) - len(pending)} applied, "
+          f"{len(pending) - len(edited)} pending, {len(edited)} edited since apply")
+    for migration, _ in pending:
+        state = "EDITED " if migration.version in edited_versions else "PENDING"
+        print(f"  {state} {migration.version}")
+    if deferred or invalid:
+        print(f"{len(deferred)} deferred index build(s) pending or failed, "
+              f"{len(invalid)} invalid index(es); see python -m migrator indexes")
+    return 1 if edited else 0
+
+
+def bootstrap(conn, migrations, dry_run=False):
+    """
+    Load the newest baseline into an empty, unledgered database. Returns
+    the versions it covers (for dry runs: would cover), or None on failure.
+    """
+    if ledger.applied_migrations(conn) or not database_is_empty(conn):
+        return set()
+    baseline = latest_baseline(migrations)
+    if baseline is None:
+        return set()
+    covered = {version for version, _ in baseline.covers}
+    if dry_run:
+        print(f"  would load {baseline.version} ({len(covered)} migrations)")
+        return covered
+    print(f"Empty database: loading {baseline.version} ({len(covered)} migrations)...")
+    duration_ms = load_baseline(conn, baseline)
+    if duration_ms is None:
+        return None
+    print(f"SUCCESS: {baseline.version} ({duration_ms} ms)")
+    return covered
+
+
+def adopt(conn, version, dry_run=False):
+    """
+    Record every migration up to and including version as applied without
+    running it (an existing database migrated by the old scripts). Returns
+    the number recorded.
+    """
+    migrations = select(discover_migrations(include_destructive=True), version)
+    applied = ledger.applied_migrations(conn)
+    adopted = [m for m in migrations if m.version not in applied]
+    if dry_run:
+        print(f"  would record {len(adopted)} migration(s) up to {migrations[-1].version} as applied")
+        return len(adopted)
+    with conn.cursor() as cur:
+        for migration in adopted:
+            ledger.record(cur, migration.version, ledger.checksum(migration.read()), 0)
+    conn.commit()
+    print(f"Adopted: recorded {len(adopted)} migration(s) up to {migrations[-1].version} as applied.")
+    return len(adopted)
+
+
+def refuse_unadopted(conn, args):
+    """
+    True (after explaining) when the ledger is empty but public already
+    holds tables: replaying the early files there would drop live data.
+    """
+    if args.mark_applied or args.baseline_version:
+        return False
+    if ledger.applied_migrations(conn) or database_is_empty(conn):
+        return False
+    print("Refusing to continue: this database already has tables in public but no migration ledger.")
+    print("Adopt it first, either by recording everything it already has:")
+    print("  python -m migrator up --mark-applied [--target <last applied prefix>]")
+    print("or by recording everything up to a known migration and applying the rest:")
+    print("  python -m migrator up --baseline-version <last applied prefix>")
+    return True
+
+
+def run_up(args):
+    conn = connect(args.dsn)
+    ledger.ensure_ledger(conn)
+    if args.baseline_version:
+        adopt(conn, args.baseline_version, dry_run=args.dry_run)
+    elif refuse_unadopted(conn, args):
+        conn.close()
+        return 1
+    if args.include_destructive and not (args.mark_applied or args.dry_run) and not database_is_empty(conn):
+        print("Refusing to continue: --include-destructive only runs against an empty database.")
+        conn.close()
+        return 1
+    # Baselines and the planner see every file; only the apply list skips
+    # the destructive ones
+    every = select(discover_migrations(include_destructive=True), args.target)
+    migrations = [
+        m for m in every
+        if args.include_destructive or args.mark_applied or m.version not in DESTRUCTIVE_MIGRATIONS
+    ]
+    for migration in migrations:
+        migration.optimize_rls = args.optimize_rls
+    if not (args.no_baseline or args.mark_applied):
+        covered = bootstrap(conn, every, dry_run=args.dry_run)
+        if covered is None:
+            print("Stopping due to error.")
+            conn.close()
+            return 1
+        if args.dry_run:
+            migrations = [m for m in migrations if m.version not in covered]
+    pending, edited = plan(conn, migrations, force=args.force)
+
+    if edited and not args.force:
+        print("Refusing to continue: these migrations changed after being applied:")
+        for migration in edited:
+            print(f"  {migration.version}")
+        print("Restore the original files, add a new migration, or re-run with --force.")
+        conn.close()
+        return 1
+
+    if not pending:
+        print("Database is up to date.")
+        if args.optimize_rls and not args.dry_run:
+            optimize_applied_policies(conn)
+        conn.close()
+        return 0
+
+    pending_versions = {m.version for m, _ in pending}
+    dependencies = None
+    if not (args.no_plan and args.no_lint) and not args.mark_applied:
+        # Dependency planning and lint run side by side in one process pool
+        dependencies = plan_migrations(
+            every, jobs=args.jobs, lint=not args.no_lint, report_versions=pending_versions,
+        )
+        ordering = [p for p in dependencies.errors() if p.version in pending_versions]
+        if ordering:
+            print("Ordering errors in pending migrations (see python -m migrator plan):")
+            for problem in ordering:
+                print(f"  {problem.format()}")
+        findings = dependencies.findings or []
+        if findings:
+            print("Lint findings in pending migrations:")
+            print_findings(findings)
+        if args.strict_lint and (ordering or any(f.severity == ERROR for f in findings)):
+            print("Refusing to continue: fix the errors above or re-run without --strict-lint.")
+            conn.close()
+            return 1
+
+    verb = "Recording" if args.mark_applied else "Applying"
+    print(f"{verb} {len(pending)} pending migration(s)...")
+    tracer = None
+    if args.trace and not (args.dry_run or args.mark_applied):
+        tracer = Tracer(lambda: connect(args.dsn), sample_interval=args.sample_interval)
+    index_phase = None
+    if not (args.inline_indexes or args.dry_run or args.mark_applied):
+        index_phase = phase_from_args(args)
+
+    total_ms = 0
+    status = 0
+    for migration, file_checksum in pending:
+        if args.dry_run:
+            print(f"  would apply {migration.version}")
+            continue
+        duration_ms = apply_migration(
+            conn, migration, file_checksum, execute=not args.mark_applied,
+            tracer=tracer, index_phase=index_phase,
+        )
+        if duration_ms is None:
+            if dependencies is not None:
+                print_blocked(dependencies, dependencies.versions.index(migration.version), pending_versions)
+            print("Stopping due to error.")
+            status = 1
+            break
+        total_ms += duration_ms
+        print(f"SUCCESS: {migration.version} ({duration_ms} ms)")
+
+    if status == 0 and args.optimize_rls and not (args.dry_run or args.mark_applied):
+        optimize_applied_policies(conn)
+    conn.close()
+    if tracer is not None:
+        tracer.close()
+        report_path = tracer.write_report(args.report_dir, top=args.top)
+        print(f"Statement trace written to {report_path}")
+    if status == 0:
+        print(f"\nDone in {total_ms / 1000:.2f}s.")
+    return status
+
+
+def add_arguments(subparsers):
+    status = subparsers.add_parser("status", help="Show applied, pending and edited migrations")
+    status.add_argument("--include-destructive", action="store_true",
+                        help="Also list the early files that drop and recreate populated tables")
+    status.set_defaults(func=run_status)
+
+    up = subparsers.add_parser("up", help="Apply pending migrations")
+    up.add_argument("--target", help="Stop after the migration whose filename starts with this prefix")
+    up.add_argument("--force", action="store_true", help="Re-apply migrations edited since they were applied")
+    up.add_argument("--dry-run", action="store_true", help="List what would run without touching the database")
+    up.add_argument(
+        "--mark-applied", action="store_true",
+        help="Record pending migrations in the ledger without executing them "
+             "(adopt a database that was migrated by the old scripts)",
+    )
+    up.add_argument(
+        "--baseline-version",
+        help="Adopt an existing database: record every migration up to the one whose filename starts "
+             "with this prefix as applied, then apply the rest",
+    )
+    up.add_argument(
+        "--include-destructive", action="store_true",
+        help="Also run the early files that DROP ... CASCADE populated tables (00001, 00102, 003); "
+             "only for replaying onto an empty database with --no-baseline",
+    )
+    up.add_argument("--no-baseline", action="store_true", help="Replay every migration even on an empty database")
+    up.add_argument("--no-lint", action="store_true", help="Skip the static lint of pending migrations")
+    up.add_argument("--no-plan", action="store_true", help="Skip the dependency and ordering check")
+    up.add_argument("--strict-lint", action="store_true",
+                    help="Refuse to apply when the lint or the ordering check reports errors")
+    up.add_argument("--jobs", type=int, help="Worker processes for the lint and planning (1 = no pool)")
+    up.add_argument(
+        "--inline-indexes", action="store_true",
+        help="Build indexes inside the migration transaction instead of CONCURRENTLY afterwards",
+    )
+    up.add_argument(
+        "--optimize-rls", action="store_true",
+        help="Rewrite RLS policies in pending files to evaluate auth.*() and admin checks once "
+             "per query (checksums are unaffected), then rewrite already-applied policies too",
+    )
+    add_build_arguments(up)
+    up.add_argument("--trace", action="store_true", help="Time and lock-trace every statement and write a report")
+    up.add_argument("--report-dir", default="migration-reports", help="Where --trace writes its JSON/markdown report")
+    up.add_argument("--sample-interval", type=float, default=0.05, help="Seconds between pg_locks wait samples (0 disables)")
+    up.add_argument("--top", type=int, default=20, help="Statements per report section")
+    up.set_defaults(func=run_up)
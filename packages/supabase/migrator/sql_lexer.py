@@ -0,0 +1,343 @@
+"""
+Single-pass PostgreSQL lexer and statement splitter.
+
+Understands everything that made the old regex fix scripts split statements
+in the wrong place: dollar-quoted bodies ($$ ... $$, $tag$ ... $tag$),
+single-quoted and E'' strings, quoted identifiers, and line and (nested)
+block comments. Each token keeps its source offsets, so joining the tokens
+of a file reproduces it byte for byte.
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import List, Optional
+
+WS = "ws"
+LINE_COMMENT = "line_comment"
+BLOCK_COMMENT = "block_comment"
+STRING = "string"
+QUOTED_IDENT = "quoted_ident"
+DOLLAR = "dollar"
+WORD = "word"
+NUMBER = "number"
+PARAM = "param"
+SEMI = "semi"
+PUNCT = "punct"
+
+TRIVIA = (WS, LINE_COMMENT, BLOCK_COMMENT)
+
+_WS_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"[A-Za-z_\u0080-\uffff][\w$\u0080-\uffff]*")
+_NUMBER_RE = re.compile(r"(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_PARAM_RE = re.compile(r"\$\d+")
+_DOLLAR_TAG_RE = re.compile(r"\$(?:[A-Za-z_\u0080-\uffff][\w\u0080-\uffff]*)?\$")
+
+
+class LexError(ValueError):
+    def __init__(self, message, offset, sql):
+        line = sql.count("\n", 0, offset) + 1
+        super().__init__(f"{message} at line {line}")
+        self.offset = offset
+        self.line = line
+
+
+@dataclass
+class Token:
+    kind: str
+    text: str
+    start: int
+
+    @property
+    def end(self):
+        return self.start + len(self.text)
+
+    @property
+    def upper(self):
+        return self.text.upper() if self.kind == WORD else self.text
+
+    @property
+    def dollar_tag(self) -> Optional[str]:
+        """'$tag$' of a dollar-quoted token"""
+        if self.kind != DOLLAR:
+            return None
+        return self.text[:self.text.index("$", 1) + 1]
+
+
+def tokenize(sql: str) -> List[Token]:
+    """Lex sql into tokens covering every character exactly once"""
+    tokens = []
+    append = tokens.append
+    pos = 0
+    n = len(sql)
+    while pos < n:
+        ch = sql[pos]
+
+        if ch.isspace():
+            m = _WS_RE.match(sql, pos)
+            append(Token(WS, m.group(), pos))
+            pos = m.end()
+            continue
+
+        if ch == "-" and sql.startswith("--", pos):
+            end = sql.find("\n", pos)
+            end = n if end == -1 else end
+            append(Token(LINE_COMMENT, sql[pos:end], pos))
+            pos = end
+            continue
+
+        if ch == "/" and sql.startswith("/*", pos):
+            depth = 0
+            i = pos
+            while i < n:
+                if sql.startswith("/*", i):
+                    depth += 1
+                    i += 2
+                elif sql.startswith("*/", i):
+                    depth -= 1
+                    i += 2
+                    if depth == 0:
+                        break
+                else:
+                    i += 1
+            if depth:
+                raise LexError("Unterminated block comment", pos, sql)
+            append(Token(BLOCK_COMMENT, sql[pos:i], pos))
+            pos = i
+            continue
+
+        if ch == "'" or (ch in "eE" and sql.startswith("'", pos + 1)):
+            escapes = ch != "'"
+            i = pos + (2 if escapes else 1)
+            while True:
+                if i >= n:
+                    raise LexError("Unterminated string", pos, sql)
+                c = sql[i]
+                if escapes and c == "\\":
+                    i += 2
+                elif c == "'":
+                    if sql.startswith("'", i + 1):
+                        i += 2
+                    else:
+                        i += 1
+                        break
+                else:
+                    i += 1
+            append(Token(STRING, sql[pos:i], pos))
+            pos = i
+            continue
+
+        if ch == '"':
+            i = pos + 1
+            while True:
+                end = sql.find('"', i)
+                if end == -1:
+                    raise LexError("Unterminated quoted identifier", pos, sql)
+                if sql.startswith('"', end + 1):
+                    i = end + 2
+                else:
+                    break
+            append(Token(QUOTED_IDENT, sql[pos:end + 1], pos))
+            pos = end + 1
+            continue
+
+        if ch == "$":
+            m = _PARAM_RE.match(sql, pos)
+            if m:
+                append(Token(PARAM, m.group(), pos))
+                pos = m.end()
+                continue
+            m = _DOLLAR_TAG_RE.match(sql, pos)
+            if m:
+                tag = m.group()
+                end = sql.find(tag, m.end())
+                if end == -1:
+                    raise LexError(f"Unterminated dollar quote {tag}", pos, sql)
+                end += len(tag)
+                append(Token(DOLLAR, sql[pos:end], pos))
+                pos = end
+                continue
+            append(Token(PUNCT, ch, pos))
+            pos += 1
+            continue
+
+        m = _WORD_RE.match(sql, pos)
+        if m:
+            append(Token(WORD, m.group(), pos))
+            pos = m.end()
+            continue
+
+        if ch.isdigit() or (ch == "." and pos + 1 < n and sql[pos + 1].isdigit()):
+            m = _NUMBER_RE.match(sql, pos)
+            append(Token(NUMBER, m.group(), pos))
+            pos = m.end()
+            continue
+
+        append(Token(SEMI if ch == ";" else PUNCT, ch, pos))
+        pos += 1
+    return tokens
+
+
+@dataclass
+class Statement:
+    """One top-level statement plus the trivia (whitespace/comments) before it"""
+    prefix: str
+    text: str
+    start: int  # offset of text in the source
+    line: int  # 1-based line of text in the source
+    tokens: List[Token] = field(repr=False, default_factory=list)
+
+    @cached_property
+    def words(self) -> List[str]:
+        """Upper-cased keywords/identifiers, in order, ignoring trivia"""
+        return [t.upper for t in self.tokens if t.kind == WORD]
+
+    @cached_property
+    def significant(self) -> List[Token]:
+        return [t for t in self.tokens if t.kind not in TRIVIA]
+
+    def startswith(self, *keywords: str) -> bool:
+        words = self.significant[:len(keywords)]
+        return len(words) == len(keywords) and all(
+            t.kind == WORD and t.upper == k for t, k in zip(words, keywords)
+        )
+
+    def kind(self, depth: int = 3) -> str:
+        """Leading keywords, e.g. 'CREATE UNIQUE INDEX'"""
+        out = []
+        for t in self.significant:
+            if t.kind != WORD or len(out) == depth:
+                break
+            out.append(t.upper)
+        return " ".join(out)
+
+
+@dataclass
+class Script:
+    """A SQL file split into statements; str(script) is the original text"""
+    statements: List[Statement]
+    trailer: str
+
+    def __str__(self):
+        return "".join(s.prefix + s.text for s in self.statements) + self.trailer
+
+
+def split_statements(sql: str) -> Script:
+    """Split sql into top-level statements in one pass over its tokens"""
+    statements = []
+    tokens = tokenize(sql)
+    prefix_start = 0
+    body: List[Token] = []
+    line = 1
+    line_pos = 0
+
+    def line_of(offset):
+        nonlocal line, line_pos
+        line += sql.count("\n", line_pos, offset)
+        line_pos = offset
+        return line
+
+    for token in tokens:
+        if not body and token.kind in TRIVIA:
+            continue
+        body.append(token)
+        if token.kind == SEMI:
+            start = body[0].start
+            statements.append(Statement(
+                prefix=sql[prefix_start:start],
+                text=sql[start:token.end],
+                start=start,
+                line=line_of(start),
+                tokens=body,
+            ))
+            prefix_start = token.end
+            body = []
+
+    if body:
+        # Final statement without a terminating semicolon; keep trailing
+        # trivia out of the statement text
+        while body and body[-1].kind in TRIVIA:
+            body.pop()
+        start, end = body[0].start, body[-1].end
+        statements.append(Statement(
+            prefix=sql[prefix_start:start],
+            text=sql[start:end],
+            start=start,
+            line=line_of(start),
+            tokens=body,
+        ))
+        prefix_start = end
+
+    return Script(statements=statements, trailer=sql[prefix_start:])
+
+
+def identifier(token):
+    """Unquoted identifier text, lower-cased unless it was quoted"""
+    if token.kind == QUOTED_IDENT:
+        return token.text[1:-1]
+    return token.text.lower()
+
+
+def read_name(tokens, i):
+    """Qualified name starting at tokens[i] -> (name, next index); drops public."""
+    if i >= len(tokens) or tokens[i].kind not in (WORD, QUOTED_IDENT):
+        return None, i
+    parts = [identifier(tokens[i])]
+    i += 1
+    while i + 1 < len(tokens) and tokens[i].text == "." and tokens[i + 1].kind in (WORD, QUOTED_IDENT):
+        parts.append(identifier(tokens[i + 1]))
+        i += 2
+    if len(parts) > 1 and parts[0] == "public":
+        parts = parts[1:]
+    return ".".join(parts), i
+
+
+def skip_words(tokens, i, *words):
+    """Advance past an optional keyword sequence starting at tokens[i]"""
+    if all(i + k < len(tokens) and tokens[i + k].upper == w for k, w in enumerate(words)):
+        return i + len(words)
+    return i
+
+
+_DDL_KEYWORDS = ("CREATE", "ALTER", "DROP")
+
+
+def ddl_statements(sql: str) -> List[Statement]:
+    """
+    Top-level statements plus the DDL inside DO blocks, with source lines.
+
+    Many migrations wrap DDL in DO $migration$ BEGIN ... EXCEPTION ... END
+    blocks; the body is split again and each piece is trimmed to start at
+    its first CREATE/ALTER/DROP keyword. Function bodies are left alone.
+    """
+    out = []
+    for stmt in split_statements(sql).statements:
+        out.append(stmt)
+        tokens = stmt.significant
+        if not (len(tokens) >= 2 and stmt.startswith("DO") and tokens[1].kind == DOLLAR):
+            continue
+        body_token = tokens[1]
+        tag = body_token.dollar_tag
+        body = body_token.text[len(tag):-len(tag)]
+        offset = body_token.start + len(tag)
+        base_line = stmt.line + sql.count("\n", stmt.start, offset)
+        try:
+            inner_statements = split_statements(body).statements
+        except LexError:
+            continue  # body PostgreSQL itself would reject; keep the DO only
+        for inner in inner_statements:
+            for k, token in enumerate(inner.tokens):
+                if token.kind == WORD and token.upper in _DDL_KEYWORDS:
+                    break
+            else:
+                continue
+            shifted = [Token(t.kind, t.text, t.start + offset) for t in inner.tokens[k:]]
+            start = shifted[0].start
+            out.append(Statement(
+                prefix="",
+                text=sql[start:shifted[-1].end],
+                start=start,
+                line=base_line + inner.line - 1 + inner.text.count("\n", 0, token.start - inner.start),
+                tokens=shifted,
+            ))
+    return out
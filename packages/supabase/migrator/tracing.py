@@ -0,0 +1,230 @@
+"""
+Statement-level timing and lock tracing for migration runs.
+
+With `up --trace` every statement is timed and, right after it runs, the
+migration backend's own granted locks are read from pg_locks; the locks
+that appeared since the previous statement are the ones it acquired.
+Because heavyweight locks are held until the file's transaction commits,
+each lock is charged the time from its statement to the commit.
+
+A sampler thread on a second connection polls pg_locks for ungranted locks
+of the migration backend, so time spent waiting on other sessions shows up
+per statement as well. The run ends with a ranked JSON + markdown report.
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+LOCK_QUERY = """
+SELECT l.locktype, COALESCE(n.nspname || '.' || c.relname, l.locktype || ':' || l.objid::text), l.mode
+FROM pg_locks l
+LEFT JOIN pg_class c ON c.oid = l.relation
+LEFT JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE l.pid = pg_backend_pid()
+  AND l.granted
+  AND l.locktype IN ('relation', 'object')
+  AND (n.nspname IS NULL OR n.nspname NOT IN ('pg_catalog', 'information_schema'))
+"""
+
+WAITING_QUERY = "SELECT count(*) FROM pg_locks WHERE pid = %s AND NOT granted"
+
+# Lock modes that block concurrent writes (or everything)
+WRITE_BLOCKING = {
+    "ShareLock",
+    "ShareRowExclusiveLock",
+    "ExclusiveLock",
+    "AccessExclusiveLock",
+}
+
+
+@dataclass
+class StatementTrace:
+    version: str
+    index: int
+    line: int
+    kind: str
+    sql: str
+    seconds: float = 0.0
+    rowcount: int = -1
+    locks: List[str] = field(default_factory=list)
+    lock_wait_seconds: float = 0.0
+    held_until_commit_seconds: float = 0.0
+
+    @property
+    def blocking_locks(self):
+        return [lock for lock in self.locks if lock.split(" ")[-1] in WRITE_BLOCKING]
+
+    @property
+    def lock_impact(self):
+        """Write-blocking locks weighted by how long they were held"""
+        return len(self.blocking_locks) * self.held_until_commit_seconds
+
+
+class LockSampler(threading.Thread):
+    """Polls pg_locks for ungranted locks of one backend"""
+
+    def __init__(self, conn, backend_pid, interval):
+        super().__init__(daemon=True)
+        self.conn = conn
+        self.backend_pid = backend_pid
+        self.interval = interval
+        self.current: Optional[StatementTrace] = None
+        self._stopped = threading.Event()
+
+    def run(self):
+        with self.conn.cursor() as cur:
+            while not self._stopped.wait(self.interval):
+                trace = self.current
+                if trace is None:
+                    continue
+                cur.execute(WAITING_QUERY, (self.backend_pid,))
+                if cur.fetchone()[0]:
+                    trace.lock_wait_seconds += self.interval
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.conn.close()
+
+
+class Tracer:
+    """Collects StatementTraces for every file applied in one run"""
+
+    def __init__(self, connect_fn=None, sample_interval=0.05):
+        self.connect_fn = connect_fn
+        self.sample_interval = sample_interval
+        self.traces: List[StatementTrace] = []
+        self._sampler: Optional[LockSampler] = None
+        self._held = set()
+        self._file_traces: List[StatementTrace] = []
+
+    def begin_file(self, conn):
+        """Start tracing a migration on conn (inside its transaction)"""
+        self._held = set()
+        self._file_traces = []
+        if self.connect_fn is not None and self._sampler is None and self.sample_interval > 0:
+            sampler_conn = self.connect_fn()
+            sampler_conn.autocommit = True
+            self._sampler = LockSampler(sampler_conn, conn.get_backend_pid(), self.sample_interval)
+            self._sampler.start()
+
+    def execute(self, cur, version, index, stmt):
+        """Run one statement and record its timing, rows and new locks"""
+        trace = StatementTrace(
+            version=version,
+            index=index,
+            line=stmt.line,
+            kind=stmt.kind(),
+            sql=" ".join(stmt.text.split())[:200],
+        )
+        if self._sampler is not None:
+            self._sampler.current = trace
+        started = time.perf_counter()
+        try:
+            cur.execute(stmt.text)
+        finally:
+            trace.seconds = time.perf_counter() - started
+            if self._sampler is not None:
+                self._sampler.current = None
+        trace.rowcount = cur.rowcount
+
+        cur.execute(LOCK_QUERY)
+        held = {f"{target} {mode}" for _, target, mode in cur.fetchall()}
+        trace.locks = sorted(held - self._held)
+        self._held |= held
+        self._file_traces.append(trace)
+        return trace
+
+    def end_file(self, committed):
+        """Charge each statement's locks with the time until commit"""
+        if committed:
+            remaining = 0.0
+            for trace in reversed(self._file_traces):
+                remaining += trace.seconds
+                trace.held_until_commit_seconds = remaining
+            self.traces.extend(self._file_traces)
+        self._file_traces = []
+
+    def close(self):
+        if self._sampler is not None:
+            self._sampler.stop()
+            self._sampler = None
+
+    # -- reporting ----------------------------------------------------------
+
+    def report(self, top=20):
+        slowest = sorted(self.traces, key=lambda t: t.seconds, reverse=True)[:top]
+        lock_heavy = sorted(
+            (t for t in self.traces if t.blocking_locks),
+            key=lambda t: t.lock_impact,
+            reverse=True,
+        )[:top]
+        waiting = sorted(
+            (t for t in self.traces if t.lock_wait_seconds),
+            key=lambda t: t.lock_wait_seconds,
+            reverse=True,
+        )[:top]
+        return {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "statements": len(self.traces),
+            "total_seconds": round(sum(t.seconds for t in self.traces), 3),
+            "slowest": [self._row(t) for t in slowest],
+            "lock_heavy": [self._row(t) for t in lock_heavy],
+            "lock_waits": [self._row(t) for t in waiting],
+        }
+
+    @staticmethod
+    def _row(trace):
+        row = asdict(trace)
+        row["seconds"] = round(trace.seconds, 4)
+        row["lock_wait_seconds"] = round(trace.lock_wait_seconds, 3)
+        row["held_until_commit_seconds"] = round(trace.held_until_commit_seconds, 4)
+        row["blocking_locks"] = trace.blocking_locks
+        return row
+
+    def write_report(self, report_dir, top=20):
+        """Write report.json and report.md; returns the markdown path"""
+        report = self.report(top)
+        os.makedirs(report_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        json_path = os.path.join(report_dir, f"migration-trace-{stamp}.json")
+        md_path = os.path.join(report_dir, f"migration-trace-{stamp}.md")
+
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+        lines = [
+            "# Migration trace",
+            "",
+            f"Generated {report['generated_at']}: {report['statements']} statements, "
+            f"{report['total_seconds']}s total.",
+        ]
+        sections = (
+            ("Slowest statements", "slowest", "seconds"),
+            ("Write-blocking locks (by lock count x time held to commit)", "lock_heavy", "held_until_commit_seconds"),
+            ("Lock waits", "lock_waits", "lock_wait_seconds"),
+        )
+        for title, key, metric in sections:
+            lines += ["", f"## {title}", ""]
+            if not report[key]:
+                lines.append("_None._")
+                continue
+            lines += [
+                f"| # | File:line | Statement | {metric} | Rows | Locks |",
+                "|---|---|---|---|---|---|",
+            ]
+            for rank, row in enumerate(report[key], 1):
+                locks = ", ".join(row["blocking_locks"] if key == "lock_heavy" else row["locks"])
+                sql = row["sql"][:80].replace("|", "\\|")
+                lines.append(
+                    f"| {rank} | {row['version']}:{row['line']} | `{sql}` | "
+                    f"{row[metric]} | {row['rowcount']} | {locks} |"
+                )
+        with open(md_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return md_path
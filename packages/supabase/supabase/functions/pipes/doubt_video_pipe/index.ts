@@ -125,12 +125,6 @@ serve(async (req: Request) => {
       }
     }
 
-    // Get current queue position
-    const { count: queueCount } = await supabaseAdmin
-      .from('jobs')
-      .select('*', { count: 'exact', head: true })
-      .eq('status', 'queued');
-
     // Create video render job
     const { data: job, error: jobError } = await supabaseAdmin
       .from('jobs')
@@ -139,7 +133,6 @@ serve(async (req: Request) => {
         job_type: 'doubt_video',
         priority: 'normal',
         status: 'queued',
-        queue_position: queueCount + 1,
         payload: {
           question: finalText,
           input_type,
@@ -157,6 +150,10 @@ serve(async (req: Request) => {
       throw new Error(`Failed to create job: ${jobError.message}`);
     }
 
+    // Get queue position (computed on read; jobs.queue_position is no longer maintained)
+    const { data: position } = await supabaseAdmin.rpc('get_queue_position', { p_job_id: job.id });
+    const queuePosition: number = (Array.isArray(position) ? position[0] : position)?.queue_position || 1;
+
     // Trigger video generation via Video Orchestrator
     const orchestratorUrl = Deno.env.get('VPS_ORCHESTRATOR_URL');
     if (orchestratorUrl) {
@@ -196,8 +193,8 @@ serve(async (req: Request) => {
       success: true,
       job_id: job.id,
       status: 'queued',
-      queue_position: queueCount + 1,
-      estimated_time_minutes: Math.ceil((queueCount + 1) * 3), // ~3 min per video
+      queue_position: queuePosition,
+      estimated_time_minutes: Math.ceil(queuePosition * 3), // ~3 min per video
     };
 
     return new Response(JSON.stringify(response), {
@@ -536,46 +536,61 @@ async function getChallenges(supabase: any, userId: string) {
  * Get leaderboard
  */
 async function getLeaderboard(supabaseAdmin: any, type: string, limit: number, currentUserId: string) {
-  // For now, generate from user_stats table
-  // In production, use leaderboard_entries table with pre-computed rankings
+  // Ranks are precomputed in the xp_leaderboards materialized view
+  // (refreshed every few minutes by refresh_xp_leaderboards)
+  const board = ['weekly', 'monthly', 'all_time'].includes(type) ? type : 'weekly';
 
   const { data: entries, error } = await supabaseAdmin
-    .from('user_stats')
-    .select('user_id, xp, level, current_streak, longest_streak')
-    .order('xp', { ascending: false })
+    .from('xp_leaderboards')
+    .select('user_id, xp, current_level, rank, refreshed_at')
+    .eq('board', board)
+    .order('rank', { ascending: true })
     .limit(limit);
 
   if (error) throw error;
 
-  // Get user profiles for names
+  // The current user's own row, which may be outside the top entries
+  const { data: own } = await supabaseAdmin
+    .from('xp_leaderboards')
+    .select('rank')
+    .eq('board', board)
+    .eq('user_id', currentUserId)
+    .maybeSingle();
+
+  // Get user profiles for names, and streaks
   const userIds = entries?.map((e: any) => e.user_id) || [];
-  const { data: profiles } = await supabaseAdmin
-    .from('user_profiles')
-    .select('user_id, full_name, avatar_url')
-    .in('user_id', userIds);
+  const [{ data: profiles }, { data: streaks }] = await Promise.all([
+    supabaseAdmin
+      .from('user_profiles')
+      .select('user_id, full_name, avatar_url')
+      .in('user_id', userIds),
+    supabaseAdmin
+      .from('user_streaks')
+      .select('user_id, current_streak')
+      .in('user_id', userIds),
+  ]);
 
   const profileMap = new Map(profiles?.map((p: any) => [p.user_id, p]) || []);
+  const streakMap = new Map(streaks?.map((s: any) => [s.user_id, s.current_streak]) || []);
 
-  const leaderboard = entries?.map((entry: any, index: number) => ({
-    rank: index + 1,
+  const leaderboard = entries?.map((entry: any) => ({
+    rank: entry.rank,
     user_id: entry.user_id,
     name: profileMap.get(entry.user_id)?.full_name || `User ${entry.user_id.slice(0, 6)}`,
     avatar: profileMap.get(entry.user_id)?.avatar_url || null,
     xp: entry.xp,
-    level: entry.level,
-    streak: entry.current_streak,
+    level: entry.current_level,
+    streak: streakMap.get(entry.user_id) || 0,
     is_current_user: entry.user_id === currentUserId,
   })) || [];
 
-  // Get current user rank
-  const currentUserRank = leaderboard.findIndex((e: any) => e.is_current_user) + 1;
-
   return new Response(JSON.stringify({
     success: true,
     data: {
       leaderboard,
-      current_user_rank: currentUserRank > 0 ? currentUserRank : null,
-      type,
+      current_user_rank: own?.rank ?? null,
+      type: board,
+      refreshed_at: entries?.[0]?.refreshed_at || null,
     },
   }), {
     headers: { ...corsHeaders, 'Content-Type': 'application/json' },
@@ -67,7 +67,8 @@ export function calculateEstimatedWaitTime(queuePosition: number, avgProcessingT
 }
 
 export async function getQueuePosition(supabase: any, jobId: string): Promise<{ position: number; totalAhead: number }> {
-  const { data: job } = await supabase.from('jobs').select('queue_position, priority').eq('id', jobId).single();
-  const { count: totalAhead } = await supabase.from('jobs').select('*', { count: 'exact', head: true }).eq('status', 'queued').lt('queue_position', job.queue_position);
-  return { position: job.queue_position || 0, totalAhead: totalAhead || 0 };
+  // Computed on read (migration 074); jobs.queue_position is no longer maintained
+  const { data } = await supabase.rpc('get_queue_position', { p_job_id: jobId });
+  const row = Array.isArray(data) ? data[0] : data;
+  return { position: row?.queue_position || 0, totalAhead: row?.total_ahead || 0 };
 }
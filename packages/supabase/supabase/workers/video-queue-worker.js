@@ -93,21 +93,21 @@ async function processQueue(config) {
     return;
   }
 
-  // Get highest priority queued job
-  const queuedJobs = await supabaseRequest('GET', '/rest/v1/jobs?status=eq.queued&order=priority.asc,created_at.asc&limit=1');
+  // Claim the next queued job (priority, then enqueue order) and mark it
+  // processing in one call; FOR UPDATE SKIP LOCKED lets workers run side by side
+  const claimed = await supabaseRequest('POST', '/rest/v1/rpc/dequeue_jobs', { p_limit: 1 });
 
-  if (!queuedJobs || queuedJobs.length === 0) {
-    console.log('No jobs in queue');
+  if (!Array.isArray(claimed)) {
+    console.error('Error claiming next job:', claimed);
     return;
   }
 
-  const job = queuedJobs[0];
+  if (claimed.length === 0) {
+    console.log('No jobs in queue');
+    return;
+  }
 
-  // Mark as processing
-  await supabaseRequest('PATCH', `/rest/v1/jobs?id=eq.${job.id}`, {
-    status: 'processing',
-    started_at: new Date().toISOString()
-  });
+  const job = claimed[0];
 
   console.log(`Processing job ${job.id.slice(0,8)} (${job.job_type})`);
 
@@ -0,0 +1,64 @@
+import ast
+import hashlib
+import os
+import re
+
+import pytest
+
+from migrator.backfill import _CONTENT_HASH, WHITESPACE_CLASS
+
+WRITER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "crawl4ai-vps", "writer.py"
+)
+
+SAMPLES = (
+    "Union\u00a0Budget\u2003 2025",
+    "\u3000lead\u2028and trail\u202f\u205f",
+    "tabs\tand\x0bvertical\x1cseparators\x85",
+    "plain text",
+)
+
+
+def crawler_hash(text):
+    """writer.content_hash: whitespace runs collapsed (str.isspace), trimmed, sha256 hex"""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def test_whitespace_class_matches_the_crawler_copy():
+    with open(WRITER, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    copies = [
+        ast.literal_eval(node.value)
+        for node in tree.body
+        if isinstance(node, ast.Assign)
+        and any(isinstance(t, ast.Name) and t.id == "WHITESPACE_CLASS" for t in node.targets)
+    ]
+    assert copies == [WHITESPACE_CLASS]
+
+
+def test_content_hash_sql_uses_the_explicit_class():
+    sql = _CONTENT_HASH.format(col="content")
+    assert "\\s" not in sql
+    assert WHITESPACE_CLASS + "+" in sql
+
+
+def test_class_collapses_like_str_split_python_side_only():
+    # Python re over the class, not Postgres: this shows the class is the
+    # right one, and test_postgres_digest_matches_the_crawler checks that
+    # regexp_replace agrees
+    for text in SAMPLES:
+        normalized = re.sub(WHITESPACE_CLASS + "+", " ", text).strip(" ")
+        assert hashlib.sha256(normalized.encode("utf-8")).hexdigest() == crawler_hash(text)
+
+
+@pytest.mark.skipif(not os.getenv("MIGRATOR_TEST_DSN"), reason="set MIGRATOR_TEST_DSN to a scratch database")
+def test_postgres_digest_matches_the_crawler():
+    psycopg2 = pytest.importorskip("psycopg2")
+    conn = psycopg2.connect(os.environ["MIGRATOR_TEST_DSN"])
+    try:
+        with conn.cursor() as cur:
+            for text in SAMPLES:
+                cur.execute("SELECT " + _CONTENT_HASH.format(col="%s::text"), (text,))
+                assert cur.fetchone()[0] == crawler_hash(text), repr(text)
+    finally:
+        conn.close()
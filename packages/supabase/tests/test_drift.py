@@ -0,0 +1,125 @@
+import copy
+
+from migrator.drift import KINDS, diff, print_diff, snapshot
+
+EXPECTED = {
+    "extensions": [{"name": "pg_trgm"}],
+    "tables": [
+        {"name": "public.jobs", "kind": "r", "rls": True},
+        {"name": "public.notes", "kind": "r", "rls": True},
+    ],
+    "columns": [
+        {"name": "public.jobs.queue_seq", "type": "bigint", "not_null": True, "default": "nextval(...)"},
+    ],
+    "indexes": [
+        {"name": "public.idx_jobs_queued_priority_seq", "table": "public.jobs",
+         "definition": "CREATE INDEX ...", "valid": True},
+    ],
+    "policies": [{"name": "public.notes.Users can view own notes", "command": "r"}],
+}
+
+
+def live():
+    return copy.deepcopy(EXPECTED)
+
+
+def test_identical_snapshots_have_no_drift(capsys):
+    result = diff(EXPECTED, live())
+    assert result == {"drift": False, "summary": {}, "changes": []}
+    print_diff(result)
+    assert capsys.readouterr().out == "No drift.\n"
+
+
+def test_swallowed_failures_show_up_as_missing():
+    actual = live()
+    actual["policies"] = []
+    result = diff(EXPECTED, actual)
+    assert result["drift"]
+    assert result["changes"] == [{
+        "kind": "policies", "change": "missing", "name": "public.notes.Users can view own notes",
+        "expected": EXPECTED["policies"][0],
+    }]
+    assert result["summary"] == {"policies": {"missing": 1, "unexpected": 0, "changed": 0}}
+
+
+def test_invalid_index_and_manual_changes_show_up_as_changed():
+    actual = live()
+    actual["indexes"][0]["valid"] = False
+    actual["tables"][1]["rls"] = False
+    actual["columns"][0]["not_null"] = False
+    result = diff(EXPECTED, actual)
+    changed = {c["name"]: c["fields"] for c in result["changes"]}
+    assert changed == {
+        "public.notes": {"rls": {"expected": True, "actual": False}},
+        "public.jobs.queue_seq": {"not_null": {"expected": True, "actual": False}},
+        "public.idx_jobs_queued_priority_seq": {"valid": {"expected": True, "actual": False}},
+    }
+    # Changes are reported in KINDS order
+    assert [c["kind"] for c in result["changes"]] == ["tables", "columns", "indexes"]
+
+
+def test_objects_created_by_hand_show_up_as_unexpected():
+    actual = live()
+    actual["tables"].append({"name": "public.tmp_fix", "kind": "r", "rls": False})
+    actual["extensions"].append({"name": "pgcrypto"})
+    result = diff(EXPECTED, actual)
+    assert [(c["kind"], c["change"], c["name"]) for c in result["changes"]] == [
+        ("extensions", "unexpected", "pgcrypto"),
+        ("tables", "unexpected", "public.tmp_fix"),
+    ]
+
+
+def test_fields_present_on_one_side_only_are_compared():
+    actual = live()
+    del actual["columns"][0]["default"]
+    result = diff(EXPECTED, actual)
+    assert result["changes"][0]["fields"] == {"default": {"expected": "nextval(...)", "actual": None}}
+
+
+def test_summary_line(capsys):
+    actual = live()
+    actual["policies"] = []
+    actual["indexes"][0]["valid"] = False
+    actual["tables"].append({"name": "public.tmp_fix", "kind": "r", "rls": False})
+    print_diff(diff(EXPECTED, actual))
+    out = capsys.readouterr().out
+    assert "MISSING    policy     public.notes.Users can view own notes" in out
+    assert "valid: True -> False" in out
+    assert out.endswith("1 missing, 1 unexpected, 1 changed.\n")
+
+
+class SnapshotConnection:
+    """One fetchone() of the JSON document, as psycopg2 returns json columns"""
+
+    def __init__(self, document):
+        self.document = document
+        self.committed = False
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.params = params
+
+    def fetchone(self):
+        return (self.document,)
+
+    def commit(self):
+        self.committed = True
+
+
+def test_snapshot_fills_every_kind_and_accepts_text():
+    conn = SnapshotConnection('{"tables": [{"name": "public.jobs"}], "policies": null}')
+    result = snapshot(conn)
+    assert set(result) == set(KINDS)
+    assert result["tables"] == [{"name": "public.jobs"}]
+    assert result["policies"] == []
+    assert conn.params["schemas"] == ["public"]
+    assert "schema_migrations" in conn.params["ignore"]
+    assert conn.committed
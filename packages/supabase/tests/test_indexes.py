@@ -0,0 +1,109 @@
+import pytest
+
+from migrator.indexes import IndexPhase, concurrent_definition, parse_index
+from migrator.sql_lexer import split_statements
+
+# read_name drops the public. prefix, so tables arrive as to_regclass sees them
+EXISTING_TABLES = {"jobs", "question_attempts", "audit.log"}
+
+
+class CatalogCursor:
+    """Answers the to_regclass probe from EXISTING_TABLES"""
+
+    def execute(self, sql, params=None):
+        assert "to_regclass" in sql
+        self._exists = params[0] in EXISTING_TABLES
+
+    def fetchone(self):
+        return (self._exists,)
+
+
+def statement(sql):
+    (stmt,) = split_statements(sql).statements
+    return stmt
+
+
+def extract(sql):
+    statements = split_statements(sql).statements
+    kept, deferred = IndexPhase().extract(CatalogCursor(), "migrations/900_test.sql", statements)
+    return [s.kind() for s in kept], deferred
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("CREATE INDEX idx_a ON public.jobs(status);", ("idx_a", "jobs", False)),
+    ("CREATE INDEX idx_log ON audit.log(at);", ("audit.idx_log", "audit.log", False)),
+    ("CREATE UNIQUE INDEX IF NOT EXISTS idx_b ON jobs USING btree (id);", ("idx_b", "jobs", True)),
+    ("CREATE INDEX CONCURRENTLY idx_c ON ONLY public.jobs(id);", ("idx_c", "jobs", False)),
+    ("CREATE INDEX ON public.jobs(id);", None),
+    ("CREATE TABLE public.t (id int);", None),
+])
+def test_parse_index(sql, expected):
+    assert parse_index(statement(sql)) == expected
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("CREATE INDEX idx_a ON public.jobs(status);",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a ON public.jobs(status)"),
+    ("create unique index if not exists idx_b on jobs(id) where x;",
+     "create unique index CONCURRENTLY if not exists idx_b on jobs(id) where x"),
+    ("CREATE INDEX CONCURRENTLY idx_c ON jobs(id);",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_c ON jobs(id)"),
+])
+def test_concurrent_definition(sql, expected):
+    assert concurrent_definition(statement(sql)) == expected
+
+
+def test_index_on_existing_table_is_deferred():
+    kept, deferred = extract("""
+        ALTER TABLE public.jobs ADD COLUMN note text;
+        CREATE INDEX IF NOT EXISTS idx_jobs_note ON public.jobs(note);
+    """)
+    assert kept == ["ALTER TABLE PUBLIC"]
+    assert [(d.name, d.table, d.guarded) for d in deferred] == [("idx_jobs_note", "jobs", False)]
+    assert deferred[0].definition.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS")
+
+
+def test_index_on_new_table_stays_inline():
+    kept, deferred = extract("""
+        CREATE TABLE public.notes (id int);
+        CREATE INDEX idx_notes_id ON public.notes(id);
+    """)
+    assert deferred == []
+    assert kept == ["CREATE TABLE PUBLIC", "CREATE INDEX IDX_NOTES_ID"]
+
+
+def test_index_used_later_in_the_file_stays_inline():
+    kept, deferred = extract("""
+        CREATE INDEX idx_jobs_note ON public.jobs(note);
+        COMMENT ON INDEX public.idx_jobs_note IS 'x';
+    """)
+    assert deferred == []
+
+
+def test_unique_index_before_on_conflict_stays_inline():
+    _, deferred = extract("""
+        CREATE UNIQUE INDEX idx_jobs_key ON public.jobs(key);
+        INSERT INTO public.jobs (key) VALUES (1) ON CONFLICT (key) DO NOTHING;
+    """)
+    assert deferred == []
+
+
+def test_exception_wrapper_is_deferred_as_guarded():
+    _, deferred = extract("""
+        DO $$ BEGIN
+          CREATE INDEX idx_attempts_user ON public.question_attempts(user_id);
+        EXCEPTION WHEN others THEN NULL;
+        END $$;
+    """)
+    assert [(d.name, d.guarded) for d in deferred] == [("idx_attempts_user", True)]
+
+
+def test_conditional_do_block_stays_inline():
+    _, deferred = extract("""
+        DO $$ BEGIN
+          IF NOT EXISTS (SELECT 1 FROM pg_class WHERE relname = 'idx_jobs_x') THEN
+            CREATE INDEX idx_jobs_x ON public.jobs(x);
+          END IF;
+        END $$;
+    """)
+    assert deferred == []
@@ -0,0 +1,49 @@
+from migrator.lint import Linter
+
+
+def lint(*files):
+    linter = Linter()
+    for number, sql in enumerate(files, 1):
+        linter.lint_file(f"{number:03d}_test.sql", sql)
+    return linter.finish()
+
+
+def rules(findings):
+    return [(f.version, f.rule) for f in findings]
+
+
+def test_index_on_materialized_view_created_in_same_file_is_not_flagged():
+    findings = lint("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS public.boards AS
+        SELECT user_id, count(*) AS n FROM public.events GROUP BY user_id;
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_boards_user ON public.boards(user_id);
+    """)
+    assert rules(findings) == []
+
+
+def test_index_on_materialized_view_from_earlier_file_is_flagged():
+    findings = lint(
+        "CREATE MATERIALIZED VIEW public.boards AS SELECT 1 AS user_id;",
+        "CREATE INDEX idx_boards_user ON public.boards(user_id);",
+    )
+    assert rules(findings) == [("002_test.sql", "L001")]
+
+
+def test_recreated_materialized_view_counts_as_new():
+    findings = lint(
+        "CREATE MATERIALIZED VIEW public.boards AS SELECT 1 AS user_id;",
+        """
+        DROP MATERIALIZED VIEW IF EXISTS public.boards;
+        CREATE MATERIALIZED VIEW public.boards AS SELECT 2 AS user_id;
+        CREATE INDEX idx_boards_user ON public.boards(user_id);
+        """,
+    )
+    assert rules(findings) == []
+
+
+def test_create_table_as_counts_as_new():
+    findings = lint("""
+        CREATE TABLE public.snapshot AS SELECT 1 AS user_id;
+        CREATE INDEX idx_snapshot_user ON public.snapshot(user_id);
+    """)
+    assert rules(findings) == []
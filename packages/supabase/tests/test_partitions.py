@@ -0,0 +1,264 @@
+import datetime
+import gzip
+
+import pytest
+
+from migrator import partitions
+from migrator.partitions import ConversionError, Partitioner, TimePartitioned, _qualify, _suffixed
+
+
+class DatabaseError(Exception):
+    def __init__(self, message, pgcode=None):
+        super().__init__(message)
+        self.pgcode = pgcode
+
+
+class Catalog:
+    """
+    Stands in for a psycopg2 connection and its cursors: catalog queries are
+    answered from answers (keyed by SQL or its first words), statements in
+    fail raise their errors in turn, and everything else is recorded as DDL
+    """
+
+    def __init__(self, answers, fail=None):
+        self.answers = answers
+        self.fail = fail or {}
+        self.executed = []
+        self.autocommit = False
+        self.commits = self.rollbacks = 0
+        self.rowcount = -1
+        self._rows = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def execute(self, sql, params=None):
+        for prefix, errors in self.fail.items():
+            if sql.startswith(prefix) and errors:
+                raise errors.pop(0)
+        for key, rows in self.answers.items():
+            if sql == key or sql.startswith(key):
+                self._rows = rows
+                return
+        self._rows = []
+        if not sql.startswith("SELECT set_config"):
+            self.executed.append(sql)
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0]
+
+    @property
+    def ddl(self):
+        return [sql for sql in self.executed if not sql.startswith("SELECT create_monthly")]
+
+
+SPEC = TimePartitioned("public.search_history", premake_months=2)
+
+
+def catalog(**overrides):
+    answers = {
+        partitions.RELKIND_SQL: [("r",)],
+        partitions.COLUMN_SQL: [("timestamp with time zone",)],
+        partitions.BLOCKERS_SQL: [],
+        partitions.PRIMARY_KEY_SQL: [("search_history_pkey", ["id"])],
+        partitions.BOUNDARY_SQL: [(datetime.date(2026, 12, 1),)],
+        partitions.INDEXES_SQL: [
+            ("idx_search_user", "CREATE INDEX idx_search_user ON public.search_history USING btree (user_id)"),
+        ],
+        partitions.TRIGGERS_SQL: [
+            ("search_touch", "CREATE TRIGGER search_touch BEFORE UPDATE ON public.search_history "
+                             "FOR EACH ROW EXECUTE FUNCTION touch()"),
+        ],
+        partitions.POLICIES_SQL: [
+            ("own", "CREATE POLICY own ON public.search_history AS PERMISSIVE FOR SELECT TO authenticated "
+                    "USING ((auth.uid() = user_id))"),
+        ],
+        partitions.GRANTS_SQL: [("GRANT SELECT ON public.search_history TO authenticated",)],
+        partitions.TABLE_SQL: [(True, False, "per-user search history")],
+        partitions.SEQUENCES_SQL: [("public.search_history_seq", "seq")],
+        partitions.VIEWS_SQL: [("public.recent_searches", " SELECT id FROM search_history;", "security_invoker=true")],
+    }
+    answers.update({getattr(partitions, key): rows for key, rows in overrides.items()})
+    return answers
+
+
+def test_suffixed_names_fit_the_identifier_limit():
+    assert _suffixed("jobs", "_legacy") == "jobs_legacy"
+    name = _suffixed("x" * 70, "_partition_bound")
+    assert len(name) == 63 and name.endswith("_partition_bound")
+    assert _qualify("jobs") == "public.jobs"
+    assert _qualify("audit.log") == "audit.log"
+
+
+def test_conversion_ddl():
+    conn = Catalog(catalog())
+    assert Partitioner(conn).convert(SPEC) is True
+    bound = "'2026-12-01 00:00:00+00'::timestamp with time zone"
+    assert conn.ddl == [
+        # 1. bound check, validated separately
+        "ALTER TABLE public.search_history DROP CONSTRAINT IF EXISTS search_history_partition_bound",
+        "ALTER TABLE public.search_history ADD CONSTRAINT search_history_partition_bound "
+        f"CHECK (created_at IS NOT NULL AND created_at < {bound}) NOT VALID",
+        "ALTER TABLE public.search_history VALIDATE CONSTRAINT search_history_partition_bound",
+        # 2. key index including the partition column
+        "DROP INDEX CONCURRENTLY IF EXISTS public.search_history_legacy_pkey",
+        "CREATE UNIQUE INDEX CONCURRENTLY search_history_legacy_pkey ON public.search_history (id, created_at)",
+        # 3. swap
+        "LOCK TABLE public.search_history IN ACCESS EXCLUSIVE MODE",
+        "ALTER TABLE public.search_history ALTER COLUMN created_at SET NOT NULL",
+        "ALTER TABLE public.search_history RENAME TO search_history_legacy",
+        'ALTER INDEX public."idx_search_user" RENAME TO "idx_search_user_legacy"',
+        'DROP TRIGGER "search_touch" ON public.search_history_legacy',
+        'DROP POLICY "own" ON public.search_history_legacy',
+        "ALTER TABLE public.search_history_legacy DROP CONSTRAINT search_history_pkey",
+        "ALTER TABLE public.search_history_legacy ADD CONSTRAINT search_history_legacy_pkey "
+        "PRIMARY KEY USING INDEX search_history_legacy_pkey",
+        "CREATE TABLE public.search_history (LIKE public.search_history_legacy INCLUDING DEFAULTS "
+        "INCLUDING CONSTRAINTS INCLUDING GENERATED INCLUDING STORAGE INCLUDING COMMENTS) "
+        "PARTITION BY RANGE (created_at)",
+        "ALTER TABLE public.search_history DROP CONSTRAINT search_history_partition_bound",
+        "ALTER TABLE public.search_history ADD CONSTRAINT search_history_pkey PRIMARY KEY (id, created_at)",
+        "CREATE INDEX idx_search_user ON public.search_history USING btree (user_id)",
+        "ALTER TABLE public.search_history ATTACH PARTITION public.search_history_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ({bound})",
+        "ALTER TABLE public.search_history_legacy DROP CONSTRAINT search_history_partition_bound",
+        "CREATE TRIGGER search_touch BEFORE UPDATE ON public.search_history FOR EACH ROW EXECUTE FUNCTION touch()",
+        "ALTER TABLE public.search_history ENABLE ROW LEVEL SECURITY",
+        "CREATE POLICY own ON public.search_history AS PERMISSIVE FOR SELECT TO authenticated "
+        "USING ((auth.uid() = user_id))",
+        "GRANT SELECT ON public.search_history TO authenticated",
+        "COMMENT ON TABLE public.search_history IS %s",
+        'ALTER SEQUENCE public.search_history_seq OWNED BY public.search_history."seq"',
+        "CREATE OR REPLACE VIEW public.recent_searches WITH (security_invoker=true) AS  SELECT id FROM search_history;",
+        partitions.REGISTER_SQL,
+        "ANALYZE public.search_history",
+    ]
+    partitions_sql = next(sql for sql in conn.executed if sql.startswith("SELECT create_monthly"))
+    assert "make_interval(months => %s)" in partitions_sql
+    assert conn.autocommit is False
+
+
+def test_table_without_primary_key_skips_the_key_index():
+    conn = Catalog(catalog(PRIMARY_KEY_SQL=[], INDEXES_SQL=[], TRIGGERS_SQL=[], POLICIES_SQL=[],
+                           GRANTS_SQL=[], SEQUENCES_SQL=[], VIEWS_SQL=[], TABLE_SQL=[(False, False, None)]))
+    Partitioner(conn).convert(TimePartitioned("public.jobs_archive", column="archived_at"))
+    assert not any("legacy_pkey" in sql or "PRIMARY KEY" in sql for sql in conn.ddl)
+    assert not any("ROW LEVEL SECURITY" in sql or sql.startswith("COMMENT") for sql in conn.ddl)
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"RELKIND_SQL": []}, "public.search_history does not exist"),
+    ({"COLUMN_SQL": []}, "public.search_history has no column created_at"),
+    ({"COLUMN_SQL": [("text",)]}, "public.search_history.created_at is text, not a timestamp or date"),
+    ({"BLOCKERS_SQL": [("foreign key fk on public.clicks references it",), ("identity column id",)]},
+     "public.search_history cannot be partitioned transparently: "
+     "foreign key fk on public.clicks references it; identity column id"),
+])
+def test_unsuitable_tables_are_refused_before_any_ddl(overrides, message):
+    conn = Catalog(catalog(**overrides))
+    with pytest.raises(ConversionError) as excinfo:
+        Partitioner(conn).convert(SPEC)
+    assert str(excinfo.value) == message
+    assert conn.ddl == []
+
+
+def test_partitioned_table_is_left_alone():
+    conn = Catalog(catalog(RELKIND_SQL=[("p",)]))
+    assert Partitioner(conn).convert(SPEC) is False
+    assert conn.ddl == []
+
+
+def test_failed_validation_removes_the_check_and_key_index():
+    conn = Catalog(catalog(), fail={"ALTER TABLE public.search_history VALIDATE": [DatabaseError("violates")]})
+    with pytest.raises(ConversionError, match="backfill created_at first"):
+        Partitioner(conn).convert(SPEC)
+    assert conn.ddl[-2:] == [
+        "DROP INDEX CONCURRENTLY IF EXISTS public.search_history_legacy_pkey",
+        "ALTER TABLE public.search_history DROP CONSTRAINT IF EXISTS search_history_partition_bound",
+    ]
+    assert not any(sql.startswith("LOCK TABLE") for sql in conn.ddl)
+    assert conn.autocommit is False
+
+
+def test_swap_retries_lock_timeouts(capsys):
+    timeout = DatabaseError("canceling statement due to lock timeout", pgcode="55P03")
+    conn = Catalog(catalog(), fail={"LOCK TABLE": [timeout, timeout]})
+    assert Partitioner(conn, backoff=0).convert(SPEC) is True
+    assert capsys.readouterr().out.count("swap: timed out waiting for a lock") == 2
+    assert sum(sql.startswith("LOCK TABLE") for sql in conn.ddl) == 1
+
+
+def test_swap_out_of_retries_leaves_the_table_as_it_was():
+    timeout = DatabaseError("canceling statement due to lock timeout", pgcode="55P03")
+    conn = Catalog(catalog(), fail={"LOCK TABLE": [timeout] * 3})
+    with pytest.raises(ConversionError, match="lock timeout"):
+        Partitioner(conn, retries=2, backoff=0).convert(SPEC)
+    assert conn.ddl[-1] == "ALTER TABLE public.search_history DROP CONSTRAINT IF EXISTS search_history_partition_bound"
+    assert not any("RENAME" in sql for sql in conn.ddl)
+
+
+class ArchiveCatalog(Catalog):
+    def __init__(self, copied, **kwargs):
+        super().__init__(**kwargs)
+        self.copied = copied
+
+    def copy_expert(self, sql, f):
+        self.executed.append(sql)
+        f.write(b"id,created_at\n1,2025-01-02\n2,2025-01-03\n3,2025-01-04\n")
+        self.rowcount = self.copied
+
+
+def expiring(copied):
+    return ArchiveCatalog(copied, answers={
+        partitions.DETACH_PENDING_SQL: [("public.search_history_p2024_12",)],
+        partitions.EXPIRED_SQL: [("public.search_history_p2025_01", datetime.datetime(2025, 2, 1))],
+        "SELECT count(*)": [(3,)],
+    })
+
+
+def test_expire_detaches_archives_and_drops(tmp_path):
+    conn = expiring(copied=3)
+    assert Partitioner(conn).expire("public.search_history", 12, archive_dir=str(tmp_path)) == 2
+    assert [sql for sql in conn.ddl if "search_history_p2025_01" in sql] == [
+        "ALTER TABLE public.search_history DETACH PARTITION public.search_history_p2025_01 CONCURRENTLY",
+        "COPY public.search_history_p2025_01 TO STDOUT (FORMAT csv, HEADER)",
+        "DROP TABLE public.search_history_p2025_01",
+    ]
+    assert "ALTER TABLE public.search_history DETACH PARTITION public.search_history_p2024_12 FINALIZE" in conn.ddl
+    with gzip.open(tmp_path / "public.search_history_p2025_01.csv.gz", "rt") as f:
+        assert f.read().splitlines()[0] == "id,created_at"
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "public.search_history_p2024_12.csv.gz", "public.search_history_p2025_01.csv.gz",
+    ]
+    assert conn.autocommit is False
+
+
+def test_short_copy_keeps_the_partition(tmp_path):
+    conn = expiring(copied=2)
+    with pytest.raises(RuntimeError, match="copied 2 rows, expected 3"):
+        Partitioner(conn).expire("public.search_history", 12, archive_dir=str(tmp_path))
+    assert not any(sql.startswith("DROP TABLE") for sql in conn.ddl)
+    assert list(tmp_path.glob("*.csv.gz")) == []
+    assert conn.autocommit is False
+
+
+def test_expire_without_archive_dir_only_detaches(capsys):
+    conn = expiring(copied=3)
+    assert Partitioner(conn).expire("public.search_history", 12) == 2
+    assert not any(sql.startswith(("COPY", "DROP TABLE")) for sql in conn.ddl)
+    assert "DETACHED: public.search_history_p2025_01 (kept as a table" in capsys.readouterr().out
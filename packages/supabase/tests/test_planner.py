@@ -0,0 +1,116 @@
+import pytest
+
+from migrator.planner import plan_migrations, print_blocked
+from migrator.runner import Migration
+
+
+@pytest.fixture
+def write(tmp_path):
+    migrations = []
+
+    def write(name, sql):
+        path = tmp_path / name
+        path.write_text(sql, encoding="utf-8")
+        migrations.append(Migration(version=f"migrations/{name}", path=str(path), rewrite=False))
+        return migrations
+
+    return write
+
+
+def problems(plan):
+    return [(p.severity, p.version, p.line, p.message) for p in plan.problems]
+
+
+def test_dependencies_point_back_to_the_creating_file(write):
+    write("001_notes.sql", "CREATE TABLE public.notes (id int, user_id uuid REFERENCES auth.users(id));")
+    write("002_boards.sql", "CREATE TABLE boards (id int, note_id int REFERENCES notes(id));")
+    migrations = write("003_index.sql", "\nCREATE INDEX idx_boards_note ON public.boards(note_id);")
+    plan = plan_migrations(migrations, jobs=1)
+    assert plan.edges == {1: {0: ["relation notes"]}, 2: {1: ["relation boards"]}}
+    # auth.users belongs to Supabase, not to any migration
+    assert problems(plan) == []
+    assert plan.order is None
+
+
+def test_forward_reference_is_an_error_with_a_working_order(write):
+    write("001_index.sql", "\n\nCREATE INDEX idx_notes ON notes(id);")
+    write("002_notes.sql", "CREATE TABLE notes (id int);")
+    migrations = write("003_other.sql", "CREATE TABLE other (id int);")
+    plan = plan_migrations(migrations, jobs=1)
+    assert problems(plan) == [
+        ("error", "migrations/001_index.sql", 3, "relation notes is created later, by migrations/002_notes.sql"),
+    ]
+    assert plan.order == ["migrations/002_notes.sql", "migrations/001_index.sql", "migrations/003_other.sql"]
+
+
+def test_references_inside_do_blocks_only_warn(write):
+    write("001_policy.sql", """
+        DO $$ BEGIN
+          CREATE POLICY own ON notes USING (true);
+        EXCEPTION WHEN undefined_table THEN NULL;
+        END $$;
+        ALTER TABLE missing ADD COLUMN x int;
+    """)
+    migrations = write("002_notes.sql", "CREATE TABLE notes (id int);")
+    plan = plan_migrations(migrations, jobs=1)
+    assert problems(plan) == [
+        ("warning", "migrations/001_policy.sql", 3, "relation notes is created later, by migrations/002_notes.sql"),
+        ("warning", "migrations/001_policy.sql", 6, "relation missing is not created by any migration"),
+    ]
+    assert plan.errors() == []
+    assert plan.order is None
+
+
+def test_function_and_type_references(write):
+    write("001_types.sql", """
+        CREATE TYPE job_status AS ENUM ('queued', 'done');
+        CREATE FUNCTION touch() RETURNS trigger AS $$ BEGIN RETURN NEW; END $$ LANGUAGE plpgsql;
+    """)
+    migrations = write("002_jobs.sql", """
+        CREATE TABLE jobs (id int, status job_status);
+        CREATE TRIGGER jobs_touch BEFORE UPDATE ON jobs FOR EACH ROW EXECUTE FUNCTION touch();
+    """)
+    plan = plan_migrations(migrations, jobs=1)
+    assert sorted(plan.edges[1][0]) == ["function touch", "type job_status"]
+    assert problems(plan) == []
+
+
+def test_blocked_by_is_transitive(write, capsys):
+    write("001_notes.sql", "CREATE TABLE notes (id int);")
+    write("002_boards.sql", "CREATE TABLE boards (id int REFERENCES notes(id));")
+    write("003_pins.sql", "CREATE TABLE pins (id int REFERENCES boards(id));")
+    migrations = write("004_tags.sql", "CREATE TABLE tags (id int);")
+    plan = plan_migrations(migrations, jobs=1)
+    assert plan.blocked_by(0) == [1, 2]
+    assert plan.blocked_by(2) == []
+    assert plan.index("002") == 1
+
+    print_blocked(plan, 0)
+    assert capsys.readouterr().out == (
+        "This blocks 2 later migration(s):\n"
+        "  migrations/002_boards.sql (needs relation notes)\n"
+        "  migrations/003_pins.sql (indirectly)\n"
+    )
+    print_blocked(plan, 0, pending_versions={"migrations/004_tags.sql"})
+    assert capsys.readouterr().out == "No later migration depends on it.\n"
+
+
+def test_lint_classifies_locks_on_existing_tables(write):
+    write("001_jobs.sql", """
+        CREATE TABLE jobs (id int, status text);
+        CREATE INDEX idx_jobs_status ON jobs(status);
+    """)
+    migrations = write("002_jobs.sql", """
+        CREATE INDEX idx_jobs_id ON jobs(id);
+        ALTER TABLE jobs ALTER COLUMN status SET NOT NULL;
+        ALTER TABLE jobs ALTER COLUMN id TYPE bigint;
+        -- migrator:lint-ignore L001
+        CREATE INDEX idx_jobs_both ON jobs(id, status);
+    """)
+    plan = plan_migrations(migrations, jobs=1, lint=True)
+    # Nothing is reported for the file that creates the table
+    assert [(f.version, f.line, f.rule, f.severity) for f in plan.findings] == [
+        ("migrations/002_jobs.sql", 2, "L001", "warning"),
+        ("migrations/002_jobs.sql", 3, "L006", "warning"),
+        ("migrations/002_jobs.sql", 4, "L003", "error"),
+    ]
@@ -0,0 +1,133 @@
+import pytest
+
+from migrator.rest import EXEC_SQL_DDL, MissingPrerequisite, exposed_objects, pack, unbatchable
+from migrator.sql_lexer import split_statements
+
+
+def statements(sql):
+    return split_statements(sql).statements
+
+
+def test_pack_keeps_order_and_respects_the_limit():
+    stmts = statements("".join(f"INSERT INTO t VALUES ({n});\n" for n in range(10)))
+    size = len(stmts[0].text) + 1
+    batches = pack(stmts, max_bytes=size * 3)
+    assert [len(b.statements) for b in batches] == [3, 3, 3, 1]
+    assert [s for b in batches for s in b.statements] == stmts
+    assert batches[1].lines == "4-6"
+
+
+def test_oversized_statement_gets_its_own_batch():
+    stmts = statements("SELECT 1;\nSELECT '" + "x" * 100 + "';\nSELECT 2;")
+    assert [len(b.statements) for b in pack(stmts, max_bytes=50)] == [1, 1, 1]
+
+
+def test_whole_file_fits_in_one_request():
+    stmts = statements("CREATE TABLE a (id int);\nCREATE TABLE b (id int);")
+    (batch,) = pack(stmts, max_bytes=512 * 1024)
+    assert batch.sql() == "CREATE TABLE a (id int);\nCREATE TABLE b (id int);"
+
+
+@pytest.mark.parametrize("sql, refused", [
+    ("CREATE INDEX CONCURRENTLY idx ON t(id);", True),
+    ("CREATE UNIQUE INDEX CONCURRENTLY idx ON t(id);", True),
+    ("VACUUM ANALYZE t;", True),
+    ("BEGIN;", True),
+    ("COMMIT;", True),
+    ("CREATE INDEX idx ON t(id);", False),
+    ("DO $$ BEGIN PERFORM 1; END $$;", False),
+])
+def test_unbatchable(sql, refused):
+    (stmt,) = statements(sql)
+    assert (unbatchable(stmt) is not None) == refused
+
+
+def test_exposed_objects_lists_public_tables_views_and_functions():
+    sql = """
+        CREATE TABLE IF NOT EXISTS public.notes (id int);
+        CREATE OR REPLACE VIEW note_titles AS SELECT 1;
+        CREATE MATERIALIZED VIEW IF NOT EXISTS public.boards AS SELECT 1;
+        CREATE UNLOGGED TABLE staging (id int);
+        CREATE OR REPLACE FUNCTION get_notes() RETURNS int AS $$ SELECT 1 $$ LANGUAGE sql;
+        CREATE TABLE audit.log (id int);
+        CREATE INDEX idx_notes ON notes(id);
+        DO $migration$ BEGIN CREATE TABLE wrapped (id int); END $migration$;
+    """
+    assert exposed_objects(sql) == {
+        "/notes", "/note_titles", "/boards", "/staging", "/rpc/get_notes", "/wrapped",
+    }
+
+
+def test_exec_sql_ddl_is_service_role_only():
+    ddl = EXEC_SQL_DDL.format(rpc="exec_sql", param="sql_query")
+    assert "SECURITY DEFINER SET search_path" in ddl
+    assert "FROM PUBLIC, anon, authenticated" in ddl
+    assert ddl.rstrip().endswith("TO service_role;")
+    assert len(statements(ddl)) == 3
+
+
+class Response:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class OpenApiSession:
+    """GET /rest/v1/ answers come from a script, one per poll"""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.gets = 0
+
+    def get(self, url, timeout):
+        self.gets += 1
+        return self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def applier():
+    pytest.importorskip("requests")
+    from migrator.rest import RestApplier
+
+    applier = RestApplier("http://localhost:8001/", "anon", "service", ready_timeout=2)
+    yield applier
+    applier.close()
+
+
+def test_wait_ready_polls_until_expected_paths_appear(applier):
+    applier.session = OpenApiSession(
+        Response(503, None),
+        Response(200, {"paths": {"/rpc/exec_sql": {}}}),
+        Response(200, {"paths": {"/rpc/exec_sql": {}, "/notes": {}}}),
+    )
+    assert applier.wait_ready(expect={"/notes"}, require={"/rpc/exec_sql"}) is not None
+    assert applier.session.gets == 3
+
+
+def test_missing_prerequisite_fails_on_first_answer(applier):
+    applier.session = OpenApiSession(Response(200, {"paths": {"/notes": {}}}))
+    with pytest.raises(MissingPrerequisite, match="/rpc/exec_sql"):
+        applier.wait_ready(require={"/rpc/exec_sql"})
+    assert applier.session.gets == 1
+
+
+def test_rest_apply_prints_the_prerequisite_ddl(applier, monkeypatch, capsys):
+    from migrator import rest
+    from migrator.__main__ import main
+
+    class Applier(rest.RestApplier):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.session = OpenApiSession(Response(200, {"paths": {}}))
+
+    monkeypatch.setattr(rest, "RestApplier", Applier)
+    assert main(["rest-apply", "022", "--url", "http://localhost:8001"]) == 1
+    out = capsys.readouterr().out
+    assert "does not expose /rpc/exec_sql" in out
+    assert EXEC_SQL_DDL.format(rpc="exec_sql", param="sql_query") in out
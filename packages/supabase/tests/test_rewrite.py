@@ -0,0 +1,111 @@
+import pytest
+
+from migrator.rewrite import optimize_policies, restore_sql, rewrite_sql
+from migrator.runner import discover_migrations
+from migrator.sql_lexer import (
+    BLOCK_COMMENT, DOLLAR, LINE_COMMENT, NUMBER, PARAM, PUNCT, QUOTED_IDENT, SEMI, STRING, WORD, WS,
+    LexError, split_statements, tokenize,
+)
+
+
+def kinds(sql):
+    return [(t.kind, t.text) for t in tokenize(sql) if t.kind != WS]
+
+
+def test_dollar_quote_with_tag_swallows_other_tags_and_semicolons():
+    sql = "DO $fn$ BEGIN EXECUTE $$ SELECT 1; $$; END $fn$;"
+    assert kinds(sql) == [
+        (WORD, "DO"),
+        (DOLLAR, "$fn$ BEGIN EXECUTE $$ SELECT 1; $$; END $fn$"),
+        (SEMI, ";"),
+    ]
+    assert tokenize(sql)[2].dollar_tag == "$fn$"
+
+
+def test_positional_parameter_is_not_a_dollar_quote():
+    assert kinds("SELECT $1 * $2") == [(WORD, "SELECT"), (PARAM, "$1"), (PUNCT, "*"), (PARAM, "$2")]
+
+
+def test_nested_block_comments():
+    sql = "SELECT /* outer /* inner; */ still comment; */ 1;"
+    assert kinds(sql) == [
+        (WORD, "SELECT"),
+        (BLOCK_COMMENT, "/* outer /* inner; */ still comment; */"),
+        (NUMBER, "1"),
+        (SEMI, ";"),
+    ]
+
+
+def test_line_comment_hides_quotes():
+    assert kinds("-- it's fine\nSELECT 1") == [
+        (LINE_COMMENT, "-- it's fine"), (WORD, "SELECT"), (NUMBER, "1"),
+    ]
+
+
+def test_escape_string_backslash_quote():
+    sql = r"SELECT E'it\'s; done', 'plain''s';"
+    assert kinds(sql) == [
+        (WORD, "SELECT"),
+        (STRING, r"E'it\'s; done'"),
+        (PUNCT, ","),
+        (STRING, "'plain''s'"),
+        (SEMI, ";"),
+    ]
+
+
+def test_plain_string_keeps_backslash_literal():
+    # Without the E prefix a backslash is an ordinary character
+    assert kinds(r"SELECT 'a\', 'b'") == [
+        (WORD, "SELECT"), (STRING, r"'a\'"), (PUNCT, ","), (STRING, "'b'"),
+    ]
+
+
+def test_quoted_identifier_with_doubled_quote_and_keyword():
+    sql = 'CREATE TABLE "odd ""name""; table" ("select" int);'
+    tokens = kinds(sql)
+    assert (QUOTED_IDENT, '"odd ""name""; table"') in tokens
+    assert (QUOTED_IDENT, '"select"') in tokens
+    assert [t for t in tokens if t[0] == SEMI] == [(SEMI, ";")]
+
+
+@pytest.mark.parametrize("sql", ["SELECT 'open", "/* open /* nested */", 'SELECT "open', "DO $x$ BEGIN"])
+def test_unterminated_tokens_raise(sql):
+    with pytest.raises(LexError):
+        tokenize(sql)
+
+
+def test_split_ignores_semicolons_inside_tokens():
+    sql = "SELECT ';'; DO $$ BEGIN NULL; END $$; /* ; */ SELECT \"a;b\";\n"
+    script = split_statements(sql)
+    assert len(script.statements) == 3
+    assert str(script) == sql
+
+
+MIGRATIONS = discover_migrations(include_destructive=True)
+
+
+@pytest.fixture(params=MIGRATIONS, ids=[m.version for m in MIGRATIONS])
+def source(request):
+    return request.param.read()
+
+
+def test_migrations_were_found_in_both_directories():
+    dirs = {m.version.rsplit("/", 1)[0] for m in MIGRATIONS}
+    assert dirs == {"migrations", "supabase/migrations"}
+
+
+def test_lexer_round_trip(source):
+    assert "".join(t.text for t in tokenize(source)) == source
+    assert str(split_statements(source)) == source
+
+
+def test_rewrite_is_reversible_and_idempotent(source):
+    rewritten = rewrite_sql(source)
+    assert restore_sql(rewritten) == source
+    assert rewrite_sql(rewritten) == rewritten
+
+
+def test_rls_pass_is_reversible_and_idempotent(source):
+    optimized = rewrite_sql(optimize_policies(source))
+    assert restore_sql(optimized) == source
+    assert rewrite_sql(optimize_policies(optimized)) == optimized
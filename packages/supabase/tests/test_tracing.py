@@ -0,0 +1,94 @@
+import json
+
+from migrator.sql_lexer import split_statements
+from migrator.tracing import LOCK_QUERY, Tracer
+
+SQL = """
+CREATE TABLE public.notes (id int);
+ALTER TABLE public.jobs ADD COLUMN note text;
+UPDATE public.jobs SET note = 'x';
+"""
+
+# Locks held by the backend after each statement, cumulatively, as pg_locks shows them
+HELD_AFTER = [
+    [("relation", "public.notes", "AccessExclusiveLock")],
+    [("relation", "public.notes", "AccessExclusiveLock"), ("relation", "public.jobs", "AccessExclusiveLock")],
+    [("relation", "public.notes", "AccessExclusiveLock"), ("relation", "public.jobs", "AccessExclusiveLock"),
+     ("relation", "public.jobs", "RowExclusiveLock")],
+]
+
+
+class LockCursor:
+    """Stands in for the migration cursor: statements run, pg_locks is scripted"""
+
+    def __init__(self):
+        self.executed = []
+        self.rowcount = -1
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        if sql == LOCK_QUERY:
+            self._rows = HELD_AFTER[len(self.executed) - 1]
+            return
+        self.executed.append(sql)
+        self.rowcount = 7 if sql.startswith("UPDATE") else -1
+
+    def fetchall(self):
+        return self._rows
+
+
+def traced_file(tracer, version="migrations/900_test.sql", seconds=(0.5, 2.0, 1.0), committed=True):
+    cur = LockCursor()
+    tracer.begin_file(conn=None)
+    traces = []
+    for index, stmt in enumerate(split_statements(SQL).statements):
+        traces.append(tracer.execute(cur, version, index, stmt))
+        traces[-1].seconds = seconds[index]
+    tracer.end_file(committed)
+    return traces
+
+
+def test_each_statement_is_charged_only_the_locks_it_acquired():
+    create, alter, update = traced_file(Tracer())
+    assert create.kind == "CREATE TABLE PUBLIC"
+    assert create.line == 2
+    assert create.locks == ["public.notes AccessExclusiveLock"]
+    assert alter.locks == ["public.jobs AccessExclusiveLock"]
+    assert update.locks == ["public.jobs RowExclusiveLock"]
+    assert update.rowcount == 7
+    assert update.blocking_locks == []
+
+
+def test_locks_are_held_until_commit():
+    create, alter, update = traced_file(Tracer())
+    assert create.held_until_commit_seconds == 3.5
+    assert alter.held_until_commit_seconds == 3.0
+    assert update.held_until_commit_seconds == 1.0
+    assert alter.lock_impact == 3.0
+
+
+def test_rolled_back_files_are_not_reported():
+    tracer = Tracer()
+    traced_file(tracer, committed=False)
+    assert tracer.traces == []
+    traced_file(tracer)
+    assert len(tracer.traces) == 3
+
+
+def test_report_ranks_by_time_and_lock_impact(tmp_path):
+    tracer = Tracer()
+    traced_file(tracer)
+    report = tracer.report(top=2)
+    assert report["statements"] == 3
+    assert report["total_seconds"] == 3.5
+    assert [row["kind"] for row in report["slowest"]] == ["ALTER TABLE PUBLIC", "UPDATE PUBLIC"]
+    # The CREATE holds its lock longest, so it outranks the slower ALTER
+    assert [row["line"] for row in report["lock_heavy"]] == [2, 3]
+    assert report["lock_waits"] == []
+
+    md_path = tracer.write_report(str(tmp_path))
+    markdown = open(md_path, encoding="utf-8").read()
+    assert "## Slowest statements" in markdown
+    assert "migrations/900_test.sql:3" in markdown
+    json_path = md_path[:-len(".md")] + ".json"
+    assert json.load(open(json_path, encoding="utf-8"))["statements"] == 3
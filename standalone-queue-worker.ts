@@ -146,49 +146,29 @@ async function processQueue(config: JobQueueConfig) {
     return;
   }
 
-  // Get next jobs from queue (FIFO by priority, then queue_position)
-  const queuedJobs: VideoJob[] = await dbFetch(
-    `/rest/v1/jobs?status=eq.queued&order=priority.desc,queue_position.asc&limit=${availableSlots}`
-  );
-
-  if (!queuedJobs || queuedJobs.length === 0) {
+  // Claim jobs with one dequeue_jobs call across all job types, which marks
+  // them processing in priority and enqueue order under FOR UPDATE SKIP
+  // LOCKED, so overlapping worker runs never double-start a job. The Manim
+  // limit is passed as a per-type cap, so topic_short jobs over it stay
+  // queued in place instead of being claimed and handed back.
+  const manimSlots = Math.max(0, config.max_manim_renders - currentManimJobs);
+  const startedJobs: VideoJob[] = (await dbFetch("/rest/v1/rpc/dequeue_jobs", {
+    method: "POST",
+    body: JSON.stringify({
+      p_limit: availableSlots,
+      p_type_limits: { topic_short: manimSlots },
+    }),
+  })) || [];
+  const manimStarted = startedJobs.filter((j) => j.job_type === "topic_short").length;
+
+  if (startedJobs.length === 0) {
     console.log("[QUEUE] No jobs in queue");
     return;
   }
 
-  let jobsStarted = 0;
-  let manimStarted = 0;
-
-  for (const job of queuedJobs) {
-    // Check Manim-specific limit
-    if (
-      job.job_type === "topic_short" &&
-      currentManimJobs + manimStarted >= config.max_manim_renders
-    ) {
-      console.log(
-        `[QUEUE] Manim limit reached (${config.max_manim_renders}), skipping job ${job.id}`
-      );
-      continue;
-    }
-
-    // Mark job as processing
-    await dbFetch(`/rest/v1/jobs?id=eq.${job.id}`, {
-      method: "PATCH",
-      headers: { Prefer: "return=minimal" },
-      body: JSON.stringify({
-        status: "processing",
-        started_at: new Date().toISOString(),
-        updated_at: new Date().toISOString(),
-      }),
-    });
-
-    jobsStarted++;
-    if (job.job_type === "topic_short") {
-      manimStarted++;
-    }
-
+  for (const job of startedJobs) {
     console.log(
-      `[QUEUE] Started job ${job.id} | Type: ${job.job_type} | Priority: ${job.priority} | Queue pos: ${job.queue_position}`
+      `[QUEUE] Started job ${job.id} | Type: ${job.job_type} | Priority: ${job.priority}`
     );
 
     // TODO: Call actual render services here
@@ -201,9 +181,7 @@ async function processQueue(config: JobQueueConfig) {
     // }
   }
 
-  if (jobsStarted > 0) {
-    console.log(`[QUEUE] Started ${jobsStarted} jobs (${manimStarted} Manim)`);
-  }
+  console.log(`[QUEUE] Started ${startedJobs.length} jobs (${manimStarted} Manim)`);
 }
 
 // Main Handler